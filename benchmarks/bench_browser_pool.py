@@ -0,0 +1,93 @@
+"""浏览器池基准：对比每个任务单独启动浏览器和从 BrowserPool 租用浏览器的耗时
+
+用法：python benchmarks/bench_browser_pool.py --tasks 30 --concurrency 3 [--executable-path /path/to/chrome]
+每个任务模拟一次上传的浏览器部分：新建上下文和页面、加载一个本地页面、关闭上下文。
+两种方式都在同一个事件循环中运行，同时用 LoopWatchdog 记录事件循环的最大停顿（应远小于 1 秒）。
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from patchright.async_api import async_playwright
+
+from social_auto_upload.utils.browser_pool import BrowserPool, LoopWatchdog
+
+PAGE = "data:text/html,<html><body><input type='file'><div id='title' contenteditable>title</div></body></html>"
+
+
+async def browser_work(browser):
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        await page.goto(PAGE)
+        await page.locator('#title').fill('benchmark')
+    finally:
+        await context.close()
+
+
+async def run_per_task(options, tasks, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with async_playwright() as playwright:
+        async def one():
+            async with semaphore:
+                browser = await playwright.chromium.launch(**options)
+                try:
+                    await browser_work(browser)
+                finally:
+                    await browser.close()
+
+        await asyncio.gather(*(one() for _ in range(tasks)))
+    return tasks
+
+
+async def run_pooled(options, tasks, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    pool = BrowserPool(idle_timeout=0)
+    try:
+        async def one():
+            async with semaphore:
+                async with pool.lease(options) as browser:
+                    await browser_work(browser)
+
+        await asyncio.gather(*(one() for _ in range(tasks)))
+    finally:
+        await pool.close()
+    return pool.launched
+
+
+async def measure(name, runner, options, tasks, concurrency):
+    watchdog = LoopWatchdog(asyncio.get_running_loop(), threading.get_ident(), threshold=1, interval=0.05).start()
+    started = time.perf_counter()
+    try:
+        launched = await runner(options, tasks, concurrency)
+    finally:
+        watchdog.stop()
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {tasks} 个任务，启动浏览器 {launched} 次，总耗时 {elapsed:.1f}s，"
+          f"平均每任务 {elapsed / tasks * 1000:.0f}ms，事件循环最大停顿 {watchdog.max_lag * 1000:.0f}ms")
+    return elapsed
+
+
+async def run(tasks, concurrency, executable_path, headless):
+    options = {'headless': headless}
+    if executable_path:
+        options['executable_path'] = executable_path
+    per_task = await measure('每任务启动', run_per_task, options, tasks, concurrency)
+    pooled = await measure('浏览器池', run_pooled, options, tasks, concurrency)
+    print(f"浏览器池耗时为每任务启动的 {pooled / per_task * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=3)
+    parser.add_argument('--executable-path', default='')
+    parser.add_argument('--headed', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.concurrency, args.executable_path, not args.headed))
@@ -0,0 +1,116 @@
+"""视频号接口客户端基准：本地 aiohttp 服务模拟视频号接口（固定延迟），对比每次请求新建会话和复用一个客户端的延迟
+
+用法：python benchmarks/bench_channels_api.py --requests 200 --latency 0.02 [--tls]
+每次新建会话相当于改造前每个删除 / 隐藏调用都新建 ClientSession，需要重新建立 TCP（和 TLS）连接；
+--tls 时本地服务使用自签名证书，更接近真实的 HTTPS 握手开销。
+"""
+import argparse
+import asyncio
+import json
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from aiohttp import web
+
+from social_auto_upload.uploader.tencent_uploader import channels_api
+from social_auto_upload.uploader.tencent_uploader.channels_api import ChannelsApiClient
+
+
+def _ssl_context(tmp_dir):
+    cert, key = Path(tmp_dir) / 'cert.pem', Path(tmp_dir) / 'key.pem'
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-keyout', str(key), '-out', str(cert)], check=True, capture_output=True)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start_stub(latency, ssl_context):
+    async def handle(request):
+        await request.read()
+        await asyncio.sleep(latency)
+        return web.json_response({'errCode': 0, 'data': {'list': [], 'totalCount': 0}})
+
+    app = web.Application()
+    app.router.add_route('POST', '/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=ssl_context)
+    await site.start()
+    scheme = 'https' if ssl_context else 'http'
+    channels_api.POST_LIST_URL = f"{scheme}://127.0.0.1:{runner.addresses[0][1]}/post_list"
+    return runner
+
+
+async def per_request(account_file, requests, concurrency):
+    """改造前的方式：每次请求新建会话（连接池）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            async with ChannelsApiClient(account_file) as client:
+                await client.post_list(0, 1)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def pooled(account_file, requests, concurrency):
+    """同一账号复用一个客户端"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    async with ChannelsApiClient(account_file, limit=concurrency) as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await client.post_list(0, 1)
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{name}: {len(latencies)} 次请求，总耗时 {elapsed:.2f}s，"
+          f"平均 {sum(latencies) / len(latencies) * 1000:.1f}ms，p50 {p50:.1f}ms，p95 {p95:.1f}ms")
+
+
+async def run(requests, latency, concurrency, tls):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        account_file = Path(tmp_dir) / 'account.json'
+        account_file.write_text(json.dumps({'cookies': [
+            {'name': 'sessionid', 'value': 's', 'domain': '.channels.weixin.qq.com'},
+            {'name': 'wxuin', 'value': '1', 'domain': '.weixin.qq.com'},
+        ]}), encoding='utf-8')
+        runner = await start_stub(latency, _ssl_context(tmp_dir) if tls else None)
+        try:
+            print(f"接口延迟 {latency * 1000:.0f}ms，并发 {concurrency}，{'HTTPS' if tls else 'HTTP'}")
+            for name, runner_func in (('每次新建会话', per_request), ('复用客户端', pooled)):
+                started = time.perf_counter()
+                latencies = await runner_func(str(account_file), requests, concurrency)
+                report(name, latencies, time.perf_counter() - started)
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--tls', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.latency, args.concurrency, args.tls))
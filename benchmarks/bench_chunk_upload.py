@@ -0,0 +1,93 @@
+"""分块上传内存基准：按 /uploadChunk/<uploadId> 的方式逐块写入一个数 GB 的文件，采样进程 RSS
+
+用法：python benchmarks/bench_chunk_upload.py --size-gb 4 --chunk-mb 64
+write_chunk 接收的是请求流（与路由传入的 request.stream 相同，只能按块 read），
+内存占用应只与 STREAM_BLOCK_SIZE 有关，峰值 RSS 不随文件大小增长。
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from myUtils.chunkUpload import ChunkUploadManager
+
+MB = 1024 * 1024
+
+
+class BodyStream(object):
+    """模拟请求体：共 size 字节，每次 read 返回新分配的块，不在内存中保留整个分块"""
+
+    def __init__(self, size, seed):
+        self.remaining = size
+        self.pattern = bytes((seed + i) % 256 for i in range(256)) * 4096  # 1MB
+
+    def read(self, n=-1):
+        if self.remaining <= 0:
+            return b''
+        n = self.remaining if n is None or n < 0 else min(n, self.remaining)
+        n = min(n, len(self.pattern))
+        self.remaining -= n
+        return self.pattern[:n]
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.process = psutil.Process()
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.samples.append(self.process.memory_info().rss)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run(size_gb, chunk_mb):
+    total = int(size_gb * 1024 * MB)
+    chunk = chunk_mb * MB
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ChunkUploadManager(tmp_dir=Path(tmp_dir) / '.uploads', video_dir=tmp_dir)
+        upload_id = manager.init('big.mp4', total)['uploadId']
+        baseline = psutil.Process().memory_info().rss
+        sampler = RssSampler()
+        sampler.start()
+        started = time.perf_counter()
+        offset, index, checkpoints = 0, 0, []
+        while offset < total:
+            size = min(chunk, total - offset)
+            offset = manager.write_chunk(upload_id, offset, BodyStream(size, index))
+            index += 1
+            if index % max(1, (total // chunk) // 4) == 0:
+                checkpoints.append((offset, psutil.Process().memory_info().rss))
+        _, _, size, md5 = manager.finalize(upload_id)
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+        manager.complete(upload_id)
+
+    peak = max(sampler.samples)
+    print(f"上传 {size / 1024 / MB:.2f} GB，{index} 个分块（每块 {chunk_mb} MB），耗时 {elapsed:.1f}s，"
+          f"{size / MB / elapsed:.0f} MB/s，md5 {md5}")
+    print(f"初始 RSS {baseline / MB:.1f} MB，峰值 RSS {peak / MB:.1f} MB（增长 {(peak - baseline) / MB:.1f} MB）")
+    for written, rss in checkpoints:
+        print(f"  已写入 {written / 1024 / MB:.2f} GB 时 RSS {rss / MB:.1f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-gb', type=float, default=4)
+    parser.add_argument('--chunk-mb', type=int, default=64)
+    args = parser.parse_args()
+    run(args.size_gb, args.chunk_mb)
@@ -0,0 +1,66 @@
+"""cookie 探测基准：本地 aiohttp 服务模拟登录态接口（固定延迟），测量并发探测一批账号的耗时
+
+用法：python benchmarks/bench_cookie_probe.py --accounts 200 --latency 0.05
+浏览器校验每个账号需要启动上下文并打开页面（通常数秒），可与这里的每账号耗时对比。
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from aiohttp import web
+
+from social_auto_upload.utils import cookie_probe
+
+
+async def run(accounts, latency, concurrency):
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.json_response({'errCode': 0, 'data': {}})
+
+    app = web.Application()
+    app.router.add_route('*', '/probe', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    cookie_probe.PROBES[2].url = f"http://127.0.0.1:{runner.addresses[0][1]}/probe"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        account_file = Path(tmp_dir) / 'account.json'
+        account_file.write_text(json.dumps({'cookies': [
+            {'name': 'sessionid', 'value': 's', 'domain': '.weixin.qq.com'},
+            {'name': 'wxuin', 'value': '1', 'domain': '.weixin.qq.com'},
+        ]}), encoding='utf-8')
+        semaphore = asyncio.Semaphore(concurrency)
+        session = cookie_probe.create_probe_session()
+
+        async def probe_one():
+            async with semaphore:
+                return await cookie_probe.probe_cookie(2, str(account_file), session=session)
+
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(probe_one() for _ in range(accounts)))
+            elapsed = time.perf_counter() - started
+        finally:
+            await session.close()
+            await runner.cleanup()
+
+    print(f"账号数 {accounts}，并发 {concurrency}，接口延迟 {latency * 1000:.0f}ms")
+    print(f"有效 {results.count(True)}，总耗时 {elapsed:.2f}s，平均每账号 {elapsed / accounts * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.accounts, args.latency, args.concurrency))
@@ -0,0 +1,67 @@
+"""分页查询基准：在临时数据库写入大量 file_records / user_info，用 nextCursor 翻完全部数据
+
+用法：python benchmarks/bench_list_query.py --rows 100000 --limit 500
+检查每条记录恰好返回一次，并输出每页平均耗时和最慢一页的耗时。
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from myUtils import listQuery
+from myUtils.database import Database
+
+
+def seed(database, rows):
+    start = datetime(2025, 1, 1)
+    with database.connection() as conn:
+        # 每 10 条共用一个上传时间，覆盖游标中 upload_time 相同、按 id 区分的情况
+        conn.executemany(
+            "INSERT INTO file_records (filename, filesize, upload_time, file_path) VALUES (?, ?, ?, ?)",
+            ((f"video_{i}.mp4", i % 500 + 0.5, (start + timedelta(seconds=i // 10)).strftime('%Y-%m-%d %H:%M:%S'),
+              f"{i}_video_{i}.mp4") for i in range(rows)))
+        conn.executemany(
+            "INSERT INTO user_info (type, filePath, userName, status) VALUES (?, ?, ?, ?)",
+            ((i % 4 + 1, f"{i}.json", f"user_{i}", i % 2) for i in range(rows)))
+
+
+def page_through(query, args):
+    seen, timings, cursor = [], [], None
+    while True:
+        started = time.perf_counter()
+        page = query(dict(args, cursor=cursor) if cursor else args)
+        timings.append(time.perf_counter() - started)
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['nextCursor']
+        if not page['hasMore']:
+            return seen, timings
+
+
+def report(name, rows, seen, timings):
+    assert len(seen) == rows and len(set(seen)) == rows, f"{name}: 返回 {len(seen)} 条，去重后 {len(set(seen))} 条"
+    print(f"{name}: {rows} 条，{len(timings)} 页，平均每页 {sum(timings) / len(timings) * 1000:.1f}ms，"
+          f"最慢 {max(timings) * 1000:.1f}ms，总耗时 {sum(timings):.2f}s")
+
+
+def run(rows, limit):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        listQuery.db = Database(Path(tmp_dir) / 'bench.db')
+        started = time.perf_counter()
+        seed(listQuery.db, rows)
+        print(f"写入 {rows} 条记录耗时 {time.perf_counter() - started:.2f}s，每页 {limit} 条")
+        args = {'limit': str(limit), 'fields': 'id,filename'}
+        report('/getFilesPage', rows, *page_through(listQuery.query_files, args))
+        report('/getAccountsPage', rows, *page_through(listQuery.query_accounts, args | {'fields': 'id,userName'}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=500)
+    args = parser.parse_args()
+    run(args.rows, args.limit)
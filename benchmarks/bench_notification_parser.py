@@ -0,0 +1,81 @@
+"""违规通知解析基准：对比逐个正则匹配的旧解析方式和 notification_parser 的单次扫描
+
+用法：python benchmarks/bench_notification_parser.py --count 50000
+通知内容轮流使用 "作品标题：xxx  发布时间：..."、"作品标题：xxx发布时间：..." 和 "你于...发表的短剧视频..." 三种格式，
+先检查两种方式解析出的发布时间和 objectId 一致，再分别计时。
+"""
+import argparse
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from social_auto_upload.uploader.tencent_uploader import notification_parser
+
+
+def legacy_extract(content, ref_url):
+    """改造前 main_tz_violation.extract_video_info_from_notification 的解析方式（每次调用重新匹配各个正则）"""
+    title_match = re.search(r'作品标题：\s*(.+)', content)
+    if title_match:
+        video_title = title_match.group(1).strip()
+    else:
+        title_match2 = re.search(r'短剧视频["\s]*[#《]*([^"\.]+)', content)
+        video_title = title_match2.group(1).strip().rstrip('...') if title_match2 else ''
+    time_match = re.search(r'发布时间：(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', content)
+    if not time_match:
+        time_match = re.search(r'你于(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})发表的', content)
+    publish_timestamp = 0
+    if time_match:
+        publish_timestamp = int(datetime.strptime(time_match.group(1), '%Y-%m-%d %H:%M:%S').timestamp())
+    object_id = ''
+    if ref_url:
+        object_id_match = re.search(r'unique_id=mmfindermachineauditdelivery(\d+)', ref_url)
+        if object_id_match:
+            object_id = object_id_match.group(1)
+    return video_title, publish_timestamp, object_id
+
+
+def build_notifications(count):
+    start = datetime(2026, 6, 1)
+    notifications = []
+    for i in range(count):
+        time_str = (start + timedelta(seconds=i * 37)).strftime('%Y-%m-%d %H:%M:%S')
+        layout = i % 3
+        if layout == 0:
+            content = f'作品标题：短剧第{i}集  发布时间：{time_str}'
+        elif layout == 1:
+            content = f'作品标题：短剧第{i}集发布时间：{time_str}'
+        else:
+            content = f'你于{time_str}发表的短剧视频" #短剧第{i}集..."中存在问题'
+        ref_url = f'https://channels.weixin.qq.com/x?unique_id=mmfindermachineauditdelivery{10 ** 19 + i}' if i % 2 else ''
+        notifications.append((content, ref_url))
+    return notifications
+
+
+def timed(func, notifications):
+    started = time.perf_counter()
+    results = [func(content, ref_url) for content, ref_url in notifications]
+    return results, time.perf_counter() - started
+
+
+def run(count):
+    notifications = build_notifications(count)
+    legacy, legacy_seconds = timed(legacy_extract, notifications)
+    current, current_seconds = timed(notification_parser.extract_video_info, notifications)
+    for (content, _), old, new in zip(notifications, legacy, current):
+        assert old[1:] == new[1:], f"解析结果不一致：{content} {old} {new}"
+        assert new[0] and '发布时间' not in new[0], f"标题解析错误：{content} {new}"
+    print(f"通知数 {count}")
+    print(f"逐个正则：{legacy_seconds:.3f}s，单次扫描：{current_seconds:.3f}s，"
+          f"提速 {legacy_seconds / current_seconds:.1f} 倍")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=50000)
+    args = parser.parse_args()
+    run(args.count)
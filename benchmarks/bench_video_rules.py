@@ -0,0 +1,101 @@
+"""删除 / 隐藏规则基准：对 10 万条作品记录求值 age_views_rules 和 violation_rules，输出每次 plan() 的耗时
+
+用法：python benchmarks/bench_video_rules.py --records 100000 --repeat 20
+同时给出逐个作品 if 判断（改造前的写法，不含日志）的耗时作为参考。
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR), str(ROOT_DIR.parent)]
+
+from social_auto_upload.uploader.tencent_uploader.video_rules import age_views_rules, violation_rules, ACTION_DELETE, \
+    ACTION_HIDE
+
+MINUTES_AGO = 1440
+MAX_VIEWS = 100
+DELETE_VIEWS = 50
+HIDE_VIEWS = 1000
+
+
+def make_records(count, now, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'object_id': f'obj{i}',
+        'export_id': f'exp{i}',
+        'create_time': now - rng.randint(0, 30 * 24 * 60 * 60),
+        'read_count': int(rng.expovariate(1 / 300)),
+        'title': ('waitdel-' if rng.random() < 0.01 else '') + f'短剧第{i}集',
+        'visible_type': 3 if rng.random() < 0.1 else 1,
+    } for i in range(count)]
+
+
+def legacy_age_views(records, now):
+    """改造前的逐个作品判断"""
+    plan = []
+    for record in records:
+        time_diff = (now - record['create_time']) / 60
+        if record['title'].startswith('waitdel-'):
+            plan.append((record, ACTION_DELETE))
+        elif time_diff >= MINUTES_AGO and record['read_count'] < MAX_VIEWS:
+            plan.append((record, ACTION_DELETE))
+    return plan
+
+
+def legacy_violation(records):
+    plan = []
+    for record in records:
+        if record['read_count'] < DELETE_VIEWS:
+            plan.append((record, ACTION_DELETE))
+        elif record['read_count'] >= HIDE_VIEWS and record['visible_type'] != 3:
+            plan.append((record, ACTION_HIDE))
+    return plan
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, samples
+
+
+def report(name, samples):
+    print(f"  {name}: 中位数 {statistics.median(samples):.1f}ms，最快 {min(samples):.1f}ms，最慢 {max(samples):.1f}ms")
+
+
+def run(count, repeat):
+    now = time.time()
+    records = make_records(count, now)
+    print(f"{count} 条作品记录，每项重复 {repeat} 次")
+
+    rules = age_views_rules(MINUTES_AGO, MAX_VIEWS)
+    plan, samples = timed(lambda: rules.plan(records, now=now), repeat)
+    print(f"age_views_rules：删除 {len(plan.actions(ACTION_DELETE))} 个，{plan.counts()}")
+    report('plan()', samples)
+    report('plan() + 取出删除条目', timed(lambda: rules.plan(records, now=now).actions(ACTION_DELETE), repeat)[1])
+    legacy, samples = timed(lambda: legacy_age_views(records, now), repeat)
+    assert len(legacy) == len(plan.actions(ACTION_DELETE))
+    report('逐个作品判断', samples)
+
+    rules = violation_rules(DELETE_VIEWS, HIDE_VIEWS)
+    plan, samples = timed(lambda: rules.plan(records, now=now), repeat)
+    print(f"violation_rules：删除 {len(plan.actions(ACTION_DELETE))} 个，隐藏 {len(plan.actions(ACTION_HIDE))} 个")
+    report('plan()', samples)
+    legacy, samples = timed(lambda: legacy_violation(records), repeat)
+    assert len(legacy) == len(plan.actions(ACTION_DELETE)) + len(plan.actions(ACTION_HIDE))
+    report('逐个作品判断', samples)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.records, args.repeat)
@@ -25,3 +25,45 @@ for platform in ['douyin', 'kuaishou', 'xiaohongshu']:
 
 XHS_SERVER = "http://127.0.0.1:5005"
 LOCAL_CHROME_PATH = ""   # change me necessary！ for example C:/Program Files/Google/Chrome/Application/chrome.exe
+
+# 发布任务队列后台并发执行的 worker 数量（每个 worker 同时执行一个发布任务）
+JOB_WORKER_COUNT = 2
+# 单个发布任务内同时运行的浏览器上限（不同账号并行上传，同一账号内串行）
+MAX_CONCURRENT_BROWSERS = 3
+# 浏览器池：单个浏览器累计创建上下文数量上限，达到后回收重启
+BROWSER_POOL_MAX_CONTEXTS = 20
+# 浏览器池：单个浏览器（含渲染进程）内存上限，单位 MB，超过后回收重启，0 表示不限制
+BROWSER_POOL_MAX_RSS_MB = 1500
+# 浏览器池：单个浏览器内同时存在的上下文数量上限，超过后启动新的浏览器
+BROWSER_POOL_MAX_ACTIVE = 3
+# 浏览器池：浏览器空闲（没有上下文在使用）超过该秒数后关闭，0 表示不关闭
+BROWSER_POOL_IDLE_TIMEOUT = 300
+# 浏览器池：所有上传共用一个事件循环，循环被同步调用阻塞超过该秒数时输出告警和阻塞位置的调用栈，0 表示不检测
+BROWSER_POOL_BLOCK_WARN_SECONDS = 1
+# cookie 校验：批量校验时同时打开的上下文数量上限（共用一个浏览器）
+COOKIE_CHECK_CONCURRENCY = 5
+# cookie 校验结果缓存有效期，单位秒
+COOKIE_CACHE_TTL = 600
+# cookie 后台刷新线程的检查间隔，单位秒（会提前两个间隔重新校验即将过期的账号）
+COOKIE_REFRESH_INTERVAL = 60
+# cookie 校验：HTTP 接口探测的超时时间，单位秒（探测无法判断时回退到浏览器校验）
+COOKIE_PROBE_TIMEOUT = 5
+# 分块上传：建议客户端每个分块的大小，单位字节（需小于 MAX_CONTENT_LENGTH）
+CHUNK_UPLOAD_SIZE = 8 * 1024 * 1024
+# 分块上传：未完成的上传会话保留时间，单位小时
+CHUNK_UPLOAD_EXPIRE_HOURS = 24
+# 登录 SSE 连接无消息时发送心跳的间隔，单位秒
+SSE_HEARTBEAT_INTERVAL = 15
+# 数据库连接池大小（db/database.db，WAL 模式下读写可并发）
+DB_POOL_SIZE = 8
+# 数据库被锁时的等待时间，单位秒
+DB_BUSY_TIMEOUT = 30
+# 上传前媒体预处理：同时探测 / 转码的文件数（每个文件一个 ffprobe / ffmpeg 子进程）
+MEDIA_PREFLIGHT_WORKERS = 2
+# 上传前媒体预处理：转封装、转码结果的缓存目录
+MEDIA_CACHE_DIR = BASE_DIR / 'videoFile' / '.preflight'
+# 上传前媒体预处理：缓存目录的容量上限，单位 GB，超出时按最近使用时间淘汰
+MEDIA_CACHE_MAX_GB = 20
+# ffmpeg / ffprobe 可执行文件路径，已在 PATH 中时无需修改
+FFMPEG_PATH = "ffmpeg"
+FFPROBE_PATH = "ffprobe"
@@ -1,42 +1,16 @@
-import sqlite3
-import json
-import os
+import sys
+from pathlib import Path
 
-# 数据库文件路径（如果不存在会自动创建）
-db_file = './database.db'
+# 表结构统一由 myUtils/database.py 中的迁移维护，这里只执行尚未执行的迁移；
+# 已有的旧库也会按版本补齐缺少的表、字段和索引（如 file_records.blob_digest）
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
 
-# 如果数据库已存在，则删除旧的表（可选）
-# if os.path.exists(db_file):
-#     os.remove(db_file)
+from myUtils.database import Database
 
-# 连接到SQLite数据库（如果文件不存在则会自动创建）
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
+# 数据库文件路径（如果不存在会自动创建），与后端使用的 db/database.db 一致；
+# conf.BASE_DIR 取决于启动脚本所在目录，单独运行本脚本时不能直接使用 myUtils.database.db
+db_file = ROOT_DIR / 'db' / 'database.db'
 
-# 创建账号记录表
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS user_info (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    type INTEGER NOT NULL,
-    filePath TEXT NOT NULL,  -- 存储文件路径
-    userName TEXT NOT NULL,
-    status INTEGER DEFAULT 0
-)
-''')
-
-# 创建文件记录表
-cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
-    filename TEXT NOT NULL,               -- 文件名
-    filesize REAL,                     -- 文件大小（单位：MB）
-    upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
-    file_path TEXT                        -- 文件路径
-)
-''')
-
-
-# 提交更改
-conn.commit()
-print("✅ 表创建成功")
-# 关闭连接
-conn.close()
\ No newline at end of file
+version = Database(db_file).migrate()
+print(f"✅ 表创建成功，当前数据库版本 {version}")
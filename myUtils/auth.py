@@ -1,117 +1,187 @@
 import asyncio
 import configparser
 import os
+from contextlib import asynccontextmanager
 
 from patchright.async_api import async_playwright
 from xhs import XhsClient
 
-from conf import BASE_DIR
+from conf import BASE_DIR, COOKIE_CHECK_CONCURRENCY, COOKIE_PROBE_TIMEOUT
 from utils.base_social_media import set_init_script
+from utils.cookie_probe import probe_cookie, create_probe_session
 from utils.log import tencent_logger, kuaishou_logger
 from pathlib import Path
 from uploader.xhs_uploader.main import sign_local
 
-async def cookie_auth_douyin(account_file):
+@asynccontextmanager
+async def _use_browser(browser=None):
+    """传入共享浏览器时直接使用，否则临时启动一个 headless Chromium 并在结束时关闭"""
+    if browser is not None:
+        yield browser
+        return
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=True)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+async def cookie_auth_douyin(account_file, browser=None):
+    async with _use_browser(browser) as browser:
         context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context,os.path.basename(account_file))
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
         try:
-            await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
-        except:
-            print("[+] 等待5秒 cookie 失效")
+            context = await set_init_script(context,os.path.basename(account_file))
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+            try:
+                await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
+            except:
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            # 2024.06.17 抖音创作者中心改版
+            if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            else:
+                print("[+] cookie 有效")
+                return True
+        finally:
             await context.close()
-            await browser.close()
-            return False
-        # 2024.06.17 抖音创作者中心改版
-        if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
-            print("[+] 等待5秒 cookie 失效")
-            return False
-        else:
-            print("[+] cookie 有效")
-            return True
-
-async def cookie_auth_tencent(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
+
+async def cookie_auth_tencent(account_file, browser=None):
+    async with _use_browser(browser) as browser:
         context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context,os.path.basename(account_file))
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
         try:
-            await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
-            tencent_logger.error("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            tencent_logger.success("[+] cookie 有效")
-            return True
-
-async def cookie_auth_ks(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
+            context = await set_init_script(context,os.path.basename(account_file))
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://channels.weixin.qq.com/platform/post/create")
+            try:
+                await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
+                tencent_logger.error("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                tencent_logger.success("[+] cookie 有效")
+                return True
+        finally:
+            await context.close()
+
+async def cookie_auth_ks(account_file, browser=None):
+    async with _use_browser(browser) as browser:
         context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context,os.path.basename(account_file))
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
         try:
-            await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
+            context = await set_init_script(context,os.path.basename(account_file))
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
+            try:
+                await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
 
-            kuaishou_logger.info("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            kuaishou_logger.success("[+] cookie 有效")
-            return True
+                kuaishou_logger.info("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                kuaishou_logger.success("[+] cookie 有效")
+                return True
+        finally:
+            await context.close()
 
 
-async def cookie_auth_xhs(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
+async def cookie_auth_xhs(account_file, browser=None):
+    async with _use_browser(browser) as browser:
         context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context,os.path.basename(account_file))
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
         try:
-            await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
-        except:
-            print("[+] 等待5秒 cookie 失效")
+            context = await set_init_script(context,os.path.basename(account_file))
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
+            try:
+                await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
+            except:
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            # 2024.06.17 抖音创作者中心改版
+            if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            else:
+                print("[+] cookie 有效")
+                return True
+        finally:
             await context.close()
-            await browser.close()
-            return False
-        # 2024.06.17 抖音创作者中心改版
-        if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
-            print("[+] 等待5秒 cookie 失效")
-            return False
-        else:
-            print("[+] cookie 有效")
-            return True
 
 
-async def check_cookie(type,file_path):
+def _browser_check(type):
     match type:
         # 小红书
         case 1:
-            return await cookie_auth_xhs(Path(BASE_DIR / "cookiesFile" / file_path))
+            return cookie_auth_xhs
         # 视频号
         case 2:
-            return await cookie_auth_tencent(Path(BASE_DIR / "cookiesFile" / file_path))
+            return cookie_auth_tencent
         # 抖音
         case 3:
-            return await cookie_auth_douyin(Path(BASE_DIR / "cookiesFile" / file_path))
+            return cookie_auth_douyin
         # 快手
         case 4:
-            return await cookie_auth_ks(Path(BASE_DIR / "cookiesFile" / file_path))
+            return cookie_auth_ks
         case _:
-            return False
+            return None
+
+
+async def check_cookie(type,file_path,browser=None,probe=True):
+    auth_func = _browser_check(type)
+    if auth_func is None:
+        return False
+    account_file = Path(BASE_DIR / "cookiesFile" / file_path)
+    if probe:
+        # 先用 HTTP 接口探测，能判断时不再启动浏览器
+        verdict = await probe_cookie(type, account_file, timeout=COOKIE_PROBE_TIMEOUT)
+        if verdict is not None:
+            return verdict
+    return await auth_func(account_file, browser)
+
+
+async def check_cookies(accounts, max_concurrency=COOKIE_CHECK_CONCURRENCY):
+    """批量校验 cookie，accounts 为 [(type, file_path)]
+
+    先用 HTTP 接口并发探测所有账号，只有探测无法判断的账号才回退到浏览器校验；
+    浏览器校验共用一个 headless 浏览器，每个账号使用独立的上下文，同时校验的数量不超过 max_concurrency。
+    返回与 accounts 顺序一致的结果列表：True 有效，False 失效，None 校验出错无法判断。
+    """
+    if not accounts:
+        return []
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+    async with create_probe_session(COOKIE_PROBE_TIMEOUT) as session:
+        async def probe_one(platform_type, file_path):
+            async with semaphore:
+                return await probe_cookie(platform_type, Path(BASE_DIR / "cookiesFile" / file_path), session)
+
+        results = list(await asyncio.gather(*(probe_one(platform_type, file_path) for platform_type, file_path in accounts)))
+
+    pending = [index for index, verdict in enumerate(results) if verdict is None]
+    if not pending:
+        return results
+    print(f"[+] {len(pending)} 个账号需要浏览器校验 cookie")
+    async with _use_browser() as browser:
+        async def check_one(platform_type, file_path):
+            async with semaphore:
+                try:
+                    return await check_cookie(platform_type, file_path, browser, probe=False)
+                except Exception as e:
+                    print(f"❌ 校验 cookie 出错 {file_path}: {type(e).__name__}: {e}")
+                    return None
+
+        checked = await asyncio.gather(*(check_one(*accounts[index]) for index in pending))
+    for index, verdict in zip(pending, checked):
+        results[index] = verdict
+    return results
 
 # a = asyncio.run(check_cookie(1,"3a6cfdc0-3d51-11f0-8507-44e51723d63c.json"))
 # print(a)
\ No newline at end of file
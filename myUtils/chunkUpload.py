@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from conf import BASE_DIR, CHUNK_UPLOAD_SIZE, CHUNK_UPLOAD_EXPIRE_HOURS
+
+# 每次从请求流读取的块大小，内存占用与文件大小无关
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+UPLOAD_TMP_DIR = Path(VIDEO_DIR / ".uploads")
+
+
+class ChunkUploadError(Exception):
+    def __init__(self, msg, status=400, data=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+        self.data = data
+
+
+def parse_size(size):
+    """解析客户端传入的文件大小，None 表示未提供，非法值抛出 ChunkUploadError"""
+    if size is None:
+        return None
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ChunkUploadError("Invalid size", 400)
+    if size < 0:
+        raise ChunkUploadError("Invalid size", 400)
+    return size
+
+
+def safe_filename(filename):
+    # 只保留文件名部分，防止路径穿越
+    return os.path.basename((filename or "").replace("\\", "/")).strip()
+
+
+def save_stream(stream, dest, hasher=None, mode="wb"):
+    """把请求流按块写入 dest，返回写入的字节数；hasher 不为空时边写边计算摘要"""
+    written = 0
+    with open(dest, mode) as f:
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            f.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            written += len(block)
+    return written
+
+
+def _hash_file(path):
+    hasher = hashlib.md5()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher
+
+
+class ChunkUploadManager(object):
+    """可断点续传的分块上传
+
+    init 创建上传会话，每个分块按 offset 顺序追加写入 videoFile/.uploads/{uploadId}.part，
+    会话信息保存在同名 .json 中；边写入边计算 md5，进程重启后首次续传时从已写入的数据重新计算。
+    finalize 校验大小后把文件移动到 videoFile 目录。
+    """
+
+    def __init__(self, tmp_dir=UPLOAD_TMP_DIR, video_dir=VIDEO_DIR, chunk_size=CHUNK_UPLOAD_SIZE,
+                 expire_hours=CHUNK_UPLOAD_EXPIRE_HOURS):
+        self.tmp_dir = Path(tmp_dir)
+        self.video_dir = Path(video_dir)
+        self.chunk_size = chunk_size
+        self.expire_seconds = expire_hours * 3600
+        self._hashers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _part_path(self, upload_id):
+        return self.tmp_dir / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id):
+        return self.tmp_dir / f"{upload_id}.json"
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _load_meta(self, upload_id):
+        try:
+            uuid.UUID(upload_id)
+        except ValueError:
+            raise ChunkUploadError("Invalid upload id", 400)
+        meta_path = self._meta_path(upload_id)
+        if not meta_path.exists():
+            raise ChunkUploadError("Upload not found", 404)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_meta(self, meta):
+        meta_path = self._meta_path(meta["uploadId"])
+        tmp_path = meta_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _discard(self, upload_id):
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            if path.exists():
+                path.unlink()
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    def cleanup_expired(self):
+        """删除超过有效期未完成的上传会话"""
+        if not self.tmp_dir.exists():
+            return
+        deadline = time.time() - self.expire_seconds
+        for meta_path in self.tmp_dir.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if meta.get("updatedAt", 0) < deadline:
+                    self._discard(meta["uploadId"])
+                    print(f"🧹 清理过期的分块上传 {meta['uploadId']}")
+            except Exception as e:
+                print(f"清理分块上传失败 {meta_path}: {e}")
+
+    def init(self, filename, size=None):
+        filename = safe_filename(filename)
+        if not filename:
+            raise ChunkUploadError("filename is required", 400)
+        size = parse_size(size)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.cleanup_expired()
+        upload_id = str(uuid.uuid1())
+        self._part_path(upload_id).touch()
+        meta = {
+            "uploadId": upload_id,
+            "filename": filename,
+            "size": size,
+            "offset": 0,
+            "createdAt": time.time(),
+            "updatedAt": time.time(),
+        }
+        self._save_meta(meta)
+        with self._lock:
+            self._hashers[upload_id] = hashlib.md5()
+        return {"uploadId": upload_id, "offset": 0, "chunkSize": self.chunk_size}
+
+    def status(self, upload_id):
+        meta = self._load_meta(upload_id)
+        return {"uploadId": upload_id, "filename": meta["filename"], "size": meta["size"], "offset": meta["offset"]}
+
+    def _hasher(self, upload_id, offset):
+        with self._lock:
+            hasher = self._hashers.get(upload_id)
+        if hasher is None:
+            # 进程重启后内存中的摘要状态丢失，从已写入的数据重新计算
+            part_path = self._part_path(upload_id)
+            hasher = _hash_file(part_path) if offset else hashlib.md5()
+            with self._lock:
+                self._hashers[upload_id] = hasher
+        return hasher
+
+    def write_chunk(self, upload_id, offset, stream):
+        """把请求流追加到上传文件，offset 必须等于当前已接收的字节数，返回新的 offset"""
+        with self._upload_lock(upload_id):
+            meta = self._load_meta(upload_id)
+            part_path = self._part_path(upload_id)
+            # 以实际落盘的大小为准，连接中断时已写入的部分也可以续传
+            current = part_path.stat().st_size if part_path.exists() else 0
+            if current != meta["offset"]:
+                meta["offset"] = current
+                with self._lock:
+                    self._hashers.pop(upload_id, None)
+            if offset != meta["offset"]:
+                raise ChunkUploadError("Offset mismatch", 409, {"offset": meta["offset"]})
+            hasher = self._hasher(upload_id, meta["offset"])
+            try:
+                save_stream(stream, part_path, hasher, mode="ab")
+            finally:
+                meta["offset"] = part_path.stat().st_size
+                meta["updatedAt"] = time.time()
+                self._save_meta(meta)
+            if meta["size"] is not None and meta["offset"] > meta["size"]:
+                self._discard(upload_id)
+                raise ChunkUploadError("Upload exceeds declared size", 400)
+            return meta["offset"]
+
+    def finalize(self, upload_id, md5=None):
+        """完成上传，返回 (part_path, filename, size, md5)，由调用方移动文件并写入记录"""
+        with self._upload_lock(upload_id):
+            meta = self._load_meta(upload_id)
+            part_path = self._part_path(upload_id)
+            size = part_path.stat().st_size
+            if meta["size"] is not None and size != meta["size"]:
+                raise ChunkUploadError("Upload incomplete", 409, {"offset": size})
+            digest = self._hasher(upload_id, size).hexdigest()
+            if md5 and md5.lower() != digest:
+                self._discard(upload_id)
+                raise ChunkUploadError("md5 mismatch", 400, {"md5": digest})
+            return part_path, meta["filename"], size, digest
+
+    def complete(self, upload_id):
+        """finalize 后文件已被移走，删除会话信息"""
+        self._discard(upload_id)
+
+
+chunk_upload_manager = ChunkUploadManager()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from conf import BASE_DIR, COOKIE_CACHE_TTL, COOKIE_REFRESH_INTERVAL
+from myUtils.auth import check_cookies
+from myUtils.database import db
+
+
+def _cookie_mtime(file_path):
+    try:
+        return os.path.getmtime(Path(BASE_DIR / "cookiesFile" / file_path))
+    except OSError:
+        return None
+
+
+def mark_accounts_invalid(account_ids):
+    """把 cookie 失效的账号状态置为 0"""
+    if not account_ids:
+        return
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+        UPDATE user_info
+        SET status = ?
+        WHERE id = ?
+        ''', [(0, account_id) for account_id in account_ids])
+        conn.commit()
+    print(f"✅ 用户状态已更新 {len(account_ids)} 个")
+
+
+class CookieCache(object):
+    """cookie 校验结果缓存
+
+    以 (账号类型, cookie 文件路径, 文件修改时间) 为键缓存校验结果，cookie 文件被重新写入后自动失效；
+    后台刷新线程会在结果过期前重新校验，使 /getValidAccounts 通常可以直接从缓存返回。
+    """
+
+    def __init__(self, ttl=COOKIE_CACHE_TTL, refresh_interval=COOKIE_REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def _key(self, platform_type, file_path):
+        return platform_type, file_path, _cookie_mtime(file_path)
+
+    def get(self, platform_type, file_path, margin=0):
+        """返回未过期的缓存结果，没有或已过期（含 margin 秒内将过期）时返回 None"""
+        key = self._key(platform_type, file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[1] + self.ttl - margin <= time.time():
+            return None
+        return entry[0]
+
+    def put(self, platform_type, file_path, valid):
+        key = self._key(platform_type, file_path)
+        with self._lock:
+            # 同一个 cookie 文件只保留最新修改时间对应的结果
+            for old_key in [k for k in self._entries if k[:2] == key[:2]]:
+                del self._entries[old_key]
+            self._entries[key] = (valid, time.time())
+
+    async def resolve(self, accounts, refresh=False, margin=0):
+        """返回 accounts（[(type, file_path)]）对应的校验结果，只对缓存未命中的账号实际校验"""
+        results = [None] * len(accounts)
+        pending = []
+        for index, (platform_type, file_path) in enumerate(accounts):
+            if _cookie_mtime(file_path) is None:
+                # cookie 文件不存在直接视为失效
+                results[index] = False
+                continue
+            cached = None if refresh else self.get(platform_type, file_path, margin)
+            if cached is None:
+                pending.append(index)
+            else:
+                results[index] = cached
+        if pending:
+            checked = await check_cookies([accounts[index] for index in pending])
+            for index, valid in zip(pending, checked):
+                results[index] = valid
+                # 校验出错的结果不缓存，下次请求重新校验
+                if valid is not None:
+                    self.put(*accounts[index], valid)
+        return results
+
+    def start_refresher(self):
+        if self._refresher is not None:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="cookie-refresher", daemon=True)
+        self._refresher.start()
+        print(f"✅ cookie 后台刷新已启动，间隔 {self.refresh_interval} 秒")
+
+    def refresh_due(self):
+        """校验所有缓存缺失或即将过期的账号，并同步失效状态到数据库"""
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, type, filePath, status FROM user_info")
+            rows = cursor.fetchall()
+        accounts = [(row[1], row[2]) for row in rows]
+        # 提前两个刷新周期重新校验，保证请求到来时缓存仍然有效
+        results = asyncio.run(self.resolve(accounts, margin=self.refresh_interval * 2))
+        mark_accounts_invalid([row[0] for row, valid in zip(rows, results) if valid is False and row[3] != 0])
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh_due()
+            except Exception:
+                traceback.print_exc()
+            time.sleep(self.refresh_interval)
+
+
+cookie_cache = CookieCache()
@@ -0,0 +1,187 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from queue import LifoQueue, Empty
+
+from conf import BASE_DIR, DB_POOL_SIZE, DB_BUSY_TIMEOUT
+
+DB_PATH = Path(BASE_DIR / "db" / "database.db")
+
+
+def _migration_base_tables(cursor):
+    # 创建账号记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type INTEGER NOT NULL,
+        filePath TEXT NOT NULL,  -- 存储文件路径
+        userName TEXT NOT NULL,
+        status INTEGER DEFAULT 0
+    )
+    ''')
+    # 创建文件记录表
+    cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
+        filename TEXT NOT NULL,               -- 文件名
+        filesize REAL,                     -- 文件大小（单位：MB）
+        upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
+        file_path TEXT                        -- 文件路径
+    )
+    ''')
+
+
+def _migration_job_table(cursor):
+    # 创建发布任务表
+    cursor.execute('''CREATE TABLE IF NOT EXISTS job_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_type TEXT NOT NULL,               -- 任务类型，对应注册的处理函数
+        payload TEXT NOT NULL,                -- 任务参数（JSON）
+        status TEXT NOT NULL DEFAULT 'pending', -- pending / running / success / failed
+        result TEXT,                          -- 任务返回值（JSON）
+        error TEXT,                           -- 失败原因
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        started_at DATETIME,
+        finished_at DATETIME
+    )
+    ''')
+
+
+def _migration_file_blobs(cursor):
+    # 创建文件内容表，相同内容（md5）的视频只保存一份
+    cursor.execute('''CREATE TABLE IF NOT EXISTS file_blobs (
+        digest TEXT PRIMARY KEY,              -- 文件内容 md5
+        path TEXT NOT NULL,                   -- 相对 videoFile 的存储路径
+        size INTEGER NOT NULL,                -- 字节数
+        ref_count INTEGER NOT NULL DEFAULT 0, -- 引用该内容的 file_records 数量
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # 旧库的 file_records 补充 blob_digest 字段
+    cursor.execute("PRAGMA table_info(file_records)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'blob_digest' not in columns:
+        cursor.execute("ALTER TABLE file_records ADD COLUMN blob_digest TEXT")
+
+
+def _migration_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_info_type_status ON user_info (type, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_records_upload_time ON file_records (upload_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_records_status ON job_records (status, id)")
+
+
+def _migration_media_probe(cursor):
+    # 创建视频元数据缓存表，按 路径 + 大小 + 修改时间 判断是否需要重新探测
+    cursor.execute('''CREATE TABLE IF NOT EXISTS media_probe_cache (
+        path TEXT PRIMARY KEY,                -- 文件绝对路径
+        size INTEGER NOT NULL,                -- 探测时的字节数
+        mtime_ns INTEGER NOT NULL,            -- 探测时的修改时间（纳秒）
+        source TEXT NOT NULL,                 -- 元数据来源：mp4（直接解析）/ ffprobe
+        metadata TEXT NOT NULL,               -- 元数据（JSON）
+        probed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _migration_repair_stamped(cursor):
+    # 旧版 db/createTable.py 只建表就直接写入版本号 5，已有库的 file_records 缺少 blob_digest 字段；
+    # 前面的迁移都可以重复执行，这里全部重新执行一遍补齐缺少的表、字段和索引
+    for migration in (_migration_base_tables, _migration_job_table, _migration_file_blobs, _migration_indexes,
+                      _migration_media_probe):
+        migration(cursor)
+
+
+# 按顺序执行的数据库迁移，执行到的版本号记录在 PRAGMA user_version 中；只能在末尾追加
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_job_table,
+    _migration_file_blobs,
+    _migration_indexes,
+    _migration_media_probe,
+    _migration_repair_stamped,
+]
+
+
+class Database(object):
+    """db/database.db 的连接池
+
+    连接在线程间复用，启用 WAL 模式使读写可以并发进行；首次获取连接时执行未完成的迁移。
+    用法：
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            ...
+    正常退出时自动提交，出现异常时回滚。
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size=DB_POOL_SIZE, busy_timeout=DB_BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.pool_size = max(1, int(pool_size))
+        self.busy_timeout = busy_timeout
+        self._pool = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    def _create_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        return conn
+
+    def migrate(self, conn=None):
+        """执行尚未执行的迁移，返回迁移后的版本号"""
+        own_conn = conn is None
+        if own_conn:
+            conn = self._create_connection()
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for index in range(version, len(MIGRATIONS)):
+                cursor = conn.cursor()
+                MIGRATIONS[index](cursor)
+                cursor.execute(f"PRAGMA user_version={index + 1}")
+                conn.commit()
+                print(f"✅ 数据库迁移到版本 {index + 1}")
+            return max(version, len(MIGRATIONS))
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if not self._migrated:
+                self.migrate()
+                self._migrated = True
+            if self._created < self.pool_size:
+                self._created += 1
+                return self._create_connection()
+        # 连接都在使用中时等待归还
+        try:
+            return self._pool.get(timeout=self.busy_timeout)
+        except Empty:
+            raise sqlite3.OperationalError("database connection pool exhausted")
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+
+db = Database()
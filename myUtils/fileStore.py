@@ -0,0 +1,113 @@
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import db
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+BLOB_DIR = Path(VIDEO_DIR / ".blobs")
+
+
+def _link_or_copy(src, dest):
+    # 优先使用硬链接，不占用额外磁盘空间；不支持时退回复制
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+class FileStore(object):
+    """按内容寻址的视频文件存储
+
+    文件内容以 md5 为键保存在 videoFile/.blobs 下，每条 file_records 仍使用 {uuid}_{文件名} 作为 file_path，
+    该文件是内容文件的硬链接，发布流程无需改动；file_blobs.ref_count 记录引用数，归零时删除内容文件。
+    """
+
+    def __init__(self, database=db, video_dir=VIDEO_DIR, blob_dir=BLOB_DIR):
+        self.db = database
+        self.video_dir = Path(video_dir)
+        self.blob_dir = Path(blob_dir)
+        self._lock = threading.Lock()
+
+    def find_blob(self, digest):
+        if not digest:
+            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM file_blobs WHERE digest = ?", (digest.lower(),))
+            row = cursor.fetchone()
+        if row and Path(self.video_dir / row['path']).exists():
+            return dict(row)
+        return None
+
+    def add_file(self, filename, digest, size, src_path=None):
+        """登记一个上传文件，返回写入 file_records 的 file_path
+
+        src_path 为已写完的临时文件：内容已存在时直接删除，否则移动为新的内容文件；
+        src_path 为空时要求内容已存在（秒传）。
+        """
+        digest = digest.lower()
+        final_filename = f"{uuid.uuid1()}_{filename}"
+        with self._lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT path FROM file_blobs WHERE digest = ?", (digest,))
+            row = cursor.fetchone()
+            blob_path = Path(self.video_dir / row['path']) if row else None
+            if blob_path is not None and blob_path.exists():
+                if src_path is not None:
+                    os.remove(src_path)
+                    print(f"♻️ 文件内容已存在，复用 {digest}")
+            else:
+                if src_path is None:
+                    raise FileNotFoundError(f"blob not found: {digest}")
+                blob_path = Path(self.blob_dir / digest[:2] / digest)
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(src_path, blob_path)
+                cursor.execute('''
+                    INSERT OR REPLACE INTO file_blobs (digest, path, size, ref_count)
+                    VALUES (?, ?, ?, COALESCE((SELECT ref_count FROM file_blobs WHERE digest = ?), 0))
+                    ''', (digest, blob_path.relative_to(self.video_dir).as_posix(), size, digest))
+            _link_or_copy(blob_path, Path(self.video_dir / final_filename))
+            cursor.execute("UPDATE file_blobs SET ref_count = ref_count + 1 WHERE digest = ?", (digest,))
+            cursor.execute('''
+                INSERT INTO file_records (filename, filesize, file_path, blob_digest)
+                VALUES (?, ?, ?, ?)
+                ''', (filename, round(float(size) / (1024 * 1024), 2), final_filename, digest))
+            conn.commit()
+        print("✅ 上传文件已记录")
+        return final_filename
+
+    def delete_file(self, record):
+        """删除 file_records 记录，内容不再被引用时一并删除内容文件"""
+        with self._lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM file_records WHERE id = ?", (record['id'],))
+            digest = record.get('blob_digest')
+            if not digest:
+                # 旧记录没有关联内容，保持原有行为只删除记录
+                conn.commit()
+                return
+            self._unlink(Path(self.video_dir / record['file_path']))
+            cursor.execute("UPDATE file_blobs SET ref_count = ref_count - 1 WHERE digest = ?", (digest,))
+            cursor.execute("SELECT path, ref_count FROM file_blobs WHERE digest = ?", (digest,))
+            row = cursor.fetchone()
+            if row and row['ref_count'] <= 0:
+                self._unlink(Path(self.video_dir / row['path']))
+                cursor.execute("DELETE FROM file_blobs WHERE digest = ?", (digest,))
+                print(f"🗑️ 文件内容已无引用，删除 {digest}")
+            conn.commit()
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            if path.exists():
+                path.unlink()
+        except OSError as e:
+            # 文件正在被发布任务使用时（Windows）无法删除，保留文件不影响记录删除
+            print(f"删除文件失败 {path}: {e}")
+
+
+file_store = FileStore()
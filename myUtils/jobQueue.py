@@ -0,0 +1,145 @@
+import json
+import threading
+import traceback
+from queue import Queue
+
+from conf import JOB_WORKER_COUNT
+from myUtils.database import db
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCESS = "success"
+JOB_FAILED = "failed"
+
+def _row_to_job(row):
+    job = dict(row)
+    job['payload'] = json.loads(job['payload']) if job['payload'] else None
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+class JobQueue(object):
+    """持久化的发布任务队列
+
+    接口只负责把任务写入 job_records 后立即返回任务 id，
+    后台 worker 线程从内存队列中取出任务 id 并执行对应的处理函数，
+    进程重启时会把未完成的任务重新放回队列。
+    """
+
+    def __init__(self, database=db, worker_count=JOB_WORKER_COUNT):
+        self.db = database
+        self.worker_count = max(1, int(worker_count))
+        self._handlers = {}
+        self._queue = Queue()
+        self._workers = []
+        self._start_lock = threading.Lock()
+
+    def register(self, job_type, handler):
+        """注册任务处理函数，handler 接收 payload，返回值需可被 JSON 序列化"""
+        self._handlers[job_type] = handler
+
+    def start(self):
+        with self._start_lock:
+            if self._workers:
+                return
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                # 上次进程退出时还在执行的任务重新排队
+                cursor.execute("UPDATE job_records SET status = ?, started_at = NULL WHERE status = ?",
+                               (JOB_PENDING, JOB_RUNNING))
+                cursor.execute("SELECT id FROM job_records WHERE status = ? ORDER BY id", (JOB_PENDING,))
+                pending_ids = [row['id'] for row in cursor.fetchall()]
+                conn.commit()
+            for job_id in pending_ids:
+                self._queue.put(job_id)
+            if pending_ids:
+                print(f"♻️ 恢复未完成的发布任务 {len(pending_ids)} 个")
+            for index in range(self.worker_count):
+                worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            print(f"✅ 发布任务队列已启动，worker 数量: {self.worker_count}")
+
+    def submit(self, job_type, payload):
+        if job_type not in self._handlers:
+            raise ValueError(f"unknown job type: {job_type}")
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO job_records (job_type, payload, status)
+                VALUES (?, ?, ?)
+                ''', (job_type, json.dumps(payload, ensure_ascii=False), JOB_PENDING))
+            job_id = cursor.lastrowid
+            conn.commit()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM job_records WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, status=None, limit=50, offset=0):
+        sql = "SELECT id, job_type, status, error, created_at, started_at, finished_at FROM job_records"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            # 只有 pending 状态的任务才会被领取，避免重复执行
+            cursor.execute('''
+                UPDATE job_records SET status = ?, started_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = ?
+                ''', (JOB_RUNNING, job_id, JOB_PENDING))
+            claimed = cursor.rowcount == 1
+            cursor.execute("SELECT job_type, payload FROM job_records WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            conn.commit()
+        if not claimed or not row:
+            return
+
+        status, result, error = JOB_SUCCESS, None, None
+        try:
+            handler = self._handlers[row['job_type']]
+            result = handler(json.loads(row['payload']))
+            print(f"✅ 发布任务 {job_id} 执行完成")
+        except Exception as e:
+            status, error = JOB_FAILED, f"{type(e).__name__}: {e}"
+            print(f"❌ 发布任务 {job_id} 执行失败: {error}")
+            traceback.print_exc()
+
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job_records
+                SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                ''', (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                      error, job_id))
+            conn.commit()
+
+
+job_queue = JobQueue()
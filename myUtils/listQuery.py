@@ -0,0 +1,153 @@
+import base64
+import json
+
+from myUtils.database import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 允许返回的列，fields 参数只能从中选择
+FILE_FIELDS = ("id", "filename", "filesize", "upload_time", "file_path", "blob_digest")
+ACCOUNT_FIELDS = ("id", "type", "filePath", "userName", "status")
+
+
+class ListQueryError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, length):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ListQueryError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise ListQueryError("Invalid cursor")
+    # 游标的值直接作为 SQL 参数，只接受标量（bool 也是 int 的子类，单独排除）
+    if any(isinstance(value, bool) or not isinstance(value, (str, int, float)) for value in values):
+        raise ListQueryError("Invalid cursor")
+    return values
+
+
+def _page_size(args):
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ListQueryError("Invalid limit")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _fields(args, allowed):
+    fields = args.get("fields")
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise ListQueryError(f"Unknown fields: {','.join(unknown)}")
+    return selected
+
+
+def _number(args, name, cast=float):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ListQueryError(f"Invalid {name}")
+
+
+def _prefix_like(prefix):
+    # 转义 LIKE 通配符，按前缀匹配
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _run_page(sql, params, fields, key_fields, limit):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params + [limit + 1])
+        rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1][key] for key in key_fields]) if has_more and rows else None
+    return {
+        "items": [{field: row[field] for field in fields} for row in rows],
+        "nextCursor": next_cursor,
+        "hasMore": has_more,
+    }
+
+
+def query_files(args):
+    """按上传时间倒序分页查询 file_records
+
+    支持参数：name 文件名前缀、minSize / maxSize 文件大小范围（MB）、startTime / endTime 上传时间范围、
+    fields 返回的列、limit 每页数量、cursor 上一页返回的 nextCursor。
+    """
+    fields = _fields(args, FILE_FIELDS)
+    limit = _page_size(args)
+    where, params = [], []
+    if args.get("name"):
+        where.append("filename LIKE ? ESCAPE '\\'")
+        params.append(_prefix_like(args["name"]))
+    min_size, max_size = _number(args, "minSize"), _number(args, "maxSize")
+    if min_size is not None:
+        where.append("filesize >= ?")
+        params.append(min_size)
+    if max_size is not None:
+        where.append("filesize <= ?")
+        params.append(max_size)
+    if args.get("startTime"):
+        where.append("upload_time >= ?")
+        params.append(args["startTime"])
+    if args.get("endTime"):
+        where.append("upload_time <= ?")
+        params.append(args["endTime"])
+    if args.get("cursor"):
+        # 游标为上一页最后一条的 (upload_time, id)，按 (upload_time, id) 倒序继续
+        upload_time, last_id = decode_cursor(args["cursor"], 2)
+        where.append("(upload_time < ? OR (upload_time = ? AND id < ?))")
+        params.extend([upload_time, upload_time, last_id])
+    columns = sorted(set(fields) | {"upload_time", "id"})
+    sql = f"SELECT {', '.join(columns)} FROM file_records"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY upload_time DESC, id DESC LIMIT ?"
+    return _run_page(sql, params, fields, ("upload_time", "id"), limit)
+
+
+def query_accounts(args):
+    """按 id 顺序分页查询 user_info
+
+    支持参数：type 平台类型、status 账号状态、name 账号名前缀、fields 返回的列、limit 每页数量、cursor。
+    """
+    fields = _fields(args, ACCOUNT_FIELDS)
+    limit = _page_size(args)
+    where, params = [], []
+    platform_type, status = _number(args, "type", int), _number(args, "status", int)
+    if platform_type is not None:
+        where.append("type = ?")
+        params.append(platform_type)
+    if status is not None:
+        where.append("status = ?")
+        params.append(status)
+    if args.get("name"):
+        where.append("userName LIKE ? ESCAPE '\\'")
+        params.append(_prefix_like(args["name"]))
+    if args.get("cursor"):
+        (last_id,) = decode_cursor(args["cursor"], 1)
+        where.append("id > ?")
+        params.append(last_id)
+    columns = sorted(set(fields) | {"id"})
+    sql = f"SELECT {', '.join(columns)} FROM user_info"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id LIMIT ?"
+    return _run_page(sql, params, fields, ("id",), limit)
@@ -0,0 +1,249 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from myUtils.database import db
+from social_auto_upload.utils.media_preflight import probe as ffprobe
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v')
+
+# 各平台的发布限制，可按平台最新规则调整；max_size_mb / max_duration 为 0 表示不限制
+DEFAULT_RULES = {'max_size_mb': 0, 'min_duration': 1, 'max_duration': 0, 'min_short_edge': 144}
+PLATFORM_RULES = {
+    'tencent': dict(DEFAULT_RULES, max_size_mb=4096, min_duration=3, max_duration=8 * 3600),
+    'douyin': dict(DEFAULT_RULES, max_size_mb=16384, min_duration=3, max_duration=4 * 3600),
+    'kuaishou': dict(DEFAULT_RULES, max_size_mb=4096, min_duration=3, max_duration=4 * 3600),
+    'xiaohongshu': dict(DEFAULT_RULES, max_size_mb=20480, min_duration=3, max_duration=4 * 3600),
+}
+# 前端 / 发布接口中的平台类型
+PLATFORM_BY_TYPE = {1: 'xiaohongshu', 2: 'tencent', 3: 'douyin', 4: 'kuaishou'}
+
+
+class Mp4Error(Exception):
+    """MP4 结构损坏（box 越界、缺少 moov 等）"""
+
+
+class NotMp4Error(Mp4Error):
+    """不是 ISO BMFF 文件，需要用 ffprobe 探测"""
+
+
+def _boxes(buf, start, end):
+    """遍历 [start, end) 范围内的 box，产出 (类型, 内容起点, box 终点)"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', buf, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4Error(f'{box_type.decode("latin-1")} box 头不完整')
+            size = struct.unpack_from('>Q', buf, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise Mp4Error(f'{box_type.decode("latin-1")} box 大小异常')
+        if offset + size > end:
+            raise Mp4Error(f'{box_type.decode("latin-1")} box 超出文件末尾，文件可能不完整')
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _child(buf, start, end, box_type):
+    for child_type, child_start, child_end in _boxes(buf, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _parse_trak(buf, start, end, meta):
+    width = height = 0
+    tkhd = _child(buf, start, end, b'tkhd')
+    if tkhd:
+        # tkhd 末尾为 16.16 定点数的宽高，version 1 的时间字段为 64 位
+        offset = tkhd[0] + (88 if buf[tkhd[0]] == 1 else 76)
+        if offset + 8 <= tkhd[1]:
+            width, height = (value >> 16 for value in struct.unpack_from('>II', buf, offset))
+    mdia = _child(buf, start, end, b'mdia')
+    if not mdia:
+        return
+    hdlr = _child(buf, mdia[0], mdia[1], b'hdlr')
+    handler = bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) if hdlr else b''
+    codec = ''
+    minf = _child(buf, mdia[0], mdia[1], b'minf')
+    stbl = _child(buf, minf[0], minf[1], b'stbl') if minf else None
+    stsd = _child(buf, stbl[0], stbl[1], b'stsd') if stbl else None
+    if stsd and stsd[0] + 16 <= stsd[1]:
+        # 第一个样本描述的格式即编码，如 avc1 / hvc1 / mp4a
+        codec = bytes(buf[stsd[0] + 12:stsd[0] + 16]).decode('latin-1').strip()
+    if handler == b'vide' and not meta['video_codec']:
+        meta.update(video_codec=codec, width=width, height=height)
+    elif handler == b'soun' and not meta['audio_codec']:
+        meta['audio_codec'] = codec
+
+
+def parse_mp4(path):
+    """直接解析 MP4 的 box 结构（moov/mvhd/tkhd/stsd），只读取文件头部信息，不扫描媒体数据"""
+    size = os.path.getsize(path)
+    if size < 8:
+        raise NotMp4Error('文件过小')
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if buf[4:8] != b'ftyp':
+            raise NotMp4Error('缺少 ftyp')
+        top = {}
+        order = []
+        for box_type, start, end in _boxes(buf, 0, size):
+            top.setdefault(box_type, (start, end))
+            order.append(box_type)
+        if b'moov' not in top:
+            raise Mp4Error('缺少 moov，文件可能未写完')
+        if b'mdat' not in top:
+            raise Mp4Error('缺少 mdat（没有媒体数据）')
+        meta = {
+            'container': 'mp4',
+            'brand': bytes(buf[top[b'ftyp'][0]:top[b'ftyp'][0] + 4]).decode('latin-1').strip(),
+            'size': size,
+            'faststart': order.index(b'moov') < order.index(b'mdat'),
+            'duration': 0,
+            'width': 0,
+            'height': 0,
+            'video_codec': '',
+            'audio_codec': '',
+            'fragmented': False,
+        }
+        moov_start, moov_end = top[b'moov']
+        timescale = fragment_duration = 0
+        for box_type, start, end in _boxes(buf, moov_start, moov_end):
+            if box_type == b'mvhd':
+                if buf[start] == 1:
+                    timescale, duration = struct.unpack_from('>IQ', buf, start + 20)
+                else:
+                    timescale, duration = struct.unpack_from('>II', buf, start + 12)
+                meta['duration'] = round(duration / timescale, 3) if timescale else 0
+            elif box_type == b'trak':
+                _parse_trak(buf, start, end, meta)
+            elif box_type == b'mvex':
+                # 分片 MP4：mvhd 中的时长通常为 0，总时长在 mehd 中（没有 mehd 时由调用方用 ffprobe 读取）
+                meta['fragmented'] = True
+                mehd = _child(buf, start, end, b'mehd')
+                if mehd:
+                    fmt = '>Q' if buf[mehd[0]] == 1 else '>I'
+                    fragment_duration = struct.unpack_from(fmt, buf, mehd[0] + 4)[0]
+        if not meta['duration'] and fragment_duration and timescale:
+            meta['duration'] = round(fragment_duration / timescale, 3)
+        return meta
+
+
+def parse_ffprobe(path):
+    """非 MP4 文件用 ffprobe 探测，返回与 parse_mp4 相同的字段"""
+    info = ffprobe(path)
+    video = info.get('video') or {}
+    return {
+        'container': info.get('format', ''),
+        'brand': '',
+        'size': info.get('size') or os.path.getsize(path),
+        'faststart': None,
+        'duration': info.get('duration', 0),
+        'width': video.get('width', 0),
+        'height': video.get('height', 0),
+        'video_codec': video.get('codec', ''),
+        'audio_codec': (info.get('audio') or {}).get('codec', ''),
+    }
+
+
+def probe_file(path):
+    """返回 (来源, 元数据)；文件损坏或无法识别时元数据中的 errors 记录原因，无法读取时长时 duration 为 None"""
+    try:
+        meta = parse_mp4(path)
+        if not meta['duration'] and meta['fragmented']:
+            # 分片 MP4 没有记录总时长，改用 ffprobe；没有 ffprobe 时不校验时长
+            try:
+                meta['duration'] = parse_ffprobe(path)['duration']
+            except Exception:
+                meta['duration'] = None
+        return 'mp4', meta
+    except NotMp4Error as e:
+        try:
+            return 'ffprobe', parse_ffprobe(path)
+        except FileNotFoundError:
+            # 没有安装 ffprobe 时无法判断，只校验文件大小
+            return 'ffprobe', {'size': os.path.getsize(path), 'unknown': True}
+        except Exception as probe_error:
+            return 'ffprobe', {'size': os.path.getsize(path), 'errors': [f'无法识别的视频格式（{e}）: {probe_error}']}
+    except Mp4Error as e:
+        return 'mp4', {'size': os.path.getsize(path), 'errors': [str(e)]}
+
+
+def validate(meta, platform=None):
+    """按平台规则检查元数据，返回错误列表，空列表表示通过"""
+    if meta.get('errors'):
+        return list(meta['errors'])
+    rules = PLATFORM_RULES.get(platform, DEFAULT_RULES)
+    errors = []
+    size_mb = meta.get('size', 0) / 1024 / 1024
+    if rules['max_size_mb'] and size_mb > rules['max_size_mb']:
+        errors.append(f"文件大小 {size_mb:.0f}MB 超过 {rules['max_size_mb']}MB")
+    if meta.get('unknown'):
+        return errors
+    if not meta.get('video_codec') and not meta.get('width'):
+        errors.append('没有视频轨道')
+    duration = meta.get('duration', 0)
+    if duration is not None:
+        if duration < rules['min_duration']:
+            errors.append(f"时长 {duration:.1f} 秒，少于 {rules['min_duration']} 秒")
+        if rules['max_duration'] and duration > rules['max_duration']:
+            errors.append(f"时长 {duration:.0f} 秒，超过 {rules['max_duration']} 秒")
+    short_edge = min(meta.get('width', 0), meta.get('height', 0))
+    if meta.get('width') and short_edge < rules['min_short_edge']:
+        errors.append(f"分辨率 {meta['width']}x{meta['height']} 过低")
+    return errors
+
+
+class MediaProbe(object):
+    """视频元数据探测和校验
+
+    元数据缓存在 media_probe_cache 表中，路径、大小、修改时间都不变时直接使用缓存，
+    发布前校验一批文件只需几次查询，文件变化后自动重新探测。
+    """
+
+    def __init__(self, database=db):
+        self.db = database
+
+    def probe(self, path, use_cache=True):
+        path = str(Path(path).resolve())
+        stat = os.stat(path)
+        if use_cache:
+            with self.db.connection() as conn:
+                row = conn.execute("SELECT size, mtime_ns, metadata FROM media_probe_cache WHERE path = ?",
+                                   (path,)).fetchone()
+            if row and row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns:
+                return json.loads(row['metadata'])
+        source, meta = probe_file(path)
+        if use_cache:
+            with self.db.connection() as conn:
+                conn.execute('''INSERT INTO media_probe_cache (path, size, mtime_ns, source, metadata, probed_at)
+                                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                                ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns,
+                                    source = excluded.source, metadata = excluded.metadata, probed_at = excluded.probed_at''',
+                             (path, stat.st_size, stat.st_mtime_ns, source, json.dumps(meta, ensure_ascii=False)))
+        return meta
+
+    def check(self, path, platform=None, use_cache=True):
+        """返回文件的错误列表，文件不存在时同样作为错误返回"""
+        try:
+            return validate(self.probe(path, use_cache), platform)
+        except FileNotFoundError:
+            return ['文件不存在']
+
+    def check_files(self, paths, platform=None):
+        """校验一批文件，返回 {路径: 错误列表}，只包含未通过的文件"""
+        failed = {}
+        for path in paths:
+            errors = self.check(path, platform)
+            if errors:
+                failed[str(path)] = errors
+        return failed
+
+
+media_probe = MediaProbe()
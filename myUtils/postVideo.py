@@ -1,90 +1,158 @@
 import asyncio
 from pathlib import Path
 
-from conf import BASE_DIR
+from conf import BASE_DIR, MAX_CONCURRENT_BROWSERS
+from myUtils.mediaProbe import media_probe
 from uploader.douyin_uploader.main import DouYinVideo
 from uploader.ks_uploader.main import KSVideo
 from uploader.tencent_uploader.main import TencentVideo
 from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
 from utils.constant import TencentZoneTypes
 from utils.files_times import generate_schedule_time_next_day
+# 与 dispatch_upload 使用同一个模块路径，保证读取到同一个浏览器池上下文变量
+from social_auto_upload.utils.browser_pool import browser_pool_scope, run_with_browser_pool
+from social_auto_upload.utils.batch_publish import BatchPublishSession
+from social_auto_upload.utils.media_preflight import get_media_preflight
+
+
+async def fan_out_uploads(build_app, files, account_file, max_browsers=MAX_CONCURRENT_BROWSERS):
+    """在同一个事件循环内把 文件×账号 的上传任务并发执行
+
+    不同账号之间并行，同一账号的文件按顺序串行上传，
+    同时进行的上传不超过 max_browsers 个，所有上传共用同一个浏览器池（通过 run_with_browser_pool 运行时为
+    跨任务长驻的浏览器池），每次上传只在池内浏览器中创建独立的上下文。
+    返回按 文件、账号 顺序排列的结果列表，每项包含 file、account、success、msg。
+    """
+    browser_semaphore = asyncio.Semaphore(max(1, int(max_browsers)))
+    matrix = [[None] * len(account_file) for _ in files]
+
+    async def upload_for_account(account_index, cookie):
+        for index, file in enumerate(files):
+            async with browser_semaphore:
+                print(f"视频文件名：{file} 账号：{cookie.name}")
+                result = {"file": file.name, "account": cookie.name, "success": True, "msg": None}
+                try:
+                    res = await build_app(index, file, cookie).main()
+                    if isinstance(res, tuple):
+                        result["success"], result["msg"] = bool(res[0]), res[1]
+                except Exception as e:
+                    result["success"], result["msg"] = False, f"{type(e).__name__}: {e}"
+                    print(f"❌ 上传失败 {file.name} -> {cookie.name}: {result['msg']}")
+                matrix[index][account_index] = result
+
+    async with browser_pool_scope():
+        await asyncio.gather(*(upload_for_account(i, cookie) for i, cookie in enumerate(account_file)))
+    return [result for row in matrix for result in row]
+
+
+def validate_files(files, platform):
+    """按平台规则校验视频元数据（有缓存，毫秒级），有不合格的文件时抛出 ValueError，不再打开浏览器"""
+    failed = media_probe.check_files(files, platform)
+    if failed:
+        raise ValueError('；'.join(f'{Path(path).name}: {"，".join(errors)}' for path, errors in failed.items()))
+
+
+def preflight_files(files, platform):
+    """校验视频后按平台格式转封装 / 转码，返回实际上传的文件（无需处理或处理失败时为原文件）"""
+    validate_files(files, platform)
+    return [Path(result['path']) for result in get_media_preflight().prepare(files, platform)]
+
+
+async def batch_uploads(video_cls, platform, items, account_file, **video_kwargs):
+    """每个账号一个批量发布会话（复用同一个浏览器上下文），不同账号之间并行
+
+    items 为 (file, title, tags, publish_date) 列表，返回值格式与 fan_out_uploads 相同，按 账号、文件 顺序排列。
+    """
+    async with browser_pool_scope():
+        reports = await asyncio.gather(*(BatchPublishSession(video_cls, platform, cookie, items, **video_kwargs).run()
+                                         for cookie in account_file))
+    return [result for report in reports for result in report.results()]
 
 
 def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
+    files = preflight_files(files, 'tencent')
     if enableTimer:
         publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
     else:
         publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
-            asyncio.run(app.main(), debug=False)
-
-
-def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
+    # 打印标题和 hashtag
+    print(f"标题：{title}")
+    print(f"Hashtag：{tags}")
+
+    def build_app(index, file, cookie):
+        return TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
+
+    return run_with_browser_pool(fan_out_uploads(build_app, files, account_file))
+
+
+def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, batch=False):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
+    files = preflight_files(files, 'douyin')
     if enableTimer:
         publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
     else:
         publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
-            asyncio.run(app.main(), debug=False)
-
-
-def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
+    # 打印标题和 hashtag
+    print(f"标题：{title}")
+    print(f"Hashtag：{tags}")
+
+    def build_app(index, file, cookie):
+        return DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
+
+    if batch:
+        # 同一账号的多个文件在一个浏览器会话内连续发布
+        items = [(str(file), title, tags, publish_datetimes[index]) for index, file in enumerate(files)]
+        return run_with_browser_pool(batch_uploads(DouYinVideo, 'douyin', items, account_file))
+    return run_with_browser_pool(fan_out_uploads(build_app, files, account_file))
+
+
+def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, batch=False):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
+    files = preflight_files(files, 'kuaishou')
     if enableTimer:
         publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
     else:
         publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
-            asyncio.run(app.main(), debug=False)
+    # 打印标题和 hashtag
+    print(f"标题：{title}")
+    print(f"Hashtag：{tags}")
+
+    def build_app(index, file, cookie):
+        return KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
+
+    if batch:
+        # 同一账号的多个文件在一个浏览器会话内连续发布
+        items = [(str(file), title, tags, publish_datetimes[index]) for index, file in enumerate(files)]
+        return run_with_browser_pool(batch_uploads(KSVideo, 'kuaishou', items, account_file))
+    return run_with_browser_pool(fan_out_uploads(build_app, files, account_file))
 
 def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
+    files = preflight_files(files, 'xiaohongshu')
     file_num = len(files)
     if enableTimer:
         publish_datetimes = generate_schedule_time_next_day(file_num, videos_per_day, daily_times,start_days)
     else:
         publish_datetimes = 0
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
-            asyncio.run(app.main(), debug=False)
+    # 打印标题和 hashtag
+    print(f"标题：{title}")
+    print(f"Hashtag：{tags}")
+
+    def build_app(index, file, cookie):
+        return XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
+
+    return run_with_browser_pool(fan_out_uploads(build_app, files, account_file))
 
 
 
 # post_video("333",["demo.mp4"],"d","d")
-# post_video_DouYin("333",["demo.mp4"],"d","d")
\ No newline at end of file
+# post_video_DouYin("333",["demo.mp4"],"d","d")
@@ -0,0 +1,29 @@
+from queue import Empty
+
+from conf import SSE_HEARTBEAT_INTERVAL
+
+# 登录流程的终止状态，收到后结束 SSE 连接
+SSE_TERMINAL_STATUS = ("200", "500")
+
+
+def sse_stream(status_queue, on_close=None, heartbeat_interval=None):
+    """SSE 流生成器：阻塞等待 status_queue 的消息并逐条输出
+
+    无消息时每 heartbeat_interval 秒（默认 conf.SSE_HEARTBEAT_INTERVAL）发送一次心跳注释；
+    收到终止状态后结束，客户端断开时写入失败，生成器随之关闭；两种情况都会调用 on_close。
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = SSE_HEARTBEAT_INTERVAL
+    try:
+        while True:
+            try:
+                msg = status_queue.get(timeout=heartbeat_interval)
+            except Empty:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"data: {msg}\n\n"
+            if str(msg) in SSE_TERMINAL_STATUS:
+                break
+    finally:
+        if on_close:
+            on_close()
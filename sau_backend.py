@@ -1,17 +1,24 @@
 import asyncio
+import hashlib
 import os
-import sqlite3
 import threading
-import time
 import uuid
 from pathlib import Path
 from queue import Queue
 from flask_cors import CORS
-from myUtils.auth import check_cookie
+from myUtils.cookieCache import cookie_cache, mark_accounts_invalid
 from flask import Flask, request, jsonify, Response, render_template, send_from_directory
 from conf import BASE_DIR
 from myUtils.login import get_tencent_cookie, douyin_cookie_gen, get_ks_cookie, xiaohongshu_cookie_gen
 from myUtils.postVideo import post_video_tencent, post_video_DouYin, post_video_ks, post_video_xhs
+from myUtils.database import db
+from myUtils.jobQueue import job_queue
+from myUtils.chunkUpload import chunk_upload_manager, save_stream, safe_filename, parse_size, ChunkUploadError, \
+    UPLOAD_TMP_DIR
+from myUtils.fileStore import file_store
+from myUtils.mediaProbe import media_probe, VIDEO_EXTENSIONS, PLATFORM_BY_TYPE
+from myUtils.listQuery import query_files, query_accounts, ListQueryError
+from myUtils.sseStream import sse_stream
 
 active_queues = {}
 app = Flask(__name__)
@@ -60,7 +67,7 @@ def upload_file():
         uuid_v1 = uuid.uuid1()
         print(f"UUID v1: {uuid_v1}")
         filepath = Path(BASE_DIR / "videoFile" / f"{uuid_v1}_{file.filename}")
-        file.save(filepath)
+        save_stream(file.stream, filepath)
         return jsonify({"code":200,"msg": "File uploaded successfully", "data": f"{uuid_v1}_{file.filename}"}), 200
     except Exception as e:
         return jsonify({"code":200,"msg": str(e),"data":None}), 500
@@ -84,6 +91,22 @@ def get_file():
     return send_from_directory(file_path,filename)
 
 
+def check_video(filename, path, platform_type=None, use_cache=True):
+    """检查视频文件的元数据，返回错误列表；非视频文件不检查，platform_type 为平台类型（可选）"""
+    if Path(filename).suffix.lower() not in VIDEO_EXTENSIONS:
+        return []
+    platform = PLATFORM_BY_TYPE.get(int(platform_type)) if str(platform_type).isdigit() else None
+    return media_probe.check(path, platform, use_cache=use_cache)
+
+
+def video_error_response(errors):
+    return jsonify({
+        "code": 400,
+        "msg": "；".join(errors),
+        "data": None
+    }), 400
+
+
 @app.route('/uploadSave', methods=['POST'])
 def upload_save():
     if 'file' not in request.files:
@@ -109,35 +132,151 @@ def upload_save():
         filename = file.filename
 
     try:
-        # 生成 UUID v1
-        uuid_v1 = uuid.uuid1()
-        print(f"UUID v1: {uuid_v1}")
+        # 按块写入临时文件并同时计算 md5，不在内存中缓存整个文件
+        UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(UPLOAD_TMP_DIR / f"{uuid.uuid1()}.tmp")
+        hasher = hashlib.md5()
+        try:
+            size = save_stream(file.stream, tmp_path, hasher)
+            # 视频先检查元数据，损坏或不符合平台规则（type 可选）的文件直接拒绝，不入库
+            errors = check_video(filename, tmp_path, request.form.get('type'), use_cache=False)
+            if errors:
+                return video_error_response(errors)
+            # 相同内容只保存一份，记录指向同一个内容文件
+            final_filename = file_store.add_file(filename, hasher.hexdigest(), size, tmp_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        return jsonify({
+            "code": 200,
+            "msg": "File uploaded and saved successfully",
+            "data": {
+                "filename": filename,
+                "filepath": final_filename
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": str("upload failed!"),
+            "data": None
+        }), 500
 
-        # 构造文件名和路径
-        final_filename = f"{uuid_v1}_{filename}"
-        filepath = Path(BASE_DIR / "videoFile" / f"{uuid_v1}_{filename}")
+def chunk_upload_error(e):
+    return jsonify({
+        "code": e.status,
+        "msg": e.msg,
+        "data": e.data
+    }), e.status
 
-        # 保存文件
-        file.save(filepath)
 
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO file_records (filename, filesize, file_path)
-            VALUES (?, ?, ?)
-                                ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024),2), final_filename))
-            conn.commit()
-            print("✅ 上传文件已记录")
+@app.route('/uploadChunk/init', methods=['POST'])
+def upload_chunk_init():
+    data = request.get_json(silent=True) or {}
+    try:
+        filename = data.get('filename')
+        custom_filename = data.get('customFilename')
+        md5 = data.get('md5')
+        for name, value in (("filename", filename), ("customFilename", custom_filename), ("md5", md5)):
+            if value is not None and not isinstance(value, str):
+                raise ChunkUploadError(f"Invalid {name}", 400)
+        # 与 /uploadSave 一致，可选的自定义文件名沿用原文件扩展名
+        if filename and custom_filename:
+            filename = custom_filename + "." + filename.split('.')[-1]
+        size = parse_size(data.get('size'))
+        # 客户端提供 md5 且内容已存在时直接登记，无需再上传（秒传）
+        blob = file_store.find_blob(md5)
+        if blob and safe_filename(filename) and (size is None or size == blob['size']):
+            filename = safe_filename(filename)
+            errors = check_video(filename, file_store.video_dir / blob['path'], data.get('type'))
+            if errors:
+                return video_error_response(errors)
+            final_filename = file_store.add_file(filename, blob['digest'], blob['size'])
+            return jsonify({
+                "code": 200,
+                "msg": "File already exists",
+                "data": {
+                    "instant": True,
+                    "filename": filename,
+                    "filepath": final_filename,
+                    "filesize": blob['size'],
+                    "md5": blob['digest']
+                }
+            }), 200
+        return jsonify({
+            "code": 200,
+            "msg": None,
+            "data": chunk_upload_manager.init(filename, size)
+        }), 200
+    except ChunkUploadError as e:
+        return chunk_upload_error(e)
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": str("upload failed!"),
+            "data": None
+        }), 500
+
+
+@app.route('/uploadChunk/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    offset = request.args.get('offset')
+    if offset is None or not offset.isdigit():
+        return jsonify({
+            "code": 400,
+            "msg": "Invalid or missing offset",
+            "data": None
+        }), 400
+    try:
+        # 直接读取请求体流，分块写入文件
+        new_offset = chunk_upload_manager.write_chunk(upload_id, int(offset), request.stream)
+        return jsonify({
+            "code": 200,
+            "msg": None,
+            "data": {"uploadId": upload_id, "offset": new_offset}
+        }), 200
+    except ChunkUploadError as e:
+        return chunk_upload_error(e)
+
+
+@app.route('/uploadChunk/<upload_id>', methods=['GET'])
+def upload_chunk_status(upload_id):
+    try:
+        return jsonify({
+            "code": 200,
+            "msg": None,
+            "data": chunk_upload_manager.status(upload_id)
+        }), 200
+    except ChunkUploadError as e:
+        return chunk_upload_error(e)
 
+
+@app.route('/uploadChunk/<upload_id>/finalize', methods=['POST'])
+def upload_chunk_finalize(upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        part_path, filename, size, md5 = chunk_upload_manager.finalize(upload_id, data.get('md5'))
+        errors = check_video(filename, part_path, data.get('type'), use_cache=False)
+        if errors:
+            # 文件内容有问题，重新上传同样会失败，直接丢弃本次上传
+            chunk_upload_manager.complete(upload_id)
+            return video_error_response(errors)
+        final_filename = file_store.add_file(filename, md5, size, part_path)
+        chunk_upload_manager.complete(upload_id)
         return jsonify({
             "code": 200,
             "msg": "File uploaded and saved successfully",
             "data": {
                 "filename": filename,
-                "filepath": final_filename
+                "filepath": final_filename,
+                "filesize": size,
+                "md5": md5
             }
         }), 200
-
+    except ChunkUploadError as e:
+        return chunk_upload_error(e)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -145,12 +284,12 @@ def upload_save():
             "data": None
         }), 500
 
+
 @app.route('/getFiles', methods=['GET'])
 def get_all_files():
     try:
         # 使用 with 自动管理数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row  # 允许通过列名访问结果
+        with db.connection() as conn:
             cursor = conn.cursor()
 
             # 查询所有记录
@@ -173,36 +312,65 @@ def get_all_files():
         }), 500
 
 
+@app.route('/getFilesPage', methods=['GET'])
+def get_files_page():
+    # 分页查询文件记录，参数见 myUtils/listQuery.query_files
+    try:
+        return jsonify({
+            "code": 200,
+            "msg": "success",
+            "data": query_files(request.args)
+        }), 200
+    except ListQueryError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
+
+
+@app.route('/getAccountsPage', methods=['GET'])
+def get_accounts_page():
+    # 分页查询账号（只读数据库中的状态，不校验 cookie），参数见 myUtils/listQuery.query_accounts
+    try:
+        return jsonify({
+            "code": 200,
+            "msg": "success",
+            "data": query_accounts(request.args)
+        }), 200
+    except ListQueryError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
+
+
 @app.route("/getValidAccounts",methods=['GET'])
 async def getValidAccounts():
-    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+    # refresh=1 时忽略缓存，重新校验所有账号
+    refresh = request.args.get('refresh') == '1'
+    with db.connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
         SELECT * FROM user_info''')
         rows = cursor.fetchall()
-        rows_list = [list(row) for row in rows]
-        print("\n📋 当前数据表内容：")
-        for row in rows:
-            print(row)
-        for row in rows_list:
-            flag = await check_cookie(row[1],row[2])
-            if not flag:
-                row[4] = 0
-                cursor.execute('''
-                UPDATE user_info 
-                SET status = ? 
-                WHERE id = ?
-                ''', (0,row[0]))
-                conn.commit()
-                print("✅ 用户状态已更新")
-        for row in rows:
-            print(row)
-        return jsonify(
-                        {
-                            "code": 200,
-                            "msg": None,
-                            "data": rows_list
-                        }),200
+    rows_list = [list(row) for row in rows]
+    # 校验期间不持有数据库连接，校验结果优先取自缓存，未命中的账号共用一个浏览器并发校验
+    results = await cookie_cache.resolve([(row[1], row[2]) for row in rows_list], refresh=refresh)
+    invalid_ids = []
+    for row, flag in zip(rows_list, results):
+        if flag is False:
+            if row[4] != 0:
+                invalid_ids.append(row[0])
+            row[4] = 0
+    mark_accounts_invalid(invalid_ids)
+    return jsonify(
+                    {
+                        "code": 200,
+                        "msg": None,
+                        "data": rows_list
+                    }),200
 
 @app.route('/deleteFile', methods=['GET'])
 def delete_file():
@@ -217,8 +385,7 @@ def delete_file():
 
     try:
         # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
+        with db.connection() as conn:
             cursor = conn.cursor()
 
             # 查询要删除的记录
@@ -234,9 +401,8 @@ def delete_file():
 
             record = dict(record)
 
-            # 删除数据库记录
-            cursor.execute("DELETE FROM file_records WHERE id = ?", (file_id,))
-            conn.commit()
+        # 删除数据库记录，文件内容不再被引用时一并删除
+        file_store.delete_file(record)
 
         return jsonify({
             "code": 200,
@@ -260,8 +426,7 @@ def delete_account():
 
     try:
         # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
+        with db.connection() as conn:
             cursor = conn.cursor()
 
             # 查询要删除的记录
@@ -308,12 +473,14 @@ def login():
     active_queues[id] = status_queue
 
     def on_close():
-        print(f"清理队列: {id}")
-        del active_queues[id]
+        # 同一账号名可能已经发起了新的登录，只清理自己的队列
+        if active_queues.get(id) is status_queue:
+            print(f"清理队列: {id}")
+            del active_queues[id]
     # 启动异步任务线程
     thread = threading.Thread(target=run_async_function, args=(type,id,status_queue), daemon=True)
     thread.start()
-    response = Response(sse_stream(status_queue,), mimetype='text/event-stream')
+    response = Response(sse_stream(status_queue, on_close), mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
     response.headers['X-Accel-Buffering'] = 'no'  # 关键：禁用 Nginx 缓冲
     response.headers['Content-Type'] = 'text/event-stream'
@@ -324,43 +491,20 @@ def login():
 def postVideo():
     # 获取JSON数据
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"code": 400, "msg": "Expected a JSON object", "data": None}), 400
 
-    # 从JSON数据中提取fileList和accountList
-    file_list = data.get('fileList', [])
-    account_list = data.get('accountList', [])
-    type = data.get('type')
-    title = data.get('title')
-    tags = data.get('tags')
-    category = data.get('category')
-    enableTimer = data.get('enableTimer')
-    if category == 0:
-        category = None
-
-    videos_per_day = data.get('videosPerDay')
-    daily_times = data.get('dailyTimes')
-    start_days = data.get('startDays')
     # 打印获取到的数据（仅作为示例）
-    print("File List:", file_list)
-    print("Account List:", account_list)
-    match type:
-        case 1:
-            post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
-        case 2:
-            post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
-        case 3:
-            post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days)
-        case 4:
-            post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days)
+    print("File List:", data.get('fileList', []))
+    print("Account List:", data.get('accountList', []))
+    # 写入任务队列后立即返回，发布由后台 worker 执行
+    job_id = job_queue.submit("postVideo", data)
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": {"jobId": job_id}
         }), 200
 
 
@@ -375,8 +519,7 @@ def updateUserinfo():
     userName = data.get('userName')
     try:
         # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
+        with db.connection() as conn:
             cursor = conn.cursor()
 
             # 更新数据库记录
@@ -407,44 +550,96 @@ def postVideoBatch():
 
     if not isinstance(data_list, list):
         return jsonify({"error": "Expected a JSON array"}), 400
+    job_ids = []
     for data in data_list:
-        # 从JSON数据中提取fileList和accountList
-        file_list = data.get('fileList', [])
-        account_list = data.get('accountList', [])
-        type = data.get('type')
-        title = data.get('title')
-        tags = data.get('tags')
-        category = data.get('category')
-        enableTimer = data.get('enableTimer')
-        if category == 0:
-            category = None
-
-        videos_per_day = data.get('videosPerDay')
-        daily_times = data.get('dailyTimes')
-        start_days = data.get('startDays')
         # 打印获取到的数据（仅作为示例）
-        print("File List:", file_list)
-        print("Account List:", account_list)
-        match type:
-            case 1:
-                return
-            case 2:
-                post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days)
-            case 3:
-                post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
-            case 4:
-                post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
+        print("File List:", data.get('fileList', []))
+        print("Account List:", data.get('accountList', []))
+        job_ids.append(job_queue.submit("postVideo", data))
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": {"jobIds": job_ids}
         }), 200
 
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({
+            "code": 404,
+            "msg": "job not found",
+            "data": None
+        }), 404
+    return jsonify({
+        "code": 200,
+        "msg": "success",
+        "data": job
+    }), 200
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    status = request.args.get('status')
+    limit = min(request.args.get('limit', default=50, type=int), 500)
+    offset = request.args.get('offset', default=0, type=int)
+    return jsonify({
+        "code": 200,
+        "msg": "success",
+        "data": job_queue.list(status=status, limit=limit, offset=offset)
+    }), 200
+
+
+# 发布任务处理函数：由任务队列的 worker 线程调用
+def publish_video(data):
+    # 从JSON数据中提取fileList和accountList
+    file_list = data.get('fileList', [])
+    account_list = data.get('accountList', [])
+    type = data.get('type')
+    title = data.get('title')
+    tags = data.get('tags')
+    category = data.get('category')
+    enableTimer = data.get('enableTimer')
+    if category == 0:
+        category = None
+
+    videos_per_day = data.get('videosPerDay')
+    daily_times = data.get('dailyTimes')
+    start_days = data.get('startDays')
+    # 抖音、快手可开启批量模式：同一账号的多个文件在一个浏览器会话内连续发布
+    batch = bool(data.get('batch'))
+    match type:
+        case 1:
+            return post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day,
+                                  daily_times, start_days)
+        case 2:
+            return post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day,
+                                      daily_times, start_days)
+        case 3:
+            return post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day,
+                                     daily_times, start_days, batch=batch)
+        case 4:
+            return post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day,
+                                 daily_times, start_days, batch=batch)
+        case _:
+            raise ValueError(f"unsupported platform type: {type}")
+
+
+job_queue.register("postVideo", publish_video)
+
+
+def init_app():
+    """启动后台服务（发布任务队列、cookie 后台刷新）
+
+    只在服务进程中调用；导入本模块（测试、工具脚本、子进程）不会启动任何线程或改动任务状态。
+    """
+    job_queue.start()
+    cookie_cache.start_refresher()
+
+
 # 包装函数：在线程中运行异步函数
 def run_async_function(type,id,status_queue):
     match type:
@@ -469,15 +664,6 @@ def run_async_function(type,id,status_queue):
             loop.run_until_complete(get_ks_cookie(id,status_queue))
             loop.close()
 
-# SSE 流生成器函数
-def sse_stream(status_queue):
-    while True:
-        if not status_queue.empty():
-            msg = status_queue.get()
-            yield f"data: {msg}\n\n"
-        else:
-            # 避免 CPU 占满
-            time.sleep(0.1)
-
 if __name__ == '__main__':
+    init_app()
     app.run(host='0.0.0.0' ,port=5409)
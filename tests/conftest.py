@@ -0,0 +1,48 @@
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+# 项目内同时使用 social_auto_upload.xxx 和 conf / myUtils 两种导入方式
+ROOT_DIR = Path(__file__).resolve().parent.parent
+for path in (str(ROOT_DIR), str(ROOT_DIR.parent)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class SqliteDbManager(object):
+    """与 db_manager 相同的接口，数据保存在内存 SQLite 中"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+    @contextmanager
+    def get_session(self):
+        yield self
+        self.conn.commit()
+
+    def execute(self, statement, params=None):
+        return self.conn.execute(str(statement), params or {})
+
+    def _execute_query(self, sql, params=None):
+        return self.conn.execute(sql, params or {}).fetchall()
+
+    def _execute_query_one(self, sql, params=None):
+        return self.conn.execute(sql, params or {}).fetchone()
+
+    def _execute_write(self, sql, params=None):
+        self.conn.execute(sql, params or {})
+        self.conn.commit()
+
+    def _execute_write_many(self, sql, params_list):
+        self.conn.executemany(sql, params_list)
+        self.conn.commit()
+
+
+@pytest.fixture
+def db_manager():
+    """内存 SQLite 数据库，同一个测试中的各个模块共用"""
+    return SqliteDbManager()
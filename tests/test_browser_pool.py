@@ -0,0 +1,145 @@
+"""浏览器池：复用 / 回收浏览器、租用结束关闭遗留上下文，以及共用事件循环的阻塞检测"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('patchright')
+browser_pool = pytest.importorskip('social_auto_upload.utils.browser_pool')
+
+
+class FakeContext(object):
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser(object):
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **kwargs):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = browser_pool.BrowserPool(max_contexts=3, max_rss_mb=0, max_active=2, idle_timeout=0)
+
+    async def launch(options):
+        pool.launched += 1
+        return browser_pool._PooledBrowser(FakeBrowser(), [])
+
+    monkeypatch.setattr(pool, '_launch', launch)
+    return pool
+
+
+def test_browser_is_reused_and_retired_after_max_contexts(pool):
+    async def run():
+        browsers = []
+        for _ in range(4):
+            async with pool.lease({'headless': True}) as browser:
+                browsers.append(browser._browser)
+        return browsers
+
+    browsers = asyncio.run(run())
+    assert browsers[0] is browsers[1] is browsers[2]
+    assert browsers[3] is not browsers[0]
+    # 达到 max_contexts 后在最后一个上下文释放时关闭
+    assert browsers[0].closed
+    assert pool.launched == 2
+
+
+def test_different_options_use_different_browsers(pool):
+    async def run():
+        async with pool.lease({'headless': True}) as first:
+            async with pool.lease({'headless': True, 'proxy': {'server': 'http://p', 'username': 'a'}}) as second:
+                return first._browser, second._browser
+
+    first, second = asyncio.run(run())
+    assert first is not second
+
+
+def test_max_active_launches_another_browser(pool):
+    async def run():
+        async with pool.lease({}) as a, pool.lease({}) as b, pool.lease({}) as c:
+            return a._browser, b._browser, c._browser
+
+    a, b, c = asyncio.run(run())
+    assert a is b and c is not a
+
+
+def test_lease_closes_leftover_contexts(pool):
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with pool.lease({}) as browser:
+                await browser.new_context()
+                await browser.new_context()
+                raise RuntimeError('upload failed')
+        return browser._browser
+
+    browser = asyncio.run(run())
+    assert [context.closed for context in browser.contexts] == [True, True]
+    assert not browser.closed  # 浏览器留在池中继续复用
+
+
+def blocking_upload_step():
+    # 模拟上传代码中的同步调用
+    time.sleep(0.8)
+
+
+def _run_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop, thread
+
+
+def _stop(watchdog, loop, thread):
+    watchdog.stop()
+    time.sleep(watchdog.interval * 2)  # 等心跳协程退出
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=2)
+    loop.close()
+
+
+def test_watchdog_reports_blocking_call_once(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(browser_pool.logger, 'warning', warnings.append)
+    loop, thread = _run_loop()
+    watchdog = browser_pool.LoopWatchdog(loop, thread.ident, threshold=0.3, interval=0.05).start()
+    try:
+        time.sleep(0.2)
+        assert watchdog.stalls == 0
+        loop.call_soon_threadsafe(blocking_upload_step)
+        time.sleep(1.2)
+        assert watchdog.stalls == 1
+        # 告警中带有阻塞所在的函数
+        assert 'blocking_upload_step' in warnings[0]
+        assert watchdog.max_lag >= 0.3
+    finally:
+        _stop(watchdog, loop, thread)
+
+
+def test_watchdog_ignores_async_waits(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(browser_pool.logger, 'warning', warnings.append)
+    loop, thread = _run_loop()
+    watchdog = browser_pool.LoopWatchdog(loop, thread.ident, threshold=0.3, interval=0.05).start()
+    try:
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.8), loop).result()
+        assert watchdog.stalls == 0 and not warnings
+    finally:
+        _stop(watchdog, loop, thread)
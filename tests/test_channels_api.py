@@ -0,0 +1,175 @@
+"""视频号接口客户端：同一账号复用一个连接池、cookie 只读一次、用完关闭"""
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+channels_api = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.channels_api')
+
+COOKIES = [
+    {'name': 'sessionid', 'value': 'sid', 'domain': '.channels.weixin.qq.com'},
+    {'name': 'wxuin', 'value': '1001', 'domain': '.weixin.qq.com'},
+]
+
+
+class StubServer(object):
+    """记录每个请求的连接端口、请求头和 cookie，返回 self.response"""
+
+    def __init__(self):
+        self.response = {'errCode': 0, 'data': {'baseResp': {'errmsg': ''}}}
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append({
+            'path': request.path,
+            'peer': request.transport.get_extra_info('peername')[1],
+            'headers': dict(request.headers),
+            'cookies': dict(request.cookies),
+            'body': await request.json(),
+        })
+        return web.json_response(self.response)
+
+
+class FakeLimiter(object):
+    def __init__(self):
+        self.reports = []
+
+    async def acquire(self, account, endpoint):
+        return True
+
+    def report(self, account, endpoint, ok, limited=False):
+        self.reports.append((account, endpoint, ok, limited))
+
+
+@pytest.fixture
+def account_file(tmp_path):
+    path = tmp_path / 'wx_account.json'
+    path.write_text(json.dumps({'cookies': COOKIES}), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = FakeLimiter()
+    monkeypatch.setattr(channels_api, 'get_rate_limiter', lambda: limiter)
+    return limiter
+
+
+async def _start(server, monkeypatch):
+    app = web.Application()
+    app.router.add_route('POST', '/{tail:.*}', server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    for name in ('POST_LIST_URL', 'POST_SEARCH_URL', 'POST_DELETE_URL', 'POST_VISIBLE_URL',
+                 'COLLECTION_FEED_URL', 'NOTIFICATION_LIST_URL'):
+        monkeypatch.setattr(channels_api, name, getattr(channels_api, name).replace(channels_api.CHANNELS_HOST, host))
+    return runner
+
+
+def test_client_reuses_one_connection_and_reads_cookies_once(account_file, limiter, monkeypatch):
+    server = StubServer()
+    loads = []
+    load_cookies = channels_api.ChannelsApiClient._load_cookies
+
+    async def counting_load(self):
+        loads.append(self.account_file)
+        await load_cookies(self)
+
+    monkeypatch.setattr(channels_api.ChannelsApiClient, '_load_cookies', counting_load)
+
+    async def run():
+        runner = await _start(server, monkeypatch)
+        try:
+            async with channels_api.ChannelsApiClient(account_file) as client:
+                session = client.session
+                await client.post_list(0, 1)
+                await client.search_posts('标题')
+                await client.notification_list()
+                assert await client.delete_post('export-1') == (True, '删除成功')
+                await client.update_visible('export-2')
+                await client.mod_collection_feed('c1', ['o1'])
+                assert client.session is session
+            return client, session
+        finally:
+            await runner.cleanup()
+
+    client, session = asyncio.run(run())
+    assert loads == [account_file]
+    assert len(server.requests) == 6 and client.request_count == 6
+    assert client.request_seconds > 0
+    # 顺序请求全部走同一个 keep-alive 连接
+    assert len({request['peer'] for request in server.requests}) == 1
+    for request in server.requests:
+        assert request['cookies'] == {'sessionid': 'sid', 'wxuin': '1001'}
+        assert request['headers']['X-WECHAT-UIN'] == '1001'
+        assert request['headers']['finger-print-device-id'] == hashlib.md5(b'sid').hexdigest()
+    assert server.requests[0]['headers']['Referer'].endswith('/micro/statistic/post')
+    # 退出 async with 后关闭会话
+    assert client.session is None and session.closed
+    assert client.account == 'wx_account.json'
+    assert [report[1] for report in limiter.reports] == ['delete', 'hide', 'collection']
+
+
+def test_use_client_does_not_close_passed_client(account_file, limiter, monkeypatch):
+    server = StubServer()
+
+    async def run():
+        runner = await _start(server, monkeypatch)
+        try:
+            client = channels_api.ChannelsApiClient(account_file)
+            for export_id in ('a', 'b', 'c'):
+                async with channels_api.use_client(client) as api:
+                    assert api is client
+                    await api.delete_post(export_id)
+            session = client.session
+            assert session is not None and not session.closed
+            await client.close()
+            assert session.closed
+
+            # 未传入 client 时临时创建，用完关闭
+            async with channels_api.use_client(account_file=account_file) as temp_client:
+                await temp_client.delete_post('d')
+            assert temp_client.session is None
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    peers = [request['peer'] for request in server.requests]
+    assert len(set(peers[:3])) == 1
+    assert peers[3] != peers[0]
+
+
+def test_rate_limited_delete_reports_limit(account_file, limiter, monkeypatch):
+    server = StubServer()
+    server.response = {'errCode': 0, 'data': {'baseResp': {'errmsg': channels_api.DELETE_RATE_LIMIT_MSG}}}
+
+    async def run():
+        runner = await _start(server, monkeypatch)
+        try:
+            async with channels_api.ChannelsApiClient(sessionid='sid', wxuin='1001') as client:
+                return await client.delete_post('export-1')
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == (False, channels_api.DELETE_RATE_LIMIT_MSG)
+    assert limiter.reports == [('1001', 'delete', False, True)]
+
+
+def test_missing_cookies_raise(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_text(json.dumps({'cookies': []}), encoding='utf-8')
+
+    async def run():
+        client = channels_api.ChannelsApiClient(str(path))
+        with pytest.raises(channels_api.ChannelsApiError):
+            await client.open()
+        assert client.session is None
+
+    asyncio.run(run())
@@ -0,0 +1,126 @@
+"""分块上传：按 offset 续传、offset 不一致时拒绝并返回服务端 offset"""
+import hashlib
+import io
+
+import pytest
+
+chunkUpload = pytest.importorskip('myUtils.chunkUpload')
+
+DATA = bytes(range(256)) * 40  # 10240 字节
+
+
+class BrokenStream(object):
+    """读到 limit 字节后连接中断"""
+
+    def __init__(self, data, limit):
+        self.stream = io.BytesIO(data[:limit])
+
+    def read(self, n=-1):
+        block = self.stream.read(n)
+        if not block:
+            raise ConnectionError('client disconnected')
+        return block
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return chunkUpload.ChunkUploadManager(tmp_dir=tmp_path / '.uploads', video_dir=tmp_path, chunk_size=4096)
+
+
+def test_chunks_resume_from_server_offset(manager):
+    upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+    assert manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:4096])) == 4096
+    assert manager.status(upload_id)['offset'] == 4096
+    assert manager.write_chunk(upload_id, 4096, io.BytesIO(DATA[4096:])) == len(DATA)
+    part_path, filename, size, md5 = manager.finalize(upload_id, hashlib.md5(DATA).hexdigest())
+    assert (filename, size, md5) == ('video.mp4', len(DATA), hashlib.md5(DATA).hexdigest())
+    assert part_path.read_bytes() == DATA
+
+
+@pytest.mark.parametrize('offset', [0, 100, 8192])
+def test_mismatched_offset_is_rejected(manager, offset):
+    upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+    manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:4096]))
+    with pytest.raises(chunkUpload.ChunkUploadError) as excinfo:
+        manager.write_chunk(upload_id, offset, io.BytesIO(DATA[offset:offset + 4096]))
+    assert excinfo.value.status == 409
+    assert excinfo.value.data == {'offset': 4096}
+    # 拒绝的分块不写入
+    assert manager.status(upload_id)['offset'] == 4096
+
+
+def test_interrupted_chunk_resumes_from_written_bytes(manager):
+    upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+    with pytest.raises(ConnectionError):
+        manager.write_chunk(upload_id, 0, BrokenStream(DATA, 3000))
+    offset = manager.status(upload_id)['offset']
+    assert offset == 3000
+    assert manager.write_chunk(upload_id, offset, io.BytesIO(DATA[offset:])) == len(DATA)
+    assert manager.finalize(upload_id)[3] == hashlib.md5(DATA).hexdigest()
+
+
+def test_resume_after_restart_recomputes_md5(manager, tmp_path):
+    upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+    manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:5000]))
+    # 进程重启：新的管理器没有内存中的摘要状态
+    restarted = chunkUpload.ChunkUploadManager(tmp_dir=tmp_path / '.uploads', video_dir=tmp_path)
+    with pytest.raises(chunkUpload.ChunkUploadError):
+        restarted.write_chunk(upload_id, 4096, io.BytesIO(DATA[4096:]))
+    restarted.write_chunk(upload_id, 5000, io.BytesIO(DATA[5000:]))
+    assert restarted.finalize(upload_id, hashlib.md5(DATA).hexdigest())[2] == len(DATA)
+
+
+def test_upload_beyond_declared_size_is_discarded(manager):
+    upload_id = manager.init('video.mp4', 100)['uploadId']
+    with pytest.raises(chunkUpload.ChunkUploadError) as excinfo:
+        manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:200]))
+    assert excinfo.value.status == 400
+    with pytest.raises(chunkUpload.ChunkUploadError) as excinfo:
+        manager.status(upload_id)
+    assert excinfo.value.status == 404
+
+
+def test_incomplete_upload_cannot_finalize(manager):
+    upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+    manager.write_chunk(upload_id, 0, io.BytesIO(DATA[:4096]))
+    with pytest.raises(chunkUpload.ChunkUploadError) as excinfo:
+        manager.finalize(upload_id)
+    assert (excinfo.value.status, excinfo.value.data) == (409, {'offset': 4096})
+
+
+class TestChunkRoutes(object):
+    """PUT / GET /uploadChunk/<uploadId> 路由"""
+
+    @pytest.fixture
+    def client(self, manager, monkeypatch):
+        sau_backend = pytest.importorskip('sau_backend')
+        monkeypatch.setattr(sau_backend, 'chunk_upload_manager', manager)
+        return sau_backend.app.test_client()
+
+    def test_put_resumes_and_rejects_mismatched_offset(self, client, manager):
+        upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+        response = client.put(f'/uploadChunk/{upload_id}?offset=0', data=DATA[:4096])
+        assert response.status_code == 200
+        assert response.get_json()['data']['offset'] == 4096
+
+        # 重复发送同一分块（客户端未收到响应后重试）
+        response = client.put(f'/uploadChunk/{upload_id}?offset=0', data=DATA[:4096])
+        assert response.status_code == 409
+        assert response.get_json()['data'] == {'offset': 4096}
+
+        # 断线后先查询 offset，再从该位置继续
+        offset = client.get(f'/uploadChunk/{upload_id}').get_json()['data']['offset']
+        response = client.put(f'/uploadChunk/{upload_id}?offset={offset}', data=DATA[offset:])
+        assert response.get_json()['data']['offset'] == len(DATA)
+
+    @pytest.mark.parametrize('query', ['', '?offset=-1', '?offset=abc'])
+    def test_put_requires_numeric_offset(self, client, manager, query):
+        upload_id = manager.init('video.mp4', len(DATA))['uploadId']
+        response = client.put(f'/uploadChunk/{upload_id}{query}', data=DATA[:10])
+        assert response.status_code == 400
+
+    def test_put_unknown_upload(self, client):
+        response = client.put('/uploadChunk/not-a-uuid?offset=0', data=b'x')
+        assert response.status_code == 400
+        response = client.put('/uploadChunk/00000000-0000-1000-8000-000000000000?offset=0', data=b'x')
+        assert response.status_code == 404
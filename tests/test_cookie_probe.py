@@ -0,0 +1,105 @@
+"""cookie 探测：用本地 aiohttp 服务模拟各平台的登录态接口"""
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+cookie_probe = pytest.importorskip('social_auto_upload.utils.cookie_probe')
+
+# 平台类型 -> (有效, 失效, 无法判断) 时接口返回的内容
+PAYLOADS = {
+    1: ({'success': True, 'code': 0, 'data': {}}, {'success': False, 'code': -100}, {'success': False, 'code': 500}),
+    2: ({'errCode': 0, 'data': {}}, {'errCode': 300333, 'errMsg': 'expired'}, {'errCode': -1, 'errMsg': 'busy'}),
+    3: ({'status_code': 0, 'user': {'uid': '1'}}, {'status_code': 8}, {'status_code': 0}),
+    4: ({'result': 1, 'data': {}}, {'result': 109}, {'result': 2}),
+}
+COOKIES = [
+    {'name': 'web_session', 'value': 'x', 'domain': '.xiaohongshu.com'},
+    {'name': 'sessionid', 'value': 's', 'domain': '.channels.weixin.qq.com'},
+    {'name': 'wxuin', 'value': '1', 'domain': '.weixin.qq.com'},
+    {'name': 'sessionid', 'value': 'd', 'domain': '.douyin.com'},
+    {'name': 'userId', 'value': 'k', 'domain': '.kuaishou.com'},
+]
+
+
+class StubServer(object):
+    """每个请求返回 self.response：(状态码, 内容, 额外响应头)，内容为 dict 时返回 JSON"""
+
+    def __init__(self):
+        self.response = (200, {}, {})
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append((request.method, dict(request.cookies)))
+        status, body, headers = self.response
+        if isinstance(body, dict):
+            return web.json_response(body, status=status, headers=headers)
+        return web.Response(text=body, status=status, headers=headers)
+
+
+async def _probe(server, platform_type, account_file, monkeypatch):
+    app = web.Application()
+    app.router.add_route('*', '/probe', server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    monkeypatch.setattr(cookie_probe.PROBES[platform_type], 'url', f"http://127.0.0.1:{runner.addresses[0][1]}/probe")
+    try:
+        return await cookie_probe.probe_cookie(platform_type, account_file)
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def account_file(tmp_path):
+    path = tmp_path / 'account.json'
+    path.write_text(json.dumps({'cookies': COOKIES}), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('platform_type', sorted(PAYLOADS))
+@pytest.mark.parametrize('outcome, expected', [(0, True), (1, False), (2, None)])
+def test_probe_judges_payload(platform_type, outcome, expected, account_file, monkeypatch):
+    server = StubServer()
+    server.response = (200, PAYLOADS[platform_type][outcome], {})
+    assert asyncio.run(_probe(server, platform_type, account_file, monkeypatch)) is expected
+    method, cookies = server.requests[0]
+    probe = cookie_probe.PROBES[platform_type]
+    assert method == probe.method
+    # 只携带平台域名下的 cookie
+    assert set(cookies) == {cookie['name'] for cookie in COOKIES if cookie['domain'].endswith(probe.domain)}
+
+
+@pytest.mark.parametrize('platform_type', sorted(PAYLOADS))
+@pytest.mark.parametrize('response, expected', [
+    ((401, {}, {}), False),
+    ((302, '', {'Location': 'https://example.com/login'}), False),
+    ((500, {}, {}), None),
+    ((200, 'not json', {}), None),
+])
+def test_probe_http_status(platform_type, response, expected, account_file, monkeypatch):
+    server = StubServer()
+    server.response = response
+    assert asyncio.run(_probe(server, platform_type, account_file, monkeypatch)) is expected
+
+
+def test_missing_required_cookie_is_expired_without_request(tmp_path, monkeypatch):
+    path = tmp_path / 'account.json'
+    path.write_text(json.dumps({'cookies': [COOKIES[1]]}), encoding='utf-8')  # 缺少 wxuin
+    server = StubServer()
+    assert asyncio.run(_probe(server, 2, str(path), monkeypatch)) is False
+    assert not server.requests
+
+
+def test_unreadable_cookie_file_and_unknown_type_fall_back(tmp_path, account_file):
+    assert asyncio.run(cookie_probe.probe_cookie(2, str(tmp_path / 'missing.json'))) is None
+    assert asyncio.run(cookie_probe.probe_cookie(99, account_file)) is None
+
+
+def test_unreachable_server_falls_back(account_file, monkeypatch):
+    monkeypatch.setattr(cookie_probe.PROBES[3], 'url', 'http://127.0.0.1:9/probe')
+    assert asyncio.run(cookie_probe.probe_cookie(3, account_file, timeout=1)) is None
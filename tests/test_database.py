@@ -0,0 +1,76 @@
+"""数据库迁移：旧版表结构的库能升级到最新版本"""
+import sqlite3
+
+import pytest
+
+database = pytest.importorskip('myUtils.database')
+
+# 迁移引入之前 db/createTable.py 创建的表结构
+OLD_SCHEMA = '''
+CREATE TABLE user_info (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type INTEGER NOT NULL,
+    filePath TEXT NOT NULL,
+    userName TEXT NOT NULL,
+    status INTEGER DEFAULT 0
+);
+CREATE TABLE file_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    filesize REAL,
+    upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    file_path TEXT
+);
+INSERT INTO file_records (filename, filesize, file_path) VALUES ('a.mp4', 1.5, 'uuid_a.mp4');
+'''
+
+
+def _create_old_db(path, user_version=0):
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.execute(f"PRAGMA user_version={user_version}")
+    conn.commit()
+    conn.close()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _check_latest(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+        assert 'blob_digest' in _columns(conn, 'file_records')
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {'job_records', 'file_blobs', 'media_probe_cache'} <= tables
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_file_records_upload_time' in indexes
+        # 原有数据保留
+        assert conn.execute("SELECT filename, blob_digest FROM file_records").fetchall() == [('a.mp4', None)]
+    finally:
+        conn.close()
+
+
+def test_old_schema_is_migrated(tmp_path):
+    path = tmp_path / 'database.db'
+    _create_old_db(path)
+    assert database.Database(path).migrate() == len(database.MIGRATIONS)
+    _check_latest(path)
+
+
+def test_db_stamped_without_blob_digest_is_repaired(tmp_path):
+    # 旧版 createTable.py 在已有库上只写入了版本号 5，没有补 blob_digest 字段
+    path = tmp_path / 'database.db'
+    _create_old_db(path, user_version=5)
+    database.Database(path).migrate()
+    _check_latest(path)
+
+
+def test_migrate_is_idempotent_and_pool_queries_new_column(tmp_path):
+    path = tmp_path / 'database.db'
+    _create_old_db(path)
+    db = database.Database(path)
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM file_records WHERE blob_digest IS NULL").fetchone()[0] == 1
+    assert db.migrate() == len(database.MIGRATIONS)
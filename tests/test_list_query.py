@@ -0,0 +1,27 @@
+"""分页游标：编码后能原样解码，非法游标抛出 ListQueryError"""
+import pytest
+
+listQuery = pytest.importorskip('myUtils.listQuery')
+
+
+def test_cursor_round_trip():
+    values = ['2025-01-01 00:00:00', 42]
+    assert listQuery.decode_cursor(listQuery.encode_cursor(values), 2) == values
+
+
+@pytest.mark.parametrize('values, length', [
+    ([{'a': 1}, 1], 2),
+    ([[1], 1], 2),
+    ([None], 1),
+    ([True], 1),
+    ([1], 2),
+])
+def test_non_scalar_or_wrong_length_cursor_is_rejected(values, length):
+    with pytest.raises(listQuery.ListQueryError):
+        listQuery.decode_cursor(listQuery.encode_cursor(values), length)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'e30', listQuery.encode_cursor({'id': 1})])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(listQuery.ListQueryError):
+        listQuery.decode_cursor(cursor, 1)
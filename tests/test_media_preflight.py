@@ -0,0 +1,168 @@
+"""上传前媒体预处理：未安装 ffmpeg、文件损坏时使用原文件，输出缓存按最近使用时间淘汰"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+media_preflight = pytest.importorskip('social_auto_upload.utils.media_preflight')
+
+needs_posix = pytest.mark.skipif(sys.platform == 'win32', reason='用 Python 脚本模拟 ffprobe / ffmpeg')
+
+H264_HIGH_BITRATE = {
+    'format': {'format_name': 'mov,mp4', 'duration': '12.5', 'size': '100', 'bit_rate': '20000000'},
+    'streams': [{'codec_type': 'video', 'codec_name': 'h264', 'width': 1080, 'height': 1920,
+                 'pix_fmt': 'yuv420p', 'bit_rate': '20000000'},
+                {'codec_type': 'audio', 'codec_name': 'aac'}],
+}
+
+
+def make_tool(bin_dir, name, body):
+    """生成一个可执行的 Python 脚本代替 ffprobe / ffmpeg"""
+    bin_dir.mkdir(exist_ok=True)
+    path = bin_dir / name
+    path.write_text(f'#!{sys.executable}\nimport sys\n{body}\n', encoding='utf-8')
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 1000)
+    return path
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    """ffprobe 输出 H264_HIGH_BITRATE（需要转码），ffmpeg 把输入复制到输出，calls 记录 ffmpeg 调用次数"""
+    calls = tmp_path / 'ffmpeg_calls'
+    ffprobe = make_tool(tmp_path / 'bin', 'ffprobe', f'print({json.dumps(json.dumps(H264_HIGH_BITRATE))})')
+    ffmpeg = make_tool(tmp_path / 'bin', 'ffmpeg', (
+        'import shutil\n'
+        f'open({str(calls)!r}, "a").write("x")\n'
+        'shutil.copyfile(sys.argv[sys.argv.index("-i") + 1], sys.argv[-1])'
+    ))
+    monkeypatch.setattr(media_preflight, 'FFPROBE_PATH', ffprobe)
+    monkeypatch.setattr(media_preflight, 'FFMPEG_PATH', ffmpeg)
+    return calls
+
+
+def test_prepare_without_ffmpeg_uses_original_files(video, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_preflight, 'FFPROBE_PATH', str(tmp_path / 'missing' / 'ffprobe'))
+    monkeypatch.setattr(media_preflight, 'FFMPEG_PATH', str(tmp_path / 'missing' / 'ffmpeg'))
+    preflight = media_preflight.MediaPreflight(cache_dir=tmp_path / 'cache')
+    assert not preflight.available()
+    results = preflight.prepare([video, video], 'tencent')
+    assert [result['path'] for result in results] == [str(video), str(video)]
+    assert {result['action'] for result in results} == {media_preflight.ACTION_NONE}
+    assert not (tmp_path / 'cache').exists()
+    # 直接调用时报告找不到 ffprobe，仍返回原文件
+    result = media_preflight.preflight_file(video, 'tencent', tmp_path / 'cache')
+    assert result['action'] == media_preflight.ACTION_ERROR and result['path'] == str(video)
+    assert '未找到 ffmpeg / ffprobe' in result['reasons'][0]
+
+
+@needs_posix
+def test_corrupt_file_falls_back_to_original(video, tmp_path, monkeypatch):
+    ffprobe = make_tool(tmp_path / 'bin', 'ffprobe', (
+        'sys.stderr.write("[mov,mp4,m4a,3gp,3g2,mj2] moov atom not found\\n"'
+        ' + sys.argv[-1] + ": Invalid data found when processing input\\n")\n'
+        'sys.exit(1)'
+    ))
+    monkeypatch.setattr(media_preflight, 'FFPROBE_PATH', ffprobe)
+    monkeypatch.setattr(media_preflight, 'FFMPEG_PATH', ffprobe)
+    preflight = media_preflight.MediaPreflight(cache_dir=tmp_path / 'cache')
+    result = preflight.prepare([video], 'tencent')[0]
+    assert result['action'] == media_preflight.ACTION_ERROR
+    assert result['path'] == str(video)
+    assert result['reasons'][0].startswith('ffprobe 执行失败')
+    assert 'Invalid data found when processing input' in result['reasons'][0]
+
+
+@needs_posix
+def test_file_without_video_stream_is_reported(video, tmp_path, monkeypatch):
+    ffprobe = make_tool(tmp_path / 'bin', 'ffprobe', 'print(\'{"format": {}, "streams": []}\')')
+    monkeypatch.setattr(media_preflight, 'FFPROBE_PATH', ffprobe)
+    result = media_preflight.preflight_file(video, 'tencent', tmp_path / 'cache')
+    assert (result['action'], result['reasons'], result['path']) == (media_preflight.ACTION_ERROR, ['没有视频流'], str(video))
+
+
+@pytest.mark.skipif(shutil.which('ffprobe') is None, reason='未安装 ffprobe')
+def test_corrupt_file_with_real_ffprobe(video, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_preflight, 'FFPROBE_PATH', 'ffprobe')
+    result = media_preflight.preflight_file(video, 'tencent', tmp_path / 'cache')
+    assert result['action'] == media_preflight.ACTION_ERROR and result['path'] == str(video)
+
+
+@needs_posix
+def test_transcode_output_is_cached_by_size_and_mtime(video, tmp_path, tools):
+    cache_dir = tmp_path / 'cache'
+    first = media_preflight.preflight_file(video, 'tencent', cache_dir)
+    assert first['action'] == media_preflight.ACTION_TRANSCODE and not first['cached']
+    assert first['path'] != str(video) and os.path.basename(first['path']) == 'video.mp4'
+    second = media_preflight.preflight_file(video, 'tencent', cache_dir)
+    assert second['cached'] and second['path'] == first['path']
+    assert tools.read_text() == 'x'
+
+    # 源文件被修改后重新处理
+    video.write_bytes(video.read_bytes() + b'\x00')
+    third = media_preflight.preflight_file(video, 'tencent', cache_dir)
+    assert not third['cached'] and third['path'] != first['path']
+    assert tools.read_text() == 'xx'
+    # 不同平台配置分开缓存
+    assert media_preflight.preflight_file(video, 'douyin', cache_dir)['path'] != third['path']
+
+
+def _entry(cache_dir, name, size, age, now):
+    entry_dir = cache_dir / name
+    entry_dir.mkdir(parents=True)
+    path = entry_dir / 'video.mp4'
+    path.write_bytes(b'\x00' * size)
+    os.utime(path, (now - age, now - age))
+    return entry_dir
+
+
+def test_prune_removes_least_recently_used_entries(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    now = time.time()
+    oldest = _entry(cache_dir, 'a', 400, 3 * 86400, now)
+    older = _entry(cache_dir, 'b', 400, 2 * 86400, now)
+    old = _entry(cache_dir, 'c', 400, 86400, now)
+    recent = _entry(cache_dir, 'd', 400, 60, now)
+    leftover = cache_dir / 'd' / '.123-456.tmp.mp4'
+    leftover.write_bytes(b'\x00' * 100)
+    os.utime(leftover, (now - 2 * media_preflight.TRANSCODE_TIMEOUT,) * 2)
+
+    assert media_preflight.prune_cache(cache_dir, max_bytes=1000, now=now) == 2
+    assert not oldest.exists() and not older.exists()
+    assert old.exists() and recent.exists()
+    assert not leftover.exists()
+    # 未超出上限时不删除
+    assert media_preflight.prune_cache(cache_dir, max_bytes=1000, now=now) == 0
+
+
+def test_prune_keeps_recently_used_entries_over_budget(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    now = time.time()
+    _entry(cache_dir, 'old', 400, 86400, now)
+    in_use = _entry(cache_dir, 'in_use', 400, 60, now)
+    assert media_preflight.prune_cache(cache_dir, max_bytes=0, now=now) == 1
+    assert in_use.exists()
+    assert media_preflight.prune_cache(tmp_path / 'missing', max_bytes=0) == 0
+
+
+@needs_posix
+def test_prepare_prunes_after_new_output(video, tmp_path, tools):
+    cache_dir = tmp_path / 'cache'
+    stale = _entry(cache_dir, 'stale', 2048, 86400, time.time())
+    preflight = media_preflight.MediaPreflight(cache_dir=cache_dir, max_cache_gb=1500 / 1024 ** 3)
+    try:
+        result = preflight.prepare([video], 'tencent')[0]
+        assert result['action'] == media_preflight.ACTION_TRANSCODE
+        assert not stale.exists()
+        assert os.path.exists(result['path'])  # 刚生成的输出不会被淘汰
+    finally:
+        preflight.shutdown()
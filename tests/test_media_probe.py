@@ -0,0 +1,216 @@
+"""视频元数据探测：MP4 box 解析（含分片 MP4）、平台规则校验、探测缓存，以及上传接口入库前的校验"""
+import os
+import struct
+
+import pytest
+
+mediaProbe = pytest.importorskip('myUtils.mediaProbe')
+database = pytest.importorskip('myUtils.database')
+
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def mvhd(duration, timescale=1000, version=0):
+    if version == 1:
+        return box(b'mvhd', b'\x01\x00\x00\x00' + b'\x00' * 16 + struct.pack('>IQ', timescale, duration) + b'\x00' * 80)
+    return box(b'mvhd', b'\x00' * 12 + struct.pack('>II', timescale, duration) + b'\x00' * 80)
+
+
+def trak(handler, codec, width=0, height=0):
+    tkhd = box(b'tkhd', b'\x00' * 76 + struct.pack('>II', width << 16, height << 16))
+    hdlr = box(b'hdlr', b'\x00' * 8 + handler + b'\x00' * 13)
+    stsd = box(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + struct.pack('>I4s', 16, codec) + b'\x00' * 8)
+    minf = box(b'minf', box(b'stbl', stsd))
+    return box(b'trak', tkhd + box(b'mdia', hdlr + minf))
+
+
+def make_mp4(duration=10000, width=1080, height=1920, audio=True, faststart=True, mvhd_version=0,
+             fragment_duration=None, fragmented=False, media=b'\x00' * 256):
+    moov_payload = mvhd(duration, version=mvhd_version) + trak(b'vide', b'avc1', width, height)
+    if audio:
+        moov_payload += trak(b'soun', b'mp4a')
+    if fragmented or fragment_duration is not None:
+        mehd = box(b'mehd', b'\x00' * 4 + struct.pack('>I', fragment_duration)) if fragment_duration is not None else b''
+        moov_payload += box(b'mvex', mehd + box(b'trex', b'\x00' * 24))
+    ftyp = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2avc1mp41')
+    moov, mdat = box(b'moov', moov_payload), box(b'mdat', media)
+    return ftyp + (moov + mdat if faststart else mdat + moov)
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(data, name='video.mp4'):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return path
+    return write
+
+
+@pytest.fixture
+def no_ffprobe(monkeypatch):
+    def missing(path):
+        raise FileNotFoundError('ffprobe')
+    monkeypatch.setattr(mediaProbe, 'ffprobe', missing)
+
+
+def test_parse_regular_mp4(write):
+    meta = mediaProbe.parse_mp4(write(make_mp4()))
+    assert (meta['duration'], meta['width'], meta['height']) == (10, 1080, 1920)
+    assert (meta['video_codec'], meta['audio_codec'], meta['brand']) == ('avc1', 'mp4a', 'isom')
+    assert meta['faststart'] is True and meta['fragmented'] is False
+    assert mediaProbe.validate(meta, 'tencent') == []
+
+    meta = mediaProbe.parse_mp4(write(make_mp4(faststart=False, mvhd_version=1, duration=90500)))
+    assert meta['faststart'] is False and meta['duration'] == 90.5
+
+
+def test_fragmented_mp4_reads_duration_from_mehd(write, no_ffprobe):
+    path = write(make_mp4(duration=0, fragment_duration=15000))
+    meta = mediaProbe.parse_mp4(path)
+    assert meta['fragmented'] is True and meta['duration'] == 15
+    assert mediaProbe.probe_file(path) == ('mp4', meta)
+    assert mediaProbe.validate(meta, 'tencent') == []
+
+
+def test_fragmented_mp4_without_mehd_falls_back_to_ffprobe(write, monkeypatch):
+    path = write(make_mp4(duration=0, fragmented=True))
+    monkeypatch.setattr(mediaProbe, 'ffprobe', lambda p: {'format': 'mov,mp4', 'duration': 42.0, 'size': 1,
+                                                          'video': {'codec': 'h264', 'width': 1080, 'height': 1920}})
+    source, meta = mediaProbe.probe_file(path)
+    assert source == 'mp4' and meta['duration'] == 42.0
+
+
+def test_fragmented_mp4_without_mehd_or_ffprobe_skips_duration(write, no_ffprobe):
+    source, meta = mediaProbe.probe_file(write(make_mp4(duration=0, fragmented=True)))
+    assert meta['duration'] is None
+    # 时长未知时不按最短时长拒绝
+    assert mediaProbe.validate(meta, 'tencent') == []
+
+
+@pytest.mark.parametrize('data, error', [
+    (make_mp4()[:-100], '超出文件末尾'),
+    (box(b'ftyp', b'isom') + box(b'mdat', b'\x00' * 64), '缺少 moov'),
+    (box(b'ftyp', b'isom') + box(b'moov', mvhd(1000) + trak(b'vide', b'avc1', 720, 1280)), '缺少 mdat'),
+])
+def test_broken_mp4_is_rejected(write, data, error):
+    source, meta = mediaProbe.probe_file(write(data))
+    errors = mediaProbe.validate(meta)
+    assert source == 'mp4' and len(errors) == 1 and error in errors[0]
+
+
+def test_non_mp4_uses_ffprobe(write, monkeypatch, no_ffprobe):
+    path = write(b'RIFF' + b'\x00' * 100, 'video.avi')
+    # 没有 ffprobe 时无法判断，只校验大小
+    source, meta = mediaProbe.probe_file(path)
+    assert source == 'ffprobe' and meta == {'size': 104, 'unknown': True}
+    assert mediaProbe.validate(meta, 'tencent') == []
+
+    def corrupt(p):
+        raise RuntimeError('Invalid data found when processing input')
+
+    monkeypatch.setattr(mediaProbe, 'ffprobe', corrupt)
+    errors = mediaProbe.validate(mediaProbe.probe_file(path)[1])
+    assert errors[0].startswith('无法识别的视频格式') and 'Invalid data' in errors[0]
+
+
+def test_validate_platform_rules():
+    meta = {'size': 1024, 'duration': 10, 'width': 1080, 'height': 1920, 'video_codec': 'avc1'}
+    assert mediaProbe.validate(meta, 'tencent') == []
+    assert mediaProbe.validate(dict(meta, duration=2), 'tencent') == ['时长 2.0 秒，少于 3 秒']
+    assert mediaProbe.validate(dict(meta, duration=2)) == []  # 未指定平台时最短 1 秒
+    assert mediaProbe.validate(dict(meta, duration=5 * 3600), 'douyin') == ['时长 18000 秒，超过 14400 秒']
+    assert mediaProbe.validate(dict(meta, width=100, height=100), 'tencent') == ['分辨率 100x100 过低']
+    assert mediaProbe.validate(dict(meta, video_codec='', width=0, height=0)) == ['没有视频轨道']
+    assert mediaProbe.validate(dict(meta, size=5000 * 1024 * 1024), 'tencent') == ['文件大小 5000MB 超过 4096MB']
+
+
+def test_probe_cache_follows_size_and_mtime(write, tmp_path, monkeypatch):
+    probes = []
+    probe_file = mediaProbe.probe_file
+
+    def counting(path):
+        probes.append(path)
+        return probe_file(path)
+
+    monkeypatch.setattr(mediaProbe, 'probe_file', counting)
+    media_probe = mediaProbe.MediaProbe(database.Database(tmp_path / 'test.db'))
+    path = write(make_mp4())
+    assert media_probe.check(path, 'tencent') == []
+    assert media_probe.check(path, 'tencent') == []
+    assert len(probes) == 1
+
+    path.write_bytes(make_mp4(duration=1000))  # 内容变化，大小不变
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert media_probe.check(path, 'tencent') == ['时长 1.0 秒，少于 3 秒']
+    assert len(probes) == 2
+    assert media_probe.check(path, 'tencent', use_cache=False) == ['时长 1.0 秒，少于 3 秒']
+    assert len(probes) == 3
+
+    assert media_probe.check(tmp_path / 'missing.mp4') == ['文件不存在']
+    assert media_probe.check_files([path, write(make_mp4(), 'ok.mp4')], 'tencent') == {
+        str(path): ['时长 1.0 秒，少于 3 秒']}
+
+
+class FakeFileStore(object):
+    def __init__(self, video_dir, blob=None):
+        self.video_dir = video_dir
+        self.blob = blob
+        self.added = []
+
+    def find_blob(self, digest):
+        return self.blob if digest and self.blob and digest == self.blob['digest'] else None
+
+    def add_file(self, filename, digest, size, src_path=None):
+        self.added.append(filename)
+        return f'stored_{filename}'
+
+
+class TestUploadRoutesValidate(object):
+    """分块上传完成和秒传都在入库前校验视频"""
+
+    @pytest.fixture
+    def backend(self, tmp_path, monkeypatch):
+        sau_backend = pytest.importorskip('sau_backend')
+        chunkUpload = pytest.importorskip('myUtils.chunkUpload')
+        monkeypatch.setattr(sau_backend, 'chunk_upload_manager', chunkUpload.ChunkUploadManager(
+            tmp_dir=tmp_path / '.uploads', video_dir=tmp_path))
+        monkeypatch.setattr(sau_backend, 'media_probe', mediaProbe.MediaProbe(database.Database(tmp_path / 'test.db')))
+        monkeypatch.setattr(sau_backend, 'file_store', FakeFileStore(tmp_path))
+        return sau_backend
+
+    def _upload(self, backend, data, filename='video.mp4', platform_type=2):
+        client = backend.app.test_client()
+        upload_id = client.post('/uploadChunk/init', json={'filename': filename, 'size': len(data)}).get_json()['data']['uploadId']
+        assert client.put(f'/uploadChunk/{upload_id}?offset=0', data=data).status_code == 200
+        response = client.post(f'/uploadChunk/{upload_id}/finalize', json={'type': platform_type})
+        return client, upload_id, response
+
+    def test_finalize_rejects_broken_video(self, backend):
+        client, upload_id, response = self._upload(backend, make_mp4()[:-100])
+        assert response.status_code == 400 and '超出文件末尾' in response.get_json()['msg']
+        assert backend.file_store.added == []
+        # 本次上传已丢弃
+        assert client.get(f'/uploadChunk/{upload_id}').status_code == 404
+
+    def test_finalize_checks_platform_rules_and_accepts_valid_video(self, backend):
+        _, _, response = self._upload(backend, make_mp4(duration=2000))
+        assert response.status_code == 400 and response.get_json()['msg'] == '时长 2.0 秒，少于 3 秒'
+        _, _, response = self._upload(backend, make_mp4(duration=0, fragment_duration=20000))
+        assert response.status_code == 200 and backend.file_store.added == ['video.mp4']
+        # 非视频文件不校验
+        _, _, response = self._upload(backend, b'not a video', filename='cover.png')
+        assert response.status_code == 200
+
+    def test_instant_upload_validates_existing_blob(self, backend, tmp_path):
+        (tmp_path / 'blob.mp4').write_bytes(make_mp4()[:-100])
+        backend.file_store.blob = {'digest': 'a' * 32, 'path': 'blob.mp4', 'size': 1}
+        client = backend.app.test_client()
+        response = client.post('/uploadChunk/init', json={'filename': 'video.mp4', 'md5': 'a' * 32})
+        assert response.status_code == 400 and backend.file_store.added == []
+
+        (tmp_path / 'blob.mp4').write_bytes(make_mp4())
+        response = client.post('/uploadChunk/init', json={'filename': 'video.mp4', 'md5': 'a' * 32})
+        assert response.status_code == 200 and response.get_json()['data']['instant'] is True
+        assert backend.file_store.added == ['video.mp4']
@@ -0,0 +1,64 @@
+"""视频号违规通知解析：标题、发布时间、objectId 的提取和按发布时间匹配作品"""
+from datetime import datetime
+
+import pytest
+
+notification_parser = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.notification_parser')
+
+PUBLISH_TIME = '2026-06-26 07:10:01'
+PUBLISH_TS = int(datetime.strptime(PUBLISH_TIME, '%Y-%m-%d %H:%M:%S').timestamp())
+REF_URL = 'https://channels.weixin.qq.com/x?unique_id=mmfindermachineauditdelivery14943811069001337356&a=1'
+
+
+@pytest.mark.parametrize('content', [
+    f'作品标题：我的短剧第1集  发布时间：{PUBLISH_TIME}',
+    f'作品标题：我的短剧第1集发布时间：{PUBLISH_TIME}',
+    f'作品标题： 我的短剧第1集\n发布时间：{PUBLISH_TIME}',
+])
+def test_title_and_publish_time_layouts(content):
+    assert notification_parser.extract_video_info(content) == ('我的短剧第1集', PUBLISH_TS, '')
+
+
+def test_title_without_publish_time():
+    assert notification_parser.extract_video_info('作品标题：只有标题') == ('只有标题', 0, '')
+
+
+def test_restricted_drama_layout():
+    content = f'你于{PUBLISH_TIME}发表的短剧视频" #逆袭人生 第3集..."中存在问题'
+    title, timestamp, object_id = notification_parser.extract_video_info(content, REF_URL)
+    assert title == '逆袭人生 第3集'
+    assert timestamp == PUBLISH_TS
+    assert object_id == '14943811069001337356'
+
+
+def test_invalid_time_is_zero():
+    assert notification_parser.extract_video_info('作品标题：x 发布时间：2026-13-40 00:00:00')[1] == 0
+
+
+def test_iter_violation_videos_filters_and_reports_unparsed():
+    notifications = [
+        {'title': '作品优化建议', 'content': f'作品标题：a发布时间：{PUBLISH_TIME}', 'isSpecialJumpType': 0,
+         'timestamp': 5},
+        {'title': '你有1条视频号视频被暂时限制传播', 'content': '无法解析的内容', 'isSpecialJumpType': 0,
+         'refUrl': REF_URL},
+        {'title': '作品优化建议', 'content': '作品标题：b', 'isSpecialJumpType': 0},
+        {'title': '普通通知', 'content': f'作品标题：c 发布时间：{PUBLISH_TIME}', 'isSpecialJumpType': 0},
+        {'title': '作品优化建议', 'content': f'作品标题：d 发布时间：{PUBLISH_TIME}', 'isSpecialJumpType': 1},
+    ]
+    unparsed = []
+    videos = list(notification_parser.iter_violation_videos(notifications, unparsed.append))
+    assert [(v['video_title'], v['match_method']) for v in videos] == [('a', 'timestamp'), ('', 'object_id')]
+    assert videos[0]['publish_timestamp'] == PUBLISH_TS
+    assert videos[0]['notification_timestamp'] == 5
+    assert videos[1]['violation_type'] == '你有1条视频号视频被暂时限制传播'
+    assert [n['content'] for n in unparsed] == ['作品标题：b']
+
+
+def test_post_time_index_finds_nearest_within_tolerance():
+    posts = [{'id': i, 'create_time': t} for i, t in enumerate([100, 200, 203, 300])] + [{'id': 9, 'create_time': 0}]
+    index = notification_parser.PostTimeIndex(posts)
+    assert len(index) == 4
+    assert index.find(200)['id'] == 1
+    assert index.find(201) is None
+    assert index.find(202, tolerance=2)['id'] == 2
+    assert index.find(0) is None
@@ -0,0 +1,111 @@
+"""视频号选择器缓存：有效期、按账号 / 类型失效，新建合集后缓存的合集列表失效"""
+import asyncio
+
+import pytest
+
+picker_cache = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.picker_cache')
+
+
+def test_get_put_and_ttl():
+    cache = picker_cache.PickerCache(ttl=60)
+    cache.put('a.json', picker_cache.KIND_COLLECTION, ['合集1', '合集2'])
+    assert cache.collections('a.json') == {'合集1': 0, '合集2': 1}
+    assert cache.collections('b.json') is None
+
+    expired = picker_cache.PickerCache(ttl=-1)
+    expired.put('a.json', picker_cache.KIND_COLLECTION, ['合集1'])
+    assert expired.collections('a.json') is None
+
+
+def test_invalidate_by_account_kind_and_key():
+    cache = picker_cache.PickerCache()
+    cache.put('a.json', picker_cache.KIND_COLLECTION, ['合集1'])
+    cache.put('a.json', picker_cache.KIND_ACTIVITY, [{'name': '活动'}], '短剧')
+    cache.put('a.json', picker_cache.KIND_ACTIVITY, [{'name': '活动'}], '电影')
+    cache.put('b.json', picker_cache.KIND_COLLECTION, ['合集2'])
+
+    cache.invalidate('a.json', picker_cache.KIND_ACTIVITY, '短剧')
+    assert cache.get('a.json', picker_cache.KIND_ACTIVITY, '短剧') is None
+    assert cache.get('a.json', picker_cache.KIND_ACTIVITY, '电影') is not None
+
+    cache.invalidate('a.json', picker_cache.KIND_COLLECTION)
+    assert cache.collections('a.json') is None
+    assert cache.get('a.json', picker_cache.KIND_ACTIVITY, '电影') is not None
+    assert cache.collections('b.json') == {'合集2': 0}
+
+    cache.invalidate('a.json')
+    assert cache.get('a.json', picker_cache.KIND_ACTIVITY, '电影') is None
+
+
+class FakeElement(object):
+    """页面元素：click 时执行 on_click，count 返回 0"""
+
+    def __init__(self, page, name):
+        self.page = page
+        self.name = name
+
+    async def click(self):
+        self.page.clicks.append(self.name)
+        if self.name in self.page.on_click:
+            self.page.on_click[self.name]()
+
+    async def wait_for(self, **kwargs):
+        pass
+
+    async def count(self):
+        return 0
+
+
+class FakePage(object):
+    def __init__(self, fail_on=None):
+        self.clicks = []
+        self.filled = []
+        self.on_click = {}
+        self.fail_on = fail_on
+
+    def get_by_text(self, text):
+        return FakeElement(self, text)
+
+    def get_by_role(self, role, name=None):
+        return FakeElement(self, name)
+
+    def locator(self, selector):
+        return FakeElement(self, selector)
+
+    async def wait_for_selector(self, selector, **kwargs):
+        if self.fail_on and self.fail_on in selector:
+            raise TimeoutError(selector)
+
+    async def fill(self, selector, value):
+        self.filled.append(value)
+
+
+@pytest.fixture
+def tencent(monkeypatch):
+    main = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.main')
+    cache = picker_cache.PickerCache()
+    monkeypatch.setattr(main, 'get_picker_cache', lambda: cache)
+    video = main.TencentVideo('标题', 'video.mp4', [], 0, '/cookies/wx_account.json', collection='新合集')
+    return video, cache
+
+
+def test_create_collection_invalidates_list_cached_during_creation(tencent):
+    video, cache = tencent
+    cache.put('wx_account.json', picker_cache.KIND_COLLECTION, ['旧合集'])
+    page = FakePage()
+    # 创建过程中另一个上传任务缓存了尚不包含新合集的完整列表
+    page.on_click['创建'] = lambda: cache.put('wx_account.json', picker_cache.KIND_COLLECTION, ['旧合集'])
+
+    asyncio.run(video.create_collection(page))
+    assert page.filled == ['新合集'] and '创建' in page.clicks
+    # 创建后不再用缓存判断“合集不存在”，下一次选择会重新读取页面
+    assert cache.collections('wx_account.json') is None
+
+
+def test_create_collection_invalidates_on_failure(tencent):
+    video, cache = tencent
+    page = FakePage(fail_on='有趣的合集标题')
+    page.on_click['创建新合集'] = lambda: cache.put('wx_account.json', picker_cache.KIND_COLLECTION, ['旧合集'])
+    with pytest.raises(TimeoutError):
+        asyncio.run(video.create_collection(page))
+    assert cache.collections('wx_account.json') is None
@@ -0,0 +1,14 @@
+"""发布任务分发：batch 字段从任务数据传到抖音、快手的发布函数"""
+import pytest
+
+pytest.importorskip('flask')
+sau_backend = pytest.importorskip('sau_backend')
+
+
+@pytest.mark.parametrize('platform_type, func_name', [(3, 'post_video_DouYin'), (4, 'post_video_ks')])
+@pytest.mark.parametrize('payload, expected', [({'batch': True}, True), ({}, False)])
+def test_publish_video_passes_batch(platform_type, func_name, payload, expected, monkeypatch):
+    calls = []
+    monkeypatch.setattr(sau_backend, func_name, lambda *args, **kwargs: calls.append(kwargs))
+    sau_backend.publish_video(dict(payload, type=platform_type, fileList=['a.mp4'], accountList=['a.json']))
+    assert calls == [{'batch': expected}]
@@ -0,0 +1,70 @@
+"""登录 SSE 流：终止状态结束连接、断开时清理、大量空闲连接不占用 CPU"""
+import threading
+import time
+from queue import Queue
+
+import pytest
+
+sseStream = pytest.importorskip('myUtils.sseStream')
+
+STREAM_COUNT = 500
+
+
+@pytest.mark.parametrize('terminal', ['200', '500', 200])
+def test_stream_ends_on_terminal_status(terminal):
+    status_queue = Queue()
+    closed = []
+    for msg in ('data:image/png;base64,xxx', terminal, 'after-terminal'):
+        status_queue.put(msg)
+    events = list(sseStream.sse_stream(status_queue, lambda: closed.append(True), heartbeat_interval=1))
+    assert events == ['data: data:image/png;base64,xxx\n\n', f'data: {terminal}\n\n']
+    assert closed == [True]
+    assert status_queue.get_nowait() == 'after-terminal'
+
+
+def test_idle_stream_sends_heartbeat_and_closes_on_disconnect():
+    closed = []
+    stream = sseStream.sse_stream(Queue(), lambda: closed.append(True), heartbeat_interval=0.01)
+    assert next(stream) == ': heartbeat\n\n'
+    assert next(stream) == ': heartbeat\n\n'
+    # 客户端断开时 WSGI 服务器关闭生成器
+    stream.close()
+    assert closed == [True]
+
+
+def test_default_heartbeat_interval_comes_from_conf(monkeypatch):
+    monkeypatch.setattr(sseStream, 'SSE_HEARTBEAT_INTERVAL', 0.01)
+    stream = sseStream.sse_stream(Queue())
+    assert next(stream) == ': heartbeat\n\n'
+    stream.close()
+
+
+def test_many_idle_streams_keep_cpu_flat():
+    """与 WSGI 线程模式相同，每个连接一个线程消费生成器；空闲期间 CPU 时间应接近 0，全部在终止状态后退出"""
+    queues = [Queue() for _ in range(STREAM_COUNT)]
+    closed = []
+    received = [[] for _ in range(STREAM_COUNT)]
+
+    def consume(index):
+        for event in sseStream.sse_stream(queues[index], lambda: closed.append(index), heartbeat_interval=30):
+            received[index].append(event)
+
+    threads = [threading.Thread(target=consume, args=(index,), daemon=True) for index in range(STREAM_COUNT)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)  # 等待全部线程进入阻塞等待
+
+    cpu_started, wall_started = time.process_time(), time.monotonic()
+    time.sleep(1)
+    idle_cpu = time.process_time() - cpu_started
+    idle_wall = time.monotonic() - wall_started
+    # 旧实现每个连接每 0.1 秒轮询一次，500 个连接每秒 5000 次唤醒，约占一个核的 5%；阻塞等待时接近 0
+    assert idle_cpu < 0.01 * idle_wall, f"{STREAM_COUNT} 个空闲连接占用 CPU {idle_cpu:.3f}s / {idle_wall:.3f}s"
+
+    for index, status_queue in enumerate(queues):
+        status_queue.put('200' if index % 2 else '500')
+    for thread in threads:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(closed) == list(range(STREAM_COUNT))
+    assert all(events == [f"data: {'200' if index % 2 else '500'}\n\n"] for index, events in enumerate(received))
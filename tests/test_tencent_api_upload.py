@@ -0,0 +1,166 @@
+"""视频号接口上传：用本地 aiohttp 服务模拟 helper_upload_params / apply / part / complete / post_create"""
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+api_upload = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.api_upload')
+
+CHUNK_SIZE = 1024
+VIDEO_INFO = {'duration': 13, 'width': 1080, 'height': 1920}
+
+
+class StubChannels(object):
+    """记录收到的请求；fail_parts 为 {分片号: 失败次数}，None 表示一直失败"""
+
+    def __init__(self, fail_parts=None, create_payload=None):
+        self.fail_parts = dict(fail_parts or {})
+        self.create_payload = create_payload or {'errCode': 0, 'data': {'objectId': 'obj-1'}}
+        self.applies = []
+        self.parts = []
+        self.completes = []
+        self.creates = []
+
+    @staticmethod
+    def _file_type(request):
+        arguments = dict(item.split('=', 1) for item in request.headers['X-Arguments'].split('&'))
+        return int(arguments['filetype'])
+
+    async def auth(self, request):
+        return web.json_response({'errCode': 0, 'data': {'authKey': 'auth-key', 'uin': 123, 'finderUsername': 'finder'}})
+
+    async def apply(self, request):
+        assert request.headers['Authorization'] == 'auth-key'
+        body = await request.json()
+        self.applies.append((self._file_type(request), body))
+        return web.json_response({'UploadID': f'upload-{len(self.applies)}'})
+
+    async def part(self, request):
+        number = int(request.query['PartNumber'])
+        data = await request.read()
+        remaining = self.fail_parts.get(number, 0)
+        if remaining is None or remaining > 0:
+            if remaining:
+                self.fail_parts[number] = remaining - 1
+            return web.json_response({'error': 'busy'}, status=500)
+        self.parts.append((request.query['UploadID'], number, len(data)))
+        return web.json_response({'ETag': f"etag-{request.query['UploadID']}-{number}"})
+
+    async def complete(self, request):
+        body = await request.json()
+        self.completes.append((request.query['UploadID'], body))
+        return web.json_response({'DownloadURL': f"https://media.example/{request.query['UploadID']}"})
+
+    async def create(self, request):
+        self.creates.append(await request.json())
+        return web.json_response(self.create_payload)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/auth', self.auth)
+        app.router.add_put('/apply', self.apply)
+        app.router.add_put('/part', self.part)
+        app.router.add_post('/complete', self.complete)
+        app.router.add_post('/create', self.create)
+        return app
+
+
+async def _publish(stub, account_file, video_path, cover_path, options=None):
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    try:
+        uploader = api_upload.ChannelsApiUploader(account_file, options=dict({
+            'auth_url': f'{base}/auth',
+            'apply_url': f'{base}/apply',
+            'part_url': f'{base}/part',
+            'complete_url': f'{base}/complete',
+            'create_url': f'{base}/create',
+            'chunk_size': CHUNK_SIZE,
+            'concurrency': 2,
+            'part_retries': 0,
+        }, **(options or {})))
+        result = await uploader.publish(str(video_path), '标题', ['话题'], None, str(cover_path))
+        return uploader, result
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_upload, 'RESUME_DIR', tmp_path / 'resume')
+    monkeypatch.setattr(api_upload, 'video_info', lambda file_path: dict(VIDEO_INFO))
+    account_file = tmp_path / 'account.json'
+    account_file.write_text(json.dumps({'cookies': [
+        {'name': 'sessionid', 'value': 's', 'domain': '.channels.weixin.qq.com'},
+        {'name': 'wxuin', 'value': '123', 'domain': '.weixin.qq.com'},
+    ]}), encoding='utf-8')
+    video_path = tmp_path / 'video.mp4'
+    video_path.write_bytes(bytes(range(256)) * 10)  # 2560 字节，3 个分片
+    cover_path = tmp_path / 'cover.jpg'
+    cover_path.write_bytes(b'\xff\xd8cover')
+    return str(account_file), video_path, cover_path
+
+
+def test_publish_uploads_cover_and_video_then_creates_post(files):
+    account_file, video_path, cover_path = files
+    stub = StubChannels()
+    uploader, result = asyncio.run(_publish(stub, account_file, video_path, cover_path))
+
+    assert result == {'objectId': 'obj-1'}
+    cover_type, video_type = api_upload.API_UPLOAD_DEFAULTS['cover_file_type'], api_upload.API_UPLOAD_DEFAULTS['file_type']
+    assert [(file_type, body['BlockSum']) for file_type, body in stub.applies] == [(cover_type, 1), (video_type, 3)]
+    assert stub.applies[1][1]['BlockPartLength'] == [1024, 1024, 512]
+    assert sorted(number for upload_id, number, _ in stub.parts if upload_id == 'upload-2') == [1, 2, 3]
+    upload_id, body = stub.completes[-1]
+    assert upload_id == 'upload-2'
+    assert [part['PartNumber'] for part in body['PartInfo']] == [1, 2, 3]
+
+    media = stub.creates[0]['objectDesc']['media'][0]
+    assert media['url'] == 'https://media.example/upload-2'
+    assert media['coverUrl'] == media['thumbUrl'] == 'https://media.example/upload-1'
+    assert (media['videoPlayLen'], media['width'], media['height']) == (13, 1080, 1920)
+    assert media['fileSize'] == 2560
+    assert media['md5sum'] == hashlib.md5(video_path.read_bytes()).hexdigest()
+    assert stub.creates[0]['objectDesc']['description'] == '标题 #话题'
+    assert uploader.metrics['bytes_sent'] == 2560
+    assert uploader.metrics['finished'] == 3
+
+
+def test_failed_part_is_retried(files):
+    account_file, video_path, cover_path = files
+    stub = StubChannels(fail_parts={2: 1})
+    uploader, _ = asyncio.run(_publish(stub, account_file, video_path, cover_path, {'part_retries': 2}))
+
+    assert uploader.metrics['retries'] == 1
+    assert uploader.metrics['failed'] == 1
+    assert len(stub.creates) == 1
+
+
+def test_interrupted_upload_resumes_remaining_parts(files):
+    account_file, video_path, cover_path = files
+    stub = StubChannels(fail_parts={3: None})
+    with pytest.raises(api_upload.ChannelsUploadError):
+        asyncio.run(_publish(stub, account_file, video_path, cover_path))
+    assert not stub.creates
+
+    stub.fail_parts = {}
+    asyncio.run(_publish(stub, account_file, video_path, cover_path))
+    video_applies = [body for file_type, body in stub.applies if file_type == api_upload.API_UPLOAD_DEFAULTS['file_type']]
+    assert len(video_applies) == 1  # 续传时不重新申请
+    video_parts = [number for upload_id, number, _ in stub.parts if upload_id == 'upload-2']
+    assert sorted(video_parts) == [1, 2, 3]
+    assert len(stub.creates) == 1
+
+
+def test_post_create_error_raises(files):
+    account_file, video_path, cover_path = files
+    stub = StubChannels(create_payload={'errCode': 300333, 'errMsg': 'expired'})
+    with pytest.raises(api_upload.ChannelsUploadError, match='300333'):
+        asyncio.run(_publish(stub, account_file, video_path, cover_path))
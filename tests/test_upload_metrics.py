@@ -0,0 +1,72 @@
+"""上传网络指标：finish 等待尚未完成的请求体大小读取"""
+import asyncio
+
+import pytest
+
+upload_metrics = pytest.importorskip('social_auto_upload.utils.upload_metrics')
+
+
+class FakeTarget(object):
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def remove_listener(self, event, handler):
+        self.handlers.pop(event, None)
+
+    def emit(self, event, request):
+        self.handlers[event](request)
+
+
+class FakeRequest(object):
+    method = 'PUT'
+    timing = {'requestStart': 10, 'responseStart': 35}
+
+    def __init__(self, part, size, delay=0.0):
+        self.url = f'https://finder.example/uploadpartdfs?PartNumber={part}&UploadID=u'
+        self.headers = {}
+        self.size = size
+        self.delay = delay
+
+    async def sizes(self):
+        await asyncio.sleep(self.delay)
+        return {'requestBodySize': self.size}
+
+
+def test_finish_waits_for_pending_body_sizes():
+    async def run():
+        target = FakeTarget()
+        monitor = upload_metrics.UploadNetworkMonitor('tencent', 'video.mp4').attach(target)
+        requests = [FakeRequest(1, 100), FakeRequest(2, 200, delay=0.05), FakeRequest(2, 200)]
+        for request in requests:
+            target.emit('request', request)
+        for request in requests:
+            target.emit('requestfinished', request)
+        # 事件回调同步返回，请求体大小还在读取中
+        return await monitor.finish(), target
+
+    metrics, target = asyncio.run(run())
+    assert metrics['finished'] == 3
+    assert metrics['retries'] == 1
+    assert metrics['bytes_sent'] == 500
+    assert metrics['ttfb_avg_ms'] == 25
+    assert not target.handlers
+
+
+def test_request_without_sizes_uses_content_length():
+    class NoSizes(FakeRequest):
+        async def sizes(self):
+            raise RuntimeError('closed')
+
+    async def run():
+        target = FakeTarget()
+        monitor = upload_metrics.UploadNetworkMonitor('tencent').attach(target)
+        request = NoSizes(1, 0)
+        request.headers = {'content-length': '42'}
+        target.emit('request', request)
+        target.emit('requestfinished', request)
+        return await monitor.finish()
+
+    assert asyncio.run(run())['bytes_sent'] == 42
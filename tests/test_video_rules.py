@@ -0,0 +1,134 @@
+"""删除 / 隐藏规则：阈值边界、规则顺序、空值和原因文本"""
+import pytest
+
+video_rules = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.video_rules')
+
+NOW = 1_700_000_000
+
+
+def _record(object_id, age_seconds, read_count, title='短剧第1集', **extra):
+    return dict(object_id=object_id, create_time=NOW - age_seconds, read_count=read_count, title=title,
+                visible_type=1, **extra)
+
+
+def _actions(plan):
+    return {item['record']['object_id']: (item['action'], item['rule']) for item in plan.items}
+
+
+def test_age_views_thresholds_are_inclusive_age_exclusive_views():
+    records = [
+        _record('exact_age', 60 * 60, 99),
+        _record('one_second_young', 60 * 60 - 1, 0),
+        _record('views_at_max', 2 * 60 * 60, 100),
+        _record('views_below_max', 2 * 60 * 60, 99),
+    ]
+    plan = video_rules.age_views_rules(minutes_ago=60, max_views=100).plan(records, now=NOW)
+    assert _actions(plan) == {
+        'exact_age': ('delete', 'age_views'),
+        'one_second_young': ('skip', 'no_match'),
+        'views_at_max': ('skip', 'no_match'),
+        'views_below_max': ('delete', 'age_views'),
+    }
+    item = plan.actions(video_rules.ACTION_DELETE)[0]
+    assert item['reason'] == '发布超过60分钟且播放量 99 < 100'
+    assert plan.actions(video_rules.ACTION_SKIP)[0]['reason'] == '不满足删除条件（60分钟前 且 播放量<100）'
+
+
+def test_age_views_zero_thresholds():
+    records = [_record('new', 0, 0), _record('old', 10, 5)]
+    # max_views=0 时没有作品满足“播放量 < 0”
+    assert _actions(video_rules.age_views_rules(0, 0).plan(records, now=NOW)) == {
+        'new': ('skip', 'no_match'), 'old': ('skip', 'no_match')}
+    # minutes_ago=0 时刚发布的作品也满足年龄条件
+    assert _actions(video_rules.age_views_rules(0, 1).plan(records, now=NOW))['new'] == ('delete', 'age_views')
+
+
+def test_fail_and_waitdel_rules_take_precedence():
+    records = [
+        _record('fail', 0, 10_000, processed_fail=True),
+        _record('waitdel', 0, 10_000, title='waitdel-短剧'),
+        _record('waitdel_inside', 0, 10_000, title='短剧 waitdel-'),
+        _record('fail_false', 0, 10_000, processed_fail=False),
+    ]
+    plan = video_rules.age_views_rules(60, 100).plan(records, now=NOW)
+    assert _actions(plan) == {
+        'fail': ('delete', 'processed_fail'),
+        'waitdel': ('delete', 'waitdel'),
+        'waitdel_inside': ('skip', 'no_match'),
+        'fail_false': ('skip', 'no_match'),
+    }
+    assert plan.counts() == {'processed_fail': 1, 'waitdel': 1, 'no_match': 2}
+
+    plan = video_rules.age_views_rules(60, 100, delete_fail=False, delete_waitdel=False).plan(records, now=NOW)
+    assert {action for action, _ in _actions(plan).values()} == {'skip'}
+
+
+def test_age_views_without_thresholds_only_cleans_up():
+    records = [_record('old_low', 10 ** 6, 0), _record('waitdel', 0, 0, title='waitdel-1')]
+    plan = video_rules.age_views_rules(None, None).plan(records, now=NOW)
+    assert _actions(plan) == {'old_low': ('skip', 'no_match'), 'waitdel': ('delete', 'waitdel')}
+
+
+def test_title_keyword_and_missing_values():
+    records = [
+        _record('match', 7200, 1, title='短剧 甄嬛传 第3集'),
+        _record('other', 7200, 1, title='其他'),
+        _record('no_views', 7200, None, title='甄嬛传'),
+        {'object_id': 'no_time', 'read_count': 0, 'title': '甄嬛传'},
+    ]
+    plan = video_rules.age_views_rules(60, 100, title_keyword='甄嬛传').plan(records, now=NOW)
+    assert _actions(plan) == {
+        'match': ('delete', 'age_views'),
+        'other': ('skip', 'no_match'),
+        'no_views': ('skip', 'no_match'),
+        'no_time': ('skip', 'no_match'),
+    }
+
+
+def test_violation_rules_boundaries():
+    records = [
+        _record('below_delete', 0, 49),
+        _record('at_delete', 0, 50),
+        _record('below_hide', 0, 999),
+        _record('at_hide', 0, 1000),
+        dict(_record('hidden', 0, 5000), visible_type=3),
+        dict(_record('hidden_low', 0, 10), visible_type=3),
+    ]
+    plan = video_rules.violation_rules(delete_views=50, hide_views=1000).plan(records, now=NOW)
+    assert _actions(plan) == {
+        'below_delete': ('delete', 'delete'),
+        'at_delete': ('skip', 'no_match'),
+        'below_hide': ('skip', 'no_match'),
+        'at_hide': ('hide', 'hide'),
+        'hidden': ('skip', 'already_hidden'),
+        'hidden_low': ('delete', 'delete'),
+    }
+    assert [item['reason'] for item in plan.actions(video_rules.ACTION_HIDE)] == ['播放量 1000 >= 1000']
+    # 条目顺序与输入一致
+    assert [item['record']['object_id'] for item in plan.items] == [record['object_id'] for record in records]
+
+
+def test_rule_set_edge_cases():
+    assert video_rules.RuleSet([]).plan([_record('a', 0, 0)]).counts() == {'no_match': 1}
+    always = video_rules.Rule('always', video_rules.ACTION_HIDE, [], '全部隐藏')
+    assert _actions(video_rules.RuleSet([always]).plan([_record('a', 0, 0)])) == {'a': ('hide', 'always')}
+    assert video_rules.age_views_rules(60, 100).plan([]).items == []
+    with pytest.raises(ValueError):
+        video_rules.Rule('bad', video_rules.ACTION_DELETE, [('read_count', '=~', 1)], '')
+    with pytest.raises(ValueError):
+        video_rules.Rule('bad', video_rules.ACTION_DELETE, [('age_minutes', 'contains', 1)], '')
+
+
+def test_plan_log_summarises():
+    class Logger(object):
+        def __init__(self):
+            self.lines = []
+
+        def info(self, message):
+            self.lines.append(message)
+
+    logger = Logger()
+    records = [_record('a', 7200, 1), _record('b', 0, 1)]
+    video_rules.age_views_rules(60, 100).plan(records, now=NOW).log(logger, '[删除流程]', dry_run=True)
+    assert logger.lines[0].startswith('[删除流程] [试运行] 规则求值 2 个作品')
+    assert logger.lines[1:] == ['[删除流程] => delete a：发布超过60分钟且播放量 1 < 100']
@@ -0,0 +1,124 @@
+"""违规巡检：额度用完排队的删除 / 隐藏在额度恢复后由巡检线程执行，不依赖下一次巡检"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('aiohttp')
+rate_limiter = pytest.importorskip('social_auto_upload.utils.rate_limiter')
+channels_api = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.channels_api')
+main_tz_violation = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.main_tz_violation')
+violation_sweeper = pytest.importorskip('social_auto_upload.uploader.tencent_uploader.violation_sweeper')
+
+ACCOUNT = 'wx_account.json'
+DELETE = channels_api.ENDPOINT_DELETE
+HIDE = channels_api.ENDPOINT_HIDE
+
+
+class Platform(object):
+    """代替 ChannelsApiClient.call：删除成功 delete_quota 次后返回频率限制，记录 (接口, 作品)"""
+
+    def __init__(self, delete_quota=None):
+        self.delete_quota = delete_quota
+        self.calls = []
+
+    async def call(self, client, url, body, referer=None):
+        endpoint = DELETE if url == channels_api.POST_DELETE_URL else HIDE
+        if endpoint == DELETE and self.delete_quota is not None:
+            if self.delete_quota == 0:
+                return {'errCode': 0, 'data': {'baseResp': {'errmsg': channels_api.DELETE_RATE_LIMIT_MSG}}}
+            self.delete_quota -= 1
+        self.calls.append((endpoint, body['objectId']))
+        return {'errCode': 0, 'data': {'baseResp': {'errmsg': ''}}}
+
+
+class FakeIndex(object):
+    def __init__(self):
+        self.marks = []
+
+    def mark(self, account, export_id, status=None, visible_type=None):
+        self.marks.append((export_id, status, visible_type))
+
+
+@pytest.fixture
+def env(monkeypatch, db_manager, tmp_path):
+    monkeypatch.setattr(rate_limiter, 'get_db_manager', lambda: db_manager)
+    monkeypatch.setattr(rate_limiter, '_rate_limiter', None)
+    monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_DEFAULTS', {})
+    monkeypatch.setattr(rate_limiter, 'DEFAULT_LIMIT', {'rate': 1000.0, 'capacity': 100, 'min_rate': 1.0, 'daily_quota': 0})
+    monkeypatch.setattr(violation_sweeper, 'get_db_manager', lambda: db_manager)
+    index = FakeIndex()
+    monkeypatch.setattr(main_tz_violation, 'get_video_index', lambda: index)
+    platform = Platform()
+    monkeypatch.setattr(channels_api.ChannelsApiClient, 'call',
+                        lambda client, url, body, referer=None: platform.call(client, url, body, referer))
+
+    account_file = tmp_path / ACCOUNT
+    account_file.write_text(json.dumps({'cookies': [{'name': 'sessionid', 'value': 's'},
+                                                    {'name': 'wxuin', 'value': '1'}]}), encoding='utf-8')
+    sweeper = violation_sweeper.ViolationSweeper({'poll_interval': 0.05})
+    # 已登记的账号，下一次巡检在很久以后
+    db_manager._execute_write(
+        'INSERT INTO violation_sweep_accounts (account_file, settings, next_sweep_at) VALUES (:account_file, :settings, :at)',
+        {'account_file': str(account_file), 'settings': '{}', 'at': int(time.time()) + 86400}
+    )
+    limiter = rate_limiter.get_rate_limiter()
+    limiter.defer(ACCOUNT, DELETE, 'exp1', {'object_id': 'obj1'})
+    limiter.defer(ACCOUNT, DELETE, 'exp2', {'object_id': 'obj2'})
+    limiter.defer(ACCOUNT, HIDE, 'exp3', {'collection_id': ''})
+    return sweeper, str(account_file), limiter, platform, index
+
+
+def test_deferred_actions_replay_once_quota_resets(env, monkeypatch):
+    sweeper, account_file, limiter, platform, index = env
+    limiter.report(ACCOUNT, DELETE, ok=False, limited=True)
+    limiter.report(ACCOUNT, HIDE, ok=False, limited=True)
+    # 额度未恢复时不执行
+    assert sweeper._replay_due_accounts() == []
+
+    # 第二天额度重置，平台只允许再删除一个
+    monkeypatch.setattr(rate_limiter, 'quota_day', lambda timestamp=None: '2099-01-01')
+    platform.delete_quota = 1
+    assert sweeper._replay_due_accounts() == [account_file]
+    asyncio.run(sweeper._replay(account_file, asyncio.Semaphore(1)))
+
+    assert platform.calls == [(DELETE, 'exp1'), (HIDE, 'exp3')]
+    assert index.marks == [('exp1', 'deleted', None), ('exp3', None, channels_api.VISIBLE_SELF)]
+    # 被再次限制的删除继续排队，额度恢复前不再调度
+    assert limiter.pending() == {(ACCOUNT, DELETE)}
+    assert sweeper._replay_due_accounts() == []
+    assert not sweeper.in_flight()
+
+
+def test_sweeper_thread_replays_without_waiting_for_next_sweep(env, monkeypatch):
+    sweeper, account_file, limiter, platform, index = env
+
+    async def no_sweep(**kwargs):
+        raise AssertionError('账号未到巡检时间')
+
+    monkeypatch.setattr(violation_sweeper, '_process_violation_batch', no_sweep)
+    thread = threading.Thread(target=sweeper.run_forever)
+    thread.start()
+    try:
+        deadline = time.time() + 5
+        while (limiter.pending() or sweeper.in_flight()) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        sweeper.stop()
+        thread.join(5)
+    assert platform.calls == [(DELETE, 'exp1'), (DELETE, 'exp2'), (HIDE, 'exp3')]
+    assert limiter.pending() == set()
+    assert sweeper.runs() == []
+
+
+def test_failed_replay_waits_for_interval(env, tmp_path):
+    sweeper, account_file, limiter, platform, index = env
+    (tmp_path / ACCOUNT).write_text('{"cookies": []}', encoding='utf-8')
+    asyncio.run(sweeper._replay(account_file, asyncio.Semaphore(1)))
+    assert platform.calls == [] and len(limiter.pending()) == 2
+    assert sweeper._replay_due_accounts() == []
+    sweeper._replay_retry_at[account_file] = 0
+    assert sweeper._replay_due_accounts() == [account_file]
@@ -13,10 +13,13 @@ from social_auto_upload.utils.base_up_util import dispatch_upload
 from social_auto_upload.conf import LOCAL_CHROME_PATH
 from social_auto_upload.uploader.douyin_uploader.juliang_util import xt_have_task
 from social_auto_upload.utils.base_social_media import set_init_script, SOCIAL_MEDIA_DOUYIN
+from social_auto_upload.utils.cookie_probe import probe_cookie
 from social_auto_upload.utils.crawler_util import convert_cookies
 from social_auto_upload.utils.bus_exception import UpdateError, BusError
 from social_auto_upload.utils.file_util import get_account_file
 from social_auto_upload.utils.log import douyin_logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
+from social_auto_upload.utils.page_wait import wait_for_any, selector, url, Deadline
 
 from log import logger
 from social_auto_upload.uploader.douyin_uploader.main_tz import add_declaration, add_goods, get_title_tag
@@ -43,7 +46,19 @@ import json
 
 config = ConfigManager()
 pub_config = json.loads(config.get(f'{PLATFORM}_pub_config',"{}")).get('douyin',{})
+
+# 发布流程各阶段的最长等待时间（秒），可在发布配置中覆盖
+PAGE_LOAD_TIMEOUT = pub_config.get('page_load_timeout', 60)
+UPLOAD_TIMEOUT = pub_config.get('upload_timeout', 1800)
+PUBLISH_TIMEOUT = pub_config.get('publish_timeout', 120)
+UPLOAD_AREA = 'text=点击上传 或直接将视频文件拖入此区域'
 async def cookie_auth(account_file, local_executable_path=None,un_close=False,proxy_setting=None,camoufox=False,addons_path=None,load_addons=False):
+    if not un_close:
+        # 先用 HTTP 接口探测登录态，能判断时不再启动浏览器
+        verdict = await probe_cookie(3, account_file, proxy_setting=proxy_setting)
+        if verdict is not None:
+            douyin_logger.info(f"[+] cookie 探测结果: {'有效' if verdict else '失效'}")
+            return verdict
     if not local_executable_path or not os.path.exists(local_executable_path):
         douyin_logger.warning(f"浏览器路径无效: {local_executable_path}")
     hide_browser = False if un_close else True
@@ -337,17 +352,16 @@ class DouYinVideo(object):
         label_element = page.locator("[class^='radio']:has-text('定时发布')")
         # 在选中的 label 元素下点击 checkbox
         await label_element.click()
-        await asyncio.sleep(1)
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M")
 
-        await asyncio.sleep(1)
-        await page.locator('.semi-input[placeholder="日期和时间"]').click()
+        # 等待日期输入框出现后直接输入，不再固定等待
+        date_input = page.locator('.semi-input[placeholder="日期和时间"]')
+        await date_input.wait_for(state='visible', timeout=5000)
+        await date_input.click()
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
 
-        await asyncio.sleep(1)
-
     async def handle_upload_error(self, page):
         douyin_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
@@ -377,74 +391,88 @@ class DouYinVideo(object):
         # 创建一个浏览器上下文，使用指定的 cookie 文件
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context,os.path.basename(self.account_file))
-        # 创建一个新的页面
-        page = await context.new_page()
-        if self.info and self.info.get("anchor_info", None) and self.info.get("enable_drama", False):
-            anchor_info = self.info.get("anchor_info", None)
-            playlet_title = anchor_info.get("title", None)
-            playlet_title_tag = anchor_info.get("title_tag", None)
-            auto_order = self.info.get("auto_order", None)
-            if self.info.get('douyin_publish_type') == '星图发布' or self.info.get('douyin_publish_type') == '王牌智媒':
-               page = await xt_check_login(self,auto_order, context, page, playlet_title)
-            elif self.info.get('douyin_publish_type') == '分销':
-                # 分销发布逻辑 - 调用自动生成的发布方法
-                pub_files = await fx_util.fx_publish(self.info, page,self)
-                await context.storage_state(path=self.account_file)
-                return True,pub_files
-            elif self.info.get('douyin_publish_type') == '抖音发布':
-                if playlet_title:
-                    have_task, page, n_url = await self.check_have_task(page, playlet_title, playlet_title_tag)
-                    if not have_task:
-                        if auto_order:
-                            douyin_logger.info('[+] 检测到不在上传页面，需要新建任务')
-                            page = await self.new_task(page, playlet_title, playlet_title_tag)
+        try:
+            # 统计视频分片上传的网络指标
+            upload_monitor = UploadNetworkMonitor('douyin', self.file_path).attach(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            if self.info and self.info.get("anchor_info", None) and self.info.get("enable_drama", False):
+                anchor_info = self.info.get("anchor_info", None)
+                playlet_title = anchor_info.get("title", None)
+                playlet_title_tag = anchor_info.get("title_tag", None)
+                auto_order = self.info.get("auto_order", None)
+                if self.info.get('douyin_publish_type') == '星图发布' or self.info.get('douyin_publish_type') == '王牌智媒':
+                   page = await xt_check_login(self,auto_order, context, page, playlet_title)
+                elif self.info.get('douyin_publish_type') == '分销':
+                    # 分销发布逻辑 - 调用自动生成的发布方法
+                    pub_files = await fx_util.fx_publish(self.info, page,self)
+                    await context.storage_state(path=self.account_file)
+                    return True,pub_files
+                elif self.info.get('douyin_publish_type') == '抖音发布':
+                    if playlet_title:
+                        have_task, page, n_url = await self.check_have_task(page, playlet_title, playlet_title_tag)
+                        if not have_task:
+                            if auto_order:
+                                douyin_logger.info('[+] 检测到不在上传页面，需要新建任务')
+                                page = await self.new_task(page, playlet_title, playlet_title_tag)
+                            else:
+                                douyin_logger.info('[+] 没有找到任务，也没有开启自动接单，直接返回')
+                                raise UpdateError(f"没有找到任务标签:{playlet_title}，也没有开启自动接单，请先接取任务")
                         else:
-                            douyin_logger.info('[+] 没有找到任务，也没有开启自动接单，直接返回')
-                            raise UpdateError(f"没有找到任务标签:{playlet_title}，也没有开启自动接单，请先接取任务")
-                    else:
-                        douyin_logger.info('[+] 已经存在任务，继续处理')
-        else:
-            # 访问指定的 URL
-            await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+                            douyin_logger.info('[+] 已经存在任务，继续处理')
+            else:
+                # 访问指定的 URL
+                await self.open_upload_page(page)
+            await self.transfer(page)
+            msg_res = await self.fill_and_publish(page)
+
+            self.upload_metrics = await upload_monitor.finish()
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            douyin_logger.success('  [-]cookie更新完毕！')
+        finally:
+            # 关闭浏览器上下文和浏览器实例，上传出错时同样关闭，避免在共用的浏览器中泄漏上下文
+            if context:
+                try:
+                    await context.close()
+                except Exception as ctx_error:
+                    douyin_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+            # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
+            if playwright and browser:
+                try:
+                    await browser.close()
+                except Exception as browser_error:
+                    douyin_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
+
+        return True, msg_res
+
+    async def open_upload_page(self, page):
+        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+
+    async def transfer(self, page):
+        """在上传页选择视频文件并等待进入发布页，视频在后台继续上传"""
         douyin_logger.info(f'[+]正在上传-------{self.title}.mp4')
         # 等待页面跳转到指定的 URL，进入，则自动等待到超时
         douyin_logger.info(f'[-] 正在打开主页...{page.url}')
         await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload*")
-        # 检查提示文字是否存在
-        while True:
-            text_exists = await page.get_by_text("点击上传 或直接将视频文件拖入此区域").is_visible()
-            if text_exists:
-                douyin_logger.info("检测到上传页面已加载,正在刷新...")
-                await page.reload()
-                while True:
-                    text_exists = await page.get_by_text("点击上传 或直接将视频文件拖入此区域").is_visible()
-                    if text_exists:
-                        break
-                break
+        # 等待上传区域出现后刷新一次页面，再等待上传区域重新出现
+        await wait_for_any(page, [selector('upload_area', UPLOAD_AREA)], timeout=PAGE_LOAD_TIMEOUT)
+        douyin_logger.info("检测到上传页面已加载,正在刷新...")
+        await page.reload()
+        await wait_for_any(page, [selector('upload_area', UPLOAD_AREA)], timeout=PAGE_LOAD_TIMEOUT)
         up_file = pub_config.get('up_file')
         # 点击 "上传视频" 按钮
         await page.locator(up_file).set_input_files(self.file_path)
 
-        # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
-        while True:
-            try:
-                # 尝试等待第一个 URL
-                await page.wait_for_url(
-                    "https://creator.douyin.com/creator-micro/content/*", timeout=3000)
-                douyin_logger.info("[+] 成功进入version_1发布页面!")
-                break  # 成功进入页面后跳出循环
-            except Exception:
-                try:
-                    # 如果第一个 URL 超时，再尝试等待第二个 URL
-                    await page.wait_for_url(
-                        "https://creator.douyin.com/creator-micro/content/post/video*",
-                        timeout=3000)
-                    douyin_logger.info("[+] 成功进入version_2发布页面!")
+        # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面，两种页面同时等待
+        version = await wait_for_any(page, [
+            url('version_1', "https://creator.douyin.com/creator-micro/content/*"),
+            url('version_2', "https://creator.douyin.com/creator-micro/content/post/video*"),
+        ], timeout=PAGE_LOAD_TIMEOUT, on_progress=lambda elapsed: douyin_logger.info("  [-] 尚未进入视频发布页面，继续等待..."))
+        douyin_logger.info(f"[+] 成功进入{version}发布页面!")
 
-                    break  # 成功进入页面后跳出循环
-                except:
-                    douyin_logger.info("  [-] 超时未进入视频发布页面，重新尝试...")
-                    await asyncio.sleep(0.5)  # 等待 0.5 秒后重新尝试
+    async def fill_and_publish(self, page):
+        """填写发布表单，等待视频上传完成后发布，返回检测结果"""
         # 填充标题和话题
         await self.fill_title_and_tags(page)
         allow_download = page.locator('.download-content-Lci5tL label:has-text("不允许")')
@@ -455,27 +483,11 @@ class DouYinVideo(object):
         await self.set_collection(page)
         # 添加声明
         await add_declaration(self,page)
-        while True:
-            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
-            try:
-                #  新版：定位重新上传
-                number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-                if number > 0:
-                    douyin_logger.success("  [-]视频上传完毕")
-                    break
-                else:
-                    douyin_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-
-                    if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-                        douyin_logger.error("  [-] 发现上传出错了... 准备重试")
-                        await self.handle_upload_error(page)
-            except Exception as e:
-                if 'Target page, context or browser has been closed' in e.message:
-                    raise e  # 直接抛出异常
-                douyin_logger.error(e)
-                douyin_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+        # 流水线模式：定时发布在视频传输期间设置，不等上传完成
+        pipeline = self.info.get('pipeline_upload', False)
+        if pipeline and self.publish_date and self.publish_date != 0:
+            await self.set_schedule_time_douyin(page, self.publish_date)
+        await self.wait_upload_complete(page)
 
         # 上传视频封面
         await self.set_thumbnail(page, self.thumbnail_path)
@@ -492,43 +504,28 @@ class DouYinVideo(object):
             if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
                 await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
 
-        if self.publish_date and self.publish_date != 0:
+        if not pipeline and self.publish_date and self.publish_date != 0:
             await self.set_schedule_time_douyin(page, self.publish_date)
         msg_res = '检测通过，暂未发现异常'
-        # 判断视频启用成功
-        while True:
-            # 判断视频启用成功
-            try:
-                publish_button = page.get_by_role('button', name="发布", exact=True)
-                if await publish_button.count():
-                    await publish_button.click()
-                await page.wait_for_url("https://creator.douyin.com/creator-micro/content/manage**",
-                                        timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
-                douyin_logger.success("  [-]视频发布成功")
-                break
-            except:
-                douyin_logger.info("  [-] 视频正在发布中...")
-                await asyncio.sleep(0.5)
+        publish_button = page.get_by_role('button', name="发布", exact=True)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        douyin_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        if context:
+        async def click_publish(elapsed=0):
+            # 还停留在发布页时（按钮仍在）再次点击发布
             try:
-                await context.close()
-            except Exception as ctx_error:
-                douyin_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
-        
-        # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
-        if playwright and browser:
-            try:
-                await browser.close()
-            except Exception as browser_error:
-                douyin_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
-        
-        return True, msg_res
+                if await publish_button.count():
+                    await publish_button.click(timeout=3000)
+                    douyin_logger.info(f"  [-] 视频正在发布中...（{elapsed:.0f} 秒）")
+            except Exception as e:
+                if 'Target page, context or browser has been closed' in str(e):
+                    raise e
+                douyin_logger.info(f"  [-] 点击发布按钮失败，稍后重试: {str(e)}")
 
+        await click_publish()
+        # 自动跳转到作品页面，则代表发布成功
+        await wait_for_any(page, [url('published', "https://creator.douyin.com/creator-micro/content/manage**")],
+                           timeout=PUBLISH_TIMEOUT, on_progress=click_publish, progress_interval=3)
+        douyin_logger.success("  [-]视频发布成功")
+        return msg_res
 
     async def new_xt_task(self, page, playlet_title):
         await page.goto("https://www.xingtu.cn/sup/creator/market?type=submission")
@@ -887,17 +884,22 @@ class DouYinVideo(object):
             return False
 
     async def wait_upload_complete(self, page):
-        """等待视频上传完成"""
+        """等待视频上传完成：出现“重新上传”即完成，出现“上传失败”时重新上传，总时长不超过 UPLOAD_TIMEOUT"""
+        deadline = Deadline(UPLOAD_TIMEOUT, '视频上传完成')
         while True:
-            try:
-                if await self.check_upload_status(page):
-                    break
-                await asyncio.sleep(2)
-            except Exception as e:
-                if "Target page, context or browser has been closed" in str(e):
-                    raise e
-                douyin_logger.error(e)
-                await asyncio.sleep(2)
+            matched = await wait_for_any(page, [
+                selector('uploaded', '[class^="long-card"] div:has-text("重新上传")', state='attached'),
+                selector('failed', 'div.progress-div > div:has-text("上传失败")', state='attached'),
+            ], timeout=deadline.remaining(),
+                on_progress=lambda elapsed: douyin_logger.info(f"  [-] 正在上传视频中...（{deadline.elapsed:.0f} 秒）"))
+            if matched == 'uploaded':
+                douyin_logger.success("  [-]视频上传完毕")
+                return
+            douyin_logger.error("  [-] 发现上传出错了... 准备重试")
+            await self.handle_upload_error(page)
+            # 等待失败提示消失后再继续等待，避免立刻再次命中
+            await page.locator('div.progress-div > div:has-text("上传失败")').wait_for(
+                state='detached', timeout=deadline.remaining() * 1000)
 
     async def main(self):
         return await dispatch_upload(self)
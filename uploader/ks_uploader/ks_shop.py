@@ -160,135 +160,137 @@ class KSVideo(object):
                 )
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context,os.path.basename(self.account_file))
-        context.on("close", lambda: context.storage_state(path=self.account_file))
-        msg_res = '检测通过，暂未发现异常'
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 动态获取屏幕尺寸
-        screen_size = await page.evaluate("""() => ({
-            width: window.screen.availWidth,
-            height: window.screen.availHeight
-        })""")
-
-        await page.set_viewport_size(screen_size)
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
-        kuaishou_logger.info(f'正在上传-------{self.title}.mp4{self.file_path}')
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        kuaishou_logger.info('正在打开主页...')
-        await page.wait_for_url("https://cp.kuaishou.com/article/publish/video")
-        # 点击 "上传视频" 按钮
-        upload_button = page.locator("button[class^='_upload-btn']")
-        await upload_button.wait_for(state='visible')  # 确保按钮可见
-
-        async with page.expect_file_chooser() as fc_info:
-            await upload_button.click()
-        file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
-
-        await asyncio.sleep(2)
-
-        # if not await page.get_by_text("封面编辑").count():
-        #     raise Exception("似乎没有跳转到到编辑页面")
+        try:
+            context.on("close", lambda: context.storage_state(path=self.account_file))
+            msg_res = '检测通过，暂未发现异常'
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 动态获取屏幕尺寸
+            screen_size = await page.evaluate("""() => ({
+                width: window.screen.availWidth,
+                height: window.screen.availHeight
+            })""")
+
+            await page.set_viewport_size(screen_size)
+            # 访问指定的 URL
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
+            kuaishou_logger.info(f'正在上传-------{self.title}.mp4{self.file_path}')
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            kuaishou_logger.info('正在打开主页...')
+            await page.wait_for_url("https://cp.kuaishou.com/article/publish/video")
+            # 点击 "上传视频" 按钮
+            upload_button = page.locator("button[class^='_upload-btn']")
+            await upload_button.wait_for(state='visible')  # 确保按钮可见
+
+            async with page.expect_file_chooser() as fc_info:
+                await upload_button.click()
+            file_chooser = await fc_info.value
+            await file_chooser.set_files(self.file_path)
 
-        await asyncio.sleep(1)
+            await asyncio.sleep(2)
 
-        # 等待按钮可交互
-        new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
-        if await new_feature_button.count() > 0:
-            await new_feature_button.click()
+            # if not await page.get_by_text("封面编辑").count():
+            #     raise Exception("似乎没有跳转到到编辑页面")
+
+            await asyncio.sleep(1)
+
+            # 等待按钮可交互
+            new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
+            if await new_feature_button.count() > 0:
+                await new_feature_button.click()
+
+            kuaishou_logger.info("正在填充标题和话题...")
+            await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
+            kuaishou_logger.info("clear existing title")
+            await page.keyboard.press("Backspace")
+            await page.keyboard.press("Control+KeyA")
+            await page.keyboard.press("Delete")
+            kuaishou_logger.info("filling new  title")
+            await page.keyboard.type(self.title)
+            await page.keyboard.press("Enter")
+
+            # 快手只能添加3个话题
+            for index, tag in enumerate(self.tags[:3], start=1):
+                kuaishou_logger.info("正在添加第%s个话题" % index)
+                await page.keyboard.type(f"#{tag} ")
+                await asyncio.sleep(2)
+            # 点击不允许下载
+            allow_download = page.locator('label:has-text("允许下载此作品")')
+            if await allow_download.count() > 0:
+                await allow_download.click()
+            # 关联商品
+            if self.goods and self.goods.relItemId:
+                await self.set_author_service(page, '关联商品')
+            max_retries = 600  # 设置最大重试次数,最大等待时间为 2 分钟
+            retry_count = 0
+
+            while retry_count < max_retries:
+                try:
+                    # 获取包含 '上传中' 文本的元素数量
+                    number = await page.locator("text=上传中").count()
+
+                    if number == 0:
+                        kuaishou_logger.success("视频上传完毕")
+                        break
+                    else:
+                        if retry_count % 5 == 0:
+                            kuaishou_logger.info("正在上传视频中...")
+                        await asyncio.sleep(2)
+                except Exception as e:
+                    if 'Target page, context or browser has been closed' in e.message:
+                        raise e  # 直接抛出异常
+                    kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
+                    await asyncio.sleep(2)  # 等待 2 秒后重试
+                retry_count += 1
 
-        kuaishou_logger.info("正在填充标题和话题...")
-        await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
-        kuaishou_logger.info("clear existing title")
-        await page.keyboard.press("Backspace")
-        await page.keyboard.press("Control+KeyA")
-        await page.keyboard.press("Delete")
-        kuaishou_logger.info("filling new  title")
-        await page.keyboard.type(self.title)
-        await page.keyboard.press("Enter")
+            if retry_count == max_retries:
+                kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
 
-        # 快手只能添加3个话题
-        for index, tag in enumerate(self.tags[:3], start=1):
-            kuaishou_logger.info("正在添加第%s个话题" % index)
-            await page.keyboard.type(f"#{tag} ")
-            await asyncio.sleep(2)
-        # 点击不允许下载
-        allow_download = page.locator('label:has-text("允许下载此作品")')
-        if await allow_download.count() > 0:
-            await allow_download.click()
-        # 关联商品
-        if self.goods and self.goods.relItemId:
-            await self.set_author_service(page, '关联商品')
-        max_retries = 600  # 设置最大重试次数,最大等待时间为 2 分钟
-        retry_count = 0
-
-        while retry_count < max_retries:
-            try:
-                # 获取包含 '上传中' 文本的元素数量
-                number = await page.locator("text=上传中").count()
+            # 定时任务
+            if self.publish_date != 0:
+                await self.set_schedule_time(page, self.publish_date)
 
-                if number == 0:
-                    kuaishou_logger.success("视频上传完毕")
+            # 判断视频启用成功
+            while True:
+                try:
+                    publish_button = page.get_by_text("发布", exact=True)
+                    if await publish_button.count() > 0:
+                        await publish_button.click()
+
+                    await asyncio.sleep(1)
+                    confirm_button = page.get_by_text("确认发布")
+                    if await confirm_button.count() > 0:
+                        await confirm_button.click()
+
+                    # 等待页面跳转，确认发布成功
+                    await page.wait_for_url(
+                        "https://cp.kuaishou.com/article/manage/video?status=2&from=publish",
+                        timeout=5000,
+                    )
+                    kuaishou_logger.success("视频发布成功")
                     break
-                else:
-                    if retry_count % 5 == 0:
-                        kuaishou_logger.info("正在上传视频中...")
-                    await asyncio.sleep(2)
-            except Exception as e:
-                if 'Target page, context or browser has been closed' in e.message:
-                    raise e  # 直接抛出异常
-                kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
-                await asyncio.sleep(2)  # 等待 2 秒后重试
-            retry_count += 1
-
-        if retry_count == max_retries:
-            kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
-
-        # 定时任务
-        if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
-
-        # 判断视频启用成功
-        while True:
-            try:
-                publish_button = page.get_by_text("发布", exact=True)
-                if await publish_button.count() > 0:
-                    await publish_button.click()
-
-                await asyncio.sleep(1)
-                confirm_button = page.get_by_text("确认发布")
-                if await confirm_button.count() > 0:
-                    await confirm_button.click()
-
-                # 等待页面跳转，确认发布成功
-                await page.wait_for_url(
-                    "https://cp.kuaishou.com/article/manage/video?status=2&from=publish",
-                    timeout=5000,
-                )
-                kuaishou_logger.success("视频发布成功")
-                break
-            except Exception as e:
-                kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
-                await page.screenshot(full_page=True)
-                await asyncio.sleep(1)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        kuaishou_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        try:
-            await context.close()
-        except Exception as ctx_error:
-            kuaishou_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
-        
-        # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
-        if playwright:
+                except Exception as e:
+                    kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
+                    await page.screenshot(full_page=True)
+                    await asyncio.sleep(1)
+
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            kuaishou_logger.info('cookie更新完毕！')
+            await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        finally:
+            # 关闭浏览器上下文和浏览器实例，上传出错时同样关闭，避免在共用的浏览器中泄漏上下文
             try:
-                await browser.close()
-            except Exception as browser_error:
-                kuaishou_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
-        
+                await context.close()
+            except Exception as ctx_error:
+                kuaishou_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+            # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
+            if playwright:
+                try:
+                    await browser.close()
+                except Exception as browser_error:
+                    kuaishou_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
+
         return True, msg_res
 
     async def main(self):
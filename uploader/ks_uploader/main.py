@@ -12,12 +12,19 @@ import asyncio
 from log import logger
 from social_auto_upload.conf import LOCAL_CHROME_PATH
 from social_auto_upload.utils.base_social_media import set_init_script, SOCIAL_MEDIA_KUAISHOU
+from social_auto_upload.utils.cookie_probe import probe_cookie
 from social_auto_upload.utils.file_util import get_account_file
 from social_auto_upload.utils.files_times import get_absolute_path
 from social_auto_upload.utils.log import kuaishou_logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
 
 
 async def cookie_auth(account_file):
+    # 先用 HTTP 接口探测登录态，能判断时不再启动浏览器
+    verdict = await probe_cookie(4, account_file)
+    if verdict is not None:
+        kuaishou_logger.info(f"[+] cookie 探测结果: {'有效' if verdict else '失效'}")
+        return verdict
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=True)
         context = await browser.new_context(storage_state=account_file)
@@ -107,6 +114,8 @@ async def get_ks_cookie(account_file):
 
 
 class KSVideo(object):
+    launch_headless = False  # 浏览器池中同样有头运行，与自行启动浏览器时一致
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, goods=None, info=None):
         self.title = title  # 视频标题
         self.file_path = file_path
@@ -137,12 +146,43 @@ class KSVideo(object):
                 )
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context,os.path.basename(self.account_file))
-        context.on("close", lambda: context.storage_state(path=self.account_file))
-        msg_res = '检测通过，暂未发现异常'
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
+        try:
+            # 统计视频分片上传的网络指标
+            upload_monitor = UploadNetworkMonitor('kuaishou', self.file_path).attach(context)
+            context.on("close", lambda: context.storage_state(path=self.account_file))
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await self.open_upload_page(page)
+            await self.transfer(page)
+            msg_res = await self.fill_and_publish(page)
+
+            self.upload_metrics = await upload_monitor.finish()
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            kuaishou_logger.info('cookie更新完毕！')
+            await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        finally:
+            # 关闭浏览器上下文和浏览器实例，上传出错时同样关闭，避免在共用的浏览器中泄漏上下文
+            try:
+                await context.close()
+            except Exception as ctx_error:
+                kuaishou_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+            # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
+            # 如果 browser 是外部传入的（使用 Camoufox），则不应该在这里关闭
+            if playwright:
+                try:
+                    await browser.close()
+                except Exception as browser_error:
+                    kuaishou_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
+
+        return True, msg_res
+
+    async def open_upload_page(self, page):
         await page.goto("https://cp.kuaishou.com/article/publish/video")
+
+    async def transfer(self, page):
+        """在发布页选择视频文件，视频在后台继续上传"""
         kuaishou_logger.info(f'正在上传-------{self.title}.mp4{self.file_path}')
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         kuaishou_logger.info('正在打开主页...')
@@ -158,6 +198,9 @@ class KSVideo(object):
 
         await asyncio.sleep(2)
 
+    async def fill_and_publish(self, page):
+        """填写发布表单，等待视频上传完成后发布，返回检测结果"""
+        msg_res = '检测通过，暂未发现异常'
         # if not await page.get_by_text("封面编辑").count():
         #     raise Exception("似乎没有跳转到到编辑页面")
 
@@ -190,6 +233,10 @@ class KSVideo(object):
         # 关联商品
         if self.goods and self.goods.relItemId:
             await self.set_author_service(page,'关联商品')
+        # 流水线模式：定时发布在视频传输期间设置，不等上传完成
+        pipeline = self.info.get('pipeline_upload', False)
+        if pipeline and self.publish_date != 0:
+            await self.set_schedule_time(page, self.publish_date)
         max_retries = 600  # 设置最大重试次数,最大等待时间为 2 分钟
         retry_count = 0
 
@@ -216,7 +263,7 @@ class KSVideo(object):
             kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
 
         # 定时任务
-        if self.publish_date != 0:
+        if not pipeline and self.publish_date != 0:
             await self.set_schedule_time(page, self.publish_date)
 
         # 判断视频启用成功
@@ -242,25 +289,7 @@ class KSVideo(object):
                 kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(1)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        kuaishou_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        try:
-            await context.close()
-        except Exception as ctx_error:
-            kuaishou_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
-        
-        # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
-        # 如果 browser 是外部传入的（使用 Camoufox），则不应该在这里关闭
-        if playwright:
-            try:
-                await browser.close()
-            except Exception as browser_error:
-                kuaishou_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
-        
-        return True, msg_res
+        return msg_res
 
     async def main(self):
         return await dispatch_upload(self)
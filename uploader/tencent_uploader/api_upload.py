@@ -0,0 +1,352 @@
+"""
+视频号接口上传：不经过浏览器，直接用 aiohttp 把视频分片并发上传到视频号媒体服务，再调用发表接口创建作品。
+
+流程：helper_upload_params 获取上传凭证 -> applyuploaddfs 申请上传 -> uploadpartdfs 并发上传分片
+-> completepartuploaddfs 合并分片 -> post_create 发表。封面（未指定时用 ffmpeg 截取第一帧）按同样流程上传，
+发表时附带 ffprobe 读取的时长和宽高，因此接口上传需要 ffmpeg / ffprobe。
+已上传的分片记录在断点文件中，上传中断后再次上传同一文件会跳过已完成的分片。
+接口地址和参数可在发布配置 tencent.api_upload 中覆盖。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import aiohttp
+
+from social_auto_upload.conf import BASE_DIR, FFMPEG_PATH
+from social_auto_upload.utils.media_preflight import probe
+from social_auto_upload.utils.cookie_probe import DEFAULT_USER_AGENT, load_cookies, _proxy_kwargs
+from social_auto_upload.utils.log import tencent_logger
+
+API_UPLOAD_DEFAULTS = {
+    'auth_url': 'https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/helper/helper_upload_params',
+    'apply_url': 'https://finderassistancea.video.qq.com/applyuploaddfs',
+    'part_url': 'https://finderassistancea.video.qq.com/uploadpartdfs',
+    'complete_url': 'https://finderassistancea.video.qq.com/completepartuploaddfs',
+    'create_url': 'https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/post/post_create',
+    'app_type': 251,
+    'file_type': 20302,
+    'cover_file_type': 20304,  # 封面图片
+    'chunk_size': 8 * 1024 * 1024,  # 分片大小（字节）
+    'concurrency': 4,  # 同时上传的分片数
+    'part_retries': 3,  # 单个分片失败后的重试次数
+    'timeout': 120,  # 单个请求超时（秒）
+}
+
+# 断点文件目录，超过有效期的断点不再续传
+RESUME_DIR = Path(BASE_DIR / "videoFile" / ".uploads" / "tencent_api")
+RESUME_EXPIRE_SECONDS = 12 * 3600
+
+
+class ChannelsUploadError(Exception):
+    pass
+
+
+def _check_response(name, payload):
+    """视频号接口返回 errCode 非 0 时抛出异常"""
+    if not isinstance(payload, dict):
+        raise ChannelsUploadError(f"{name} 返回格式异常: {str(payload)[:200]}")
+    if payload.get('errCode', 0) != 0:
+        raise ChannelsUploadError(f"{name} 失败 errCode={payload.get('errCode')} errMsg={payload.get('errMsg')}")
+    return payload.get('data', payload)
+
+
+class ChannelsApiUploader(object):
+    """单个账号的视频号接口上传"""
+
+    def __init__(self, account_file, proxy_setting=None, options=None):
+        self.account_file = account_file
+        self.proxy_setting = proxy_setting
+        self.options = dict(API_UPLOAD_DEFAULTS)
+        self.options.update(options or {})
+        self.cookies = None
+        self.upload_params = None
+        self.metrics = None
+
+    def _headers(self):
+        return {
+            'Accept': 'application/json, text/plain, */*',
+            'Content-Type': 'application/json',
+            'User-Agent': DEFAULT_USER_AGENT,
+            'X-WECHAT-UIN': self.cookies.get('wxuin', ''),
+            'Referer': 'https://channels.weixin.qq.com/platform/post/create',
+        }
+
+    def _base_body(self):
+        return {
+            'timestamp': str(int(time.time() * 1000)),
+            '_log_finder_uin': '',
+            '_log_finder_id': self.upload_params.get('finderUsername', '') if self.upload_params else '',
+            'rawKeyBuff': None,
+            'pluginSessionId': None,
+            'scene': 7,
+            'reqScene': 7,
+        }
+
+    async def _post_json(self, session, url, body, name):
+        async with session.post(url, headers=self._headers(), cookies=self.cookies, json=body,
+                                **_proxy_kwargs(self.proxy_setting)) as response:
+            if response.status != 200:
+                raise ChannelsUploadError(f"{name} HTTP状态码: {response.status}")
+            return _check_response(name, await response.json(content_type=None))
+
+    async def prepare(self, session):
+        """读取 cookie 并获取上传凭证"""
+        self.cookies = load_cookies(self.account_file, 'weixin.qq.com')
+        if not self.cookies.get('sessionid') or not self.cookies.get('wxuin'):
+            raise ChannelsUploadError('无法获取sessionid或wxuin')
+        self.upload_params = await self._post_json(session, self.options['auth_url'], self._base_body(),
+                                                   'helper_upload_params')
+        if not self.upload_params.get('authKey'):
+            raise ChannelsUploadError('上传凭证缺少 authKey')
+
+    def _media_headers(self, file_path, file_size, task_id, file_type):
+        arguments = (f"apptype={self.options['app_type']}&filetype={file_type}"
+                     f"&weixinnum={self.upload_params.get('uin', '')}&filekey={os.path.basename(file_path)}"
+                     f"&filesize={file_size}&taskid={task_id}&scene=0")
+        return {
+            'Accept': 'application/json, text/plain, */*',
+            'User-Agent': DEFAULT_USER_AGENT,
+            'Authorization': self.upload_params['authKey'],
+            'X-Arguments': arguments,
+            'Origin': 'https://channels.weixin.qq.com',
+            'Referer': 'https://channels.weixin.qq.com/',
+        }
+
+    def _resume_path(self, file_path, file_size):
+        stat = os.stat(file_path)
+        raw = f"{os.path.abspath(file_path)}|{file_size}|{stat.st_mtime}|{self.cookies.get('wxuin')}"
+        return Path(RESUME_DIR / f"{hashlib.md5(raw.encode('utf-8')).hexdigest()}.json")
+
+    @staticmethod
+    def _load_resume(resume_path, chunk_size):
+        try:
+            with open(resume_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('chunk_size') != chunk_size or time.time() - state.get('created_at', 0) > RESUME_EXPIRE_SECONDS:
+            return None
+        return state
+
+    @staticmethod
+    def _save_resume(resume_path, state):
+        resume_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = resume_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, resume_path)
+
+    async def _apply(self, session, headers, part_lengths):
+        body = {'BlockSum': len(part_lengths), 'BlockPartLength': part_lengths}
+        async with session.put(self.options['apply_url'], headers=headers, json=body,
+                               **_proxy_kwargs(self.proxy_setting)) as response:
+            payload = await response.json(content_type=None)
+        if response.status != 200 or not payload.get('UploadID'):
+            raise ChannelsUploadError(f"applyuploaddfs 失败: {response.status} {str(payload)[:200]}")
+        return payload['UploadID']
+
+    async def _upload_part(self, session, headers, file_path, upload_id, part_number, offset, length, metrics):
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, _read_block, file_path, offset, length)
+        url = f"{self.options['part_url']}?PartNumber={part_number}&UploadID={upload_id}"
+        for attempt in range(self.options['part_retries'] + 1):
+            try:
+                async with session.put(url, headers=headers, data=data,
+                                       **_proxy_kwargs(self.proxy_setting)) as response:
+                    payload = await response.json(content_type=None)
+                    if response.status == 200 and payload.get('ETag'):
+                        metrics['bytes_sent'] += length
+                        return payload['ETag']
+                    error = f"{response.status} {str(payload)[:200]}"
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = str(e)
+            metrics['failed'] += 1
+            if attempt < self.options['part_retries']:
+                metrics['retries'] += 1
+                tencent_logger.warning(f"[接口上传] 分片 {part_number} 上传失败，{2 ** attempt} 秒后重试: {error}")
+                await asyncio.sleep(2 ** attempt)
+        raise ChannelsUploadError(f"分片 {part_number} 上传失败: {error}")
+
+    async def upload_media(self, session, file_path, file_type=None):
+        """分片上传文件（默认为视频），返回 {url, size, md5}"""
+        file_type = file_type or self.options['file_type']
+        file_size = os.path.getsize(file_path)
+        chunk_size = int(self.options['chunk_size'])
+        part_lengths = [min(chunk_size, file_size - offset) for offset in range(0, file_size, chunk_size)]
+        resume_path = self._resume_path(file_path, file_size)
+        state = self._load_resume(resume_path, chunk_size)
+        if state is None:
+            task_id = str(uuid.uuid4())
+            headers = self._media_headers(file_path, file_size, task_id, file_type)
+            state = {'task_id': task_id, 'upload_id': await self._apply(session, headers, part_lengths),
+                     'chunk_size': chunk_size, 'created_at': time.time(), 'parts': {}}
+            self._save_resume(resume_path, state)
+        else:
+            headers = self._media_headers(file_path, file_size, state['task_id'], file_type)
+            tencent_logger.info(f"[接口上传] {file_path} 断点续传，已完成 {len(state['parts'])}/{len(part_lengths)} 个分片")
+
+        metrics = {'bytes_sent': 0, 'failed': 0, 'retries': 0}
+        semaphore = asyncio.Semaphore(int(self.options['concurrency']))
+        state_lock = asyncio.Lock()
+        started = time.time()
+
+        async def upload_one(part_number, offset, length):
+            async with semaphore:
+                etag = await self._upload_part(session, headers, file_path, state['upload_id'],
+                                               part_number, offset, length, metrics)
+            async with state_lock:
+                state['parts'][str(part_number)] = etag
+                self._save_resume(resume_path, state)
+
+        pending = [(index + 1, index * chunk_size, length) for index, length in enumerate(part_lengths)
+                   if str(index + 1) not in state['parts']]
+        results = await asyncio.gather(*(upload_one(*part) for part in pending), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            # 保留断点文件，下次上传同一文件时续传
+            raise errors[0]
+
+        part_info = [{'PartNumber': number, 'ETag': state['parts'][str(number)]}
+                     for number in range(1, len(part_lengths) + 1)]
+        url = f"{self.options['complete_url']}?UploadID={state['upload_id']}"
+        async with session.post(url, headers=headers, json={'TransFlag': '0_0', 'PartInfo': part_info},
+                                **_proxy_kwargs(self.proxy_setting)) as response:
+            payload = await response.json(content_type=None)
+        if response.status != 200 or not payload.get('DownloadURL'):
+            raise ChannelsUploadError(f"completepartuploaddfs 失败: {response.status} {str(payload)[:200]}")
+        try:
+            resume_path.unlink()
+        except OSError:
+            pass
+
+        duration = max(time.time() - started, 0.001)
+        self.metrics = {
+            'platform': 'tencent',
+            'mode': 'api',
+            'requests': len(pending) + metrics['retries'],
+            'finished': len(pending),
+            'failed': metrics['failed'],
+            'retries': metrics['retries'],
+            'bytes_sent': metrics['bytes_sent'],
+            'duration': round(duration, 2),
+            'bytes_per_second': int(metrics['bytes_sent'] / duration),
+            'ttfb_avg_ms': None,
+            'ttfb_max_ms': None,
+        }
+        md5 = payload.get('FileMd5') or await asyncio.get_running_loop().run_in_executor(None, _file_md5, file_path)
+        return {'url': payload['DownloadURL'], 'size': file_size, 'md5': md5}
+
+    async def upload_cover(self, session, file_path, cover_path=None):
+        """上传封面，未指定封面时截取视频第一帧，返回封面地址"""
+        if cover_path:
+            return (await self.upload_media(session, cover_path, self.options['cover_file_type']))['url']
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cover_path = os.path.join(tmp_dir, 'cover.jpg')
+            await asyncio.get_running_loop().run_in_executor(None, extract_cover, file_path, cover_path)
+            return (await self.upload_media(session, cover_path, self.options['cover_file_type']))['url']
+
+    async def create_post(self, session, media, title, tags=None, publish_date=None):
+        """用上传好的媒体发表作品，publish_date 不为空时定时发表
+
+        media 为 upload_media 的返回值加上 cover_url、duration、width、height。
+        """
+        description = title + ''.join(f" #{tag}" for tag in (tags or []))
+        body = self._base_body()
+        body.update({
+            'objectType': 0,
+            'longitude': 0,
+            'latitude': 0,
+            'feedLongitude': 0,
+            'feedLatitude': 0,
+            'originalFlag': 0,
+            'topics': list(tags or []),
+            'isFullPost': 1,
+            'handleFlag': 2,
+            'videoClipTaskId': '',
+            'traceInfo': {},
+            'objectDesc': {
+                'mpTitle': '',
+                'description': description,
+                'extReading': {},
+                'mediaType': 4,
+                'location': {},
+                'topic': {},
+                'event': {},
+                'mentionedUser': [],
+                'media': [{
+                    'url': media['url'],
+                    'fileSize': media['size'],
+                    'thumbUrl': media['cover_url'],
+                    'fullThumbUrl': media['cover_url'],
+                    'coverUrl': media['cover_url'],
+                    'fullCoverUrl': media['cover_url'],
+                    'mediaType': 4,
+                    'videoPlayLen': media['duration'],
+                    'width': media['width'],
+                    'height': media['height'],
+                    'md5sum': media['md5'],
+                    'urlCdnTaskId': '',
+                }],
+                'member': {},
+            },
+            'postFlag': 0,
+            'clientid': str(uuid.uuid4()),
+        })
+        if publish_date:
+            body['effectiveTime'] = int(publish_date.timestamp())
+        return await self._post_json(session, self.options['create_url'], body, 'post_create')
+
+    async def publish(self, file_path, title, tags=None, publish_date=None, cover_path=None):
+        """上传并发表，返回 post_create 的返回数据；cover_path 为空时截取视频第一帧作为封面"""
+        # 先读取视频信息，缺少 ffprobe 或文件无法识别时在上传前失败，由调用方改用浏览器上传
+        info = await asyncio.get_running_loop().run_in_executor(None, video_info, file_path)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.options['timeout'])
+        connector = aiohttp.TCPConnector(resolver=aiohttp.ThreadedResolver(), ssl=False,
+                                         limit=int(self.options['concurrency']) + 2)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await self.prepare(session)
+            cover_url = await self.upload_cover(session, file_path, cover_path)
+            # 最后上传视频，self.metrics 记录的是视频的上传指标
+            media = await self.upload_media(session, file_path)
+            media.update(info, cover_url=cover_url)
+            tencent_logger.info(
+                f"[上传指标] tencent {file_path} 接口上传 {self.metrics['bytes_sent'] / 1024 / 1024:.2f} MB，"
+                f"耗时 {self.metrics['duration']} 秒，速度 {self.metrics['bytes_per_second'] / 1024 / 1024:.2f} MB/s，"
+                f"重试 {self.metrics['retries']}")
+            return await self.create_post(session, media, title, tags, publish_date)
+
+
+def _read_block(file_path, offset, length):
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _file_md5(file_path):
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def video_info(file_path):
+    """发表接口需要的视频时长（秒）和宽高"""
+    info = probe(file_path)
+    video = info.get('video') or {}
+    if not video.get('width') or not video.get('height') or not info.get('duration'):
+        raise ChannelsUploadError(f"无法读取视频时长或宽高: {file_path}")
+    return {'duration': int(round(info['duration'])), 'width': video['width'], 'height': video['height']}
+
+
+def extract_cover(file_path, cover_path):
+    """截取视频第一帧作为封面"""
+    subprocess.run([FFMPEG_PATH, '-y', '-v', 'error', '-i', str(file_path), '-frames:v', '1', '-q:v', '2',
+                    str(cover_path)], capture_output=True, timeout=60, check=True)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+视频号后台接口客户端
+
+同一个账号的所有接口请求共用一个 aiohttp 会话（连接池），cookie 文件只解析一次，请求头只构造一次。
+删除、隐藏等写操作经过 utils.rate_limiter 按账号限速并记录每日额度。
+用法：
+    async with ChannelsApiClient(account_file) as client:
+        result = await client.post_list(start_time, end_time)
+"""
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiofiles
+import aiohttp
+from aiohttp import ThreadedResolver, TCPConnector
+
+from social_auto_upload.utils.cookie_probe import _proxy_kwargs
+from social_auto_upload.utils.rate_limiter import get_rate_limiter
+
+CHANNELS_HOST = 'https://channels.weixin.qq.com'
+POST_LIST_URL = f'{CHANNELS_HOST}/micro/statistic/cgi-bin/mmfinderassistant-bin/statistic/post_list'
+POST_SEARCH_URL = f'{CHANNELS_HOST}/micro/content/cgi-bin/mmfinderassistant-bin/post/post_search_user_page'
+POST_DELETE_URL = f'{CHANNELS_HOST}/micro/content/cgi-bin/mmfinderassistant-bin/post/post_delete'
+POST_VISIBLE_URL = f'{CHANNELS_HOST}/micro/content/cgi-bin/mmfinderassistant-bin/post/post_update_visible'
+COLLECTION_FEED_URL = f'{CHANNELS_HOST}/micro/content/cgi-bin/mmfinderassistant-bin/collection/mod_collection_feed'
+NOTIFICATION_LIST_URL = f'{CHANNELS_HOST}/cgi-bin/mmfinderassistant-bin/notification/notification_list'
+
+# 删除接口返回的频率限制提示
+DELETE_RATE_LIMIT_MSG = '暂无法删除，你今日删除太频繁，如需继续操作可登录管理员账号重试'
+
+VISIBLE_PUBLIC = 1
+VISIBLE_SELF = 3  # 仅自己可见
+
+COLLECTION_OP_REMOVE = 3  # 从合集中移除
+
+# 限流器中的接口名
+ENDPOINT_DELETE = 'delete'
+ENDPOINT_HIDE = 'hide'
+ENDPOINT_COLLECTION = 'collection'
+
+
+class ChannelsApiError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ChannelsApiClient(object):
+    """单个账号的视频号后台接口客户端
+
+    可以直接传入 sessionid / wxuin，否则在 open 时从 account_file 中读取。
+    request_count / request_seconds 记录请求次数和累计耗时。
+    account 为限流、索引使用的账号键：cookie 文件名，没有文件时为 wxuin。
+    """
+
+    def __init__(self, account_file=None, sessionid=None, wxuin=None, proxy_setting=None, timeout=30, limit=10):
+        self.account_file = account_file
+        self.sessionid = sessionid
+        self.wxuin = wxuin
+        self.proxy_setting = proxy_setting
+        self.timeout = timeout
+        self.limit = limit
+        self.headers = None
+        self.session = None
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self.account = os.path.basename(account_file) if account_file else wxuin
+
+    async def _load_cookies(self):
+        async with aiofiles.open(self.account_file, 'r', encoding='utf-8') as f:
+            session_data = json.loads(await f.read())
+        for cookie in session_data.get('cookies', []):
+            if cookie['name'] == 'sessionid':
+                self.sessionid = cookie['value']
+            elif cookie['name'] == 'wxuin':
+                self.wxuin = cookie['value']
+
+    async def open(self):
+        if self.session is not None:
+            return self
+        if (not self.sessionid or not self.wxuin) and self.account_file:
+            await self._load_cookies()
+        if not self.sessionid or not self.wxuin:
+            raise ChannelsApiError('无法获取sessionid或wxuin')
+        self.account = self.account or self.wxuin
+        self.headers = {
+            'Accept': '*/*',
+            'Accept-Language': 'zh-CN,zh;q=0.9',
+            'Content-Type': 'application/json',
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/150.0.0.0 Safari/537.36',
+            'X-WECHAT-UIN': self.wxuin,
+            'Referer': f'{CHANNELS_HOST}/micro/content/post/list',
+            'Sec-Fetch-Dest': 'empty',
+            'Sec-Fetch-Mode': 'cors',
+            'Sec-Fetch-Site': 'same-origin',
+            'finger-print-device-id': hashlib.md5(self.sessionid.encode()).hexdigest(),
+            'sec-ch-ua': '"Not;A=Brand";v="8", "Chromium";v="150", "Google Chrome";v="150"',
+            'sec-ch-ua-mobile': '?0',
+            'sec-ch-ua-platform': '"Windows"'
+        }
+        resolver = ThreadedResolver()  # 使用线程池进行DNS解析，避免Windows异步DNS问题
+        connector = TCPConnector(resolver=resolver, ssl=False, limit=self.limit)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                             cookies={'sessionid': self.sessionid, 'wxuin': self.wxuin})
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @staticmethod
+    def _common_fields():
+        return {
+            'timestamp': str(int(time.time() * 1000)),
+            '_log_finder_uin': '',
+            '_log_finder_id': '',
+            'rawKeyBuff': None,
+            'pluginSessionId': None,
+            'scene': 7,
+            'reqScene': 7
+        }
+
+    async def call(self, url, body, referer=None):
+        """发送 POST 请求并返回响应 JSON，HTTP 状态码异常时抛出 ChannelsApiError"""
+        await self.open()
+        payload = self._common_fields()
+        payload.update(body)
+        headers = self.headers if referer is None else dict(self.headers, Referer=referer)
+        started = time.perf_counter()
+        try:
+            async with self.session.post(url, headers=headers, json=payload,
+                                         **_proxy_kwargs(self.proxy_setting)) as response:
+                if response.status not in [200, 201]:
+                    raise ChannelsApiError(f'HTTP状态码: {response.status}', status=response.status)
+                return await response.json(content_type=None)
+        finally:
+            self.request_count += 1
+            self.request_seconds += time.perf_counter() - started
+
+    async def post_list(self, start_time, end_time, current_page=1, page_size=20, sort=0, order=0):
+        """按发布时间范围分页查询作品数据"""
+        return await self.call(POST_LIST_URL, {
+            'pageSize': page_size,
+            'currentPage': current_page,
+            'sort': sort,
+            'order': order,
+            'startTime': start_time,
+            'endTime': end_time,
+        }, referer=f'{CHANNELS_HOST}/micro/statistic/post')
+
+    async def search_posts(self, wording='', last_buffer=''):
+        """按关键词搜索作品，last_buffer 为上一页返回的翻页标记"""
+        return await self.call(POST_SEARCH_URL, {
+            'wording': wording or '',
+            'lastBuffer': last_buffer,
+            'continueFlag': bool(last_buffer),
+            'rawKeyBuff': '',
+        })
+
+    async def notification_list(self, current_page=1, page_size=20, req_type=1):
+        return await self.call(NOTIFICATION_LIST_URL, {
+            'pageSize': page_size,
+            'currentPage': current_page,
+            'reqType': req_type,
+        })
+
+    async def _limited_call(self, endpoint, url, body, referer=None):
+        """经过限流器的写操作，额度已用完时返回 None"""
+        await self.open()
+        limiter = get_rate_limiter()
+        if not await limiter.acquire(self.account, endpoint):
+            return None
+        try:
+            result = await self.call(url, body, referer=referer)
+        except Exception:
+            limiter.report(self.account, endpoint, ok=False)
+            raise
+        if result.get('errCode') != 0:
+            limiter.report(self.account, endpoint, ok=False)
+        # errCode 为 0 时仍可能因删除过于频繁被拒绝
+        elif result.get('data', {}).get('baseResp', {}).get('errmsg', '') == DELETE_RATE_LIMIT_MSG:
+            limiter.report(self.account, endpoint, ok=False, limited=True)
+        else:
+            limiter.report(self.account, endpoint, ok=True)
+        return result
+
+    async def delete_post(self, export_id):
+        """删除作品，返回 (是否成功, 原因)；当天额度已用完时不发请求，直接返回频率限制"""
+        result = await self._limited_call(ENDPOINT_DELETE, POST_DELETE_URL, {'objectId': export_id})
+        if result is None:
+            return False, DELETE_RATE_LIMIT_MSG
+        if result.get('errCode') != 0:
+            return False, result.get('errMsg', '删除失败')
+        base_errmsg = result.get('data', {}).get('baseResp', {}).get('errmsg', '')
+        if base_errmsg == DELETE_RATE_LIMIT_MSG:
+            return False, base_errmsg
+        return True, '删除成功'
+
+    async def update_visible(self, export_id, visible_type=VISIBLE_SELF):
+        """修改作品可见范围，返回响应 JSON"""
+        result = await self._limited_call(ENDPOINT_HIDE, POST_VISIBLE_URL, {'objectId': export_id, 'visibleType': visible_type})
+        return result if result is not None else {'errCode': -1, 'errMsg': '今日修改可见范围次数已用完'}
+
+    async def mod_collection_feed(self, collection_id, object_ids, op_type=COLLECTION_OP_REMOVE):
+        """修改合集内的作品，默认从合集中移除，返回响应 JSON"""
+        result = await self._limited_call(ENDPOINT_COLLECTION, COLLECTION_FEED_URL, {
+            'opType': op_type,
+            'collectionId': collection_id,
+            'objectInfo': [{'objectId': object_id} for object_id in object_ids],
+            'collectionBusinessType': 0,
+            'rawKeyBuff': '',
+        }, referer=f'{CHANNELS_HOST}/micro/content/collection/item')
+        return result if result is not None else {'errCode': -1, 'errMsg': '今日修改合集次数已用完'}
+
+
+@asynccontextmanager
+async def use_client(client=None, account_file=None, sessionid=None, wxuin=None):
+    """传入 client 时直接使用（不关闭），否则临时创建一个客户端，用完关闭"""
+    if client is not None:
+        yield client
+        return
+    async with ChannelsApiClient(account_file, sessionid, wxuin) as temp_client:
+        yield temp_client
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import asyncio
-import hashlib
 import json
 import os
 import random
@@ -16,14 +15,24 @@ from config_manager import ConfigManager
 from patchright.async_api import Playwright, async_playwright
 from social_auto_upload.conf import LOCAL_CHROME_PATH
 from social_auto_upload.uploader.tencent_uploader.main_tz import delete_videos_by_conditions
-from social_auto_upload.uploader.tencent_uploader.main_tz_violation import check_and_handle_violation
+from social_auto_upload.uploader.tencent_uploader.violation_sweeper import get_violation_sweeper
 from social_auto_upload.utils.base_social_media import set_init_script, SOCIAL_MEDIA_TENCENT
+from social_auto_upload.utils.cookie_probe import probe_cookie
 from social_auto_upload.utils.bus_exception import UpdateError
 from social_auto_upload.utils.file_util import get_account_file
 from social_auto_upload.utils.log import tencent_logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
+from social_auto_upload.utils.rate_limiter import get_rate_limiter, RATE_LIMIT_DEFAULTS, DEFAULT_LIMIT
 
 from log import logger
 from social_auto_upload.uploader.tencent_uploader.main_tz import add_original
+from social_auto_upload.uploader.tencent_uploader.api_upload import ChannelsApiUploader
+from social_auto_upload.uploader.tencent_uploader.channels_api import ChannelsApiClient, DELETE_RATE_LIMIT_MSG, \
+    ENDPOINT_DELETE
+from social_auto_upload.uploader.tencent_uploader.video_index import get_video_index, index_account, STATUS_DELETED
+from social_auto_upload.uploader.tencent_uploader.video_rules import age_views_rules, ACTION_DELETE
+from social_auto_upload.uploader.tencent_uploader.picker_cache import get_picker_cache, KIND_ACTIVITY, \
+    KIND_COLLECTION, ACTIVITY_ITEMS_JS, COLLECTION_NAMES_JS, SELECT_COLLECTION_JS
 
 from social_auto_upload.uploader.tencent_uploader.main_tz import add_short_play_by_juji, add_comment, add_declaration
 
@@ -33,6 +42,9 @@ from social_auto_upload.utils.camoufox_util import _get_camoufox_config
 
 config = ConfigManager()
 pub_config = json.loads(config.get(f'{PLATFORM}_pub_config', "{}")).get('tencent', {})
+# 删除、隐藏等接口的限速和每日额度可在发布配置中覆盖
+for _endpoint, _limit in pub_config.get('rate_limit', {}).items():
+    RATE_LIMIT_DEFAULTS.setdefault(_endpoint, dict(DEFAULT_LIMIT)).update(_limit)
 
 
 def remove_punctuation(text: str) -> str:
@@ -41,6 +53,37 @@ def remove_punctuation(text: str) -> str:
     return re.sub(r'[^\w]', '', text, flags=re.UNICODE)
 
 
+def match_activity(activities, match_title, playlet_title_tag=None, match_drama_name=False, ignore_punctuation=False):
+    """在活动列表 [{name, creator}] 中查找短剧活动，返回匹配项的下标，没有时返回 None
+
+    活动名称形如“《剧名》xxx推广”：match_drama_name 为真时剧名需完全一致，否则包含即可；
+    指定了剧场（playlet_title_tag）时创建者名称还需包含剧场名。
+    """
+    compare_match_title = match_title.strip()
+    if ignore_punctuation:
+        compare_match_title = remove_punctuation(compare_match_title)
+    for index, activity in enumerate(activities):
+        name = activity['name']
+        if name == '不参与活动':
+            continue
+        book_title = re.search(r'《(.*?)》', name)
+        if not book_title:
+            continue
+        compare_book_content = book_title.group(1).strip()
+        if ignore_punctuation:
+            compare_book_content = remove_punctuation(compare_book_content)
+        if match_drama_name:
+            have_platlet = compare_match_title == compare_book_content
+        else:
+            have_platlet = compare_match_title in compare_book_content
+        if not have_platlet:
+            continue
+        if playlet_title_tag and playlet_title_tag not in (activity['creator'] or ''):
+            continue
+        return index
+    return None
+
+
 def format_str_for_short_title(origin_title: str) -> str:
     # 定义允许的特殊字符
     allowed_special_chars = "《》""+?%°"
@@ -62,6 +105,12 @@ def format_str_for_short_title(origin_title: str) -> str:
 
 
 async def cookie_auth(account_file, local_executable_path=None, un_close=False,proxy_setting=None,camoufox=False,addons_path=None,load_addons=False):
+    if not un_close:
+        # 先用 HTTP 接口探测登录态，能判断时不再启动浏览器
+        verdict = await probe_cookie(2, account_file, proxy_setting=proxy_setting)
+        if verdict is not None:
+            tencent_logger.info(f"[+] cookie 探测结果: {'有效' if verdict else '失效'}")
+            return verdict
     hide_browser = False if un_close else True
     if camoufox:
         camoufox_config = await _get_camoufox_config(SimpleNamespace(info={'addons_path':addons_path if load_addons else None},account_file=account_file,hide_browser=hide_browser,proxy_setting=proxy_setting))
@@ -766,7 +815,66 @@ async def weidaren_refresh_backend_br(account_file, browser):
         await context.close()
 
 
+# 上传状态检测：无事件时的检测周期、进度停滞超时、监听无事件多久后确认监听是否仍然存在（秒）
+UPLOAD_STATUS_TICK = 2
+UPLOAD_PROGRESS_TIMEOUT = 300
+UPLOAD_OBSERVER_IDLE = 30
+
+# 页面内的上传状态监听：DOM 变化后汇总一次状态，状态有变化时通过 __sauUploadStatus 推送给 Python
+UPLOAD_OBSERVER_JS = """() => {
+    if (window.__sauUploadObserver) {
+        window.__sauUploadObserver.disconnect();
+    }
+    let last = null;
+    let timer = null;
+    const visible = el => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+    const snapshot = () => {
+        const buttons = Array.from(document.querySelectorAll('button, [role="button"]'));
+        const publish = buttons.find(b => b.innerText.trim() === '发表') || buttons.find(b => b.innerText.includes('发表'));
+        const progress = document.querySelector('.ant-progress-text');
+        const deleteTag = Array.from(document.querySelectorAll('div.media-status-content div.tag-inner'))
+            .some(el => el.innerText.includes('删除'));
+        return {
+            uploadTips: Array.from(document.querySelectorAll('.upload-tip')).filter(visible).length,
+            progressText: progress ? progress.innerText.trim() : null,
+            checkCircle: !!document.querySelector('i[aria-label="图标: check-circle"]'),
+            publishEnabled: !!publish && !String(publish.className).includes('weui-desktop-btn_disabled'),
+            error: !!document.querySelector('div.status-msg.error') && deleteTag,
+        };
+    };
+    const emit = (force) => {
+        timer = null;
+        const state = snapshot();
+        const key = JSON.stringify(state);
+        if (force === true || key !== last) {
+            last = key;
+            window.__sauUploadStatus(state);
+        }
+        return true;
+    };
+    const observer = new MutationObserver(() => {
+        if (!timer) {
+            timer = setTimeout(emit, 100);
+        }
+    });
+    observer.observe(document.body, {subtree: true, childList: true, attributes: true, characterData: true});
+    window.__sauUploadObserver = observer;
+    window.__sauUploadObserverEmit = emit;
+    emit(true);
+}"""
+
+
 class TencentVideo(object):
+    # 使用浏览器池时的 Chromium 启动参数，与 upload 内自行启动时保持一致
+    launch_args = [
+        '--disable-blink-features=AutomationControlled',
+        '--lang=zh-CN',
+        '--disable-infobars',
+        '--start-fullscreen',
+        '--no-sandbox',
+        '--disable-web-security'
+    ]
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, category=None,
                  local_executable_path=None, info=None, collection=None, declare_original=None, proxy_setting=None, hide_browser=False, thumbnail_path=None):
         self.title = title[:999]  # 视频标题
@@ -784,6 +892,9 @@ class TencentVideo(object):
         self.upload_retry_attempts = 0
         self.max_upload_retries = 3
         self.thumbnail_path = thumbnail_path
+        self.upload_progress = None  # 最近一次上传的进度：percent、bytes、bytes_per_second、elapsed
+        self.upload_metrics = None  # 最近一次上传的网络指标，mode 为 browser / api
+        self._upload_event_queues = {}
 
     async def _check_is_weidaren_login(self) -> bool:
         """检查是否为微达人登录方式
@@ -904,70 +1015,51 @@ class TencentVideo(object):
         search_activity_input = form_item.locator('input[placeholder="搜索活动"]')
         # 使用搜索剧名填充活动搜索框
         await search_activity_input.fill(search_title)
-        # 等待活动列表项出现
+
+        account = index_account(self.account_file)
+        picker_cache = get_picker_cache()
+        ignore_punctuation = anchor_info.get("ignore_punctuation", False)
+        activity_items = form_item.locator('.activity-item-info')
+
+        # 同一账号近期搜索过该剧名时，直接按缓存的活动名称点击，点击失败再重新读取
+        activities = picker_cache.get(account, KIND_ACTIVITY, search_title)
+        if activities is not None:
+            index = match_activity(activities, match_title, playlet_title_tag, match_drama_name, ignore_punctuation)
+            if index is not None:
+                target = activity_items.filter(has_text=activities[index]['name'])
+                if playlet_title_tag:
+                    target = target.filter(has_text=activities[index]['creator'])
+                try:
+                    await target.first.click(timeout=5000)
+                    tencent_logger.info(f"  [视频号上传] {self.file_path} 成功添加活动（缓存）: {activities[index]['name']}")
+                    return
+                except Exception as e:
+                    tencent_logger.warning(f"  [视频号上传] {self.file_path} 按缓存选择活动失败，重新读取活动列表: {str(e)}")
+                    picker_cache.invalidate(account, KIND_ACTIVITY, search_title)
+
+        # 等待活动列表项出现，每次用一次 evaluate 读取全部活动名称和创建者
         start_time = time.time()
         while True:
-            await search_activity_input.fill(search_title)
-            activity_elements = await form_item.locator('.activity-item-info').all()
-            if len(activity_elements) > 1:
+            activities = await form_item.evaluate(ACTIVITY_ITEMS_JS)
+            if len(activities) > 1:
                 break
             if time.time() - start_time > 5:  # 5秒超时
                 raise UpdateError(f"没有找到该短剧任务{search_title}")
             await asyncio.sleep(0.5)
+            # 搜索结果还没出来时重新输入一次触发搜索
+            await search_activity_input.fill(search_title)
+        picker_cache.put(account, KIND_ACTIVITY, activities, search_title)
+        tencent_logger.info(f'  [视频号上传] {self.file_path} 已找到活动：{[item["name"] for item in activities]}--需要匹配活动：{match_title}')
 
-        found = False
-
-        for element in activity_elements:
-            name = await element.locator('.name').text_content()
-            if name == '不参与活动':
-                continue
-            creator_name = await element.locator('.creator-name').text_content()
-            # 去除当前活动标题中的标点符号
-            tencent_logger.info(f'  [视频号上传] {self.file_path} 已找到活动：{name}--需要匹配活动：{match_title}')
-
-            # 提取书名号中的内容和推广前的内容
-            book_title = re.search(r'《(.*?)》', name)
-            promotion_title = re.search(r'》(.*?)推广', name)
-
-            if book_title:
-                book_content = book_title.group(1)
-                promotion_content = promotion_title.group(1).strip()
-                tencent_logger.info(f'  [视频号上传] {self.file_path} 提取的活动名称：书名号内容={book_content}, 推广前内容={promotion_content}')
-
-                # 获取忽略标点设置
-                ignore_punctuation = anchor_info.get("ignore_punctuation", False)
-                
-                # 根据设置决定是否移除标点符号
-                if ignore_punctuation:
-                    compare_match_title = remove_punctuation(match_title.strip())
-                    compare_book_content = remove_punctuation(book_content.strip())
-                    tencent_logger.info(f'  [视频号上传] {self.file_path} 忽略标点对比：[{compare_match_title}] vs [{compare_book_content}]')
-                else:
-                    compare_match_title = match_title.strip()
-                    compare_book_content = book_content.strip()
-
-                if match_drama_name:
-                    have_platlet = compare_match_title == compare_book_content
-                else:
-                    have_platlet = compare_match_title in compare_book_content
-            # else:
-            # have_platlet = False
-            if have_platlet:
-                if playlet_title_tag:
-                    if playlet_title_tag not in creator_name:
-                        continue
-                await element.click()
-                tencent_logger.info(f"  [视频号上传] {self.file_path} 成功添加活动: {match_title}")
-                found = True
-                break
+        index = match_activity(activities, match_title, playlet_title_tag, match_drama_name, ignore_punctuation)
+        if index is not None:
+            await activity_items.nth(index).click()
+            tencent_logger.info(f"  [视频号上传] {self.file_path} 成功添加活动: {match_title}")
+            return
 
-        if not found:
-            if type == 1:
-                raise UpdateError(f"  [视频号上传] {self.file_path} 没有找到 {playlet_title_tag}：剧场的短剧任务：{match_title}")
-            else:
-                random_element = random.choice(activity_elements)
-                if random_element:
-                    random_element.click()
+        if type == 1:
+            raise UpdateError(f"  [视频号上传] {self.file_path} 没有找到 {playlet_title_tag}：剧场的短剧任务：{match_title}")
+        await activity_items.nth(random.randrange(len(activities))).click()
 
     async def upload(self, playwright: Playwright,browser) -> tuple[bool, str]:
         if playwright:
@@ -992,6 +1084,8 @@ class TencentVideo(object):
             storage_state=f"{self.account_file}",
         )
         context = await set_init_script(context,os.path.basename(self.account_file))
+        # 统计视频分片上传的网络指标
+        upload_monitor = UploadNetworkMonitor('tencent', self.file_path).attach(context)
         msg_res = '检测通过，暂未发现异常'
         # 创建一个新的页面
         page = await context.new_page()
@@ -1005,136 +1099,98 @@ class TencentVideo(object):
         upload_count = 1
         if self.info and "video_upload_count" in self.info:
             upload_count = max(1, int(self.info.get("video_upload_count", 1)))  # 确保至少上传1次
-        for i in range(upload_count):
-            tencent_logger.info(f'  [视频号上传] {self.file_path} 正在进行第 {i + 1}/{upload_count} 次上传 -------{self.title}.mp4')
-            # 访问指定的 URL
-            await page.goto("https://channels.weixin.qq.com/platform/post/create")
-            tencent_logger.info(f' [视频号上传] {self.file_path} 正在上传-------{self.title}.mp4')
-            
-            # 检查是否需要重新登录（微达人方式）
-            try:
-                # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-                await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create", timeout=10000)
-            except:
-                # 如果跳转失败，可能是掉线了，检查是否为微达人登录方式
-                is_weidaren = await self._check_is_weidaren_login()
-                if is_weidaren:
-                    tencent_logger.info(f'  [视频号上传] {self.file_path} 检测到微达人登录已掉线，尝试重新登录...')
-                    # 跳转到微达人页面
-                    await page.goto("https://store.weixin.qq.com/talent/channel/finder")
-                    # 等待页面加载
-                    await page.wait_for_selector('text=邀约', timeout=10000)
-                    # 点击"发视频"按钮
-                    await page.click('text=发视频')
-                    tencent_logger.info(f'  [视频号上传] {self.file_path} 已点击发视频按钮，等待跳转...')
-                    # 等待新标签页打开
-                    async with page.expect_popup() as popup_info:
-                        pass
-                    new_page = await popup_info.value
-                    # 等待跳转到发布页面
-                    await new_page.wait_for_url("https://channels.weixin.qq.com/platform/post/create*", timeout=30000)
-                    tencent_logger.info(f'  [视频号上传] {self.file_path} 已重新进入发布页面')
-                    # 关闭旧页面，使用新页面
+        # 流水线模式：定时、合集在视频传输期间填写；多次上传时当前这次填写表单的同时，在新页面开始传输下一次的视频
+        pipeline = bool(self.info and self.info.get('pipeline_upload', False))
+        next_page = None
+        try:
+            for i in range(upload_count):
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 正在进行第 {i + 1}/{upload_count} 次上传 -------{self.title}.mp4')
+                prefetched_page = None
+                if next_page is not None:
+                    # 流水线模式：上一次上传时已在新页面开始传输本次视频
+                    try:
+                        prefetched_page = await next_page
+                    except Exception as e:
+                        tencent_logger.exception(f'  [视频号上传] {self.file_path} 预上传失败，重新上传: {str(e)}')
+                    next_page = None
+                if prefetched_page is not None:
                     await page.close()
-                    page = new_page
+                    page = prefetched_page
+                    await page.bring_to_front()
                 else:
-                    # 不是微达人登录方式，抛出异常
-                    raise
-            
-            # await page.wait_for_selector('input[type="file"]', timeout=10000)
-            file_input = page.locator(pub_config.get('up_file'))
-            await file_input.set_input_files(self.file_path)
-            # 添加商品
-            # await self.add_product(page)
-            if self.info.get("enable_drama", False):
-                if self.info.get("enable_cps", False):
-                    if 1 < upload_count != i + 1 and self.info.get("delete_platform_video", False):
-                        tencent_logger.info('，，，')
-                    else:
-                        await self.add_activity(page)
-                # 添加活动
-                if self.info.get("enable_baobai", False):
-                    await self.add_short_play_by_baobai(page)
-                elif self.info.get("enable_juji", False):
-                    # if 1 < upload_count != i + 1:
-                    #     tencent_logger.info('，，，')
-                    # else:
-                    if 1 < upload_count != i + 1 and self.info.get("delete_platform_video", False):
-                        tencent_logger.info('，，，')
+                    page = await self.open_create_page(page)
+                    file_input = page.locator(pub_config.get('up_file'))
+                    await file_input.set_input_files(self.file_path)
+                if pipeline and i + 1 < upload_count:
+                    next_page = asyncio.ensure_future(self.prefetch_upload(context))
+                # await page.wait_for_selector('input[type="file"]', timeout=10000)
+                # 添加商品
+                # await self.add_product(page)
+                if self.info.get("enable_drama", False):
+                    if self.info.get("enable_cps", False):
+                        if 1 < upload_count != i + 1 and self.info.get("delete_platform_video", False):
+                            tencent_logger.info('，，，')
+                        else:
+                            await self.add_activity(page)
+                    # 添加活动
+                    if self.info.get("enable_baobai", False):
+                        await self.add_short_play_by_baobai(page)
+                    elif self.info.get("enable_juji", False):
+                        # if 1 < upload_count != i + 1:
+                        #     tencent_logger.info('，，，')
+                        # else:
+                        if 1 < upload_count != i + 1 and self.info.get("delete_platform_video", False):
+                            tencent_logger.info('，，，')
+                        else:
+                            await add_short_play_by_juji(self,page,pub_config)
+                else:
+                    tencent_logger.info(f'  [视频号上传] {self.file_path} 未选择挂短剧')
+                try:
+                    await add_original(self, page)
+                except:
+                    tencent_logger.exception(f'  [视频号上传] {self.file_path} 添加原创失败，不影响执行')
+                # 添加自主声明
+                try:
+                    await add_declaration(self, page)
+                except:
+                    tencent_logger.exception(f'  [视频号上传] {self.file_path} 添加自主声明失败，不影响执行')
+                should_delete = self.info and self.info.get("delete_platform_video", False) and (i < upload_count - 1)
+                if should_delete:
+                    random_uuid = str(uuid.uuid4())[:5]
+                    self.title = f"waitdel-{random_uuid} {self.title}"
+                else:
+                    self.title = old_title
+                # 填充标题和话题
+                await self.add_title_tags(page)
+                await self.close_location(page)
+                if pipeline:
+                    await self.fill_schedule_and_collection(page, should_delete)
+                # 检测上传状态
+                await self.detect_upload_status(page)
+                if not pipeline:
+                    await self.fill_schedule_and_collection(page, should_delete)
+                await self.click_publish(page)
+
+                await context.storage_state(path=f"{self.account_file}")  # 保存cookie
+                tencent_logger.success('  [-]cookie更新完毕！')
+
+                # 检查页面是否有错误视频，如果有则删除
+                try:
+                    fail_video_count = await page.locator('.post-processed-fail').count()
+                    if fail_video_count > 0:
+                        tencent_logger.warning(f'[错误视频处理] 发现 {fail_video_count} 个错误视频，准备删除')
+                        await delete_videos_by_conditions(page, page_index=5, only_delete_fail=True, process_interval=self.info.get("violation_process_interval", 0))
+                        tencent_logger.success('[错误视频处理] 错误视频删除完毕')
                     else:
-                        await add_short_play_by_juji(self,page,pub_config)
-            else:
-                tencent_logger.info(f'  [视频号上传] {self.file_path} 未选择挂短剧')
-            try:
-                await add_original(self, page)
-            except:
-                tencent_logger.exception(f'  [视频号上传] {self.file_path} 添加原创失败，不影响执行')
-            # 添加自主声明
-            try:
-                await add_declaration(self, page)
-            except:
-                tencent_logger.exception(f'  [视频号上传] {self.file_path} 添加自主声明失败，不影响执行')
-            should_delete = self.info and self.info.get("delete_platform_video", False) and (i < upload_count - 1)
-            if should_delete:
-                random_uuid = str(uuid.uuid4())[:5]
-                self.title = f"waitdel-{random_uuid} {self.title}"
-            else:
-                self.title = old_title
-            # 填充标题和话题
-            await self.add_title_tags(page)
-            await self.close_location(page)
-            # 检测上传状态
-            await self.detect_upload_status(page)
-            if self.publish_date and self.publish_date != 0 and not should_delete:
-                # 检查是否开启了定时功能
-                # 如果定时时间小于当前时间（已过期），使用当前时间+间隔
-                use_schedule = self.info and self.info.get('use_current_time_schedule', False)
-                if use_schedule:
-                    from datetime import datetime
-                    current_time = datetime.now()
-                    # 只有当定时时间比当前时间小时才调整（说明是过期的定时时间）
-                    if self.publish_date < current_time:
-                        # 获取定时间隔（分钟）
-                        schedule_interval = self.info.get('schedule_interval', '5')
-                        try:
-                            from config_util import parse_schedule_interval
-                            interval_minutes = parse_schedule_interval(schedule_interval)
-                        except:
-                            tencent_logger.warning(f"解析定时间隔失败，使用默认值5分钟")
-                            interval_minutes = 5
-                        
-                        # 计算新的定时时间：当前时间 + 定时间隔
-                        from datetime import timedelta
-                        self.publish_date = current_time + timedelta(minutes=interval_minutes)
-                        tencent_logger.info(f"  [视频号上传] {self.file_path} 定时时间已过期，使用当前时间加上定时间隔 {interval_minutes} 分钟，新定时时间为 {self.publish_date}")
-                
-                await self.set_schedule_time_tencent(page, self.publish_date)
-            # 添加短标题
-            # await self.add_short_title(page)
-            try:
-                # 合集功能
-                await self.add_collection_with_create(page)
-            except:
-                tencent_logger.exception('添加合集失败，不影响执行')
-            await self.click_publish(page)
+                        tencent_logger.info('[错误视频处理] 未发现错误视频')
+                except Exception as e:
+                    tencent_logger.exception(f'[错误视频处理] 检查或删除错误视频时出错: {str(e)}')
 
-            await context.storage_state(path=f"{self.account_file}")  # 保存cookie
-            tencent_logger.success('  [-]cookie更新完毕！')
-            
-            # 检查页面是否有错误视频，如果有则删除
-            try:
-                fail_video_count = await page.locator('.post-processed-fail').count()
-                if fail_video_count > 0:
-                    tencent_logger.warning(f'[错误视频处理] 发现 {fail_video_count} 个错误视频，准备删除')
-                    await delete_videos_by_conditions(page, page_index=5, only_delete_fail=True, process_interval=self.info.get("violation_process_interval", 0))
-                    tencent_logger.success('[错误视频处理] 错误视频删除完毕')
-                else:
-                    tencent_logger.info('[错误视频处理] 未发现错误视频')
-            except Exception as e:
-                tencent_logger.exception(f'[错误视频处理] 检查或删除错误视频时出错: {str(e)}')
-            
-            if should_delete:
-                await self.delete_video(page)
+                if should_delete:
+                    await self.delete_video(page)
+        finally:
+            # 本次循环出错时，下一次的预上传任务和它打开的页面不再使用，取消并关闭
+            await self.discard_prefetch(next_page)
         if not (self.publish_date and self.publish_date != 0):
             if self.info and self.info.get("auto_comment_enabled", False) and self.info.get("auto_comment_text", None) :
                 await add_comment(page,self.info.get("auto_comment_text", None))
@@ -1154,7 +1210,8 @@ class TencentVideo(object):
                     minutes_ago=self.info.get("delete_time_threshold", 1440), 
                     max_views=self.info.get("delete_play_threshold", 100),
                     user_id=user_id,
-                    last_delete_timestamp=last_delete_timestamp))
+                    last_delete_timestamp=last_delete_timestamp,
+                    dry_run=self.info.get("delete_dry_run", False)))
                 tencent_logger.info("[删除流程] API删除任务已在后台启动")
             else:
                 tencent_logger.info("[删除流程] 使用页面操作删除视频")
@@ -1163,36 +1220,19 @@ class TencentVideo(object):
                     max_views=self.info.get("delete_play_threshold", 100),
                     page_index=50,
                     video_title=None,  # 自动删除时不按剧名过滤
-                    process_interval=self.info.get("violation_process_interval", 0))
+                    process_interval=self.info.get("violation_process_interval", 0),
+                    dry_run=self.info.get("delete_dry_run", False))
         
-        # 检查并处理违规视频（异步执行，不阻塞主流程）
-        if self.info and self.info.get("delete_violation", False):
-            try:
-                violation_delete_days = self.info.get("violation_delete_days", 7)
-                violation_delete_views = self.info.get("violation_delete_views", 100)
-                violation_hide_views = self.info.get("violation_hide_views", 1000)
-                user_id = self.info.get("user_id")  # 获取用户ID
-                last_check_timestamp = self.info.get("last_violation_check_timestamp")  # 获取最后检查时间戳
-                
-                tencent_logger.info("[违规处理] 开始后台检查违规视频（不阻塞主流程）")
-                # 创建独立的异步任务，不等待完成
-                asyncio.create_task(check_and_handle_violation(
-                    self.account_file,  # 传递session文件路径
-                    violation_delete_days,
-                    violation_delete_views,
-                    violation_hide_views,
-                    user_id,  # 传递用户ID用于更新数据库
-                    last_check_timestamp  # 传递最后检查时间戳，避免重复查询
-                ))
-                tencent_logger.info("[违规处理] 违规检查任务已在后台启动")
-            except Exception as e:
-                tencent_logger.exception(f"启动违规检查任务时出错: {str(e)}")
+        # 检查并处理违规视频（交给违规巡检服务，不阻塞主流程）
+        self.register_violation_sweep()
 
 
 
+        self.upload_metrics = await upload_monitor.finish()
         # 关闭浏览器上下文和浏览器实例
         try:
-            if playwright and context:
+            # 上下文始终由本方法创建，需要关闭；浏览器只在本方法内启动时才关闭（外部传入的由调用方管理）
+            if context:
                 await context.close()
             if playwright and browser:
                 await browser.close()
@@ -1200,6 +1240,139 @@ class TencentVideo(object):
             tencent_logger.exception(f"关闭浏览器资源时出错: {str(e)}")
         return True, msg_res
 
+    def register_violation_sweep(self):
+        """开启了违规处理时把账号登记到违规巡检服务"""
+        if not (self.info and self.info.get("delete_violation", False)):
+            return
+        try:
+            violation_delete_days = self.info.get("violation_delete_days", 7)
+            violation_delete_views = self.info.get("violation_delete_views", 100)
+            violation_hide_views = self.info.get("violation_hide_views", 1000)
+            user_id = self.info.get("user_id")  # 获取用户ID
+            last_check_timestamp = self.info.get("last_violation_check_timestamp")  # 获取最后检查时间戳
+            
+            # 登记到违规巡检服务，由巡检线程统一调度（同一账号不会重复巡检），不阻塞主流程
+            get_violation_sweeper(pub_config.get('violation_sweep')).register(
+                self.account_file,
+                {
+                    'violation_delete_days': violation_delete_days,
+                    'violation_delete_views': violation_delete_views,
+                    'violation_hide_views': violation_hide_views,
+                    'violation_process_interval': self.info.get("violation_process_interval", 0),
+                    'dry_run': self.info.get("delete_dry_run", False),
+                },
+                user_id=user_id,  # 传递用户ID用于更新数据库
+                last_check_timestamp=last_check_timestamp  # 传递最后检查时间戳，避免重复查询
+            )
+            tencent_logger.info("[违规处理] 已登记到违规巡检服务")
+        except Exception as e:
+            tencent_logger.exception(f"启动违规检查任务时出错: {str(e)}")
+
+    async def open_create_page(self, page):
+        """打开发表页，微达人登录掉线时重新进入，返回可用的页面"""
+        # 访问指定的 URL
+        await page.goto("https://channels.weixin.qq.com/platform/post/create")
+        tencent_logger.info(f' [视频号上传] {self.file_path} 正在上传-------{self.title}.mp4')
+
+        # 检查是否需要重新登录（微达人方式）
+        try:
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create", timeout=10000)
+        except:
+            # 如果跳转失败，可能是掉线了，检查是否为微达人登录方式
+            is_weidaren = await self._check_is_weidaren_login()
+            if is_weidaren:
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 检测到微达人登录已掉线，尝试重新登录...')
+                # 跳转到微达人页面
+                await page.goto("https://store.weixin.qq.com/talent/channel/finder")
+                # 等待页面加载
+                await page.wait_for_selector('text=邀约', timeout=10000)
+                # 点击"发视频"按钮
+                await page.click('text=发视频')
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 已点击发视频按钮，等待跳转...')
+                # 等待新标签页打开
+                async with page.expect_popup() as popup_info:
+                    pass
+                new_page = await popup_info.value
+                # 等待跳转到发布页面
+                await new_page.wait_for_url("https://channels.weixin.qq.com/platform/post/create*", timeout=30000)
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 已重新进入发布页面')
+                # 关闭旧页面，使用新页面
+                await page.close()
+                page = new_page
+            else:
+                # 不是微达人登录方式，抛出异常
+                raise
+        return page
+
+    async def prefetch_upload(self, context):
+        """流水线模式：在新页面打开发表页并开始传输视频，返回该页面；失败或被取消时关闭该页面"""
+        page = await context.new_page()
+        try:
+            screen_size = await page.evaluate("""() => ({
+                width: window.screen.availWidth,
+                height: window.screen.availHeight
+            })""")
+            await page.set_viewport_size(screen_size)
+            page = await self.open_create_page(page)
+            await page.locator(pub_config.get('up_file')).set_input_files(self.file_path)
+        except BaseException:
+            await page.close()
+            raise
+        tencent_logger.info(f'  [视频号上传] {self.file_path} 已在新页面开始预上传')
+        return page
+
+    @staticmethod
+    async def discard_prefetch(task):
+        """取消未使用的预上传任务，已完成的关闭它打开的页面"""
+        if task is None:
+            return
+        task.cancel()
+        try:
+            page = await task
+        except (asyncio.CancelledError, Exception):
+            # 被取消或预上传本身失败，页面已在 prefetch_upload 中关闭
+            return
+        try:
+            await page.close()
+        except Exception:
+            tencent_logger.exception('  [视频号上传] 关闭预上传页面失败')
+
+    async def fill_schedule_and_collection(self, page, should_delete=False):
+        """设置定时发表和合集"""
+        if self.publish_date and self.publish_date != 0 and not should_delete:
+            self.adjust_expired_schedule()
+            await self.set_schedule_time_tencent(page, self.publish_date)
+        # 添加短标题
+        # await self.add_short_title(page)
+        try:
+            # 合集功能
+            await self.add_collection_with_create(page)
+        except:
+            tencent_logger.exception('添加合集失败，不影响执行')
+
+    def adjust_expired_schedule(self):
+        """开启了 use_current_time_schedule 且定时时间已过期时，改为当前时间加定时间隔"""
+        use_schedule = self.info and self.info.get('use_current_time_schedule', False)
+        if use_schedule:
+            from datetime import datetime
+            current_time = datetime.now()
+            # 只有当定时时间比当前时间小时才调整（说明是过期的定时时间）
+            if self.publish_date < current_time:
+                # 获取定时间隔（分钟）
+                schedule_interval = self.info.get('schedule_interval', '5')
+                try:
+                    from config_util import parse_schedule_interval
+                    interval_minutes = parse_schedule_interval(schedule_interval)
+                except:
+                    tencent_logger.warning(f"解析定时间隔失败，使用默认值5分钟")
+                    interval_minutes = 5
+
+                # 计算新的定时时间：当前时间 + 定时间隔
+                from datetime import timedelta
+                self.publish_date = current_time + timedelta(minutes=interval_minutes)
+                tencent_logger.info(f"  [视频号上传] {self.file_path} 定时时间已过期，使用当前时间加上定时间隔 {interval_minutes} 分钟，新定时时间为 {self.publish_date}")
+
     async def close_location(self, page):
         if self.info and not self.info.get('location_enabled', False):
             # 循环尝试10秒
@@ -1328,16 +1501,15 @@ class TencentVideo(object):
             except Exception as e:
                 tencent_logger.exception(f"  [视频号上传] {self.file_path} [删除流程] 删除视频时出错：{str(e)}")
 
-    async def delete_videos_by_api(self, minutes_ago=None, max_views=None, user_id=None, last_delete_timestamp=None):
+    async def delete_videos_by_api(self, minutes_ago=None, max_views=None, user_id=None, last_delete_timestamp=None, dry_run=False):
         """
         使用API接口根据时间间隔和播放量条件删除视频
         :param minutes_ago: 多少分钟之前的视频
         :param max_views: 最大播放量
         :param user_id: 用户ID，用于更新最后删除时间戳
         :param last_delete_timestamp: 最后删除时的视频发布时间戳，避免重复处理
+        :param dry_run: 试运行，只输出删除计划并返回，不执行删除
         """
-        import requests
-        import json
         from datetime import datetime, timedelta
         
         if not minutes_ago and not max_views:
@@ -1349,29 +1521,18 @@ class TencentVideo(object):
         if last_delete_timestamp:
             tencent_logger.info(f"[删除流程-API] 上次删除时的视频时间戳: {last_delete_timestamp} ({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_delete_timestamp))})")
         
+        client = None
         try:
-            # 从session文件读取cookie
-            # ✅ 使用异步文件读取
-            import aiofiles
-            async with aiofiles.open(self.account_file, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                session_data = json.loads(content)
-            
-            cookies_list = session_data.get('cookies', [])
-            sessionid = None
-            wxuin = None
-            for cookie in cookies_list:
-                if cookie['name'] == 'sessionid':
-                    sessionid = cookie['value']
-                elif cookie['name'] == 'wxuin':
-                    wxuin = cookie['value']
-            
-            if not sessionid or not wxuin:
-                tencent_logger.error('[删除流程-API] 无法获取sessionid或wxuin')
-                return
+            # 查询和删除共用同一个客户端（连接池），cookie 只读取一次
+            client = ChannelsApiClient(self.account_file)
+            await client.open()
             
             # 导入删除函数
-            from social_auto_upload.uploader.tencent_uploader.main_tz_violation import delete_violation_video
+            from social_auto_upload.uploader.tencent_uploader.main_tz_violation import delete_violation_video, \
+                replay_deferred_actions
+            
+            # 先执行之前因频率限制排队的删除
+            await replay_deferred_actions(client, "[删除流程-API]")
             
             # 计算时间范围（与页面操作逻辑一致：获取 minutes_ago 分钟前的时间点）
             current_time = datetime.now()
@@ -1382,182 +1543,76 @@ class TencentVideo(object):
             tencent_logger.info(f"[删除流程-API] 截止时间: {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')} (时间戳: {cutoff_timestamp})")
             tencent_logger.info(f"[删除流程-API] 删除条件: 发布时间 <= {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')} 且 播放量 < {max_views}")
             
-            # 查询视频列表
-            url = 'https://channels.weixin.qq.com/micro/statistic/cgi-bin/mmfinderassistant-bin/statistic/post_list'
-
-            headers = {
-                'Accept': '*/*',
-                'Accept-Language': 'zh-CN,zh;q=0.9',
-                'Connection': 'keep-alive',
-                'Content-Type': 'application/json',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/149.0.0.0 Safari/537.36',
-                'X-WECHAT-UIN': wxuin,
-                'Referer': 'https://channels.weixin.qq.com/micro/statistic/post',
-                'Sec-Fetch-Dest': 'empty',
-                'Sec-Fetch-Mode': 'cors',
-                'Sec-Fetch-Site': 'same-origin',
-                'finger-print-device-id': hashlib.md5(sessionid.encode()).hexdigest(),
-                'sec-ch-ua': '"Google Chrome";v="149", "Chromium";v="149", "Not)A;Brand";v="24"',
-                'sec-ch-ua-mobile': '?0',
-                'sec-ch-ua-platform': '"Windows"'
-            }
+            # 先增量同步本地作品索引，再直接按索引判断，不再每次从头翻页请求接口
+            video_index = get_video_index()
+            account = index_account(self.account_file)
+            try:
+                await video_index.sync(client, account, cutoff_timestamp)
+            except Exception as e:
+                tencent_logger.error(f"[删除流程-API] 同步作品索引失败：{str(e)}")
+                return
+            # 上次删除时间戳之前的视频已处理过，直接在查询中排除
+            videos = video_index.records(account, start_time=cutoff_timestamp, newer_than=last_delete_timestamp)
+            tencent_logger.info(f"[删除流程-API] 索引中待检查 {len(videos)} 个视频")
+            
+            # 对整批视频求值删除规则，得到删除计划
+            plan = age_views_rules(minutes_ago, max_views, delete_fail=False, delete_waitdel=False).plan(
+                videos, now=current_time.timestamp())
+            plan.log(tencent_logger, "[删除流程-API]", dry_run=dry_run)
+            if dry_run:
+                return plan
             
-            cookies = {'sessionid': sessionid, 'wxuin': wxuin}
-            # 禁用SSL警告
-            import warnings
-            from urllib3.exceptions import InsecureRequestWarning
-            warnings.filterwarnings('ignore', category=InsecureRequestWarning)
-
-            session = requests.Session()
-
-            # 分页查询视频
-            page_size = 20
-            current_page = 1
             delete_success_count = 0
             delete_fail_count = 0
             skip_count = 0  # ✅ 添加跳过计数
             rate_limited = False  # ✅ 添加频率限制标志位
-            first_video_timestamp = None  # ✅ 记录第一页第一条视频的时间戳
+            first_video_timestamp = videos[0]['create_time'] if videos else None  # ✅ 记录最新一条视频的时间戳
             last_successful_timestamp = None  # ✅ 记录最后一次成功处理的视频时间戳
             
-            while True:
-                data = {
-                    'pageSize': page_size,
-                    'currentPage': current_page,
-                    'sort': 0,  # 使用当前排序字段
-                    'order': 0,  # 使用当前排序方向
-                    'startTime': cutoff_timestamp,
-                    'endTime': int(current_time.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()),
-                    'timestamp': str(int(time.time() * 1000)),
-                    '_log_finder_uin': '',
-                    '_log_finder_id': '',
-                    'rawKeyBuff': '',
-                    'pluginSessionId': None,
-                    'scene': 7,
-                    'reqScene': 7
-                }
-                print(data)
-                # ✅ 使用 asyncio.to_thread 将同步请求转移到线程池
-                response = await asyncio.to_thread(
-                    session.post, url, headers=headers, cookies=cookies, json=data, timeout=30, verify=False
-                )
+            limiter = get_rate_limiter()
+            for item in plan.actions(ACTION_DELETE):
+                video = item['record']
+                create_time = video['create_time']
+                export_id = video['export_id']
                 
-                if response.status_code not in [200, 201]:
-                    tencent_logger.error(f"[删除流程-API] 查询视频列表失败（第{current_page}页），状态码：{response.status_code}")
-                    break
-                
-                result = response.json()
-                
-                if result.get('errCode') != 0:
-                    tencent_logger.error(f"[删除流程-API] 视频列表API返回错误：{result.get('errMsg')}")
-                    break
-                
-                data_obj = result.get('data', {})
-                video_list = data_obj.get('list', [])
-                total_count = data_obj.get('totalCount', 0)
-                
-                if not video_list:
-                    tencent_logger.info(f"[删除流程-API] 第{current_page}页无数据，查询完成")
-                    break
-                
-                tencent_logger.info(f"[删除流程-API] 第{current_page}页: 获取 {len(video_list)} 个视频")
+                # ✅ 已遇到删除频率限制：加入队列，额度重置后继续删除
+                if rate_limited:
+                    limiter.defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': video['object_id']})
+                    skip_count += 1
+                    continue
                 
-                # ✅ 记录本页第一条视频的发布时间（用于更新时间戳）
-                # 如果是第一页且还没有记录，则记录第一条
-                if current_page == 1 and video_list and first_video_timestamp is None:
-                    first_video_timestamp = video_list[0].get('createTime', 0)
+                # 立即执行删除，请求间隔由限流器控制
+                success,errmsg = await delete_violation_video(export_id, client=client)
                 
-                # 检查符合条件的视频并立即删除
-                should_continue = False
-                stop_pagination = False
+                # 使用配置的处理间隔
+                process_interval = self.info.get("violation_process_interval", 0)
+                if process_interval > 0:
+                    tencent_logger.info(f"[删除流程-API] 等待处理间隔 {process_interval} 秒...")
+                    await asyncio.sleep(process_interval)
                 
-                for video in video_list:
-                    create_time = video.get('createTime', 0)
-                    read_count = video.get('readCount', 0)
-                    export_id = video.get('exportId', '')
-                    object_id = video.get('objectId', '')
-
-                    # 如果有上次删除时间戳，遇到更早或相等的视频就停止
-                    if last_delete_timestamp and create_time <= last_delete_timestamp:
-                        tencent_logger.info(f"[删除流程-API] 遇到已处理的视频（发布时间：{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(create_time))}），停止检查")
-                        stop_pagination = True
-                        break
-                    
-                    # 计算时间差（分钟）
-                    video_time = datetime.fromtimestamp(create_time)
-                    time_diff = (current_time - video_time).total_seconds() / 60
-                    
-                    # 记录详细的比对信息
-                    tencent_logger.info(f"[删除流程-API] 视频信息比对:")
-                    tencent_logger.info(f"[删除流程-API] - ObjectID: {object_id}")
-                    tencent_logger.info(f"[删除流程-API] - 发布时间: {video_time.strftime('%Y年%m月%d日 %H:%M')} ({time_diff:.0f}分钟前)")
-                    tencent_logger.info(f"[删除流程-API] - 播放量: {read_count}")
-                    tencent_logger.info(f"[删除流程-API] - 条件比对: 时间>={minutes_ago}分钟 且 播放量<{max_views}")
-                    tencent_logger.info(f"[删除流程-API] - 实际数据: {time_diff:.0f}>={minutes_ago} 且 {read_count}<{max_views}")
-                    
-                    # 检查是否符合删除条件（与页面操作逻辑一致）
-                    if minutes_ago is not None and time_diff >= minutes_ago and max_views is not None and read_count < max_views:
-                        tencent_logger.info(f"[删除流程-API] => 符合删除条件")
-                        
-                        # ✅ 检查是否已经遇到删除频率限制
-                        if rate_limited:
-                            tencent_logger.warning(f"[删除流程-API] ⚠️ 已遇到删除频率限制，跳过删除操作")
-                            skip_count += 1
-                        else:
-                            # 立即执行删除
-                            success,errmsg = await delete_violation_video(export_id, self.account_file, sessionid, wxuin)
-                            
-                            # 使用配置的处理间隔
-                            process_interval = self.info.get("violation_process_interval", 0)
-                            if process_interval > 0:
-                                tencent_logger.info(f"[删除流程-API] 等待处理间隔 {process_interval} 秒...")
-                                await asyncio.sleep(process_interval)
-                            else:
-                                await asyncio.sleep(1.5)  # 默认间隔，避免请求过快
-                            
-                            if success:
-                                delete_success_count += 1
-                                # ✅ 记录最后一次成功处理的视频时间戳
-                                last_successful_timestamp = create_time
-                                tencent_logger.info(f"[删除流程-API] ✅ 删除成功 (已删除: {delete_success_count})")
-                            else:
-                                # 检查是否是删除频率限制
-                                if errmsg == '暂无法删除，你今日删除太频繁，如需继续操作可登录管理员账号重试':
-                                    tencent_logger.error(f"[删除流程-API] ⚠️ 遇到删除频率限制，后续不再执行删除操作")
-                                    rate_limited = True  # ✅ 设置标志位
-                                    # ✅ 保存出问题的视频时间戳（而不是第一条视频的时间戳）
-                                    last_successful_timestamp = create_time
-                                    skip_count += 1
-                                    # ✅ 不再 return，继续处理列表
-                                else:
-                                    delete_fail_count += 1
-                                    tencent_logger.error(f"[删除流程-API] ❌ 删除失败 (失败: {delete_fail_count}): {errmsg}")
-                        
-                        should_continue = True
+                if success:
+                    delete_success_count += 1
+                    video_index.mark(account, export_id, status=STATUS_DELETED)
+                    # ✅ 记录最后一次成功处理的视频时间戳
+                    last_successful_timestamp = create_time
+                    tencent_logger.info(f"[删除流程-API] ✅ 删除成功 (已删除: {delete_success_count})")
+                else:
+                    # 检查是否是删除频率限制
+                    if errmsg == DELETE_RATE_LIMIT_MSG:
+                        tencent_logger.error(f"[删除流程-API] ⚠️ 遇到删除频率限制，剩余删除加入队列，额度重置后继续")
+                        rate_limited = True  # ✅ 设置标志位
+                        # ✅ 保存出问题的视频时间戳（而不是第一条视频的时间戳），更早的视频已在队列中
+                        last_successful_timestamp = create_time
+                        limiter.defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': video['object_id']})
+                        skip_count += 1
+                        # ✅ 不再 return，继续处理列表
                     else:
-                        tencent_logger.info(f"[删除流程-API] => 不符合删除条件")
-                
-                # 如果遇到了已处理的视频，停止翻页
-                if stop_pagination:
-                    tencent_logger.info(f"[删除流程-API] 已到达上次处理的时间节点，停止翻页")
-                    break
-                
-                # 如果没有找到符合条件的视频且已检查完本页，检查是否需要翻页
-                if not should_continue and len(video_list) >= page_size:
-                    # 继续翻页查找
-                    pass
-                elif len(video_list) < page_size:
-                    # 已到最后一页
-                    tencent_logger.info(f"[删除流程-API] 已到最后一页，处理完成")
-                    break
-                
-                current_page += 1
-                # ✅ 使用 asyncio.sleep 替代 time.sleep
-                await asyncio.sleep(0.5)
+                        delete_fail_count += 1
+                        tencent_logger.error(f"[删除流程-API] ❌ 删除失败 (失败: {delete_fail_count}): {errmsg}")
             
             # ✅ 输出最终统计（包含跳过的）
             if rate_limited:
-                tencent_logger.info(f"[删除流程-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个，跳过 {skip_count} 个（遇到频率限制）")
+                tencent_logger.info(f"[删除流程-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个，排队 {skip_count} 个（遇到频率限制，额度重置后自动执行）")
             else:
                 tencent_logger.info(f"[删除流程-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个")
             
@@ -1572,14 +1627,18 @@ class TencentVideo(object):
                     
                     db_manager = get_db_manager()
                     
-                    # 更新最后删除时的视频时间戳
-                    db_manager.update_user(user_id, {'last_delete_video_timestamp': timestamp_to_save})
+                    # 更新最后删除时的视频时间戳（同步数据库调用，放到线程池执行）
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, db_manager.update_user, user_id, {'last_delete_video_timestamp': timestamp_to_save})
                     tencent_logger.info(f"[删除流程-API] ✅ 已更新最后删除视频时间戳: {timestamp_to_save} ({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp_to_save))})")
                 except Exception as e:
                     tencent_logger.warning(f"[删除流程-API] 更新最后删除时间戳失败: {str(e)}")
             
         except Exception as e:
             tencent_logger.exception(f"[删除流程-API] 删除视频时出错：{str(e)}")
+        finally:
+            if client is not None:
+                await client.close()
 
     async def add_short_play_by_baobai(self, page,idx=1,need_click =True):
         # 等待并点击"选择链接"按钮
@@ -1797,7 +1856,142 @@ class TencentVideo(object):
                     tencent_logger.info(f"  [视频号上传] {self.file_path} 视频正在发布中...")
                     await asyncio.sleep(0.5)
 
+    async def _install_upload_observer(self, page):
+        """在页面内注入上传状态监听，返回接收状态事件的队列"""
+        queue = self._upload_event_queues.get(page)
+        if queue is None:
+            queue = asyncio.Queue()
+            # 同一个页面只能注册一次 binding，多次上传复用同一个队列
+            await page.expose_binding('__sauUploadStatus', lambda source, state: queue.put_nowait(state))
+            self._upload_event_queues[page] = queue
+        while not queue.empty():
+            queue.get_nowait()
+        await page.evaluate(UPLOAD_OBSERVER_JS)
+        return queue
+
+    def _update_upload_progress(self, progress_text, started_at, file_size):
+        match = re.search(r'(\d+(?:\.\d+)?)\s*%', progress_text or '')
+        if not match:
+            return None
+        percent = min(100.0, float(match.group(1)))
+        elapsed = max(time.time() - started_at, 0.001)
+        sent = int(file_size * percent / 100)
+        self.upload_progress = {
+            'percent': percent,
+            'bytes': sent,
+            'bytes_per_second': int(sent / elapsed),
+            'elapsed': round(elapsed, 1),
+        }
+        return self.upload_progress
+
     async def detect_upload_status(self, page):
+        """等待视频上传完成
+
+        页面内的 MutationObserver 在上传提示、进度、发表按钮、错误标签变化时推送状态，
+        Python 侧只在收到事件或每 UPLOAD_STATUS_TICK 秒检查一次超时，不再反复查询 DOM；注入失败时退回轮询检测。
+        """
+        try:
+            queue = await self._install_upload_observer(page)
+        except Exception as e:
+            if 'Target page, context or browser has been closed' in str(e):
+                raise e
+            tencent_logger.warning(f"  [视频号上传] {self.file_path} 注入上传状态监听失败，改为轮询检测: {str(e)}")
+            return await self._detect_upload_status_polling(page)
+
+        file_size = os.path.getsize(self.file_path) if os.path.exists(self.file_path) else 0
+        started_at = time.time()
+        last_event_time = started_at
+        state = None
+        tip_count_base = 0  # 之前几次 upload-tip 出现累计的次数
+        tip_visible_since = None
+        upload_tip_count = 0
+        last_progress_text = None
+        progress_unchanged_start = None
+        last_logged_step = -1
+        error_handled = False
+
+        while True:
+            try:
+                state = await asyncio.wait_for(queue.get(), timeout=UPLOAD_STATUS_TICK)
+                last_event_time = time.time()
+            except asyncio.TimeoutError:
+                if time.time() - last_event_time >= UPLOAD_OBSERVER_IDLE:
+                    # 长时间没有事件时确认监听仍然存在（页面刷新后需要重新注入）
+                    try:
+                        alive = await page.evaluate(
+                            "() => !!(window.__sauUploadObserverEmit && window.__sauUploadObserverEmit(true))")
+                        if not alive:
+                            tencent_logger.info(f"  [视频号上传] {self.file_path} 上传状态监听已失效，重新注入")
+                            await page.evaluate(UPLOAD_OBSERVER_JS)
+                    except Exception as e:
+                        if 'Target page, context or browser has been closed' in str(e):
+                            raise e
+                        tencent_logger.info(f"  [视频号上传] {self.file_path} 正在上传视频中...")
+                    last_event_time = time.time()
+            if state is None:
+                continue
+            now = time.time()
+
+            # upload-tip 出现计一次，持续显示时每个检测周期再计一次，累计三次视为解析失败
+            if state['uploadTips'] > 0:
+                if tip_visible_since is None:
+                    tip_visible_since = now
+                current_count = tip_count_base + 1 + int((now - tip_visible_since) // UPLOAD_STATUS_TICK)
+                if current_count > upload_tip_count:
+                    upload_tip_count = current_count
+                    tencent_logger.warning(f"  [视频号上传] {self.file_path} 检测到upload-tip标签（第{upload_tip_count}次）")
+                if upload_tip_count >= 3:
+                    msg = f"  [视频号上传] {self.file_path} 上传视频解析失败，请检查视频"
+                    tencent_logger.error(msg)
+                    raise UpdateError(msg)
+            elif tip_visible_since is not None:
+                tip_count_base = upload_tip_count
+                tip_visible_since = None
+
+            # 进度停滞检测
+            current_progress_text = state['progressText']
+            if current_progress_text is not None:
+                progress = self._update_upload_progress(current_progress_text, started_at, file_size)
+                if progress and int(progress['percent'] // 10) > last_logged_step:
+                    last_logged_step = int(progress['percent'] // 10)
+                    tencent_logger.info(
+                        f"  [视频号上传] {self.file_path} 上传进度 {progress['percent']:.0f}%，"
+                        f"速度 {progress['bytes_per_second'] / 1024 / 1024:.2f} MB/s")
+                if last_progress_text is None or (current_progress_text != last_progress_text and not state['checkCircle']):
+                    last_progress_text = current_progress_text
+                    progress_unchanged_start = now
+                elif now - progress_unchanged_start >= UPLOAD_PROGRESS_TIMEOUT:
+                    if state['checkCircle']:
+                        msg = f"  [视频号上传] {self.file_path} 上传已完成但5分钟无响应，可能异常"
+                    else:
+                        msg = f"  [视频号上传] {self.file_path} 上传进度已经5分钟没有变动（{current_progress_text}），可能异常"
+                    tencent_logger.error(msg)
+                    raise UpdateError(msg)
+
+            # 发表按钮可用，代表视频上传完毕
+            if state['publishEnabled']:
+                elapsed = now - started_at
+                tencent_logger.info(
+                    f"  [视频号上传] {self.file_path} 视频上传完毕，耗时 {elapsed:.1f} 秒，"
+                    f"平均速度 {file_size / max(elapsed, 0.001) / 1024 / 1024:.2f} MB/s")
+                self.upload_progress = {
+                    'percent': 100.0,
+                    'bytes': file_size,
+                    'bytes_per_second': int(file_size / max(elapsed, 0.001)),
+                    'elapsed': round(elapsed, 1),
+                }
+                break
+
+            # 视频出错，每次出错只重试一次，等待新的状态
+            if state['error']:
+                if not error_handled:
+                    error_handled = True
+                    tencent_logger.error(f"  [视频号上传] {self.file_path} 发现上传出错了...准备重试")
+                    await self.handle_upload_error(page)
+            else:
+                error_handled = False
+
+    async def _detect_upload_status_polling(self, page):
         upload_tip_count = 0  # 记录upload-tip标签出现的次数
         last_progress_text = None  # 上次进度文本
         progress_unchanged_start = None  # 进度未变化的起始时间
@@ -1885,6 +2079,14 @@ class TencentVideo(object):
         tencent_logger.info(f"  [视频号上传] {self.file_path} 成功添加hashtag: {len(self.tags)}")
 
     async def create_collection(self, page):
+        try:
+            await self._create_collection(page)
+        finally:
+            # 创建完成（或标题重复、创建失败）后缓存的合集列表失效：创建前缓存的完整列表中没有新合集，
+            # 在有效期内继续使用会让后续上传判断合集不存在而重复创建
+            get_picker_cache().invalidate(index_account(self.account_file), KIND_COLLECTION)
+
+    async def _create_collection(self, page):
         await page.get_by_text("创建新合集").click()
 
         # 等待输入框出现并可见
@@ -2004,13 +2206,24 @@ class TencentVideo(object):
             await page.wait_for_selector('.option-list-wrap', state="visible", timeout=5000)
         except:
             pass
+        container = page.locator('div.common-option-list-wrap.option-list-wrap')
+
+        # 缓存的完整合集列表中没有该合集时不再翻找，直接交给调用方创建
+        account = index_account(self.account_file)
+        picker_cache = get_picker_cache()
+        cached = picker_cache.collections(account)
+        if cached is not None and self.collection not in cached:
+            tencent_logger.info(f'  [视频号上传] {self.file_path} 合集列表（缓存）中没有合集: {self.collection}')
+            return False
 
         # 等待合集列表加载完成
         start_time = time.time()
         while True:
-            collection_elements = await page.locator('.option-list-wrap').locator(
-                '.option-item .item:not(:has-text("创建新合集"))').all()
-            if len(collection_elements) > 0:
+            try:
+                names = await container.evaluate(COLLECTION_NAMES_JS)
+            except Exception:
+                names = []
+            if len(names) > 0:
                 break
             if time.time() - start_time > 5:  # 5秒超时
                 tencent_logger.warning(f"  [视频号上传] {self.file_path} 等待合集列表加载超时")
@@ -2020,98 +2233,70 @@ class TencentVideo(object):
         found = False
         last_count = 0
 
-        while not found:
-            # 获取当前所有合集元素
-            collection_elements = await page.locator('.option-list-wrap').locator(
-                '.option-item .item:not(:has-text("创建新合集"))').all()
-            current_count = len(collection_elements)
-            tencent_logger.info(f'  [视频号上传] {self.file_path} 当前找到 {current_count} 个合集')
+        while True:
+            # 一次 evaluate 读取当前全部合集并尝试选择，没找到时在页面内滚动加载更多
+            try:
+                result = await container.evaluate(SELECT_COLLECTION_JS, self.collection)
+            except Exception as e:
+                tencent_logger.exception(f'  [视频号上传] {self.file_path} 选择合集出错: {str(e)}')
+                break
+            current_count = len(result['names'])
+            if result['found']:
+                tencent_logger.info(f"  [视频号上传] {self.file_path} 成功选择合集: {self.collection}（已加载 {current_count} 个合集）")
+                found = True
+                break
 
             # 如果数量没有增加,说明已经到底了
             if current_count == last_count:
-                tencent_logger.info(f'  [视频号上传] {self.file_path} 合集数量未增加，可能已到底部')
-                break
-
-            # 查找匹配的合集
-            for element in collection_elements:
-                text = await element.locator('.name').text_content()
-                tencent_logger.info(f'  [视频号上传] {self.file_path} 找到合集：{text} 需要选择合集：{self.collection}')
-                if text.strip() == self.collection:
-                    # 使用JavaScript来执行点击操作
-                    await element.evaluate('el => el.click()')
-                    tencent_logger.info(f"  [视频号上传] {self.file_path} 成功选择合集: {self.collection}")
-                    found = True
-                    break
-
-            if found:
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 共 {current_count} 个合集，没有合集: {self.collection}')
+                picker_cache.put(account, KIND_COLLECTION, result['names'])
                 break
-
-            # 记录当前数量
             last_count = current_count
 
-            try:
-                # 使用Playwright定位器找到滚动容器
-                scroll_container = page.locator('div.common-option-list-wrap.option-list-wrap')
-                if await scroll_container.count() > 0:
-                    # 获取滚动容器的位置和尺寸
-                    box = await scroll_container.bounding_box()
-                    if box:
-                        tencent_logger.info(f'  [视频号上传] {self.file_path} 找到滚动容器，位置: {box}')
-                        # 先滚动到底部
-                        await page.evaluate('''(container) => {
-                            if (container) {
-                                const prevHeight = container.scrollHeight;
-                                container.scrollTop = prevHeight;
-                                return { success: true, prevHeight: prevHeight };
-                            }
-                            return { success: false };
-                        }''', await scroll_container.element_handle())
-                        tencent_logger.info('  [视频号上传] {self.file_path} 已执行滚动到底部操作')
-
-                        # 等待一下让内容加载
-                        await asyncio.sleep(0.5)
-
-                        # 先向上滚动一段距离
-                        await page.evaluate('''(container) => {
-                            if (container) {
-                                const currentScrollTop = container.scrollTop;
-                                container.scrollTop = Math.max(0, currentScrollTop - container.clientHeight / 3);
-                                return { success: true, scrolledTo: container.scrollTop };
-                            }
-                            return { success: false };
-                        }''', await scroll_container.element_handle())
-                        # 再次等待
-                        await asyncio.sleep(0.3)
-
-                        # 再次滚动到底部以触发更新
-                        await page.evaluate('''(container) => {
-                            if (container) {
-                                const prevHeight = container.scrollHeight;
-                                container.scrollTop = prevHeight;
-                                return {
-                                    success: true,
-                                    prevHeight: prevHeight,
-                                    newScrollTop: container.scrollTop,
-                                    clientHeight: container.clientHeight,
-                                    scrollHeight: container.scrollHeight
-                                };
-                            }
-                            return { success: false };
-                        }''', await scroll_container.element_handle())
-                    else:
-                        tencent_logger.warning(f'  [视频号上传] {self.file_path} 找到滚动容器但无法获取位置信息')
-                else:
-                    tencent_logger.warning(f'  [视频号上传] {self.file_path} 未找到滚动容器')
-            except Exception as e:
-                tencent_logger.exception(f'  [视频号上传] {self.file_path} 滚动操作出错: {str(e)}')
-
             # 等待新内容加载
             await asyncio.sleep(1)
 
         return found
 
+    def api_unsupported_options(self):
+        """接口上传不支持的发布选项（需要在页面上操作），返回选项名列表，为空时才可以走接口上传"""
+        info = self.info or {}
+        declaration = info.get('declaration', '')
+        options = {
+            'enable_drama': info.get('enable_drama', False),
+            'video_upload_count': int(info.get('video_upload_count', 1)) > 1,
+            'delete_platform_video': info.get('delete_platform_video', False),
+            'collection': self.collection,
+            'declare_original': self.declare_original,
+            'declaration': declaration not in ('', '不声明', '无需标注'),
+            'location_enabled': info.get('location_enabled', False),
+            'auto_comment_enabled': info.get('auto_comment_enabled', False) and info.get('auto_comment_text'),
+            'delete_after_play': info.get('delete_after_play', False),
+        }
+        return [name for name, enabled in options.items() if enabled]
+
+    async def upload_by_api(self):
+        """接口上传：视频直接分片上传到视频号，不打开浏览器"""
+        if self.publish_date and self.publish_date != 0:
+            self.adjust_expired_schedule()
+        uploader = ChannelsApiUploader(self.account_file, self.proxy_setting, pub_config.get('api_upload'))
+        await uploader.publish(self.file_path, self.title, self.tags, self.publish_date or None, self.thumbnail_path)
+        self.upload_metrics = uploader.metrics
+        tencent_logger.success(f'  [视频号上传] {self.file_path} 接口上传发表成功')
+        # 违规巡检只登记账号，不依赖页面
+        self.register_violation_sweep()
+        return True, '检测通过，暂未发现异常'
 
     async def main(self):
+        if self.info and self.info.get('upload_mode') == 'api':
+            unsupported = self.api_unsupported_options()
+            if unsupported:
+                tencent_logger.info(f'  [视频号上传] {self.file_path} 发布选项 {", ".join(unsupported)} 需要页面操作，使用浏览器上传')
+            else:
+                try:
+                    return await self.upload_by_api()
+                except Exception as e:
+                    tencent_logger.exception(f'  [视频号上传] {self.file_path} 接口上传失败，改用浏览器上传: {str(e)}')
         return await dispatch_upload(self)
 
 # def normalize_post_time(post_time: str) -> str:
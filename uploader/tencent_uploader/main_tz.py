@@ -2,12 +2,14 @@
 import asyncio
 import os
 import time
-import json
-import hashlib
 from datetime import datetime
 
 from patchright.async_api import async_playwright
+from social_auto_upload.uploader.tencent_uploader.channels_api import ChannelsApiClient, ChannelsApiError, \
+    DELETE_RATE_LIMIT_MSG, ENDPOINT_DELETE
+from social_auto_upload.uploader.tencent_uploader.video_rules import age_views_rules, ACTION_DELETE
 from social_auto_upload.utils.log import tencent_logger
+from social_auto_upload.utils.rate_limiter import get_rate_limiter
 
 from social_auto_upload.utils.base_social_media import set_init_script
 
@@ -37,7 +39,28 @@ async def delete_video(local_executable_path, account_file, minutes_ago, max_vie
         await browser.close()
 
 
-async def delete_videos_by_conditions(page, minutes_ago=None, max_views=None,page_index=0,video_title=None,only_delete_fail=False,process_interval=0):
+async def read_feed_item(item):
+    """读取作品列表中一个作品的发布时间、播放量、标题和是否处理失败，生成规则求值用的记录"""
+    record = {'create_time': None, 'read_count': None, 'title': '', 'processed_fail': False}
+    post_time_element = item.locator('.post-time .time-label')
+    if await post_time_element.count() > 0:
+        post_time_str = await post_time_element.text_content()
+        post_time = datetime.strptime(post_time_str.replace('仅自己可见', ''), '%Y年%m月%d日 %H:%M')
+        record['create_time'] = int(post_time.timestamp())
+        views_element = item.locator('.weui-icon-outlined-eyes-on').locator('..').locator('.count')
+        record['read_count'] = parse_view_count(await views_element.text_content())
+        try:
+            if await item.locator('.post-title').count() > 0:
+                record['title'] = await item.locator('.post-title').text_content() or ''
+        except Exception as e:
+            tencent_logger.error(f"[删除流程] 获取视频标题时出错: {str(e)}")
+    else:
+        # 没有发布时间的作品才检查是否处理失败
+        record['processed_fail'] = await item.locator('.post-processed-fail').count() > 0
+    return record
+
+
+async def delete_videos_by_conditions(page, minutes_ago=None, max_views=None,page_index=0,video_title=None,only_delete_fail=False,process_interval=0,dry_run=False):
     """
     根据时间间隔和播放量条件删除视频
     :param page: 页面对象
@@ -47,11 +70,16 @@ async def delete_videos_by_conditions(page, minutes_ago=None, max_views=None,pag
     :param video_title: 视频标题前缀匹配
     :param only_delete_fail: 仅删除错误视频（.post-processed-fail）
     :param process_interval: 处理间隔（秒）
+    :param dry_run: 试运行，只输出符合条件的视频，不执行删除
     :return:
     """
     if not only_delete_fail and not minutes_ago and not max_views:
         tencent_logger.info("[删除流程] 未设置删除条件，跳过删除")
         return
+    if only_delete_fail:
+        rules = age_views_rules(None, None, delete_waitdel=False)
+    else:
+        rules = age_views_rules(minutes_ago, max_views, title_keyword=video_title)
     await page.goto('https://channels.weixin.qq.com/platform/post/list')
     if only_delete_fail:
         tencent_logger.info(f"[删除流程] 开始删除错误视频（仅删除 .post-processed-fail）")
@@ -103,73 +131,14 @@ async def delete_videos_by_conditions(page, minutes_ago=None, max_views=None,pag
             while current_index < len(feed_items):
                 try:
                     item = feed_items[current_index]
-                    should_delete = False
-                    
-                    # 如果只删除错误视频，直接检查是否有 .post-processed-fail 元素
-                    if only_delete_fail:
-                        fail_video = await item.locator('.post-processed-fail').count()
-                        if fail_video > 0:
-                            should_delete = True
-                            tencent_logger.info(f"[删除流程] => 找到错误视频，符合删除条件")
-                    else:
-                        # 原有的删除逻辑
-                        # 获取发布时间
-                        post_time_element = item.locator('.post-time .time-label')
-                        if await post_time_element.count() > 0:
-                            post_time_str = await post_time_element.text_content()
-                            # 解析发布时间
-                            post_time = datetime.strptime(post_time_str.replace('仅自己可见', ''), '%Y年%m月%d日 %H:%M')
-                            current_time = datetime.now()
-                            time_diff = (current_time - post_time).total_seconds() / 60  # 转换为分钟
-
-                            # 获取播放量
-                            views_element = item.locator('.weui-icon-outlined-eyes-on').locator('..').locator('.count')
-                            views_count = await views_element.text_content()
-                            views_count = parse_view_count(views_count)
-                            
-                            # 获取视频标题用于日志和比对
-                            try:
-                                if await item.locator('.post-title').count()>0:
-                                    title = await item.locator('.post-title').text_content()
-                                else:
-                                    title = ''
-                            except Exception as e:
-                                tencent_logger.error(f"[删除流程] 获取视频标题时出错: {str(e)}")
-                                title = ''
-                            
-                            # 记录详细的比对信息
-                            tencent_logger.info(f"[删除流程] 视频信息比对:")
-                            tencent_logger.info(f"[删除流程] - 标题: {title}")
-                            tencent_logger.info(f"[删除流程] - 发布时间: {post_time_str} ({time_diff:.0f}分钟前)")
-                            tencent_logger.info(f"[删除流程] - 播放量: {views_count}")
-                            
-                            # 检查剧名是否匹配（如果设置了剧名）
-                            drama_name_match = True
-                            if video_title:
-                                drama_name_match = (video_title in title) if title else False
-                                tencent_logger.info(f"[删除流程] - 剧名匹配: {drama_name_match} (标题包含'{video_title}')")
-                            
-                            tencent_logger.info(f"[删除流程] - 条件比对: 时间>={minutes_ago}分钟 且 播放量<{max_views}")
-                            tencent_logger.info(f"[删除流程] - 实际数据: {time_diff:.0f}>={minutes_ago} 且 {views_count}<{max_views}")
-                            
-                            # 检查是否满足删除条件
-                            if drama_name_match and minutes_ago is not None and time_diff >= minutes_ago and max_views is not None and views_count < max_views:
-                                should_delete = True
-                                tencent_logger.info(f"[删除流程] => 符合删除条件")
-                            else:
-                                tencent_logger.info(f"[删除流程] => 不符合删除条件")
-                            
-                            # 特殊处理：以 waitdel- 开头的视频直接删除
-                            if title and title.startswith('waitdel-'):
-                                should_delete = True
-                                tencent_logger.info(f"[删除流程] => waitdel-视频符合删除条件")
-                        else:
-                            fail_video = await item.locator('.post-processed-fail').count()
-                            if fail_video > 0:
-                                should_delete = True
-                                tencent_logger.info(f"[删除流程] => 错误视频符合删除条件")
-                    
-                    if should_delete:
+                    record = await read_feed_item(item)
+                    decision = rules.plan([record]).items[0]
+                    if decision['action'] == ACTION_DELETE:
+                        tencent_logger.info(f"[删除流程] => {record['title'][:30]} 符合删除条件：{decision['reason']}")
+                        if dry_run:
+                            # 试运行只记录，不执行删除
+                            current_index += 1
+                            continue
                         # 执行删除
                         delete_button = item.locator('text=删除')
                         if await delete_button.count() > 0:
@@ -503,9 +472,6 @@ async def delete_videos_by_search_api(account_file, minutes_ago, max_views, vide
     :param video_title: 视频标题匹配（剧名），如果为None则不按剧名过滤
     :param process_interval: 处理间隔（秒）
     """
-    import requests
-    import aiofiles
-    
     if not minutes_ago and not max_views:
         tencent_logger.info("[手动删除-API] 未设置删除条件，跳过删除")
         return
@@ -517,59 +483,17 @@ async def delete_videos_by_search_api(account_file, minutes_ago, max_views, vide
     
     tencent_logger.info(f"[手动删除-API] 处理间隔: {process_interval}秒")
     
+    client = None
     try:
-        # 从session文件读取cookie
-        async with aiofiles.open(account_file, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            session_data = json.loads(content)
-        
-        cookies_list = session_data.get('cookies', [])
-        sessionid = None
-        wxuin = None
-        for cookie in cookies_list:
-            if cookie['name'] == 'sessionid':
-                sessionid = cookie['value']
-            elif cookie['name'] == 'wxuin':
-                wxuin = cookie['value']
-        
-        if not sessionid or not wxuin:
-            tencent_logger.error('[手动删除-API] 无法获取sessionid或wxuin')
-            return
-        
         # 导入删除函数
         from social_auto_upload.uploader.tencent_uploader.main_tz_violation import delete_violation_video
         
         # 计算时间范围
         current_time = datetime.now()
         
-        # 构建请求
-        url = 'https://channels.weixin.qq.com/micro/content/cgi-bin/mmfinderassistant-bin/post/post_search_user_page'
-        
-        headers = {
-            'Accept': '*/*',
-            'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Connection': 'keep-alive',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/150.0.0.0 Safari/537.36',
-            'X-WECHAT-UIN': wxuin,
-            'Referer': 'https://channels.weixin.qq.com/micro/content/post/list',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'finger-print-device-id': hashlib.md5(sessionid.encode()).hexdigest(),
-            'sec-ch-ua': '"Not;A=Brand";v="8", "Chromium";v="150", "Google Chrome";v="150"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"Windows"'
-        }
-        
-        cookies = {'sessionid': sessionid, 'wxuin': wxuin}
-        
-        # 禁用SSL警告
-        import warnings
-        from urllib3.exceptions import InsecureRequestWarning
-        warnings.filterwarnings('ignore', category=InsecureRequestWarning)
-        
-        session = requests.Session()
+        # 查询和删除共用同一个客户端（连接池）
+        client = ChannelsApiClient(account_file)
+        await client.open()
         
         # 分页查询视频
         last_buffer = ""
@@ -583,33 +507,14 @@ async def delete_videos_by_search_api(account_file, minutes_ago, max_views, vide
         while continue_flag:
             page_count += 1
             
-            # 构建请求数据
-            data = {
-                'wording': video_title if video_title else "",  # 搜索关键词（剧名）
-                'lastBuffer': last_buffer,
-                'continueFlag': False if not last_buffer else True,
-                'timestamp': str(int(time.time() * 1000)),
-                '_log_finder_uin': '',
-                '_log_finder_id': '',
-                'rawKeyBuff': '',
-                'pluginSessionId': None,
-                'scene': 7,
-                'reqScene': 7
-            }
-            
-            tencent_logger.info(f"[手动删除-API] 第{page_count}页: 请求数据 wording='{data['wording']}', lastBuffer={'有' if last_buffer else '无'}")
+            tencent_logger.info(f"[手动删除-API] 第{page_count}页: 请求数据 wording='{video_title or ''}', lastBuffer={'有' if last_buffer else '无'}")
             
-            # 使用 asyncio.to_thread 将同步请求转移到线程池
-            response = await asyncio.to_thread(
-                session.post, url, headers=headers, cookies=cookies, json=data, timeout=30, verify=False
-            )
-            
-            if response.status_code not in [200, 201]:
-                tencent_logger.error(f"[手动删除-API] 查询视频列表失败（第{page_count}页），状态码：{response.status_code}")
+            try:
+                result = await client.search_posts(video_title, last_buffer)
+            except ChannelsApiError as e:
+                tencent_logger.error(f"[手动删除-API] 查询视频列表失败（第{page_count}页），{str(e)}")
                 break
             
-            result = response.json()
-            
             if result.get('errCode') != 0:
                 tencent_logger.error(f"[手动删除-API] 视频列表API返回错误：{result.get('errMsg')}")
                 break
@@ -673,29 +578,29 @@ async def delete_videos_by_search_api(account_file, minutes_ago, max_views, vide
                 if drama_name_match and minutes_ago is not None and time_diff >= minutes_ago and max_views is not None and read_count < max_views:
                     tencent_logger.info(f"[手动删除-API] => 符合删除条件")
                     
-                    # ✅ 检查是否已经遇到删除频率限制
+                    # ✅ 已遇到删除频率限制：加入队列，额度重置后继续删除
                     if rate_limited:
-                        tencent_logger.warning(f"[手动删除-API] ⚠️ 已遇到删除频率限制，跳过删除操作")
+                        tencent_logger.warning(f"[手动删除-API] ⚠️ 已遇到删除频率限制，加入删除队列")
+                        get_rate_limiter().defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': object_id})
                         skip_count += 1
                     else:
-                        # 立即执行删除
-                        success, errmsg = await delete_violation_video(export_id, account_file, sessionid, wxuin)
+                        # 立即执行删除，请求间隔由限流器控制
+                        success, errmsg = await delete_violation_video(export_id, client=client)
                         
                         # 使用配置的处理间隔
                         if process_interval > 0:
                             tencent_logger.info(f"[手动删除-API] 等待处理间隔 {process_interval} 秒...")
                             await asyncio.sleep(process_interval)
-                        else:
-                            await asyncio.sleep(1)  # 默认间隔
                         
                         if success:
                             delete_success_count += 1
                             tencent_logger.info(f"[手动删除-API] ✅ 删除成功 (已删除: {delete_success_count})")
                         else:
                             # 检查是否是删除频率限制
-                            if errmsg == '暂无法删除，你今日删除太频繁，如需继续操作可登录管理员账号重试':
-                                tencent_logger.error(f"[手动删除-API] ⚠️ 遇到删除频率限制，后续不再执行删除操作")
+                            if errmsg == DELETE_RATE_LIMIT_MSG:
+                                tencent_logger.error(f"[手动删除-API] ⚠️ 遇到删除频率限制，剩余删除加入队列，额度重置后继续")
                                 rate_limited = True  # ✅ 设置标志位
+                                get_rate_limiter().defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': object_id})
                                 skip_count += 1
                                 # ✅ 不再 return，继续处理列表
                             else:
@@ -714,9 +619,12 @@ async def delete_videos_by_search_api(account_file, minutes_ago, max_views, vide
         
         # ✅ 输出最终统计（包含跳过的）
         if rate_limited:
-            tencent_logger.info(f"[手动删除-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个，跳过 {skip_count} 个（遇到频率限制）")
+            tencent_logger.info(f"[手动删除-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个，排队 {skip_count} 个（遇到频率限制，额度重置后自动执行）")
         else:
             tencent_logger.info(f"[手动删除-API] 删除完成：成功 {delete_success_count} 个，失败 {delete_fail_count} 个")
         
     except Exception as e:
         tencent_logger.exception(f"[手动删除-API] 删除视频时出错：{str(e)}")
+    finally:
+        if client is not None:
+            await client.close()
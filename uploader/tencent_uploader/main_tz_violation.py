@@ -3,267 +3,35 @@
 违规视频处理模块
 """
 import asyncio
+import json
 import time
-import hashlib
 from datetime import datetime
 
-from aiohttp import ThreadedResolver, TCPConnector
-
+from social_auto_upload.uploader.tencent_uploader.channels_api import ChannelsApiClient, use_client, \
+    DELETE_RATE_LIMIT_MSG, VISIBLE_SELF, ENDPOINT_DELETE, ENDPOINT_HIDE
+from social_auto_upload.uploader.tencent_uploader.video_index import get_video_index, index_account, STATUS_DELETED
+from social_auto_upload.uploader.tencent_uploader.notification_parser import iter_violation_videos, PostTimeIndex, \
+    TIME_MATCH_TOLERANCE
+from social_auto_upload.uploader.tencent_uploader.video_rules import violation_rules, ACTION_DELETE, ACTION_HIDE
 from social_auto_upload.utils.log import tencent_logger
-
-
-def extract_video_info_from_notification(content, ref_url, title=''):
-    """从通知内容和refUrl中提取视频信息
-    
-    支持多种通知格式：
-    1. 作品优化建议：作品标题：xxx  发布时间：xxx
-    2. 限制传播：你于xxxx-xx-xx xx:xx:xx发表的短剧视频" #xxx..."中
-    """
-    import re
-    from urllib.parse import unquote
-    
-    video_title = ''
-    publish_timestamp = 0
-    object_id = ''
-    
-    # ========== 提取标题 ==========
-    # 格式1：作品标题：《xxx》
-    title_match = re.search(r'作品标题：\s*(.+)', content)
-    if title_match:
-        video_title = title_match.group(1).strip()
-    # 格式2：短剧视频" #xxx..."中
-    else:
-        title_match2 = re.search(r'短剧视频["\s]*[#《]*([^"\.]+)', content)
-        if title_match2:
-            video_title = title_match2.group(1).strip()
-            # 清理可能的后缀
-            video_title = video_title.rstrip('...')
-    
-    # ========== 提取发布时间 ==========
-    # 格式1：发布时间：2026-06-26 07:10:01
-    time_match = re.search(r'发布时间：(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', content)
-    if time_match:
-        publish_time_str = time_match.group(1)
-    # 格式2：你于2026-06-26 07:10:01发表的
-    else:
-        time_match2 = re.search(r'你于(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})发表的', content)
-        if time_match2:
-            publish_time_str = time_match2.group(1)
-        else:
-            publish_time_str = ''
-    
-    # 转换为时间戳
-    if publish_time_str:
-        try:
-            dt = datetime.strptime(publish_time_str, '%Y-%m-%d %H:%M:%S')
-            publish_timestamp = int(dt.timestamp())
-        except:
-            pass
-    
-    # ========== 提取ObjectID ==========
-    # 格式1：unique_id=mmfindermachineauditdelivery14943811069001337356
-    if ref_url:
-        unique_id_match = re.search(r'unique_id=mmfindermachineauditdelivery(\d+)', ref_url)
-        if unique_id_match:
-            object_id = unique_id_match.group(1)
-        # 格式2：rand_id=FDxxxxxxxxx (这种通常无法提取objectId)
-        # 后续只能依赖时间戳匹配
-    
-    return video_title, publish_timestamp, object_id
+from social_auto_upload.utils.rate_limiter import get_rate_limiter
 
 
 def collect_violation_videos(notification_list):
     """收集所有违规视频的信息（notification_list已经过滤过时间）
     
-    支持的违规类型：
+    支持的违规类型见 notification_parser.VIOLATION_TITLES：
     1. 作品优化建议
     2. 视频被暂时限制传播
-    3. 其他违规通知
     """
-    violation_videos = []
-    
-    # 定义需要处理的违规通知类型
-    violation_titles = [
-        '作品优化建议',
-        '你有1条视频号视频被暂时限制传播',
-        '视频号视频被暂时限制传播',
-        '你的视频号视频被暂时限制传播',
-    ]
-    
-    for notification in notification_list:
-        title = notification.get('title', '')
-        timestamp = notification.get('timestamp', 0)
-        is_special_jump = notification.get('isSpecialJumpType', 1)
-        content = notification.get('content', '')
-        ref_url = notification.get('refUrl', '')
-        
-        # 检查是否是违规通知（支持多种类型）
-        is_violation = False
-        violation_type = ''
-        
-        for vt in violation_titles:
-            if vt in title:
-                is_violation = True
-                violation_type = vt
-                break
-        
-        if is_violation and is_special_jump == 0 and content:
-            # 从content和refUrl中提取视频信息
-            video_title, publish_timestamp, object_id = extract_video_info_from_notification(content, ref_url, title)
-            
-            # 只有当至少有objectId或时间戳时才添加
-            if object_id or publish_timestamp:
-                violation_videos.append({
-                    'video_title': video_title,
-                    'publish_timestamp': publish_timestamp,
-                    'object_id': object_id,
-                    'notification_timestamp': timestamp,
-                    'content': content,
-                    'violation_type': violation_type,  # 记录违规类型
-                    'match_method': 'object_id' if object_id else 'timestamp'
-                })
-            else:
-                tencent_logger.warning(f"[违规处理] 无法从通知中提取有效信息: {title} - {content[:50]}...")
-    
-    return violation_videos
-
-
-async def get_post_list_by_date_with_early_stop_async(session, headers, cookies, start_time, end_time, violation_videos, page_size=50, batch_days=15):
-    """根据日期范围查询视频列表（分批查询，找到所有违规视频后提前停止） - 异步版本
-    
-    Args:
-        session: aiohttp会话
-        headers: 请求头
-        cookies: Cookie
-        start_time: 查询开始时间戳
-        end_time: 查询结束时间戳
-        violation_videos: 需要匹配的违规视频列表
-        page_size: 每页大小
-        batch_days: 分批天数（默认15天）
-    """
-    url = 'https://channels.weixin.qq.com/micro/statistic/cgi-bin/mmfinderassistant-bin/statistic/post_list'
-    
-    all_videos = []
-    
-    # 构建需要匹配的objectId和时间戳集合
-    target_object_ids = set()
-    target_timestamps = set()
-    
-    for violation in violation_videos:
-        object_id = violation.get('object_id', '')
-        timestamp = violation.get('publish_timestamp', 0)
-        if object_id:
-            target_object_ids.add(object_id)
-        elif timestamp:
-            target_timestamps.add(timestamp)
-    
-    matched_count = 0
-    
-    # 计算总天数和批次数
-    total_seconds = end_time - start_time
-    total_days = total_seconds / (24 * 60 * 60)
-    batch_seconds = batch_days * 24 * 60 * 60
-    num_batches = max(1,int((total_seconds + batch_seconds - 1) / batch_seconds))
-    
-    tencent_logger.info(f"[违规处理] 开始分批查询视频列表")
-    tencent_logger.info(f"[违规处理] 总时间跨度: {total_days:.1f}天，分为 {num_batches} 批，每批 {batch_days} 天")
-    tencent_logger.info(f"[违规处理] 需要匹配 {len(violation_videos)} 个违规视频")
-    
-    # 从最新时间开始，向过去分批查询
-    for batch_idx in range(num_batches):
-        # 计算当前批次的时间范围
-        batch_end_time = end_time - (batch_idx * batch_seconds)
-        batch_start_time = max(start_time, batch_end_time - batch_seconds)
-        
-        batch_start_date = datetime.fromtimestamp(batch_start_time).strftime('%Y-%m-%d %H:%M:%S')
-        batch_end_date = datetime.fromtimestamp(batch_end_time).strftime('%Y-%m-%d %H:%M:%S')
-        
-        tencent_logger.info(f"[违规处理] 【批次 {batch_idx + 1}/{num_batches}】查询时间范围: {batch_start_date} ~ {batch_end_date}")
-        
-        # 分页查询当前批次
-        current_page = 1
-        batch_videos = []
-        
-        while True:
-            data = {
-                'pageSize': page_size,
-                'currentPage': current_page,
-                'sort': 0,
-                'order': 0,
-                'startTime': batch_start_time,
-                'endTime': batch_end_time,
-                'timestamp': str(int(time.time() * 1000)),
-                '_log_finder_uin': '',
-                '_log_finder_id': '',
-                'rawKeyBuff': None,
-                'pluginSessionId': None,
-                'scene': 7,
-                'reqScene': 7
-            }
-            
-            try:
-                async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                    if response.status not in [200, 201]:
-                        tencent_logger.error(f"[违规处理] 批次{batch_idx + 1}第{current_page}页查询失败，状态码：{response.status}")
-                        break
-                    
-                    result = await response.json()
-                    
-                    if result.get('errCode') != 0:
-                        tencent_logger.error(f"[违规处理] 批次{batch_idx + 1}视频列表API返回错误：{result.get('errMsg')}")
-                        break
-                    
-                    data_obj = result.get('data', {})
-                    video_list = data_obj.get('list', [])
-                    total_count = data_obj.get('totalCount', 0)
-                    
-                    if not video_list:
-                        tencent_logger.info(f"[违规处理] 批次{batch_idx + 1}第{current_page}页无数据")
-                        break
-                    
-                    batch_videos.extend(video_list)
-                    
-                    # 检查当前页是否匹配到了目标视频
-                    page_matched = 0
-                    for video in video_list:
-                        object_id = video.get('objectId', '')
-                        create_time = video.get('createTime', 0)
-                        
-                        if object_id in target_object_ids or create_time in target_timestamps:
-                            page_matched += 1
-                    
-                    matched_count += page_matched
-                    
-                    tencent_logger.info(f"[违规处理] 批次{batch_idx + 1}第{current_page}页: 获取 {len(video_list)} 个视频，本页匹配 {page_matched} 个 (累计匹配: {matched_count}/{len(violation_videos)})")
-                    
-                    # 如果已获取当前批次所有数据，结束当前批次
-                    if len(batch_videos) >= total_count:
-                        tencent_logger.info(f"[违规处理] 批次{batch_idx + 1}已获取所有视频数据 ({len(batch_videos)}/{total_count})")
-                        break
-                    
-                    current_page += 1
-                    await asyncio.sleep(0.5)  # 避免请求过快
-                    
-            except Exception as e:
-                tencent_logger.error(f"[违规处理] 批次{batch_idx + 1}第{current_page}页查询出错：{str(e)}")
-                break
-        
-        all_videos.extend(batch_videos)
-        tencent_logger.info(f"[违规处理] 批次{batch_idx + 1}完成: 获取 {len(batch_videos)} 个视频 (总获取: {len(all_videos)})")
-        
-        # 如果已经找到所有违规视频，提前结束所有批次
-        if matched_count >= len(violation_videos):
-            tencent_logger.info(f"[违规处理] ✅ 已找到所有 {len(violation_videos)} 个违规视频，提前结束查询！")
-            break
-    tencent_logger.info(f"[违规处理] 分批查询完成: 共获取 {len(all_videos)} 个视频，匹配 {matched_count}/{len(violation_videos)} 个违规视频")
+    def on_unparsed(notification):
+        tencent_logger.warning(f"[违规处理] 无法从通知中提取有效信息: {notification.get('title', '')} - {notification.get('content', '')[:50]}...")
     
-    return all_videos
+    return list(iter_violation_videos(notification_list, on_unparsed))
 
 
-async def find_videos_by_object_id_and_time_async(session, headers, cookies, violation_videos):
-    """根据所有违规视频的时间范围，一次性查询所有视频并匹配 - 异步版本"""
-    from datetime import timedelta
-    
+async def find_videos_by_object_id_and_time_async(client, violation_videos):
+    """同步违规视频发布时间范围内的作品索引，并从索引中匹配违规视频 - 异步版本"""
     if not violation_videos:
         tencent_logger.warning("[违规处理] 没有违规视频需要查询")
         return {}
@@ -295,30 +63,15 @@ async def find_videos_by_object_id_and_time_async(session, headers, cookies, vio
     tencent_logger.info(f"[违规处理]    查询范围: {start_date.strftime('%Y-%m-%d %H:%M:%S')} ~ {end_date.strftime('%Y-%m-%d %H:%M:%S')}")
     tencent_logger.info(f"[违规处理]    时间戳范围: {start_time} ~ {end_time}")
     
-    # 查询所有视频（分批查询，找到所有违规视频后提前停止）
-    all_videos = await get_post_list_by_date_with_early_stop_async(session, headers, cookies, start_time, end_time, violation_videos, batch_days=15)
-    
-    if not all_videos:
-        tencent_logger.warning(f"[违规处理] 未查询到任何视频")
-        return {}
-    
-    tencent_logger.info(f"[违规处理] 共查询到 {len(all_videos)} 个视频")
-    
-    # 构建两种索引：objectId索引（最靠谱）和时间戳索引（降级）
-    object_id_to_video = {}
-    time_to_video = {}
-    
-    for video in all_videos:
-        object_id = video.get('objectId', '')
-        create_time = video.get('createTime', 0)
-        
-        if object_id:
-            object_id_to_video[object_id] = video
-        elif create_time:
-            print(video)
-            time_to_video[create_time] = video
+    # 同步本地作品索引（索引足够新时只拉取新发布的作品），再按 objectId / 发布时间查询索引
+    video_index = get_video_index()
+    account = index_account(client.account_file)
+    calls = await video_index.sync(client, account, start_time, end_time)
+    object_id_to_video, _ = video_index.find(account, object_ids=[v.get('object_id') for v in violation_videos])
+    # 没有 objectId 的违规视频按发布时间在时间范围内的作品中二分查找
+    time_index = PostTimeIndex(video_index.records(account, start_time=start_time, end_time=end_time + 86400))
     
-    tencent_logger.info(f"[违规处理] 构建了 {len(object_id_to_video)} 个objectId索引，{len(time_to_video)} 个时间索引")
+    tencent_logger.info(f"[违规处理] 作品索引同步请求 {calls} 次，命中 {len(object_id_to_video)} 个objectId，时间范围内作品 {len(time_index)} 个")
     
     # 匹配违规视频（优先使用objectId，降级到时间戳）
     matched_videos = {}
@@ -332,6 +85,7 @@ async def find_videos_by_object_id_and_time_async(session, headers, cookies, vio
         
         matched = False
         match_key = None
+        time_match = None if object_id in object_id_to_video else time_index.find(publish_timestamp, TIME_MATCH_TOLERANCE)
         
         # 优先使用objectId匹配（最靠谱）
         if object_id and object_id in object_id_to_video:
@@ -344,10 +98,10 @@ async def find_videos_by_object_id_and_time_async(session, headers, cookies, vio
             matched_by_object_id += 1
             matched = True
         # 降级到时间戳匹配
-        elif publish_timestamp and publish_timestamp in time_to_video:
+        elif time_match is not None:
             match_key = f"timestamp_{publish_timestamp}"
             matched_videos[match_key] = {
-                'video': time_to_video[publish_timestamp],
+                'video': time_match,
                 'violation': violation,
                 'match_method': 'timestamp'
             }
@@ -362,370 +116,141 @@ async def find_videos_by_object_id_and_time_async(session, headers, cookies, vio
     tencent_logger.info(f"[违规处理]    - 通过时间戳匹配: {matched_by_timestamp} 个")
     
     return matched_videos
-async def delete_violation_video(object_id, account_file=None, sessionid=None, wxuin=None):
-    """删除指定的违规视频 - 使用异步HTTP请求"""
-    import json
-    import aiohttp
-    
+
+
+async def delete_violation_video(object_id, account_file=None, sessionid=None, wxuin=None, client=None):
+    """删除指定的违规视频，返回 (是否成功, 原因)
+
+    传入 client 时复用其连接和 cookie，否则根据 account_file 或 sessionid / wxuin 临时创建客户端。
+    """
     try:
         tencent_logger.info("=" * 80)
         tencent_logger.info(f"[违规处理-删除] 开始删除视频: {object_id}")
         tencent_logger.info("=" * 80)
-        
-        # 如果没有提供cookie，从session文件读取
-        if not sessionid or not wxuin:
-            if not account_file:
-                tencent_logger.error("[违规处理-删除] 未提供cookie或session文件")
-                return False
-            
-            tencent_logger.info(f"[违规处理-删除] 从session文件读取cookie: {account_file}")
-            # ✅ 使用异步文件读取
-            import aiofiles
-            async with aiofiles.open(account_file, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                session_data = json.loads(content)
-            
-            cookies_list = session_data.get('cookies', [])
-            for cookie in cookies_list:
-                if cookie['name'] == 'sessionid':
-                    sessionid = cookie['value']
-                elif cookie['name'] == 'wxuin':
-                    wxuin = cookie['value']
-        
-        if not sessionid or not wxuin:
-            tencent_logger.error('[违规处理-删除] 无法获取sessionid或wxuin')
-            return False
-        
-        # 调用删除接口
-        url = 'https://channels.weixin.qq.com/micro/content/cgi-bin/mmfinderassistant-bin/post/post_delete'
-        
-        headers = {
-            'Accept': '*/*',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'X-WECHAT-UIN': wxuin,
-            'Referer': 'https://channels.weixin.qq.com/micro/content/post/list'
-        }
-        
-        cookies = {
-            'sessionid': sessionid,
-            'wxuin': wxuin
-        }
-        
-        data = {
-            'objectId': object_id,
-            'timestamp': str(int(time.time() * 1000)),
-            '_log_finder_uin': '',
-            '_log_finder_id': '',
-            'rawKeyBuff': None,
-            'pluginSessionId': None,
-            'scene': 7,
-            'reqScene': 7
-        }
-        
-        # 打印请求参数
-        tencent_logger.info(f"[违规处理-删除] 请求URL: {url}")
-        tencent_logger.info(f"[违规处理-删除] 请求Headers: {json.dumps(headers, ensure_ascii=False, indent=2)}")
-        tencent_logger.info(f"[违规处理-删除] 请求Cookies: sessionid={sessionid[:20]}..., wxuin={wxuin}")
-        tencent_logger.info(f"[违规处理-删除] 请求Body: {json.dumps(data, ensure_ascii=False, indent=2)}")
-        
-        tencent_logger.info(f"[违规处理-删除] 正在发送删除请求...")
-        # ✅ 使用 aiohttp 进行异步HTTP请求
-        connector = aiohttp.TCPConnector(ssl=False)
-        timeout = aiohttp.ClientTimeout(total=30)
-        resolver = ThreadedResolver()  # 使用线程池进行DNS解析，避免Windows异步DNS问题
-        connector = TCPConnector(resolver=resolver, ssl=False)
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                # 打印响应参数
-                tencent_logger.info(f"[违规处理-删除] 响应状态码: {response.status}")
-                tencent_logger.info(f"[违规处理-删除] 响应Headers: {json.dumps(dict(response.headers), ensure_ascii=False, indent=2)}")
-                
-                try:
-                    response_json = await response.json()
-                    tencent_logger.info(f"[违规处理-删除] 响应Body: {json.dumps(response_json, ensure_ascii=False, indent=2)}")
-                except:
-                    response_text = await response.text()
-                    tencent_logger.warning(f"[违规处理-删除] 响应Body (非JSON): {response_text[:500]}")
 
-                if response.status in [200, 201]:
-                    result = await response.json()
-                    if result.get('errCode') == 0:
-                        # 检查是否是删除频率限制
-                        res_data = result.get('data', {})
-                        baseResp = res_data.get('baseResp', {})
-                        base_errmsg = baseResp.get('errmsg', '')
-                        
-                        if base_errmsg == '暂无法删除，你今日删除太频繁，如需继续操作可登录管理员账号重试':
-                            tencent_logger.error(f"[违规处理-删除] ❌ 遇到删除频率限制: {base_errmsg}")
-                            tencent_logger.info("=" * 80)
-                            return False, base_errmsg
-                        
-                        tencent_logger.info(f"[违规处理-删除] ✅ 视频删除成功: {object_id}")
-                        tencent_logger.info("=" * 80)
-                        return True, '删除成功'
-                    else:
-                        errmsg = result.get('errMsg', '删除失败')
-                        tencent_logger.error(f"[违规处理-删除] ❌ 删除失败 - errCode: {result.get('errCode')}, errMsg: {errmsg}")
-                        tencent_logger.info("=" * 80)
-                        return False, errmsg
-                else:
-                    errmsg = f'HTTP状态码: {response.status}'
-                    tencent_logger.error(f"[违规处理-删除] ❌ 删除请求失败，状态码: {response.status}")
-                    tencent_logger.info("=" * 80)
-                    return False, errmsg
-            
+        async with use_client(client, account_file, sessionid, wxuin) as api:
+            success, errmsg = await api.delete_post(object_id)
+
+        if success:
+            tencent_logger.info(f"[违规处理-删除] ✅ 视频删除成功: {object_id}")
+        elif errmsg == DELETE_RATE_LIMIT_MSG:
+            tencent_logger.error(f"[违规处理-删除] ❌ 遇到删除频率限制: {errmsg}")
+        else:
+            tencent_logger.error(f"[违规处理-删除] ❌ 删除失败 - errMsg: {errmsg}")
+        tencent_logger.info("=" * 80)
+        return success, errmsg
+
     except Exception as e:
         tencent_logger.exception(f"[违规处理-删除] 删除视频异常: {str(e)}")
         tencent_logger.info("=" * 80)
         return False, str(e)
 
 
-async def remove_from_collection(object_id, collection_id, account_file=None, sessionid=None, wxuin=None):
-    """从合集中移除视频 - 使用异步HTTP请求"""
-    import json
-    import aiohttp
-    
+async def remove_from_collection(object_id, collection_id, account_file=None, sessionid=None, wxuin=None, client=None):
+    """从合集中移除视频"""
     try:
         tencent_logger.info("=" * 80)
         tencent_logger.info(f"[合集管理] 开始从合集移除视频")
         tencent_logger.info(f"[合集管理] - 视频ID: {object_id}")
         tencent_logger.info(f"[合集管理] - 合集ID: {collection_id}")
         tencent_logger.info("=" * 80)
-        
-        # 如果没有提供cookie，从session文件读取
-        if not sessionid or not wxuin:
-            if not account_file:
-                tencent_logger.error("[合集管理] 未提供cookie或session文件")
-                return False
-            
-            # 使用异步文件读取
-            import aiofiles
-            async with aiofiles.open(account_file, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                session_data = json.loads(content)
-            
-            cookies_list = session_data.get('cookies', [])
-            for cookie in cookies_list:
-                if cookie['name'] == 'sessionid':
-                    sessionid = cookie['value']
-                elif cookie['name'] == 'wxuin':
-                    wxuin = cookie['value']
-        
-        if not sessionid or not wxuin:
-            tencent_logger.error('[合集管理] 无法获取sessionid或wxuin')
-            return False
-        
-        # 调用合集管理接口
-        url = 'https://channels.weixin.qq.com/micro/content/cgi-bin/mmfinderassistant-bin/collection/mod_collection_feed'
-        
-        headers = {
-            'Accept': '*/*',
-            'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Connection': 'keep-alive',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/150.0.0.0 Safari/537.36',
-            'X-WECHAT-UIN': wxuin,
-            'Referer': f'https://channels.weixin.qq.com/micro/content/collection/item',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'finger-print-device-id': hashlib.md5(sessionid.encode()).hexdigest(),
-            'sec-ch-ua': '"Not;A=Brand";v="8", "Chromium";v="150", "Google Chrome";v="150"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"Windows"'
-        }
-        
-        cookies = {
-            'sessionid': sessionid,
-            'wxuin': wxuin
-        }
-        
-        data = {
-            'opType': 3,  # 3 = 从合集中移除
-            'collectionId': collection_id,
-            'objectInfo': [{'objectId': object_id}],
-            'collectionBusinessType': 0,
-            'timestamp': str(int(time.time() * 1000)),
-            '_log_finder_uin': '',
-            '_log_finder_id': '',
-            'rawKeyBuff': '',
-            'pluginSessionId': None,
-            'scene': 7,
-            'reqScene': 7
-        }
-        
-        tencent_logger.info(f"[合集管理] 请求URL: {url}")
-        tencent_logger.info(f"[合集管理] 请求Body: {json.dumps(data, ensure_ascii=False, indent=2)}")
-        
-        # 使用 aiohttp 进行异步HTTP请求
-        connector = aiohttp.TCPConnector(ssl=False)
-        timeout = aiohttp.ClientTimeout(total=30)
-        resolver = ThreadedResolver()
-        connector = TCPConnector(resolver=resolver, ssl=False)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                tencent_logger.info(f"[合集管理] 响应状态码: {response.status}")
-                
-                if response.status in [200, 201]:
-                    result = await response.json()
-                    tencent_logger.info(f"[合集管理] 响应Body: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                    
-                    if result.get('errCode') == 0:
-                        tencent_logger.info(f"[合集管理] ✅ 从合集移除视频成功")
-                        tencent_logger.info("=" * 80)
-                        return True
-                    else:
-                        tencent_logger.error(f"[合集管理] ❌ 从合集移除失败 - errCode: {result.get('errCode')}, errMsg: {result.get('errMsg')}")
-                        tencent_logger.info("=" * 80)
-                        return False
-                else:
-                    tencent_logger.error(f"[合集管理] ❌ 请求失败，状态码: {response.status}")
-                    response_text = await response.text()
-                    tencent_logger.error(f"[合集管理] 响应内容: {response_text[:500]}")
-                    tencent_logger.info("=" * 80)
-                    return False
-            
+
+        async with use_client(client, account_file, sessionid, wxuin) as api:
+            result = await api.mod_collection_feed(collection_id, [object_id])
+        tencent_logger.info(f"[合集管理] 响应Body: {json.dumps(result, ensure_ascii=False, indent=2)}")
+
+        if result.get('errCode') == 0:
+            tencent_logger.info(f"[合集管理] ✅ 从合集移除视频成功")
+            tencent_logger.info("=" * 80)
+            return True
+        tencent_logger.error(f"[合集管理] ❌ 从合集移除失败 - errCode: {result.get('errCode')}, errMsg: {result.get('errMsg')}")
+        tencent_logger.info("=" * 80)
+        return False
+
     except Exception as e:
         tencent_logger.exception(f"[合集管理] 从合集移除视频异常: {str(e)}")
         tencent_logger.info("=" * 80)
         return False
 
 
-async def hide_violation_video(object_id, account_file=None, sessionid=None, wxuin=None, collection_id=None):
-    """隐藏指定的违规视频（设置为仅自己可见） - 使用异步HTTP请求
-    
+async def hide_violation_video(object_id, account_file=None, sessionid=None, wxuin=None, collection_id=None, client=None):
+    """隐藏指定的违规视频（设置为仅自己可见）
+
     如果视频在合集中，会先从合集中移除，再隐藏视频
     """
-    import json
-    import aiohttp
-    
     try:
         tencent_logger.info("=" * 80)
         tencent_logger.info(f"[违规处理-隐藏] 开始隐藏视频: {object_id}")
         if collection_id:
             tencent_logger.info(f"[违规处理-隐藏] 视频在合集中: {collection_id}")
         tencent_logger.info("=" * 80)
-        
-        # 如果没有提供cookie，从session文件读取
-        if not sessionid or not wxuin:
-            if not account_file:
-                tencent_logger.error("[违规处理-隐藏] 未提供cookie或session文件")
-                return False
-            
-            tencent_logger.info(f"[违规处理-隐藏] 从session文件读取cookie: {account_file}")
-            # ✅ 使用异步文件读取
-            import aiofiles
-            async with aiofiles.open(account_file, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                session_data = json.loads(content)
-            
-            cookies_list = session_data.get('cookies', [])
-            for cookie in cookies_list:
-                if cookie['name'] == 'sessionid':
-                    sessionid = cookie['value']
-                elif cookie['name'] == 'wxuin':
-                    wxuin = cookie['value']
-        
-        if not sessionid or not wxuin:
-            tencent_logger.error('[违规处理-隐藏] 无法获取sessionid或wxuin')
-            return False
-        
-        # 如果视频在合集中，先从合集移除
-        if collection_id:
-            tencent_logger.info("[违规处理-隐藏] 第一步：从合集中移除视频")
-            remove_success = await remove_from_collection(
-                object_id=object_id,
-                collection_id=collection_id,
-                account_file=account_file,
-                sessionid=sessionid,
-                wxuin=wxuin
-            )
-            
-            if not remove_success:
-                tencent_logger.warning("[违规处理-隐藏] ⚠️ 从合集移除失败，但继续尝试隐藏视频")
-            else:
-                tencent_logger.info("[违规处理-隐藏] ✅ 已从合集移除，等待1秒后隐藏视频")
-                await asyncio.sleep(1)
-        
-        # 调用隐藏接口（设置为仅自己可见）
-        tencent_logger.info("[违规处理-隐藏] 第二步：隐藏视频（设置为仅自己可见）")
-        url = 'https://channels.weixin.qq.com/micro/content/cgi-bin/mmfinderassistant-bin/post/post_update_visible'
-        
-        headers = {
-            'Accept': '*/*',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'X-WECHAT-UIN': wxuin,
-            'Referer': 'https://channels.weixin.qq.com/micro/content/post/list'
-        }
-        
-        cookies = {
-            'sessionid': sessionid,
-            'wxuin': wxuin
-        }
-        
-        data = {
-            'objectId': object_id,
-            'visibleType': 3,  # 3 = 仅自己可见
-            'timestamp': str(int(time.time() * 1000)),
-            '_log_finder_uin': '',
-            '_log_finder_id': '',
-            'rawKeyBuff': None,
-            'pluginSessionId': None,
-            'scene': 7,
-            'reqScene': 7
-        }
-        
-        # 打印请求参数
-        tencent_logger.info(f"[违规处理-隐藏] 请求URL: {url}")
-        tencent_logger.info(f"[违规处理-隐藏] 请求Headers: {json.dumps(headers, ensure_ascii=False, indent=2)}")
-        tencent_logger.info(f"[违规处理-隐藏] 请求Cookies: sessionid={sessionid[:20]}..., wxuin={wxuin}")
-        tencent_logger.info(f"[违规处理-隐藏] 请求Body: {json.dumps(data, ensure_ascii=False, indent=2)}")
-        
-        tencent_logger.info(f"[违规处理-隐藏] 正在发送隐藏请求...")
-        # ✅ 使用 aiohttp 进行异步HTTP请求
-        connector = aiohttp.TCPConnector(ssl=False)
-        timeout = aiohttp.ClientTimeout(total=30)
-        resolver = ThreadedResolver()  # 使用线程池进行DNS解析，避免Windows异步DNS问题
-        connector = TCPConnector(resolver=resolver, ssl=False)
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                # 打印响应参数
-                tencent_logger.info(f"[违规处理-隐藏] 响应状态码: {response.status}")
-                tencent_logger.info(f"[违规处理-隐藏] 响应Headers: {json.dumps(dict(response.headers), ensure_ascii=False, indent=2)}")
-                
-                try:
-                    response_json = await response.json()
-                    tencent_logger.info(f"[违规处理-隐藏] 响应Body: {json.dumps(response_json, ensure_ascii=False, indent=2)}")
-                except:
-                    response_text = await response.text()
-                    tencent_logger.warning(f"[违规处理-隐藏] 响应Body (非JSON): {response_text[:500]}")
-                
-                if response.status in [200, 201]:
-                    result = await response.json()
-                    if result.get('errCode') == 0:
-                        tencent_logger.info(f"[违规处理-隐藏] ✅ 视频隐藏成功: {object_id}")
-                        tencent_logger.info("=" * 80)
-                        return True
-                    else:
-                        tencent_logger.error(f"[违规处理-隐藏] ❌ 隐藏失败 - errCode: {result.get('errCode')}, errMsg: {result.get('errMsg')}")
-                        tencent_logger.info("=" * 80)
-                        return False
+
+        async with use_client(client, account_file, sessionid, wxuin) as api:
+            # 如果视频在合集中，先从合集移除
+            if collection_id:
+                tencent_logger.info("[违规处理-隐藏] 第一步：从合集中移除视频")
+                remove_success = await remove_from_collection(object_id, collection_id, client=api)
+                if not remove_success:
+                    tencent_logger.warning("[违规处理-隐藏] ⚠️ 从合集移除失败，但继续尝试隐藏视频")
                 else:
-                    tencent_logger.error(f"[违规处理-隐藏] ❌ 隐藏请求失败，状态码: {response.status}")
-                    tencent_logger.info("=" * 80)
-                    return False
-            
+                    tencent_logger.info("[违规处理-隐藏] ✅ 已从合集移除，等待1秒后隐藏视频")
+                    await asyncio.sleep(1)
+
+            # 调用隐藏接口（设置为仅自己可见）
+            tencent_logger.info("[违规处理-隐藏] 第二步：隐藏视频（设置为仅自己可见）")
+            result = await api.update_visible(object_id, VISIBLE_SELF)
+        tencent_logger.info(f"[违规处理-隐藏] 响应Body: {json.dumps(result, ensure_ascii=False, indent=2)}")
+
+        if result.get('errCode') == 0:
+            tencent_logger.info(f"[违规处理-隐藏] ✅ 视频隐藏成功: {object_id}")
+            tencent_logger.info("=" * 80)
+            return True
+        tencent_logger.error(f"[违规处理-隐藏] ❌ 隐藏失败 - errCode: {result.get('errCode')}, errMsg: {result.get('errMsg')}")
+        tencent_logger.info("=" * 80)
+        return False
+
     except Exception as e:
         tencent_logger.exception(f"[违规处理-隐藏] 隐藏视频异常: {str(e)}")
         tencent_logger.info("=" * 80)
         return False
 
 
+async def replay_deferred_actions(client, log_prefix="[违规处理]"):
+    """额度重置后继续执行之前因频率限制排队的删除和隐藏，返回 {'delete': 成功数, 'hide': 成功数}"""
+    await client.open()
+    limiter = get_rate_limiter()
+    video_index = get_video_index()
+    replayed = {ENDPOINT_DELETE: 0, ENDPOINT_HIDE: 0}
+    
+    for action in limiter.deferred(client.account, ENDPOINT_DELETE):
+        success, errmsg = await delete_violation_video(action['target'], client=client)
+        if not success and errmsg == DELETE_RATE_LIMIT_MSG:
+            # 额度又用完了，剩余的继续排队
+            break
+        # 其他失败（如作品已不存在）不再重试
+        limiter.complete(client.account, ENDPOINT_DELETE, action['target'])
+        if success:
+            replayed[ENDPOINT_DELETE] += 1
+            video_index.mark(client.account, action['target'], status=STATUS_DELETED)
+    
+    for action in limiter.deferred(client.account, ENDPOINT_HIDE):
+        if limiter.exhausted(client.account, ENDPOINT_HIDE):
+            break
+        success = await hide_violation_video(action['target'], collection_id=action['payload'].get('collection_id'),
+                                             client=client)
+        limiter.complete(client.account, ENDPOINT_HIDE, action['target'])
+        if success:
+            replayed[ENDPOINT_HIDE] += 1
+            video_index.mark(client.account, action['target'], visible_type=VISIBLE_SELF)
+    
+    if replayed[ENDPOINT_DELETE] or replayed[ENDPOINT_HIDE]:
+        tencent_logger.info(f"{log_prefix} 额度恢复，已执行排队的删除 {replayed[ENDPOINT_DELETE]} 个、隐藏 {replayed[ENDPOINT_HIDE]} 个")
+    return replayed
+
+
 async def check_and_handle_violation(account_file, violation_delete_days, violation_delete_views,
-                                     violation_hide_views, user_id=None, last_check_timestamp=None, process_interval=0):
+                                     violation_hide_views, user_id=None, last_check_timestamp=None, process_interval=0,
+                                     dry_run=False):
     """检查并处理违规视频
     
     Args:
@@ -736,10 +261,8 @@ async def check_and_handle_violation(account_file, violation_delete_days, violat
         user_id: 用户ID，用于更新数据库
         last_check_timestamp: 最后检查时间戳，避免重复处理
         process_interval: 处理间隔（秒），用于删除和隐藏操作之间的等待
+        dry_run: 试运行，只输出处理计划，不删除、隐藏，也不更新最后检查时间戳
     """
-    import json
-    import aiohttp
-    
     tencent_logger.info("=" * 60)
     tencent_logger.info("[违规处理] 开始检查违规视频")
     tencent_logger.info("=" * 60)
@@ -763,7 +286,8 @@ async def check_and_handle_violation(account_file, violation_delete_days, violat
         user_id=user_id,
         last_check_timestamp=last_check_timestamp,
         batch_info="处理中",
-        process_interval=process_interval
+        process_interval=process_interval,
+        dry_run=dry_run
     )
     
     # 输出结果
@@ -777,6 +301,7 @@ async def check_and_handle_violation(account_file, violation_delete_days, violat
         tencent_logger.info(f"[违规处理] 🔒 已隐藏: {batch_result.get('hide_count', 0)} 个（播放量 >= {violation_hide_views}）")
         tencent_logger.info(f"[违规处理] ⏭️  已是隐藏状态: {batch_result.get('already_hidden_count', 0)} 个（跳过）")
         tencent_logger.info(f"[违规处理] ⏸️  暂不处理: {batch_result.get('skip_count', 0)} 个")
+        tencent_logger.info(f"[违规处理] ⏳ 额度用完排队: {batch_result.get('deferred_count', 0)} 个（额度重置后自动执行）")
         tencent_logger.info(f"[违规处理] 🔍 未找到视频: {batch_result.get('not_found_count', 0)} 个")
         tencent_logger.info("=" * 60)
     
@@ -784,7 +309,8 @@ async def check_and_handle_violation(account_file, violation_delete_days, violat
 
 
 async def _process_violation_batch(account_file, violation_delete_days, violation_delete_views,
-                                   violation_hide_views, user_id=None, last_check_timestamp=None, batch_info="", process_interval=0):
+                                   violation_hide_views, user_id=None, last_check_timestamp=None, batch_info="", process_interval=0,
+                                   dry_run=False):
     """处理单批次的违规视频（内部函数）
     
     Args:
@@ -796,13 +322,11 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         last_check_timestamp: 最后检查时间戳，避免重复处理
         batch_info: 批次信息（用于日志）
         process_interval: 处理间隔（秒）
+        dry_run: 试运行，只输出处理计划
     
     Returns:
         dict: 包含统计结果的字典
     """
-    import json
-    import aiohttp
-    
     tencent_logger.info("=" * 60)
     tencent_logger.info(f"[违规处理-{batch_info}] 开始处理")
     tencent_logger.info("=" * 60)
@@ -814,61 +338,28 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         'skip_count': 0,
         'not_found_count': 0,
         'already_hidden_count': 0,
+        'deferred_count': 0,
         'violation_videos_count': 0,
-        'rate_limited': False  # 是否遇到删除频率限制
+        'notifications_count': 0,  # 时间范围内扫描的通知数
+        'matched_count': 0,  # 在作品索引中匹配到的视频数
+        'newest_notification_timestamp': 0,
+        'api_calls': 0,
+        'rate_limited': False,  # 是否遇到删除频率限制
+        'error': None  # 处理出错时的错误信息，出错时 newest_notification_timestamp 保持为 0
     }
     
+    client = ChannelsApiClient(account_file)
     try:
-        # 从session文件读取cookie
+        # 从session文件读取cookie，本批次的所有请求共用同一个客户端
         tencent_logger.info(f"[违规处理-{batch_info}] 从session文件读取cookie: {account_file}")
+        await client.open()
         
-        # ✅ 使用异步文件读取
-        import aiofiles
-        async with aiofiles.open(account_file, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            session_data = json.loads(content)
+        tencent_logger.info(f'[违规处理-{batch_info}] 成功读取cookie (sessionid长度: {len(client.sessionid)}, wxuin: {client.wxuin})')
         
-        # 提取cookies
-        cookies_list = session_data.get('cookies', [])
-        
-        # 获取sessionid和wxuin
-        sessionid = None
-        wxuin = None
-        for cookie in cookies_list:
-            if cookie['name'] == 'sessionid':
-                sessionid = cookie['value']
-            elif cookie['name'] == 'wxuin':
-                wxuin = cookie['value']
-        
-        if not sessionid or not wxuin:
-            tencent_logger.error(f'[违规处理-{batch_info}] 未找到sessionid或wxuin')
-            return result_stats
-        
-        tencent_logger.info(f'[违规处理-{batch_info}] 成功读取cookie (sessionid长度: {len(sessionid)}, wxuin: {wxuin})')
+        # 先执行之前因频率限制排队的操作
+        await replay_deferred_actions(client, f"[违规处理-{batch_info}]")
         tencent_logger.info(f'[违规处理-{batch_info}] 正在请求通知列表...')
         
-        # 构造请求
-        url = 'https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/notification/notification_list'
-        headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'X-WECHAT-UIN': wxuin
-        }
-        cookies = {'sessionid': sessionid, 'wxuin': wxuin}
-        
-        # 请求第一页
-        data = {
-            'pageSize': 20,
-            'currentPage': 1,
-            'reqType': 1,
-            'timestamp': str(int(time.time() * 1000)),
-            '_log_finder_uin': '',
-            '_log_finder_id': '',
-            'scene': 7,
-            'reqScene': 7
-        }
-        
         # 计算时间范围（用于判断是否继续翻页）
         current_timestamp = int(time.time())
         time_range_seconds = violation_delete_days * 24 * 60 * 60
@@ -876,163 +367,149 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         
         tencent_logger.info(f"[违规处理-{batch_info}] 时间过滤：只处理 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(oldest_allowed_timestamp))} 之后的通知")
         
-        resolver = ThreadedResolver()  # 使用线程池进行DNS解析，避免Windows异步DNS问题
-        connector = aiohttp.TCPConnector(resolver=resolver, ssl=False)
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                if response.status not in [200, 201]:
-                    tencent_logger.error(f'[违规处理-{batch_info}] 请求失败，状态码：{response.status}')
-                    return result_stats
-                
-                result = await response.json()
+        # 请求第一页
+        result = await client.notification_list(1, 20)
+        
+        if result.get('errCode') != 0:
+            tencent_logger.error(f'[违规处理-{batch_info}] API返回错误：{result.get("errMsg")}')
+            result_stats['error'] = f"notification_list errCode={result.get('errCode')} errMsg={result.get('errMsg')}"
+            return result_stats
+        
+        # 获取数据
+        data_obj = result.get('data', {})
+        total_count = data_obj.get('totalCount', 0)
+        page_list = data_obj.get('list', [])
+        
+        notification_list = []
+        current_page = 1
+        
+        tencent_logger.info(f"[违规处理-{batch_info}] 总通知数：{total_count}")
+        tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页获取：{len(page_list)} 条")
+        
+        # 收集第一页符合时间范围的通知
+        newest_notification_timestamp = 0  # 记录最新的通知时间戳
+        
+        for notification in page_list:
+            notification_timestamp = notification.get('timestamp', 0)
+            newest_notification_timestamp = max(newest_notification_timestamp, notification_timestamp)
+            
+            # 如果有上次检查时间戳，只处理比它新的通知
+            if last_check_timestamp and notification_timestamp <= last_check_timestamp:
+                tencent_logger.info(f"[违规处理-{batch_info}] 通知时间戳 {notification_timestamp} <= 上次检查时间戳 {last_check_timestamp}，已处理过，停止检查")
+                break
+            
+            if notification_timestamp >= oldest_allowed_timestamp:
+                notification_list.append(notification)
+        
+        tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页符合时间范围：{len(notification_list)} 条")
+        
+        # 如果遇到了上次检查的时间戳，不再翻页
+        if last_check_timestamp and page_list:
+            last_notification_timestamp = page_list[-1].get('timestamp', 0)
+            if last_notification_timestamp <= last_check_timestamp:
+                tencent_logger.info(f"[违规处理-{batch_info}] 已到达上次检查的时间节点，停止翻页")
+                should_continue = False
+            else:
+                should_continue = last_notification_timestamp >= oldest_allowed_timestamp
+        elif page_list:
+            last_notification_timestamp = page_list[-1].get('timestamp', 0)
+            should_continue = last_notification_timestamp >= oldest_allowed_timestamp
+        else:
+            should_continue = False
+        
+        # 继续翻页直到：1) 某页所有通知都超出时间范围 2) 没有更多数据 3) 达到最大页数
+        max_pages = 100  # 最多检查100页
+        
+        while should_continue and current_page < max_pages and len(notification_list) < total_count:
+            current_page += 1
+            
+            try:
+                result = await client.notification_list(current_page, 20)
                 
                 if result.get('errCode') != 0:
-                    tencent_logger.error(f'[违规处理-{batch_info}] API返回错误：{result.get("errMsg")}')
-                    return result_stats
-                
-                # 获取数据
-                data_obj = result.get('data', {})
-                total_count = data_obj.get('totalCount', 0)
-                page_list = data_obj.get('list', [])
+                    tencent_logger.warning(f'[违规处理-{batch_info}] 第{current_page}页API返回错误：{result.get("errMsg")}')
+                    break
                 
-                notification_list = []
-                current_page = 1
+                page_list = result.get('data', {}).get('list', [])
                 
-                tencent_logger.info(f"[违规处理-{batch_info}] 总通知数：{total_count}")
-                tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页获取：{len(page_list)} 条")
+                if not page_list:
+                    tencent_logger.info(f'[违规处理-{batch_info}] 第{current_page}页无数据，停止翻页')
+                    break
                 
-                # 检查第一页是否有符合时间范围的通知
-                page_has_valid_notifications = False
-                newest_notification_timestamp = 0  # 记录最新的通知时间戳
+                # 统计本页符合时间范围的通知
+                page_valid_count = 0
+                page_oldest_timestamp = float('inf')
+                stop_pagination = False
                 
                 for notification in page_list:
                     notification_timestamp = notification.get('timestamp', 0)
                     newest_notification_timestamp = max(newest_notification_timestamp, notification_timestamp)
+                    page_oldest_timestamp = min(page_oldest_timestamp, notification_timestamp)
                     
-                    # 如果有上次检查时间戳，只处理比它新的通知
+                    # 如果有上次检查时间戳，遇到已处理的通知就停止
                     if last_check_timestamp and notification_timestamp <= last_check_timestamp:
-                        tencent_logger.info(f"[违规处理-{batch_info}] 通知时间戳 {notification_timestamp} <= 上次检查时间戳 {last_check_timestamp}，已处理过，停止检查")
+                        tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页遇到已处理的通知（时间戳：{notification_timestamp}），停止翻页")
+                        stop_pagination = True
                         break
                     
                     if notification_timestamp >= oldest_allowed_timestamp:
                         notification_list.append(notification)
-                        page_has_valid_notifications = True
+                        page_valid_count += 1
                 
-                tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页符合时间范围：{len(notification_list)} 条")
+                if stop_pagination:
+                    tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页符合条件：{page_valid_count} 条，已到达上次检查节点")
+                    break
                 
-                # 如果遇到了上次检查的时间戳，不再翻页
-                if last_check_timestamp and page_list:
-                    last_notification_timestamp = page_list[-1].get('timestamp', 0)
-                    if last_notification_timestamp <= last_check_timestamp:
-                        tencent_logger.info(f"[违规处理-{batch_info}] 已到达上次检查的时间节点，停止翻页")
-                        should_continue = False
-                    else:
-                        should_continue = last_notification_timestamp >= oldest_allowed_timestamp
-                elif page_list:
-                    last_notification_timestamp = page_list[-1].get('timestamp', 0)
-                    should_continue = last_notification_timestamp >= oldest_allowed_timestamp
-                else:
-                    should_continue = False
-                
-                # 继续翻页直到：1) 某页所有通知都超出时间范围 2) 没有更多数据 3) 达到最大页数
-                max_pages = 100  # 最多检查100页
-                
-                while should_continue and current_page < max_pages and len(notification_list) < total_count:
-                    current_page += 1
-                    data['currentPage'] = current_page
-                    data['timestamp'] = str(int(time.time() * 1000))
-                    
-                    try:
-                        async with session.post(url, headers=headers, cookies=cookies, json=data) as response:
-                            if response.status not in [200, 201]:
-                                tencent_logger.warning(f'[违规处理-{batch_info}] 第{current_page}页请求失败，状态码：{response.status}')
-                                break
-                            
-                            result = await response.json()
-                            
-                            if result.get('errCode') != 0:
-                                tencent_logger.warning(f'[违规处理-{batch_info}] 第{current_page}页API返回错误：{result.get("errMsg")}')
-                                break
-                            
-                            page_list = result.get('data', {}).get('list', [])
-                            
-                            if not page_list:
-                                tencent_logger.info(f'[违规处理-{batch_info}] 第{current_page}页无数据，停止翻页')
-                                break
-                            
-                            # 统计本页符合时间范围的通知
-                            page_valid_count = 0
-                            page_oldest_timestamp = float('inf')
-                            stop_pagination = False
-                            
-                            for notification in page_list:
-                                notification_timestamp = notification.get('timestamp', 0)
-                                newest_notification_timestamp = max(newest_notification_timestamp, notification_timestamp)
-                                page_oldest_timestamp = min(page_oldest_timestamp, notification_timestamp)
-                                
-                                # 如果有上次检查时间戳，遇到已处理的通知就停止
-                                if last_check_timestamp and notification_timestamp <= last_check_timestamp:
-                                    tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页遇到已处理的通知（时间戳：{notification_timestamp}），停止翻页")
-                                    stop_pagination = True
-                                    break
-                                
-                                if notification_timestamp >= oldest_allowed_timestamp:
-                                    notification_list.append(notification)
-                                    page_valid_count += 1
-                            
-                            if stop_pagination:
-                                tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页符合条件：{page_valid_count} 条，已到达上次检查节点")
-                                break
-                            
-                            tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页获取：{len(page_list)} 条，符合时间范围：{page_valid_count} 条（最旧：{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(page_oldest_timestamp))}）")
-                            
-                            # 判断是否需要继续翻页
-                            last_notification_timestamp = page_list[-1].get('timestamp', 0)
-                            if last_notification_timestamp < oldest_allowed_timestamp:
-                                tencent_logger.info(f'[违规处理-{batch_info}] ✅ 本页最后一条通知已超出时间范围 ({time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_notification_timestamp))} < {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest_allowed_timestamp))})，提前停止翻页')
-                                should_continue = False
-                            else:
-                                should_continue = True
-                            
-                            await asyncio.sleep(0.5)  # 避免请求过快
-                            
-                    except Exception as e:
-                        tencent_logger.error(f'[违规处理-{batch_info}] 第{current_page}页请求异常：{str(e)}')
-                        break
+                tencent_logger.info(f"[违规处理-{batch_info}] 第{current_page}页获取：{len(page_list)} 条，符合时间范围：{page_valid_count} 条（最旧：{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(page_oldest_timestamp))}）")
                 
-                tencent_logger.info(f"[违规处理-{batch_info}] 通知列表获取完成：共获取 {current_page} 页，筛选出 {len(notification_list)} 条符合时间范围的通知（总数：{total_count}）")
-                
-                # 第一步：收集所有优化建议视频
-                tencent_logger.info("=" * 60)
-                tencent_logger.info(f"[违规处理-{batch_info}] 第一步：收集所有优化建议视频")
-                tencent_logger.info("=" * 60)
-                
-                violation_videos = collect_violation_videos(notification_list)
-                
-                result_stats['violation_videos_count'] = len(violation_videos)
-                
-                tencent_logger.info(f"[违规处理-{batch_info}] 收集结果：发现 {len(violation_videos)} 个违规视频")
-                
-                if not violation_videos:
-                    tencent_logger.info(f"[违规处理-{batch_info}] 未找到任何违规视频，无需继续处理")
-                    return result_stats
-                
-                # 显示收集到的视频列表
-                for idx, v in enumerate(violation_videos, 1):
-                    ts_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(v['publish_timestamp'])) if v['publish_timestamp'] else '无'
-                    title_short = v['video_title'][:40] if v['video_title'] else '未知标题'
-                    object_id = v.get('object_id', '')
-                    violation_type = v.get('violation_type', '未知类型')
-                    tencent_logger.info(f"[违规处理] [{idx}] {title_short} (类型: {violation_type}, 发布: {ts_str}, ObjectID: {object_id or '无'})")
+                # 判断是否需要继续翻页
+                last_notification_timestamp = page_list[-1].get('timestamp', 0)
+                if last_notification_timestamp < oldest_allowed_timestamp:
+                    tencent_logger.info(f'[违规处理-{batch_info}] ✅ 本页最后一条通知已超出时间范围 ({time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_notification_timestamp))} < {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest_allowed_timestamp))})，提前停止翻页')
+                    should_continue = False
+                else:
+                    should_continue = True
                 
-                # 第二步：按时间区间查询所有视频
-                tencent_logger.info("=" * 60)
-                tencent_logger.info(f"[违规处理-{batch_info}] 第二步：按时间区间查询所有视频（自动翻页）")
-                tencent_logger.info("=" * 60)
+                await asyncio.sleep(0.5)  # 避免请求过快
                 
-                # ✅ 调用异步版本的查询函数
-                matched_videos = await find_videos_by_object_id_and_time_async(session, headers, cookies, violation_videos)
+            except Exception as e:
+                tencent_logger.error(f'[违规处理-{batch_info}] 第{current_page}页请求异常：{str(e)}')
+                break
+        
+        tencent_logger.info(f"[违规处理-{batch_info}] 通知列表获取完成：共获取 {current_page} 页，筛选出 {len(notification_list)} 条符合时间范围的通知（总数：{total_count}）")
+        
+        # 第一步：收集所有优化建议视频
+        tencent_logger.info("=" * 60)
+        tencent_logger.info(f"[违规处理-{batch_info}] 第一步：收集所有优化建议视频")
+        tencent_logger.info("=" * 60)
+        
+        violation_videos = collect_violation_videos(notification_list)
+        
+        result_stats['violation_videos_count'] = len(violation_videos)
+        result_stats['notifications_count'] = len(notification_list)
+        
+        tencent_logger.info(f"[违规处理-{batch_info}] 收集结果：发现 {len(violation_videos)} 个违规视频")
+        
+        if not violation_videos:
+            tencent_logger.info(f"[违规处理-{batch_info}] 未找到任何违规视频，无需继续处理")
+            result_stats['newest_notification_timestamp'] = newest_notification_timestamp
+            return result_stats
+        
+        # 显示收集到的视频列表
+        for idx, v in enumerate(violation_videos, 1):
+            ts_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(v['publish_timestamp'])) if v['publish_timestamp'] else '无'
+            title_short = v['video_title'][:40] if v['video_title'] else '未知标题'
+            object_id = v.get('object_id', '')
+            violation_type = v.get('violation_type', '未知类型')
+            tencent_logger.info(f"[违规处理] [{idx}] {title_short} (类型: {violation_type}, 发布: {ts_str}, ObjectID: {object_id or '无'})")
+        
+        # 第二步：按时间区间查询所有视频
+        tencent_logger.info("=" * 60)
+        tencent_logger.info(f"[违规处理-{batch_info}] 第二步：按时间区间查询所有视频（自动翻页）")
+        tencent_logger.info("=" * 60)
+        
+        # ✅ 调用异步版本的查询函数
+        matched_videos = await find_videos_by_object_id_and_time_async(client, violation_videos)
         
         # 第三步：对比数据并执行逻辑
         tencent_logger.info("=" * 60)
@@ -1044,113 +521,88 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         skip_count = 0
         not_found_count = 0
         already_hidden_count = 0
+        deferred_count = 0  # 因频率限制加入队列的操作
         rate_limited = False  # 是否遇到删除频率限制
+        limiter = get_rate_limiter()
         
-        for idx, violation in enumerate(violation_videos, 1):
-            video_title = violation['video_title']
+        # 找出匹配到的作品，未匹配的只计数
+        videos = []
+        for violation in violation_videos:
             object_id = violation.get('object_id', '')
             publish_timestamp = violation['publish_timestamp']
-            
-            tencent_logger.info(f"[违规处理-{batch_info}] [{idx}/{len(violation_videos)}] 处理违规视频: {video_title[:50]}")
-            
-            # 查找匹配的视频
-            match_key = None
-            if object_id:
-                match_key = f"objectId_{object_id}"
-            elif publish_timestamp:
-                match_key = f"timestamp_{publish_timestamp}"
-            
+            match_key = f"objectId_{object_id}" if object_id else (f"timestamp_{publish_timestamp}" if publish_timestamp else None)
             match_data = matched_videos.get(match_key) if match_key else None
-            
             if match_data:
-                video = match_data['video']
-                used_match_method = match_data.get('match_method', 'unknown')
-                read_count = video.get('readCount', 0)
-                video_object_id = video.get('objectId', '')  # 纯数字ID
-                export_id = video.get('exportId', '')  # export/ 格式的ID
-                visible_type = video.get('visibleType', 1)  # 1=公开, 3=仅自己可见
-                
-                # 获取合集信息
-                desc_obj = video.get('desc', {})
-                topic_obj = desc_obj.get('topic', {}) if isinstance(desc_obj, dict) else {}
-                collection_id = topic_obj.get('collectionId', '') if isinstance(topic_obj, dict) else ''
-                collection_name = topic_obj.get('collectionName', '') if isinstance(topic_obj, dict) else ''
+                videos.append(match_data['video'])
+            else:
+                tencent_logger.warning(f"[违规处理-{batch_info}] 未找到匹配的视频（可能已删除或时间范围外）: {violation['video_title'][:50]}")
+                not_found_count += 1
+        
+        # 对整批作品求值删除 / 隐藏规则
+        plan = violation_rules(violation_delete_views, violation_hide_views, hidden_visible_type=VISIBLE_SELF).plan(videos)
+        plan.log(tencent_logger, f"[违规处理-{batch_info}]", dry_run=dry_run)
+        video_index = get_video_index()
+        
+        # 试运行只输出计划，不执行任何操作
+        for item in ([] if dry_run else plan.items):
+            video = item['record']
+            export_id = video['export_id']  # export/ 格式的ID
+            
+            if item['action'] == ACTION_DELETE:
+                # ✅ 已遇到删除频率限制：加入队列，额度重置后继续删除
+                if rate_limited:
+                    limiter.defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': video['object_id']})
+                    deferred_count += 1
+                    continue
+                # 执行删除（使用 exportId），请求间隔由限流器控制
+                success,errmsg = await delete_violation_video(export_id, client=client)
                 
-                tencent_logger.info(f"[违规处理-{batch_info}] 找到匹配视频 (匹配方式: {used_match_method})")
-                tencent_logger.info(f"[违规处理-{batch_info}] Object ID: {video_object_id}")
-                tencent_logger.info(f"[违规处理-{batch_info}] Export ID: {export_id}")
-                tencent_logger.info(f"[违规处理-{batch_info}] 真实播放量: {read_count}")
-                tencent_logger.info(f"[违规处理-{batch_info}] 可见性: {visible_type} (1=公开, 3=仅自己可见)")
-                if collection_id:
-                    tencent_logger.info(f"[违规处理-{batch_info}] 合集ID: {collection_id}")
-                    tencent_logger.info(f"[违规处理-{batch_info}] 合集名称: {collection_name}")
+                # 使用配置的处理间隔
+                if process_interval > 0:
+                    tencent_logger.info(f"[违规处理-{batch_info}] 等待处理间隔 {process_interval} 秒...")
+                    await asyncio.sleep(process_interval)
                 
-                # 根据真实播放量判断并执行操作
-                if read_count < violation_delete_views:
-                    tencent_logger.warning(f"[违规处理-{batch_info}] ❌ 满足删除条件（{read_count} < {violation_delete_views}）")
-                    
-                    # ✅ 检查是否已经遇到删除频率限制
-                    if rate_limited:
-                        tencent_logger.warning(f"[违规处理-{batch_info}] ⚠️ 已遇到删除频率限制，跳过删除操作")
-                        skip_count += 1
-                    else:
-                        # 执行删除（使用 exportId）
-                        success,errmsg = await delete_violation_video(export_id, account_file, sessionid, wxuin)
-                        
-                        # 使用配置的处理间隔
-                        if process_interval > 0:
-                            tencent_logger.info(f"[违规处理-{batch_info}] 等待处理间隔 {process_interval} 秒...")
-                            await asyncio.sleep(process_interval)
-                        else:
-                            await asyncio.sleep(1.5)  # 默认间隔，避免请求过快
-                        
-                        if success:
-                            delete_count += 1
-                            tencent_logger.info(f"[违规处理-{batch_info}] 删除成功")
-                        else:
-                            if errmsg =='暂无法删除，你今日删除太频繁，如需继续操作可登录管理员账号重试':
-                                tencent_logger.error(f"[违规处理-{batch_info}] ⚠️ 遇到删除频率限制，后续不再执行删除操作，但继续处理隐藏")
-                                rate_limited = True
-                                skip_count += 1
-                                # ✅ 不再 break，继续处理后续的隐藏操作
-                            else:
-                                tencent_logger.error(f"[违规处理-{batch_info}] 删除失败: {errmsg}")
-                        
-                elif read_count >= violation_hide_views:
-                    # 检查是否已经隐藏
-                    if visible_type == 3:
-                        tencent_logger.info(f"[违规处理-{batch_info}] ⏭️  视频已经是隐藏状态（仅自己可见），跳过")
-                        already_hidden_count += 1
+                if success:
+                    delete_count += 1
+                    video_index.mark(index_account(account_file), export_id, status=STATUS_DELETED)
+                    tencent_logger.info(f"[违规处理-{batch_info}] 删除成功: {video['object_id']}")
+                else:
+                    if errmsg == DELETE_RATE_LIMIT_MSG:
+                        tencent_logger.error(f"[违规处理-{batch_info}] ⚠️ 遇到删除频率限制，剩余删除加入队列，继续处理隐藏")
+                        rate_limited = True
+                        limiter.defer(client.account, ENDPOINT_DELETE, export_id, {'object_id': video['object_id']})
+                        deferred_count += 1
                     else:
-                        tencent_logger.warning(f"[违规处理-{batch_info}] 🔒 满足隐藏条件（{read_count} >= {violation_hide_views}）")
-                        # 执行隐藏（使用 exportId，如果在合集中会先移除）
-                        success = await hide_violation_video(
-                            object_id=export_id,
-                            account_file=account_file,
-                            sessionid=sessionid,
-                            wxuin=wxuin,
-                            collection_id=collection_id if collection_id else None
-                        )
-                        
-                        # 使用配置的处理间隔
-                        if process_interval > 0:
-                            tencent_logger.info(f"[违规处理-{batch_info}] 等待处理间隔 {process_interval} 秒...")
-                            await asyncio.sleep(process_interval)
-                        else:
-                            await asyncio.sleep(1.5)  # 默认间隔，避免请求过快
-                        
-                        if success:
-                            hide_count += 1
-                            tencent_logger.info(f"[违规处理-{batch_info}] 隐藏成功")
-                        else:
-                            tencent_logger.error(f"[违规处理-{batch_info}] 隐藏失败")
-                        
+                        tencent_logger.error(f"[违规处理-{batch_info}] 删除失败: {errmsg}")
+            
+            elif item['action'] == ACTION_HIDE:
+                if limiter.exhausted(client.account, ENDPOINT_HIDE):
+                    limiter.defer(client.account, ENDPOINT_HIDE, export_id, {'collection_id': video['collection_id']})
+                    deferred_count += 1
+                    continue
+                # 执行隐藏（使用 exportId，如果在合集中会先移除）
+                success = await hide_violation_video(
+                    object_id=export_id,
+                    collection_id=video['collection_id'] or None,
+                    client=client
+                )
+                
+                # 使用配置的处理间隔
+                if process_interval > 0:
+                    tencent_logger.info(f"[违规处理-{batch_info}] 等待处理间隔 {process_interval} 秒...")
+                    await asyncio.sleep(process_interval)
+                
+                if success:
+                    hide_count += 1
+                    video_index.mark(index_account(account_file), export_id, visible_type=VISIBLE_SELF)
+                    tencent_logger.info(f"[违规处理-{batch_info}] 隐藏成功: {video['object_id']}")
                 else:
-                    tencent_logger.info(f"[违规处理-{batch_info}] ⏸️  不满足条件（{violation_delete_views} <= {read_count} < {violation_hide_views}）")
-                    skip_count += 1
+                    tencent_logger.error(f"[违规处理-{batch_info}] 隐藏失败: {video['object_id']}")
+            
+            elif item['rule'] == 'already_hidden':
+                already_hidden_count += 1
             else:
-                tencent_logger.warning(f"[违规处理-{batch_info}] 未找到匹配的视频（可能已删除或时间范围外）")
-                not_found_count += 1
+                skip_count += 1
         
         # 更新结果统计
         result_stats['delete_count'] = delete_count
@@ -1159,6 +611,8 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         result_stats['not_found_count'] = not_found_count
         result_stats['already_hidden_count'] = already_hidden_count
         result_stats['rate_limited'] = rate_limited
+        result_stats['deferred_count'] = deferred_count
+        result_stats['matched_count'] = len(matched_videos)
         
         # 汇总结果（批次信息）
         tencent_logger.info("=" * 60)
@@ -1172,10 +626,11 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
         tencent_logger.info(f"[违规处理-{batch_info}] 已隐藏: {hide_count} 个（播放量 >= {violation_hide_views}）")
         tencent_logger.info(f"[违规处理-{batch_info}] 已是隐藏状态: {already_hidden_count} 个（跳过）")
         tencent_logger.info(f"[违规处理-{batch_info}] 暂不处理: {skip_count} 个")
+        tencent_logger.info(f"[违规处理-{batch_info}] 额度用完排队: {deferred_count} 个")
         tencent_logger.info("=" * 60)
         
-        # 更新用户的最后检查时间戳
-        if user_id and newest_notification_timestamp > 0:
+        # 更新用户的最后检查时间戳（试运行不更新，避免下次跳过这些通知）
+        if user_id and newest_notification_timestamp > 0 and not dry_run:
             try:
                 from db_manager import get_db_manager
                 
@@ -1187,8 +642,14 @@ async def _process_violation_batch(account_file, violation_delete_days, violatio
             except Exception as e:
                 tencent_logger.warning(f"[违规处理-{batch_info}] 更新最后检查时间戳失败: {str(e)}")
         
+        # 只有全部处理完成才返回检查进度，出错时下次巡检重新处理这些通知
+        result_stats['newest_notification_timestamp'] = newest_notification_timestamp
         return result_stats
         
     except Exception as e:
         tencent_logger.exception(f"[违规处理-{batch_info}] 处理过程出错: {str(e)}")
+        result_stats['error'] = f"{type(e).__name__}: {e}"
         return result_stats
+    finally:
+        result_stats['api_calls'] = client.request_count
+        await client.close()
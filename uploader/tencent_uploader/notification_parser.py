@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+视频号通知解析
+
+- 违规通知标题、通知内容中的标题 / 发布时间、refUrl 中的 objectId 都使用预编译的正则，
+  内容只扫描一遍（合并后的正则按命名分组区分是哪一种字段）；
+- iter_violation_videos 逐条解析通知，不需要先把整页通知转换成中间列表；
+- PostTimeIndex 按发布时间排序作品，按时间匹配违规视频时二分查找，不再逐个比较。
+"""
+import re
+from bisect import bisect_left
+from datetime import datetime
+
+# 需要处理的违规通知类型，按优先级排列
+VIOLATION_TITLES = (
+    '作品优化建议',
+    '你有1条视频号视频被暂时限制传播',
+    '视频号视频被暂时限制传播',
+    '你的视频号视频被暂时限制传播',
+)
+VIOLATION_TITLE_RE = re.compile('|'.join(re.escape(title) for title in VIOLATION_TITLES))
+
+_TIME = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'
+# 支持的内容格式：
+# 1. 作品优化建议：作品标题：xxx  发布时间：2026-06-26 07:10:01（标题与发布时间之间可能没有空白，也可能换行）
+# 2. 限制传播：你于2026-06-26 07:10:01发表的短剧视频" #xxx..."中
+CONTENT_RE = re.compile(
+    rf'作品标题：\s*(?P<title>.+?)(?=\s*发布时间：|$)'
+    rf'|短剧视频["\s]*[#《]*(?P<drama_title>[^"\.]+)'
+    rf'|发布时间：(?P<time>{_TIME})'
+    rf'|你于(?P<published_time>{_TIME})发表的',
+    re.MULTILINE
+)
+# 按发布时间匹配作品时允许的误差（秒），通知中的发布时间与作品 createTime 精度相同，默认要求完全一致
+TIME_MATCH_TOLERANCE = 0
+
+# unique_id=mmfindermachineauditdelivery14943811069001337356；rand_id=FDxxx 这种无法提取 objectId，只能按时间匹配
+OBJECT_ID_RE = re.compile(r'unique_id=mmfindermachineauditdelivery(\d+)')
+
+
+def _to_timestamp(time_str):
+    # 'YYYY-MM-DD HH:MM:SS'，按本地时间转换
+    try:
+        return int(datetime(int(time_str[0:4]), int(time_str[5:7]), int(time_str[8:10]),
+                            int(time_str[11:13]), int(time_str[14:16]), int(time_str[17:19])).timestamp())
+    except ValueError:
+        return 0
+
+
+def extract_video_info(content, ref_url=''):
+    """从通知内容和 refUrl 中提取 (视频标题, 发布时间戳, objectId)"""
+    fields = {}
+    for match in CONTENT_RE.finditer(content):
+        # 每个分支只有一个命名分组，lastgroup 即命中的字段；同一字段只保留第一次出现的值
+        if match.lastgroup not in fields:
+            fields[match.lastgroup] = match.group(match.lastgroup)
+
+    if 'title' in fields:
+        video_title = fields['title'].strip()
+    else:
+        video_title = fields.get('drama_title', '').strip().rstrip('.')
+    time_str = fields.get('time') or fields.get('published_time')
+    publish_timestamp = _to_timestamp(time_str) if time_str else 0
+
+    object_id = ''
+    if ref_url:
+        object_id_match = OBJECT_ID_RE.search(ref_url)
+        if object_id_match:
+            object_id = object_id_match.group(1)
+    return video_title, publish_timestamp, object_id
+
+
+def violation_type(title):
+    """返回通知标题对应的违规类型，不是违规通知时返回空字符串"""
+    match = VIOLATION_TITLE_RE.search(title) if title else None
+    return match.group(0) if match else ''
+
+
+def iter_violation_videos(notifications, on_unparsed=None):
+    """逐条解析通知，产出违规视频信息；是违规通知但提取不到 objectId 和发布时间时调用 on_unparsed(notification)"""
+    for notification in notifications:
+        content = notification.get('content', '')
+        if not content or notification.get('isSpecialJumpType', 1) != 0:
+            continue
+        vtype = violation_type(notification.get('title', ''))
+        if not vtype:
+            continue
+        video_title, publish_timestamp, object_id = extract_video_info(content, notification.get('refUrl', ''))
+        if not object_id and not publish_timestamp:
+            if on_unparsed is not None:
+                on_unparsed(notification)
+            continue
+        yield {
+            'video_title': video_title,
+            'publish_timestamp': publish_timestamp,
+            'object_id': object_id,
+            'notification_timestamp': notification.get('timestamp', 0),
+            'content': content,
+            'violation_type': vtype,  # 记录违规类型
+            'match_method': 'object_id' if object_id else 'timestamp'
+        }
+
+
+class PostTimeIndex(object):
+    """按发布时间排序的作品，用于按发布时间（允许 tolerance 秒误差）查找作品"""
+
+    def __init__(self, posts, time_key='create_time'):
+        ordered = sorted((post for post in posts if post.get(time_key)), key=lambda post: post[time_key])
+        self.times = [post[time_key] for post in ordered]
+        self.posts = ordered
+
+    def __len__(self):
+        return len(self.posts)
+
+    def find(self, timestamp, tolerance=0):
+        """返回发布时间与 timestamp 相差不超过 tolerance 秒、且最接近的作品，没有时返回 None"""
+        if not timestamp or not self.times:
+            return None
+        index = bisect_left(self.times, timestamp - tolerance)
+        best = None
+        while index < len(self.times) and self.times[index] <= timestamp + tolerance:
+            if best is None or abs(self.times[index] - timestamp) < abs(self.times[best] - timestamp):
+                best = index
+            index += 1
+        return self.posts[best] if best is not None else None
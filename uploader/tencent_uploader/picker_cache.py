@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+视频号发表页“选择合集”、“参与活动”选择器的页面缓存
+
+- 合集列表、活动搜索结果按账号缓存 PICKER_CACHE_TTL 秒，同一账号连续上传时不必每次重新翻找；
+- 读取页面时用一次 evaluate 取出全部条目的文字（合集名称 / 活动名称、创建者），选择时也只需一次调用，
+  不再逐个元素 await text_content。
+
+合集列表中没有可见的合集 id，缓存的是合集名称 → 列表中的位置；只有翻到列表底部后才缓存（完整列表），
+据此判断合集不存在时可以直接创建，不必再翻找一遍。
+"""
+import threading
+import time
+
+PICKER_CACHE_TTL = 1800  # 缓存有效期（秒）
+
+KIND_COLLECTION = 'collection'
+KIND_ACTIVITY = 'activity'
+
+# 读取合集列表：返回合集名称（不含“创建新合集”），按页面顺序
+COLLECTION_NAMES_JS = '''(container) => Array.from(container.querySelectorAll('.option-item .item'))
+    .filter(el => !el.textContent.includes('创建新合集'))
+    .map(el => { const name = el.querySelector('.name'); return name ? name.textContent.trim() : ''; })'''
+
+# 选择合集：找到名称完全一致的合集直接点击；没找到时滚动到底部触发加载（先到底、上移一段、再到底），
+# 返回 {found, names}，names 为本次读取到的全部合集名称
+SELECT_COLLECTION_JS = '''async (container, target) => {
+    const items = Array.from(container.querySelectorAll('.option-item .item'))
+        .filter(el => !el.textContent.includes('创建新合集'));
+    const names = items.map(el => { const name = el.querySelector('.name'); return name ? name.textContent.trim() : ''; });
+    const index = names.indexOf(target);
+    if (index >= 0) {
+        items[index].click();
+        return { found: true, names };
+    }
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+    container.scrollTop = container.scrollHeight;
+    await sleep(500);
+    container.scrollTop = Math.max(0, container.scrollTop - container.clientHeight / 3);
+    await sleep(300);
+    container.scrollTop = container.scrollHeight;
+    return { found: false, names };
+}'''
+
+# 读取活动搜索结果：返回 [{name, creator}]，按页面顺序
+ACTIVITY_ITEMS_JS = '''(form) => Array.from(form.querySelectorAll('.activity-item-info')).map(el => {
+    const name = el.querySelector('.name');
+    const creator = el.querySelector('.creator-name');
+    return { name: name ? name.textContent : '', creator: creator ? creator.textContent : '' };
+})'''
+
+
+class PickerCache(object):
+    """按 (账号, 类型, 键) 缓存选择器内容，超过 ttl 秒的条目视为失效"""
+
+    def __init__(self, ttl=PICKER_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, account, kind, key=''):
+        with self._lock:
+            entry = self._entries.get((account, kind, key))
+            if entry is None:
+                return None
+            saved_at, value = entry
+            if time.time() - saved_at > self.ttl:
+                del self._entries[(account, kind, key)]
+                return None
+            return value
+
+    def put(self, account, kind, value, key=''):
+        with self._lock:
+            self._entries[(account, kind, key)] = (time.time(), value)
+
+    def invalidate(self, account, kind=None, key=None):
+        """删除账号的缓存，kind / key 为 None 时删除该账号对应的全部条目"""
+        with self._lock:
+            for entry_key in list(self._entries):
+                entry_account, entry_kind, entry_name = entry_key
+                if entry_account != account:
+                    continue
+                if kind is not None and entry_kind != kind:
+                    continue
+                if key is not None and entry_name != key:
+                    continue
+                del self._entries[entry_key]
+
+    def collections(self, account):
+        """缓存的完整合集列表：合集名称 → 位置，没有缓存时返回 None"""
+        names = self.get(account, KIND_COLLECTION)
+        return None if names is None else {name: index for index, name in enumerate(names)}
+
+
+_picker_cache = None
+
+
+def get_picker_cache():
+    global _picker_cache
+    if _picker_cache is None:
+        _picker_cache = PickerCache()
+    return _picker_cache
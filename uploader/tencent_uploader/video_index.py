@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+视频号作品本地索引
+
+按账号把 statistic/post_list 返回的作品（objectId、exportId、发布时间、播放量、标题、可见性、合集）保存到本地表，
+删除、隐藏和违规处理直接查询索引，不再每次从头翻页请求接口。
+
+同步策略：
+- 索引在 INDEX_REFRESH_INTERVAL 秒内刷新过且覆盖所需时间范围时，只拉取检查点之后新发布的作品（通常只需一页）；
+- 否则重新拉取整个时间范围，刷新播放量，并把范围内接口已不再返回的作品标记为 gone。
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db_manager import get_db_manager
+from social_auto_upload.utils.log import tencent_logger
+
+INDEX_REFRESH_INTERVAL = 600  # 播放量等数据的最长缓存时间（秒）
+SYNC_PAGE_SIZE = 50  # 同步时每页请求的作品数
+SYNC_PAGE_INTERVAL = 0.5  # 翻页间隔（秒），避免请求过快
+
+STATUS_ACTIVE = 'active'
+STATUS_DELETED = 'deleted'
+STATUS_GONE = 'gone'  # 刷新时接口不再返回（已在别处删除）
+
+COLUMNS = ('object_id', 'export_id', 'create_time', 'read_count', 'title', 'visible_type',
+           'collection_id', 'collection_name', 'status', 'synced_at')
+
+
+def index_account(account_file):
+    """索引中的账号键：cookie 文件名"""
+    return os.path.basename(account_file)
+
+
+def video_title(video):
+    """提取作品标题：优先 desc.component.title，其次 desc.description"""
+    desc_obj = video.get('desc', {})
+    if isinstance(desc_obj, str):
+        return desc_obj
+    if not isinstance(desc_obj, dict):
+        return ''
+    component_obj = desc_obj.get('component', {})
+    title = component_obj.get('title', '') if isinstance(component_obj, dict) else ''
+    return title or desc_obj.get('description', '')
+
+
+def _day_start(timestamp):
+    # post_list 的 startTime / endTime 按天生效，统一取当天 00:00:00
+    return int(datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def _record(account, video, synced_at):
+    desc_obj = video.get('desc', {})
+    topic_obj = desc_obj.get('topic', {}) if isinstance(desc_obj, dict) else {}
+    if not isinstance(topic_obj, dict):
+        topic_obj = {}
+    return {
+        'account': account,
+        'object_id': str(video.get('objectId', '')),
+        'export_id': video.get('exportId', ''),
+        'create_time': int(video.get('createTime', 0) or 0),
+        'read_count': int(video.get('readCount', 0) or 0),
+        'title': video_title(video),
+        'visible_type': int(video.get('visibleType', 1) or 1),
+        'collection_id': topic_obj.get('collectionId', '') or '',
+        'collection_name': topic_obj.get('collectionName', '') or '',
+        'status': STATUS_ACTIVE,
+        'synced_at': synced_at,
+    }
+
+
+class ChannelsVideoIndex(object):
+    """视频号作品索引，数据保存在 channels_video_index / channels_index_checkpoint 表中"""
+
+    def __init__(self, refresh_interval=INDEX_REFRESH_INTERVAL, page_size=SYNC_PAGE_SIZE):
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.db_manager = get_db_manager()
+        self._locks = {}
+        self.init_db()
+
+    def init_db(self):
+        with self.db_manager.get_session() as session:
+            session.execute(text('''CREATE TABLE IF NOT EXISTS channels_video_index (
+                account TEXT NOT NULL,            -- cookie 文件名
+                object_id TEXT NOT NULL,
+                export_id TEXT,                   -- 删除、隐藏接口使用的 ID
+                create_time INTEGER NOT NULL,     -- 发布时间戳
+                read_count INTEGER DEFAULT 0,     -- 播放量
+                title TEXT,
+                visible_type INTEGER DEFAULT 1,   -- 1=公开, 3=仅自己可见
+                collection_id TEXT,
+                collection_name TEXT,
+                status TEXT DEFAULT 'active',     -- active / deleted / gone
+                synced_at INTEGER,                -- 最近一次从接口同步的时间
+                PRIMARY KEY (account, object_id)
+            )'''))
+            session.execute(text('''CREATE INDEX IF NOT EXISTS idx_channels_video_index_time
+                ON channels_video_index (account, status, create_time)'''))
+            session.execute(text('''CREATE INDEX IF NOT EXISTS idx_channels_video_index_read
+                ON channels_video_index (account, status, read_count)'''))
+            session.execute(text('''CREATE TABLE IF NOT EXISTS channels_index_checkpoint (
+                account TEXT PRIMARY KEY,
+                newest_create_time INTEGER DEFAULT 0, -- 已同步的最新发布时间
+                covered_from INTEGER DEFAULT 0,       -- 最近一次完整刷新覆盖的起始时间
+                refreshed_at INTEGER DEFAULT 0,       -- 最近一次完整刷新的时间
+                api_calls INTEGER DEFAULT 0           -- 累计请求次数
+            )'''))
+
+    def checkpoint(self, account):
+        row = self.db_manager._execute_query_one(
+            'SELECT newest_create_time, covered_from, refreshed_at, api_calls FROM channels_index_checkpoint WHERE account = :account',
+            {'account': account}
+        )
+        if not row:
+            return None
+        return {key: row[key] for key in ('newest_create_time', 'covered_from', 'refreshed_at', 'api_calls')}
+
+    def _save_checkpoint(self, account, newest_create_time, covered_from, refreshed_at, api_calls):
+        self.db_manager._execute_write(
+            '''INSERT INTO channels_index_checkpoint (account, newest_create_time, covered_from, refreshed_at, api_calls)
+               VALUES (:account, :newest_create_time, :covered_from, :refreshed_at, :api_calls)
+               ON CONFLICT(account) DO UPDATE SET
+                   newest_create_time = MAX(newest_create_time, excluded.newest_create_time),
+                   covered_from = excluded.covered_from,
+                   refreshed_at = excluded.refreshed_at,
+                   api_calls = api_calls + excluded.api_calls''',
+            {'account': account, 'newest_create_time': newest_create_time, 'covered_from': covered_from,
+             'refreshed_at': refreshed_at, 'api_calls': api_calls}
+        )
+
+    def upsert(self, records):
+        if not records:
+            return
+        self.db_manager._execute_write_many(
+            '''INSERT INTO channels_video_index
+                   (account, object_id, export_id, create_time, read_count, title, visible_type,
+                    collection_id, collection_name, status, synced_at)
+               VALUES (:account, :object_id, :export_id, :create_time, :read_count, :title, :visible_type,
+                       :collection_id, :collection_name, :status, :synced_at)
+               ON CONFLICT(account, object_id) DO UPDATE SET
+                   export_id = excluded.export_id,
+                   create_time = excluded.create_time,
+                   read_count = excluded.read_count,
+                   title = excluded.title,
+                   visible_type = excluded.visible_type,
+                   collection_id = excluded.collection_id,
+                   collection_name = excluded.collection_name,
+                   status = CASE WHEN channels_video_index.status = 'deleted' THEN 'deleted' ELSE 'active' END,
+                   synced_at = excluded.synced_at''',
+            records
+        )
+
+    async def _fetch(self, client, account, start_day, end_day, stop_before=None):
+        """分页拉取 [start_day, end_day] 的作品写入索引，返回 (请求次数, 最新发布时间, 同步时间)
+
+        stop_before 不为空时，遇到发布时间不晚于它的作品即停止（接口按发布时间倒序返回）。
+        """
+        synced_at = int(time.time())
+        current_page = 1
+        fetched = 0
+        calls = 0
+        newest = 0
+        while True:
+            result = await client.post_list(start_day, end_day, current_page, self.page_size)
+            calls += 1
+            if result.get('errCode') != 0:
+                raise RuntimeError(f"post_list 返回错误：{result.get('errMsg')}")
+            data_obj = result.get('data', {})
+            video_list = data_obj.get('list', [])
+            total_count = data_obj.get('totalCount', 0)
+            records = [_record(account, video, synced_at) for video in video_list if video.get('objectId')]
+            self.upsert(records)
+            fetched += len(video_list)
+            if records:
+                newest = max(newest, max(record['create_time'] for record in records))
+            if not video_list or fetched >= total_count:
+                break
+            if stop_before is not None and records and min(record['create_time'] for record in records) <= stop_before:
+                break
+            current_page += 1
+            await asyncio.sleep(SYNC_PAGE_INTERVAL)
+        return calls, newest, synced_at
+
+    async def sync(self, client, account, start_time, end_time=None, force=False):
+        """保证索引覆盖 [start_time, end_time] 且数据足够新，返回本次请求接口的次数"""
+        start_day = _day_start(start_time)
+        end_day = _day_start(end_time or time.time())
+        lock = self._locks.setdefault(account, asyncio.Lock())
+        async with lock:
+            checkpoint = self.checkpoint(account)
+            now = int(time.time())
+            fresh = (checkpoint is not None and now - checkpoint['refreshed_at'] < self.refresh_interval
+                     and checkpoint['covered_from'] <= start_day)
+            if fresh and not force:
+                # 只拉取检查点之后新发布的作品
+                newest_before = checkpoint['newest_create_time']
+                fetch_from = max(start_day, _day_start(newest_before or start_day))
+                if fetch_from > end_day:
+                    return 0
+                calls, newest, _ = await self._fetch(client, account, fetch_from, end_day, stop_before=newest_before)
+                self._save_checkpoint(account, newest, checkpoint['covered_from'], checkpoint['refreshed_at'], calls)
+                tencent_logger.info(f"[作品索引] {account} 增量同步完成，请求 {calls} 次")
+                return calls
+
+            calls, newest, synced_at = await self._fetch(client, account, start_day, end_day)
+            # 刷新范围内本次未返回的作品已在别处删除
+            self.db_manager._execute_write(
+                '''UPDATE channels_video_index SET status = :gone
+                   WHERE account = :account AND status = :active AND synced_at < :synced_at
+                     AND create_time >= :start_time AND create_time < :end_time''',
+                {'gone': STATUS_GONE, 'active': STATUS_ACTIVE, 'account': account, 'synced_at': synced_at,
+                 'start_time': start_day, 'end_time': end_day + 24 * 60 * 60}
+            )
+            self._save_checkpoint(account, newest, start_day, now, calls)
+            tencent_logger.info(f"[作品索引] {account} 完整刷新 {datetime.fromtimestamp(start_day):%Y-%m-%d} 起的作品，请求 {calls} 次")
+            return calls
+
+    def records(self, account, start_time=None, end_time=None, newer_than=None, status=STATUS_ACTIVE):
+        """按发布时间倒序返回索引中的作品"""
+        where = ['account = :account', 'status = :status']
+        params = {'account': account, 'status': status}
+        if start_time is not None:
+            where.append('create_time >= :start_time')
+            params['start_time'] = start_time
+        if end_time is not None:
+            where.append('create_time <= :end_time')
+            params['end_time'] = end_time
+        if newer_than:
+            where.append('create_time > :newer_than')
+            params['newer_than'] = newer_than
+        rows = self.db_manager._execute_query(
+            f"SELECT {', '.join(COLUMNS)} FROM channels_video_index WHERE {' AND '.join(where)} ORDER BY create_time DESC",
+            params
+        )
+        return [{key: row[key] for key in COLUMNS} for row in rows]
+
+    def find(self, account, object_ids=(), create_times=()):
+        """按 objectId 或发布时间查找作品，返回 ({object_id: 作品}, {create_time: 作品})"""
+        by_object_id, by_create_time = {}, {}
+        object_ids = [str(object_id) for object_id in object_ids if object_id]
+        create_times = [int(create_time) for create_time in create_times if create_time]
+        if object_ids:
+            params = {f'o{i}': object_id for i, object_id in enumerate(object_ids)}
+            params['account'] = account
+            rows = self.db_manager._execute_query(
+                f"SELECT {', '.join(COLUMNS)} FROM channels_video_index WHERE account = :account AND status = 'active' "
+                f"AND object_id IN ({', '.join(':' + key for key in params if key != 'account')})",
+                params
+            )
+            by_object_id = {row['object_id']: {key: row[key] for key in COLUMNS} for row in rows}
+        if create_times:
+            params = {f't{i}': create_time for i, create_time in enumerate(create_times)}
+            params['account'] = account
+            rows = self.db_manager._execute_query(
+                f"SELECT {', '.join(COLUMNS)} FROM channels_video_index WHERE account = :account AND status = 'active' "
+                f"AND create_time IN ({', '.join(':' + key for key in params if key != 'account')})",
+                params
+            )
+            by_create_time = {row['create_time']: {key: row[key] for key in COLUMNS} for row in rows}
+        return by_object_id, by_create_time
+
+    def mark(self, account, export_id, status=None, visible_type=None):
+        """删除、隐藏成功后同步更新索引"""
+        sets, params = [], {'account': account, 'export_id': export_id}
+        if status is not None:
+            sets.append('status = :status')
+            params['status'] = status
+        if visible_type is not None:
+            sets.append('visible_type = :visible_type')
+            params['visible_type'] = visible_type
+        if not sets:
+            return
+        self.db_manager._execute_write(
+            f"UPDATE channels_video_index SET {', '.join(sets)} WHERE account = :account AND export_id = :export_id",
+            params
+        )
+
+
+_video_index = None
+
+
+def get_video_index():
+    global _video_index
+    if _video_index is None:
+        _video_index = ChannelsVideoIndex()
+    return _video_index
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+视频号作品删除 / 隐藏规则
+
+规则按顺序声明，每条规则由若干 (列, 运算符, 值) 条件组成，条件之间为“且”，先命中的规则生效。
+plan() 把规则集编译成一个只遍历一次作品的函数（if / elif 链，比较运算内联），对整批作品求值，
+输出每个作品的动作（delete / hide / skip）和原因，不执行任何接口操作。
+
+用法：
+    rules = age_views_rules(minutes_ago=1440, max_views=100)
+    plan = rules.plan(video_index.records(account))
+    for item in plan.actions(ACTION_DELETE):
+        ...
+"""
+import operator
+import time
+
+ACTION_DELETE = 'delete'
+ACTION_HIDE = 'hide'
+ACTION_SKIP = 'skip'
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'contains': lambda column_value, value: value in column_value,
+    'startswith': lambda column_value, value: column_value.startswith(value),
+}
+
+# 年龄条件改写为发布时间条件，避免为整批作品计算年龄列：age_minutes >= N 等价于 create_time <= now - N * 60
+AGE_OPERATORS = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+
+# 直接写入生成代码的比较运算符，其余运算符调用 OPERATORS 中的函数
+INLINE_OPERATORS = ('<', '<=', '>', '>=', '==', '!=')
+
+
+def _resolve(condition, now):
+    name, op, value = condition
+    if name == 'age_minutes':
+        return 'create_time', AGE_OPERATORS[op], now - value * 60
+    return condition
+
+
+def _compile(rules, now):
+    """生成 evaluate(records) -> [命中的规则或 None]
+
+    列名、比较值和规则都通过命名空间传入，生成的代码中只有变量名和固定的比较运算符。
+    空值不满足任何条件。
+    """
+    namespace = {}
+    branches = []
+    for i, rule in enumerate(rules):
+        namespace[f'rule_{i}'] = rule
+        tests = []
+        for j, condition in enumerate(rule.conditions):
+            name, op, value = _resolve(condition, now)
+            namespace[f'name_{i}_{j}'] = name
+            namespace[f'value_{i}_{j}'] = value
+            if op in INLINE_OPERATORS:
+                compare = f'value {op} value_{i}_{j}'
+            else:
+                namespace[f'op_{i}_{j}'] = OPERATORS[op]
+                compare = f'op_{i}_{j}(value, value_{i}_{j})'
+            tests.append(f'(value := get(name_{i}_{j})) is not None and {compare}')
+        branches.append((' and '.join(tests) or 'True', f'rule_{i}'))
+
+    lines = ['def evaluate(records):',
+             '    decided = []',
+             '    append = decided.append',
+             '    for record in records:',
+             '        get = record.get']
+    for k, (test, rule_name) in enumerate(branches):
+        lines.append(f"        {'elif' if k else 'if'} {test}:")
+        lines.append(f'            append({rule_name})')
+    if branches:
+        lines.append('        else:')
+        lines.append('            append(None)')
+    else:
+        lines.append('        append(None)')
+    lines.append('    return decided')
+    exec('\n'.join(lines), namespace)
+    return namespace['evaluate']
+
+
+class Rule(object):
+    """一条规则：conditions 全部满足时执行 action，reason 支持 {列名} 占位符"""
+
+    def __init__(self, name, action, conditions, reason):
+        for column, op, value in conditions:
+            if op not in OPERATORS or (column == 'age_minutes' and op not in AGE_OPERATORS):
+                raise ValueError(f'不支持的运算符: {op}')
+        self.name = name
+        self.action = action
+        self.conditions = list(conditions)
+        self.reason = reason
+
+
+class ActionPlan(object):
+    """规则求值结果：rules[i] 为第 i 个作品命中的规则（未命中为 None），条目在取用时才生成"""
+
+    def __init__(self, records, rules, default_reason, elapsed_ms):
+        self.records = records
+        self.rules = rules
+        self.default_reason = default_reason
+        self.elapsed_ms = elapsed_ms
+
+    def _item(self, record, rule):
+        if rule is None:
+            return {'record': record, 'action': ACTION_SKIP, 'rule': 'no_match', 'reason': self.default_reason}
+        return {'record': record, 'action': rule.action, 'rule': rule.name, 'reason': rule.reason.format_map(record)}
+
+    @property
+    def items(self):
+        """与输入作品顺序一致的全部条目"""
+        return [self._item(record, rule) for record, rule in zip(self.records, self.rules)]
+
+    def actions(self, action):
+        return [self._item(record, rule) for record, rule in zip(self.records, self.rules)
+                if (rule.action if rule is not None else ACTION_SKIP) == action]
+
+    def counts(self):
+        """按规则名统计作品数"""
+        counts = {}
+        for rule in self.rules:
+            name = rule.name if rule is not None else 'no_match'
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def log(self, logger, prefix, dry_run=False):
+        """输出汇总和需要操作的作品，不再逐个作品输出比对明细"""
+        summary = '，'.join(f'{rule} {count} 个' for rule, count in self.counts().items())
+        logger.info(f"{prefix} {'[试运行] ' if dry_run else ''}规则求值 {len(self.records)} 个作品，耗时 {self.elapsed_ms:.1f} ms：{summary or '无'}")
+        for action in (ACTION_DELETE, ACTION_HIDE):
+            for item in self.actions(action):
+                record = item['record']
+                logger.info(f"{prefix} => {action} {record.get('object_id') or record.get('title', '')[:30]}：{item['reason']}")
+
+
+class RuleSet(object):
+    def __init__(self, rules, default_reason='不符合任何规则'):
+        self.rules = list(rules)
+        self.default_reason = default_reason
+
+    def plan(self, records, now=None):
+        started = time.perf_counter()
+        decided = _compile(self.rules, now or time.time())(records)
+        return ActionPlan(records, decided, self.default_reason, (time.perf_counter() - started) * 1000)
+
+
+def age_views_rules(minutes_ago, max_views, title_keyword=None, delete_fail=True, delete_waitdel=True):
+    """发布超过 minutes_ago 分钟且播放量低于 max_views 的作品删除（可按标题关键词过滤）"""
+    rules = []
+    if delete_fail:
+        rules.append(Rule('processed_fail', ACTION_DELETE, [('processed_fail', '==', True)], '处理失败的视频'))
+    if delete_waitdel:
+        rules.append(Rule('waitdel', ACTION_DELETE, [('title', 'startswith', 'waitdel-')], 'waitdel-视频'))
+    if minutes_ago is not None and max_views is not None:
+        conditions = [('age_minutes', '>=', minutes_ago), ('read_count', '<', max_views)]
+        if title_keyword:
+            conditions.append(('title', 'contains', title_keyword))
+        rules.append(Rule('age_views', ACTION_DELETE, conditions,
+                          f'发布超过{minutes_ago}分钟且播放量 {{read_count}} < {max_views}'))
+    return RuleSet(rules, default_reason=f'不满足删除条件（{minutes_ago}分钟前 且 播放量<{max_views}）')
+
+
+def violation_rules(delete_views, hide_views, hidden_visible_type=3):
+    """违规作品：低播放量删除，高播放量隐藏（已隐藏的跳过），其余暂不处理"""
+    return RuleSet([
+        Rule('delete', ACTION_DELETE, [('read_count', '<', delete_views)],
+             f'播放量 {{read_count}} < {delete_views}'),
+        Rule('already_hidden', ACTION_SKIP, [('read_count', '>=', hide_views), ('visible_type', '==', hidden_visible_type)],
+             '已经是隐藏状态（仅自己可见）'),
+        Rule('hide', ACTION_HIDE, [('read_count', '>=', hide_views)],
+             f'播放量 {{read_count}} >= {hide_views}'),
+    ], default_reason=f'{delete_views} <= 播放量 < {hide_views}，暂不处理')
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+视频号违规视频巡检服务
+
+上传流程只负责登记账号（register），巡检在独立线程的事件循环中执行，不随上传的 asyncio.run 结束而中断：
+- 按账号到期时间调度，全局最多同时巡检 concurrency 个账号，同一账号同一时间只有一个巡检；
+- 账号配置、最后检查的通知时间戳、下次巡检时间保存在 violation_sweep_accounts 表中，进程重启后继续；
+- 每次巡检的统计（通知数、违规数、匹配数、删除数、隐藏数、排队数、接口请求数、耗时）写入 violation_sweep_runs 表；
+- 因额度用完排队的删除 / 隐藏不等下次巡检：巡检线程每次检查到期账号时，也检查已登记账号的排队操作，
+  额度恢复后立即执行（与巡检共用并发数，同一账号不会同时巡检和执行排队操作）。
+
+单独运行：python -m social_auto_upload.uploader.tencent_uploader.violation_sweeper
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from db_manager import get_db_manager
+from social_auto_upload.uploader.tencent_uploader.channels_api import ChannelsApiClient
+from social_auto_upload.uploader.tencent_uploader.main_tz_violation import _process_violation_batch, replay_deferred_actions
+from social_auto_upload.uploader.tencent_uploader.video_index import index_account
+from social_auto_upload.utils.log import tencent_logger
+from social_auto_upload.utils.rate_limiter import get_rate_limiter
+
+SWEEP_DEFAULTS = {
+    'interval': 3600,  # 同一账号两次巡检的最短间隔（秒）
+    'concurrency': 2,  # 同时巡检的账号数
+    'poll_interval': 30,  # 检查到期账号的间隔（秒）
+}
+
+RUN_SUCCESS = 'success'
+RUN_FAILED = 'failed'
+RUN_INTERRUPTED = 'interrupted'  # 进程退出时未完成
+
+ACCOUNT_COLUMNS = ('account_file', 'user_id', 'settings', 'last_check_timestamp')
+RUN_COLUMNS = ('account_file', 'started_at', 'finished_at', 'status', 'notifications', 'violations', 'matched',
+               'deleted', 'hidden', 'deferred', 'api_calls', 'wall_time', 'error')
+
+
+class ViolationSweeper(object):
+    def __init__(self, options=None):
+        self.options = dict(SWEEP_DEFAULTS)
+        self.options.update(options or {})
+        self.db_manager = get_db_manager()
+        self._in_flight = set()
+        self._replay_retry_at = {}  # 执行排队操作出错的账号，到该时间后再重试
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._wake = None
+        self._stopping = False
+        self.init_db()
+
+    def init_db(self):
+        with self.db_manager.get_session() as session:
+            session.execute(text('''CREATE TABLE IF NOT EXISTS violation_sweep_accounts (
+                account_file TEXT PRIMARY KEY,
+                user_id INTEGER,
+                settings TEXT,                          -- 删除 / 隐藏阈值等配置（JSON）
+                last_check_timestamp INTEGER DEFAULT 0, -- 已处理的最新通知时间戳
+                next_sweep_at INTEGER DEFAULT 0,        -- 下次巡检时间
+                sweep_started_at INTEGER,               -- 正在巡检时的开始时间
+                enabled INTEGER DEFAULT 1
+            )'''))
+            session.execute(text('''CREATE TABLE IF NOT EXISTS violation_sweep_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_file TEXT NOT NULL,
+                started_at INTEGER,
+                finished_at INTEGER,
+                status TEXT,
+                notifications INTEGER DEFAULT 0,        -- 扫描的通知数
+                violations INTEGER DEFAULT 0,           -- 其中的违规视频数
+                matched INTEGER DEFAULT 0,              -- 在作品索引中匹配到的视频数
+                deleted INTEGER DEFAULT 0,
+                hidden INTEGER DEFAULT 0,
+                deferred INTEGER DEFAULT 0,             -- 额度用完排队的操作数
+                api_calls INTEGER DEFAULT 0,
+                wall_time REAL DEFAULT 0,               -- 耗时（秒）
+                error TEXT
+            )'''))
+            session.execute(text('''CREATE INDEX IF NOT EXISTS idx_violation_sweep_runs_account
+                ON violation_sweep_runs (account_file, started_at)'''))
+
+    def register(self, account_file, settings, user_id=None, last_check_timestamp=None, sweep_now=True):
+        """登记（或更新）账号的巡检配置；巡检线程未启动时自动启动
+
+        新登记（或重新启用）的账号在 sweep_now 时立即巡检，否则 interval 秒后巡检；
+        已登记的账号保持原来的巡检时间，不会因为每次上传都重新巡检，已到期的账号由巡检线程立即处理。
+        """
+        now = int(time.time())
+        self.db_manager._execute_write(
+            '''INSERT INTO violation_sweep_accounts (account_file, user_id, settings, last_check_timestamp, next_sweep_at, enabled)
+               VALUES (:account_file, :user_id, :settings, :last_check_timestamp, :next_sweep_at, 1)
+               ON CONFLICT(account_file) DO UPDATE SET
+                   user_id = excluded.user_id,
+                   settings = excluded.settings,
+                   last_check_timestamp = MAX(last_check_timestamp, excluded.last_check_timestamp),
+                   next_sweep_at = CASE WHEN enabled = 0 THEN excluded.next_sweep_at ELSE next_sweep_at END,
+                   enabled = 1''',
+            {'account_file': account_file, 'user_id': user_id, 'settings': json.dumps(settings, ensure_ascii=False),
+             'last_check_timestamp': last_check_timestamp or 0,
+             'next_sweep_at': now if sweep_now else now + self.options['interval']}
+        )
+        self.start()
+        self._notify()
+
+    def unregister(self, account_file):
+        self.db_manager._execute_write(
+            'UPDATE violation_sweep_accounts SET enabled = 0 WHERE account_file = :account_file',
+            {'account_file': account_file}
+        )
+
+    def in_flight(self):
+        return set(self._in_flight)
+
+    def runs(self, account_file=None, limit=20):
+        """最近的巡检统计，按开始时间倒序"""
+        where, params = '', {'limit': limit}
+        if account_file:
+            where = 'WHERE account_file = :account_file'
+            params['account_file'] = account_file
+        rows = self.db_manager._execute_query(
+            f"SELECT {', '.join(RUN_COLUMNS)} FROM violation_sweep_runs {where} ORDER BY started_at DESC LIMIT :limit",
+            params
+        )
+        return [{key: row[key] for key in RUN_COLUMNS} for row in rows]
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self.run_forever, name='violation-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._notify()
+
+    def _notify(self):
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            loop.call_soon_threadsafe(wake.set)
+
+    def run_forever(self):
+        """在当前线程运行巡检循环，直到 stop"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._run())
+        finally:
+            self._loop = None
+            self._wake = None
+            loop.close()
+
+    def _recover_interrupted(self):
+        """上次进程退出时未完成的巡检记为中断，并立即重新安排"""
+        rows = self.db_manager._execute_query(
+            'SELECT account_file, sweep_started_at FROM violation_sweep_accounts WHERE sweep_started_at IS NOT NULL', {}
+        )
+        for row in rows:
+            self._save_run(row['account_file'], row['sweep_started_at'], RUN_INTERRUPTED, {}, 0, '进程退出时未完成')
+        if rows:
+            self.db_manager._execute_write(
+                'UPDATE violation_sweep_accounts SET sweep_started_at = NULL, next_sweep_at = 0 WHERE sweep_started_at IS NOT NULL',
+                {}
+            )
+            tencent_logger.info(f"[违规巡检] 恢复上次未完成的巡检 {len(rows)} 个")
+
+    def _due_accounts(self):
+        rows = self.db_manager._execute_query(
+            f'''SELECT {', '.join(ACCOUNT_COLUMNS)} FROM violation_sweep_accounts
+               WHERE enabled = 1 AND next_sweep_at <= :now ORDER BY next_sweep_at''',
+            {'now': int(time.time())}
+        )
+        return [{key: row[key] for key in ACCOUNT_COLUMNS} for row in rows]
+
+    def _replay_due_accounts(self):
+        """有排队操作且其中至少一个接口额度已恢复的已登记账号"""
+        limiter = get_rate_limiter()
+        pending = limiter.pending()
+        if not pending:
+            return []
+        rows = self.db_manager._execute_query(
+            'SELECT account_file FROM violation_sweep_accounts WHERE enabled = 1', {}
+        )
+        now = time.time()
+        due = []
+        for row in rows:
+            account_file = row['account_file']
+            account = index_account(account_file)
+            if self._replay_retry_at.get(account_file, 0) > now:
+                continue
+            if any(not limiter.exhausted(account, endpoint) for pending_account, endpoint in pending
+                   if pending_account == account):
+                due.append(account_file)
+        return due
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.options['concurrency'])
+        tasks = set()
+        self._recover_interrupted()
+        tencent_logger.info(f"[违规巡检] 巡检服务已启动，并发数: {self.options['concurrency']}，间隔: {self.options['interval']}秒")
+        while not self._stopping:
+            try:
+                for account in self._due_accounts():
+                    account_file = account['account_file']
+                    if account_file in self._in_flight:
+                        continue
+                    self._in_flight.add(account_file)
+                    task = asyncio.create_task(self._sweep(account, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                for account_file in self._replay_due_accounts():
+                    if account_file in self._in_flight:
+                        continue
+                    self._in_flight.add(account_file)
+                    task = asyncio.create_task(self._replay(account_file, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            except Exception as e:
+                tencent_logger.exception(f"[违规巡检] 调度出错: {str(e)}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.options['poll_interval'])
+            except asyncio.TimeoutError:
+                pass
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        tencent_logger.info("[违规巡检] 巡检服务已停止")
+
+    async def _sweep(self, account, semaphore):
+        account_file = account['account_file']
+        try:
+            async with semaphore:
+                if not os.path.exists(account_file):
+                    tencent_logger.warning(f"[违规巡检] cookie 文件不存在，停止巡检该账号: {account_file}")
+                    self.unregister(account_file)
+                    return
+                settings = json.loads(account['settings'] or '{}')
+                started_at = int(time.time())
+                self.db_manager._execute_write(
+                    'UPDATE violation_sweep_accounts SET sweep_started_at = :started_at WHERE account_file = :account_file',
+                    {'account_file': account_file, 'started_at': started_at}
+                )
+                started = time.perf_counter()
+                error = None
+                try:
+                    stats = await _process_violation_batch(
+                        account_file=account_file,
+                        violation_delete_days=settings.get('violation_delete_days', 7),
+                        violation_delete_views=settings.get('violation_delete_views', 100),
+                        violation_hide_views=settings.get('violation_hide_views', 1000),
+                        user_id=account['user_id'],
+                        last_check_timestamp=account['last_check_timestamp'] or None,
+                        batch_info="巡检",
+                        process_interval=settings.get('violation_process_interval', 0),
+                        dry_run=settings.get('dry_run', False)
+                    )
+                except Exception as e:
+                    tencent_logger.exception(f"[违规巡检] {os.path.basename(account_file)} 巡检出错: {str(e)}")
+                    stats, error = {}, str(e)
+                # 处理函数内部出错时返回 error，本次巡检记为失败且不推进检查进度
+                error = error or stats.get('error')
+                wall_time = time.perf_counter() - started
+                self._save_run(account_file, started_at, RUN_FAILED if error else RUN_SUCCESS, stats, wall_time, error)
+                self.db_manager._execute_write(
+                    '''UPDATE violation_sweep_accounts SET
+                           last_check_timestamp = MAX(last_check_timestamp, :newest),
+                           next_sweep_at = :next_sweep_at,
+                           sweep_started_at = NULL
+                       WHERE account_file = :account_file''',
+                    # 试运行、失败时不推进检查进度
+                    {'account_file': account_file,
+                     'newest': 0 if settings.get('dry_run') or error else stats.get('newest_notification_timestamp', 0),
+                     'next_sweep_at': int(time.time()) + self.options['interval']}
+                )
+                tencent_logger.info(
+                    f"[违规巡检] {os.path.basename(account_file)} 完成：通知 {stats.get('notifications_count', 0)} 条，"
+                    f"违规 {stats.get('violation_videos_count', 0)} 个，匹配 {stats.get('matched_count', 0)} 个，"
+                    f"删除 {stats.get('delete_count', 0)} 个，隐藏 {stats.get('hide_count', 0)} 个，"
+                    f"排队 {stats.get('deferred_count', 0)} 个，请求 {stats.get('api_calls', 0)} 次，耗时 {wall_time:.1f} 秒")
+        finally:
+            self._in_flight.discard(account_file)
+
+    async def _replay(self, account_file, semaphore):
+        """额度恢复后执行账号排队的删除 / 隐藏，出错时 interval 秒后再重试"""
+        try:
+            async with semaphore:
+                if not os.path.exists(account_file):
+                    tencent_logger.warning(f"[违规巡检] cookie 文件不存在，停止巡检该账号: {account_file}")
+                    self.unregister(account_file)
+                    return
+                async with ChannelsApiClient(account_file) as client:
+                    await replay_deferred_actions(client, f"[违规巡检] {os.path.basename(account_file)}")
+                self._replay_retry_at.pop(account_file, None)
+        except Exception as e:
+            tencent_logger.exception(f"[违规巡检] {os.path.basename(account_file)} 执行排队操作出错: {str(e)}")
+            self._replay_retry_at[account_file] = time.time() + self.options['interval']
+        finally:
+            self._in_flight.discard(account_file)
+
+    def _save_run(self, account_file, started_at, status, stats, wall_time, error=None):
+        self.db_manager._execute_write(
+            '''INSERT INTO violation_sweep_runs (account_file, started_at, finished_at, status, notifications, violations,
+                   matched, deleted, hidden, deferred, api_calls, wall_time, error)
+               VALUES (:account_file, :started_at, :finished_at, :status, :notifications, :violations,
+                   :matched, :deleted, :hidden, :deferred, :api_calls, :wall_time, :error)''',
+            {'account_file': account_file, 'started_at': started_at, 'finished_at': int(time.time()), 'status': status,
+             'notifications': stats.get('notifications_count', 0), 'violations': stats.get('violation_videos_count', 0),
+             'matched': stats.get('matched_count', 0), 'deleted': stats.get('delete_count', 0),
+             'hidden': stats.get('hide_count', 0), 'deferred': stats.get('deferred_count', 0),
+             'api_calls': stats.get('api_calls', 0), 'wall_time': round(wall_time, 2), 'error': error}
+        )
+
+
+_violation_sweeper = None
+_violation_sweeper_lock = threading.Lock()
+
+
+def get_violation_sweeper(options=None):
+    """全局巡检服务，options 只在第一次创建时生效"""
+    global _violation_sweeper
+    with _violation_sweeper_lock:
+        if _violation_sweeper is None:
+            _violation_sweeper = ViolationSweeper(options)
+        return _violation_sweeper
+
+
+if __name__ == '__main__':
+    get_violation_sweeper().run_forever()
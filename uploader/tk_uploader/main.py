@@ -10,6 +10,7 @@ from social_auto_upload.uploader.tk_uploader.tk_config import Tk_Locator
 from social_auto_upload.utils.base_social_media import set_init_script
 from social_auto_upload.utils.files_times import get_absolute_path
 from social_auto_upload.utils.log import tiktok_logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
 
 
 async def cookie_auth(account_file):
@@ -147,6 +148,8 @@ class TiktokVideo(object):
         browser = await playwright.firefox.launch(headless=headless_mode)
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context,os.path.basename(self.account_file))
+        # 统计视频分片上传的网络指标
+        upload_monitor = UploadNetworkMonitor('tiktok', self.file_path).attach(context)
         page = await context.new_page()
 
         await page.goto("https://www.tiktok.com/creator-center/upload")
@@ -179,6 +182,7 @@ class TiktokVideo(object):
 
         await self.click_publish(page)
 
+        self.upload_metrics = await upload_monitor.finish()
         await context.storage_state(path=f"{self.account_file}")  # save cookie
         tiktok_logger.info('  [-] update cookie！')
         await asyncio.sleep(2)  # close delay for look the video status
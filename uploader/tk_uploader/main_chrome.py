@@ -73,6 +73,8 @@ async def get_tiktok_cookie(account_file):
 
 
 class TiktokVideo(object):
+    launch_headless = False  # 浏览器池中同样有头运行，与自行启动浏览器时一致
+
     def __init__(self, title, file_path, tags, publish_date, account_file, thumbnail_path=None,info=None):
         self.title = title
         self.file_path = file_path
@@ -12,6 +12,7 @@ from social_auto_upload.conf import LOCAL_CHROME_PATH
 from social_auto_upload.utils.base_social_media import set_init_script, SOCIAL_MEDIA_TOUTIAO
 from social_auto_upload.utils.file_util import get_account_file
 from social_auto_upload.utils.log import toutiao_logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
 
 load_dotenv()
 
@@ -188,178 +189,183 @@ class TouTiaoVideo(object):
         # 创建一个浏览器上下文，使用指定的 cookie 文件
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context,os.path.basename(self.account_file))
-
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://mp.toutiao.com/profile_v4/xigua/upload-video")
-        toutiao_logger.info(f'[+]正在上传-------{self.title}.mp4')
-        # 等待页面跳转到指定的 URL，进入，则自动等待到超时
-        toutiao_logger.info(f'[-] 正在打开主页...')
-        await page.wait_for_url("https://mp.toutiao.com/profile_v4/xigua/upload-video")
-
-        # 检查提示文字是否存在
-        while True:
-            text_exists = await page.get_by_text("点击上传或将文件拖入此区域").is_visible()
-            if text_exists:
-                toutiao_logger.info("检测到上传页面已加载,正在刷新...")
-                await page.reload()
-                while True:
-                    text_exists = await page.get_by_text("点击上传或将文件拖入此区域").is_visible()
-                    if text_exists:
-                        break
-                break
-
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class='upload-video-trigger'] input").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL
-        while True:
-            # 判断是是否进入视频发布页面，没进入，则自动等待到超时
-            try:
-                text_exists = await page.get_by_text("添加视频").is_visible()
+        try:
+            # 统计视频分片上传的网络指标
+            upload_monitor = UploadNetworkMonitor('toutiao', self.file_path).attach(context)
+
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://mp.toutiao.com/profile_v4/xigua/upload-video")
+            toutiao_logger.info(f'[+]正在上传-------{self.title}.mp4')
+            # 等待页面跳转到指定的 URL，进入，则自动等待到超时
+            toutiao_logger.info(f'[-] 正在打开主页...')
+            await page.wait_for_url("https://mp.toutiao.com/profile_v4/xigua/upload-video")
+
+            # 检查提示文字是否存在
+            while True:
+                text_exists = await page.get_by_text("点击上传或将文件拖入此区域").is_visible()
                 if text_exists:
+                    toutiao_logger.info("检测到上传页面已加载,正在刷新...")
+                    await page.reload()
+                    while True:
+                        text_exists = await page.get_by_text("点击上传或将文件拖入此区域").is_visible()
+                        if text_exists:
+                            break
                     break
-            except:
-                toutiao_logger.info(f'  [-] 正在等待进入视频发布页面...')
-                await asyncio.sleep(0.1)
-                # try:
-                #     await page.wait_for_url(
-                #         "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page")
-                #     break
-                # except:
-                #     toutiao_logger.info(f'  [-] 正在等待进入视频发布页面...')
-                #     await asyncio.sleep(0.1)
-
-        # 填充标题和话题
-        # 检查是否存在包含输入框的元素
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        # 点击"文本 生成图文"元素
-        try:
-            # 使用精确匹配定位"生成图文"按钮
-            sctw = page.locator('span:text-is("生成图文")')
-            await sctw.click()
-            text_to_image_btn = await page.wait_for_selector('text="添加贴纸"')
-            await text_to_image_btn.click()
-            await asyncio.sleep(1)
 
-            # 点击包含"关注引导"且有tabindex="-1"属性的元素
-            follow_guide = await page.wait_for_selector('[tabindex="-1"]:has-text("关注引导")')
-            await follow_guide.click()
-            await asyncio.sleep(1)
+            # 点击 "上传视频" 按钮
+            await page.locator("div[class='upload-video-trigger'] input").set_input_files(self.file_path)
 
-            # 点击"智能添加"元素
-            smart_add_btn = await page.wait_for_selector('text="智能添加"')
-            await smart_add_btn.click()
-            await asyncio.sleep(1)
-
-            # 点击互动贴纸确定按钮
-            confirm_btn = await page.locator("div:has-text('添加互动贴纸')").locator("..").locator("button:has-text('确定')").click()
+            # 等待页面跳转到指定的 URL
+            while True:
+                # 判断是是否进入视频发布页面，没进入，则自动等待到超时
+                try:
+                    text_exists = await page.get_by_text("添加视频").is_visible()
+                    if text_exists:
+                        break
+                except:
+                    toutiao_logger.info(f'  [-] 正在等待进入视频发布页面...')
+                    await asyncio.sleep(0.1)
+                    # try:
+                    #     await page.wait_for_url(
+                    #         "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page")
+                    #     break
+                    # except:
+                    #     toutiao_logger.info(f'  [-] 正在等待进入视频发布页面...')
+                    #     await asyncio.sleep(0.1)
+
+            # 填充标题和话题
+            # 检查是否存在包含输入框的元素
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
             await asyncio.sleep(1)
-        except Exception as e:
-            toutiao_logger.info(f"添加互动贴纸相关操作失败: {e.__class__.__name__} - {str(e)}")
-        toutiao_logger.info(f'  [-] 正在填充标题和话题...')
-        title_container = page.get_by_text('标题').locator("..").locator("..").locator("input")
-
-        if await title_container.count():
-            await title_container.fill(self.title[:30])
-        else:
-            # titlecontainer = page.locator(".notranslate")
-            await title_container.click()
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("Control+KeyA")
-            await page.keyboard.press("Delete")
-            await page.keyboard.type(self.title)
-            await page.keyboard.press("Enter")
-        tag_input = await page.wait_for_selector('input[placeholder="请输入"]')
-        for index, tag in enumerate(self.tags, start=1):
-            await tag_input.type("#" + tag)
-            await page.wait_for_timeout(500)
-            await tag_input.press("Space")
-        toutiao_logger.info(f'总共添加{len(self.tags)}个话题')
-        # 自行拍摄
-        try:
-            # 首先尝试直接定位包含"自行拍摄"文本的label元素
-            checkbox_label = page.locator('label.byte-checkbox').filter(has_text="自行拍摄")
-            await checkbox_label.click()
-
-            # 如果上面的方法失败，尝试备用方案
-            if await checkbox_label.count() == 0:
-                # 尝试通过span文本定位
-                await page.locator('span.byte-checkbox-inner-text:text("自行拍摄")').click()
-
-        except Exception as e:
-            toutiao_logger.error(f"点击自行拍摄选项时出错: {str(e)}")
-            # 最后一个备用方案
+            # 点击"文本 生成图文"元素
             try:
-                await page.evaluate('document.querySelector("label.byte-checkbox:text-is(\'自行拍摄\')").click()')
-            except Exception as inner_e:
-                toutiao_logger.error(f"所有尝试都失败了: {str(inner_e)}")
-                raise inner_e
+                # 使用精确匹配定位"生成图文"按钮
+                sctw = page.locator('span:text-is("生成图文")')
+                await sctw.click()
+                text_to_image_btn = await page.wait_for_selector('text="添加贴纸"')
+                await text_to_image_btn.click()
+                await asyncio.sleep(1)
+
+                # 点击包含"关注引导"且有tabindex="-1"属性的元素
+                follow_guide = await page.wait_for_selector('[tabindex="-1"]:has-text("关注引导")')
+                await follow_guide.click()
+                await asyncio.sleep(1)
+
+                # 点击"智能添加"元素
+                smart_add_btn = await page.wait_for_selector('text="智能添加"')
+                await smart_add_btn.click()
+                await asyncio.sleep(1)
+
+                # 点击互动贴纸确定按钮
+                confirm_btn = await page.locator("div:has-text('添加互动贴纸')").locator("..").locator("button:has-text('确定')").click()
+                await asyncio.sleep(1)
+            except Exception as e:
+                toutiao_logger.info(f"添加互动贴纸相关操作失败: {e.__class__.__name__} - {str(e)}")
+            toutiao_logger.info(f'  [-] 正在填充标题和话题...')
+            title_container = page.get_by_text('标题').locator("..").locator("..").locator("input")
 
-        while True:
-            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
+            if await title_container.count():
+                await title_container.fill(self.title[:30])
+            else:
+                # titlecontainer = page.locator(".notranslate")
+                await title_container.click()
+                await page.keyboard.press("Backspace")
+                await page.keyboard.press("Control+KeyA")
+                await page.keyboard.press("Delete")
+                await page.keyboard.type(self.title)
+                await page.keyboard.press("Enter")
+            tag_input = await page.wait_for_selector('input[placeholder="请输入"]')
+            for index, tag in enumerate(self.tags, start=1):
+                await tag_input.type("#" + tag)
+                await page.wait_for_timeout(500)
+                await tag_input.press("Space")
+            toutiao_logger.info(f'总共添加{len(self.tags)}个话题')
+            # 自行拍摄
             try:
-                #  新版：定位重新上传
-                number = await page.locator('span:text-is("上传成功")').count()
-                if number > 0:
-                    toutiao_logger.success("  [-]视频上传完毕")
-                    break
-                else:
+                # 首先尝试直接定位包含"自行拍摄"文本的label元素
+                checkbox_label = page.locator('label.byte-checkbox').filter(has_text="自行拍摄")
+                await checkbox_label.click()
+
+                # 如果上面的方法失败，尝试备用方案
+                if await checkbox_label.count() == 0:
+                    # 尝试通过span文本定位
+                    await page.locator('span.byte-checkbox-inner-text:text("自行拍摄")').click()
+
+            except Exception as e:
+                toutiao_logger.error(f"点击自行拍摄选项时出错: {str(e)}")
+                # 最后一个备用方案
+                try:
+                    await page.evaluate('document.querySelector("label.byte-checkbox:text-is(\'自行拍摄\')").click()')
+                except Exception as inner_e:
+                    toutiao_logger.error(f"所有尝试都失败了: {str(inner_e)}")
+                    raise inner_e
+
+            while True:
+                # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
+                try:
+                    #  新版：定位重新上传
+                    number = await page.locator('span:text-is("上传成功")').count()
+                    if number > 0:
+                        toutiao_logger.success("  [-]视频上传完毕")
+                        break
+                    else:
+                        toutiao_logger.info("  [-] 正在上传视频中...")
+                        await asyncio.sleep(2)
+
+                        if await page.locator('span:has-text("上传失败")').count():
+                            toutiao_logger.error("  [-] 发现上传出错了... 准备重试")
+                            await self.handle_upload_error(page)
+                except Exception as e:
+                    if 'Target page, context or browser has been closed' in e.message:
+                        raise e  # 直接抛出异常
+                    toutiao_logger.error(e)
                     toutiao_logger.info("  [-] 正在上传视频中...")
                     await asyncio.sleep(2)
 
-                    if await page.locator('span:has-text("上传失败")').count():
-                        toutiao_logger.error("  [-] 发现上传出错了... 准备重试")
-                        await self.handle_upload_error(page)
-            except Exception as e:
-                if 'Target page, context or browser has been closed' in e.message:
-                    raise e  # 直接抛出异常
-                toutiao_logger.error(e)
-                toutiao_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
-
-        # 上传视频封面
-        await self.set_thumbnail(page, self.thumbnail_path)
-
-        # 更换可见元素
-        # await self.set_location(page, "杭州市")
-
-        if self.publish_date != 0:
-            await self.set_schedule_time_toutiao(page, self.publish_date)
-        msg_res = '检测通过，暂未发现异常'
-        # 判断视频启用成功
-        while True:
+            # 上传视频封面
+            await self.set_thumbnail(page, self.thumbnail_path)
+
+            # 更换可见元素
+            # await self.set_location(page, "杭州市")
+
+            if self.publish_date != 0:
+                await self.set_schedule_time_toutiao(page, self.publish_date)
+            msg_res = '检测通过，暂未发现异常'
             # 判断视频启用成功
+            while True:
+                # 判断视频启用成功
+                try:
+                    publish_button = page.locator('button span:text-is("发布")').first
+                    if await publish_button.count():
+                        await publish_button.click()
+                    await page.wait_for_url("https://mp.toutiao.com/profile_v4/xigua/content-manage-v2**",
+                                            timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
+                    toutiao_logger.success("  [-]视频发布成功")
+                    break
+                except:
+                    toutiao_logger.info("  [-] 视频正在发布中...")
+                    await asyncio.sleep(0.5)
+
+            self.upload_metrics = await upload_monitor.finish()
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            toutiao_logger.success('  [-]cookie更新完毕！')
+            await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        finally:
+            # 关闭浏览器上下文和浏览器实例，上传出错时同样关闭，避免在共用的浏览器中泄漏上下文
             try:
-                publish_button = page.locator('button span:text-is("发布")').first
-                if await publish_button.count():
-                    await publish_button.click()
-                await page.wait_for_url("https://mp.toutiao.com/profile_v4/xigua/content-manage-v2**",
-                                        timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
-                toutiao_logger.success("  [-]视频发布成功")
-                break
-            except:
-                toutiao_logger.info("  [-] 视频正在发布中...")
-                await asyncio.sleep(0.5)
+                await context.close()
+            except Exception as ctx_error:
+                toutiao_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+            # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
+            if playwright:
+                try:
+                    await browser.close()
+                except Exception as browser_error:
+                    toutiao_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        toutiao_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        try:
-            await context.close()
-        except Exception as ctx_error:
-            toutiao_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
-        
-        # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
-        if playwright:
-            try:
-                await browser.close()
-            except Exception as browser_error:
-                toutiao_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
-        
         return True, msg_res
 
     async def set_thumbnail(self, page: Page, thumbnail_path: str):
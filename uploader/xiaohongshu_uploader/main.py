@@ -9,9 +9,16 @@ import asyncio
 from conf import LOCAL_CHROME_PATH
 from utils.base_social_media import set_init_script
 from utils.log import xiaohongshu_logger
+from social_auto_upload.utils.cookie_probe import probe_cookie
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
 
 
 async def cookie_auth(account_file):
+    # 先用 HTTP 接口探测登录态，能判断时不再启动浏览器
+    verdict = await probe_cookie(1, account_file)
+    if verdict is not None:
+        xiaohongshu_logger.info(f"[+] cookie 探测结果: {'有效' if verdict else '失效'}")
+        return verdict
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=True)
         context = await browser.new_context(storage_state=account_file)
@@ -123,140 +130,145 @@ class XiaoHongShuVideo(object):
             storage_state=f"{self.account_file}"
         )
         context = await set_init_script(context,os.path.basename(self.account_file))
+        try:
+            # 统计视频分片上传的网络指标
+            upload_monitor = UploadNetworkMonitor('xiaohongshu', self.file_path).attach(context)
 
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
-        xiaohongshu_logger.info(f'[+]正在上传-------{self.title}.mp4')
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        xiaohongshu_logger.info(f'[-] 正在打开主页...')
-        await page.wait_for_url("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
-        while True:
-            try:
-                # 等待upload-input元素出现
-                upload_input = await page.wait_for_selector('input.upload-input', timeout=3000)
-                # 获取下一个兄弟元素
-                preview_new = await upload_input.query_selector(
-                    'xpath=following-sibling::div[contains(@class, "preview-new")]')
-                if preview_new:
-                    # 在preview-new元素中查找包含"上传成功"的stage元素
-                    stage_elements = await preview_new.query_selector_all('div.stage')
-                    upload_success = False
-                    for stage in stage_elements:
-                        text_content = await page.evaluate('(element) => element.textContent', stage)
-                        if '上传成功' in text_content:
-                            upload_success = True
-                            break
-                    if upload_success:
-                        xiaohongshu_logger.info("[+] 检测到上传成功标识!")
-                        break  # 成功检测到上传成功后跳出循环
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
+            xiaohongshu_logger.info(f'[+]正在上传-------{self.title}.mp4')
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            xiaohongshu_logger.info(f'[-] 正在打开主页...')
+            await page.wait_for_url("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
+            # 点击 "上传视频" 按钮
+            await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
+
+            # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
+            while True:
+                try:
+                    # 等待upload-input元素出现
+                    upload_input = await page.wait_for_selector('input.upload-input', timeout=3000)
+                    # 获取下一个兄弟元素
+                    preview_new = await upload_input.query_selector(
+                        'xpath=following-sibling::div[contains(@class, "preview-new")]')
+                    if preview_new:
+                        # 在preview-new元素中查找包含"上传成功"的stage元素
+                        stage_elements = await preview_new.query_selector_all('div.stage')
+                        upload_success = False
+                        for stage in stage_elements:
+                            text_content = await page.evaluate('(element) => element.textContent', stage)
+                            if '上传成功' in text_content:
+                                upload_success = True
+                                break
+                        if upload_success:
+                            xiaohongshu_logger.info("[+] 检测到上传成功标识!")
+                            break  # 成功检测到上传成功后跳出循环
+                        else:
+                            print("  [-] 未找到上传成功标识，继续等待...")
                     else:
-                        print("  [-] 未找到上传成功标识，继续等待...")
-                else:
-                    print("  [-] 未找到预览元素，继续等待...")
-                    await asyncio.sleep(1)
-            except Exception as e:
-                print(f"  [-] 检测过程出错: {str(e)}，重新尝试...")
-                await asyncio.sleep(0.5)  # 等待0.5秒后重新尝试
+                        print("  [-] 未找到预览元素，继续等待...")
+                        await asyncio.sleep(1)
+                except Exception as e:
+                    print(f"  [-] 检测过程出错: {str(e)}，重新尝试...")
+                    await asyncio.sleep(0.5)  # 等待0.5秒后重新尝试
 
-        # 填充标题和话题
-        # 检查是否存在包含输入框的元素
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        xiaohongshu_logger.info(f'  [-] 正在填充标题和话题...')
-        title_container = page.locator('div.input.titleInput').locator('input.d-text')
-        if await title_container.count():
-            await title_container.fill(self.title[:30])
-        else:
-            titlecontainer = page.locator(".notranslate")
-            await titlecontainer.click()
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("Control+KeyA")
-            await page.keyboard.press("Delete")
-            await page.keyboard.type(self.title)
-            await page.keyboard.press("Enter")
-        css_selector = ".ql-editor" # 不能加上 .ql-blank 属性，这样只能获取第一次非空状态
-        for index, tag in enumerate(self.tags, start=1):
-            await page.type(css_selector, "#" + tag)
-            await page.press(css_selector, "Space")
-        xiaohongshu_logger.info(f'总共添加{len(self.tags)}个话题')
-
-        # while True:
-        #     # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
-        #     try:
-        #         #  新版：定位重新上传
-        #         number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-        #         if number > 0:
-        #             xiaohongshu_logger.success("  [-]视频上传完毕")
-        #             break
-        #         else:
-        #             xiaohongshu_logger.info("  [-] 正在上传视频中...")
-        #             await asyncio.sleep(2)
-
-        #             if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-        #                 xiaohongshu_logger.error("  [-] 发现上传出错了... 准备重试")
-        #                 await self.handle_upload_error(page)
-        #     except:
-        #         xiaohongshu_logger.info("  [-] 正在上传视频中...")
-        #         await asyncio.sleep(2)
-        
-        # 上传视频封面
-        # await self.set_thumbnail(page, self.thumbnail_path)
+            # 填充标题和话题
+            # 检查是否存在包含输入框的元素
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
+            await asyncio.sleep(1)
+            xiaohongshu_logger.info(f'  [-] 正在填充标题和话题...')
+            title_container = page.locator('div.input.titleInput').locator('input.d-text')
+            if await title_container.count():
+                await title_container.fill(self.title[:30])
+            else:
+                titlecontainer = page.locator(".notranslate")
+                await titlecontainer.click()
+                await page.keyboard.press("Backspace")
+                await page.keyboard.press("Control+KeyA")
+                await page.keyboard.press("Delete")
+                await page.keyboard.type(self.title)
+                await page.keyboard.press("Enter")
+            css_selector = ".ql-editor" # 不能加上 .ql-blank 属性，这样只能获取第一次非空状态
+            for index, tag in enumerate(self.tags, start=1):
+                await page.type(css_selector, "#" + tag)
+                await page.press(css_selector, "Space")
+            xiaohongshu_logger.info(f'总共添加{len(self.tags)}个话题')
 
-        # 更换可见元素
-        # await self.set_location(page, "青岛市")
+            # while True:
+            #     # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
+            #     try:
+            #         #  新版：定位重新上传
+            #         number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
+            #         if number > 0:
+            #             xiaohongshu_logger.success("  [-]视频上传完毕")
+            #             break
+            #         else:
+            #             xiaohongshu_logger.info("  [-] 正在上传视频中...")
+            #             await asyncio.sleep(2)
 
-        # # 頭條/西瓜
-        # third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
-        # # 定位是否有第三方平台
-        # if await page.locator(third_part_element).count():
-        #     # 检测是否是已选中状态
-        #     if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
-        #         await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
+            #             if await page.locator('div.progress-div > div:has-text("上传失败")').count():
+            #                 xiaohongshu_logger.error("  [-] 发现上传出错了... 准备重试")
+            #                 await self.handle_upload_error(page)
+            #     except:
+            #         xiaohongshu_logger.info("  [-] 正在上传视频中...")
+            #         await asyncio.sleep(2)
 
-        if self.publish_date != 0:
-            await self.set_schedule_time_xiaohongshu(page, self.publish_date)
+            # 上传视频封面
+            # await self.set_thumbnail(page, self.thumbnail_path)
 
-        # 判断视频是否发布成功
-        while True:
-            try:
-                # 等待包含"定时发布"文本的button元素出现并点击
-                if self.publish_date != 0:
-                    await page.locator('button:has-text("定时发布")').click()
-                else:
-                    await page.locator('button:has-text("发布")').click()
-                await page.wait_for_url(
-                    "https://creator.xiaohongshu.com/publish/success?**",
-                    timeout=3000
-                )  # 如果自动跳转到作品页面，则代表发布成功
-                xiaohongshu_logger.success("  [-]视频发布成功")
-                break
-            except:
-                xiaohongshu_logger.info("  [-] 视频正在发布中...")
-                await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        xiaohongshu_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        try:
-            await context.close()
-        except Exception as ctx_error:
-            xiaohongshu_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
-        
-        # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
-        if playwright:
+            # 更换可见元素
+            # await self.set_location(page, "青岛市")
+
+            # # 頭條/西瓜
+            # third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
+            # # 定位是否有第三方平台
+            # if await page.locator(third_part_element).count():
+            #     # 检测是否是已选中状态
+            #     if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
+            #         await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
+
+            if self.publish_date != 0:
+                await self.set_schedule_time_xiaohongshu(page, self.publish_date)
+
+            # 判断视频是否发布成功
+            while True:
+                try:
+                    # 等待包含"定时发布"文本的button元素出现并点击
+                    if self.publish_date != 0:
+                        await page.locator('button:has-text("定时发布")').click()
+                    else:
+                        await page.locator('button:has-text("发布")').click()
+                    await page.wait_for_url(
+                        "https://creator.xiaohongshu.com/publish/success?**",
+                        timeout=3000
+                    )  # 如果自动跳转到作品页面，则代表发布成功
+                    xiaohongshu_logger.success("  [-]视频发布成功")
+                    break
+                except:
+                    xiaohongshu_logger.info("  [-] 视频正在发布中...")
+                    await page.screenshot(full_page=True)
+                    await asyncio.sleep(0.5)
+
+            self.upload_metrics = await upload_monitor.finish()
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            xiaohongshu_logger.success('  [-]cookie更新完毕！')
+            await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        finally:
+            # 关闭浏览器上下文和浏览器实例，上传出错时同样关闭，避免在共用的浏览器中泄漏上下文
             try:
-                await browser.close()
-            except Exception as browser_error:
-                xiaohongshu_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
-    
+                await context.close()
+            except Exception as ctx_error:
+                xiaohongshu_logger.warning(f"关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+            # 只有在 playwright 不为 None 时才关闭浏览器（说明浏览器是在此方法内创建的）
+            if playwright:
+                try:
+                    await browser.close()
+                except Exception as browser_error:
+                    xiaohongshu_logger.warning(f"关闭浏览器时出错（已忽略）: {str(browser_error)}")
+
     async def set_thumbnail(self, page: Page, thumbnail_path: str):
         if thumbnail_path:
             await page.click('text="选择封面"')
@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 from typing import List
 import os
@@ -290,7 +291,9 @@ async def set_init_script(context, cookie_name=None):
     # 如果提供了cookie名称，则注入对应的浏览器指纹
     if cookie_name:
         try:
-            fingerprint = fingerprint_manager.get_or_create_fingerprint(cookie_name)
+            # 指纹读写数据库，放到线程池执行，不阻塞共用的事件循环
+            fingerprint = await asyncio.get_running_loop().run_in_executor(
+                None, fingerprint_manager.get_or_create_fingerprint, cookie_name)
             fingerprint_script = fingerprint_manager.inject_fingerprint_script(fingerprint)
             await context.add_init_script(fingerprint_script)
             print(f"✅ 已为 {cookie_name} 注入浏览器指纹伪装")
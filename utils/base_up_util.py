@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 
 from camoufox import AsyncCamoufox, DefaultAddons
 from patchright.async_api import async_playwright
@@ -6,13 +7,61 @@ from patchright.async_api import async_playwright
 from social_auto_upload.utils.fingerprint_manager import fingerprint_manager
 
 from social_auto_upload.utils.camoufox_util import _get_camoufox_config
+from social_auto_upload.utils.browser_pool import get_browser_pool
+
+# 浏览器池启动 Chromium 时的默认参数，上传类可通过 launch_args 属性覆盖
+DEFAULT_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--lang=zh-CN',
+    '--disable-infobars',
+    '--start-fullscreen',
+    '--no-sandbox',
+]
+
+
+def _chromium_launch_options(par_):
+    # 上传类自己启动浏览器时固定有头运行的（如快手）通过 launch_headless = False 保持原来的行为
+    headless = getattr(par_, 'launch_headless', None)
+    return {
+        'headless': getattr(par_, 'hide_browser', False) if headless is None else headless,
+        'executable_path': getattr(par_, 'local_executable_path', None),
+        'proxy': getattr(par_, 'proxy_setting', None),
+        'args': getattr(par_, 'launch_args', DEFAULT_LAUNCH_ARGS),
+    }
 
 
 async def dispatch_upload(par_):
-    if par_.info.get("camoufox", False):
+    if (par_.info or {}).get("camoufox", False):
         config = await _get_camoufox_config(par_)
         async with AsyncCamoufox(**config) as browser:
             return await par_.upload(None, browser)
+    pool = get_browser_pool()
+    if pool is not None:
+        # 启用了浏览器池时复用池内浏览器，上传类只创建并关闭自己的上下文
+        async with pool.lease(_chromium_launch_options(par_)) as browser:
+            return await par_.upload(None, browser)
     else:
         async with async_playwright() as playwright:
-            return await par_.upload(playwright, None)
\ No newline at end of file
+            return await par_.upload(playwright, None)
+
+@asynccontextmanager
+async def browser_session(par_):
+    """打开一个浏览器供调用方自行创建上下文（批量发布用），选择顺序与 dispatch_upload 一致：
+    Camoufox / 浏览器池 / 新启动的 Chromium"""
+    if (par_.info or {}).get("camoufox", False):
+        config = await _get_camoufox_config(par_)
+        async with AsyncCamoufox(**config) as browser:
+            yield browser
+        return
+    pool = get_browser_pool()
+    if pool is not None:
+        async with pool.lease(_chromium_launch_options(par_)) as browser:
+            yield browser
+        return
+    async with async_playwright() as playwright:
+        options = {k: v for k, v in _chromium_launch_options(par_).items() if v not in (None, '')}
+        browser = await playwright.chromium.launch(**options)
+        try:
+            yield browser
+        finally:
+            await browser.close()
@@ -0,0 +1,149 @@
+"""
+同一账号多条视频批量发布：整批只打开一次浏览器、加载一次 cookie，复用同一个上下文逐条发布。
+
+- 上传类需要提供 open_upload_page / transfer / fill_and_publish 三个阶段（抖音、快手已拆分）；
+- 两个标签页轮换：第 N 条在一个标签页填写表单、发布时，另一个标签页已回到上传页开始传输第 N+1 条（prefetch），
+  prefetch=False 时只用一个标签页，每条发布后回到上传页再传输下一条；
+- 返回每条的结果和耗时，以及整批耗时与逐条发布（每条都冷启动浏览器）的估算耗时对比。
+
+用法：
+    items = [BatchItem(file_path, title, tags, publish_date), ...]
+    report = await BatchPublishSession(DouYinVideo, 'douyin', account_file, items).run()
+    results = report.results()
+"""
+import asyncio
+import os
+import time
+from collections import namedtuple
+
+from social_auto_upload.utils.base_social_media import set_init_script
+from social_auto_upload.utils.base_up_util import browser_session
+from social_auto_upload.utils.log import logger
+from social_auto_upload.utils.upload_metrics import UploadNetworkMonitor
+
+BatchItem = namedtuple('BatchItem', ['file_path', 'title', 'tags', 'publish_date'])
+
+PAGE_CLOSED = 'Target page, context or browser has been closed'
+
+
+class BatchReport(object):
+    def __init__(self, platform, account_file):
+        self.platform = platform
+        self.account = os.path.basename(str(account_file))
+        self.items = []
+        self.setup_seconds = 0  # 启动浏览器、加载 cookie、打开标签页的耗时
+        self.total_seconds = 0
+
+    @property
+    def succeeded(self):
+        return sum(1 for item in self.items if item['success'])
+
+    @property
+    def sequential_seconds(self):
+        """逐条发布的估算耗时：每条都要重新启动浏览器，且传输和填写表单不能重叠"""
+        return sum(item['transfer_seconds'] + item['publish_seconds'] + self.setup_seconds for item in self.items)
+
+    def results(self):
+        """与 fan_out_uploads 相同格式的结果列表"""
+        return [{'file': os.path.basename(item['file_path']), 'account': self.account,
+                 'success': item['success'], 'msg': item['msg']} for item in self.items]
+
+    def log(self):
+        for index, item in enumerate(self.items, start=1):
+            status = '成功' if item['success'] else '失败'
+            logger.info(f"[批量发布] {self.platform} {self.account} 第 {index} 条 {status}：{item['file_path']} "
+                        f"传输 {item['transfer_seconds']:.1f}s 发布 {item['publish_seconds']:.1f}s {item['msg'] or ''}")
+        saved = self.sequential_seconds - self.total_seconds
+        logger.info(f"[批量发布] {self.platform} {self.account} 共 {len(self.items)} 条，成功 {self.succeeded} 条，"
+                    f"总耗时 {self.total_seconds:.1f}s，逐条发布估算 {self.sequential_seconds:.1f}s，节省 {saved:.1f}s")
+
+
+class BatchPublishSession(object):
+    def __init__(self, video_cls, platform, account_file, items, prefetch=True, **video_kwargs):
+        """video_cls 按 (title, file_path, tags, publish_date, account_file, **video_kwargs) 创建上传对象"""
+        self.platform = platform
+        self.account_file = str(account_file)
+        self.items = [BatchItem(*item) for item in items]
+        self.prefetch = prefetch
+        self.videos = [video_cls(item.title, str(item.file_path), item.tags, item.publish_date, self.account_file,
+                                 **video_kwargs) for item in self.items]
+
+    async def _transfer(self, video, page, result):
+        """回到上传页并开始传输视频，失败时返回异常"""
+        started = time.monotonic()
+        result['monitor'] = UploadNetworkMonitor(self.platform, video.file_path).attach(page)
+        try:
+            await video.open_upload_page(page)
+            await video.transfer(page)
+            return None
+        except Exception as e:
+            return e
+        finally:
+            result['transfer_seconds'] = time.monotonic() - started
+
+    async def _publish(self, video, page, result):
+        started = time.monotonic()
+        try:
+            await page.bring_to_front()
+            result['msg'] = await video.fill_and_publish(page)
+            result['success'] = True
+        except Exception as e:
+            result['msg'] = f"{type(e).__name__}: {e}"
+            logger.exception(f"[批量发布] {self.platform} {video.file_path} 发布失败: {e}")
+        finally:
+            result['publish_seconds'] = time.monotonic() - started
+            video.upload_metrics = await result.pop('monitor').finish()
+
+    async def run(self):
+        report = BatchReport(self.platform, self.account_file)
+        if not self.videos:
+            return report
+        started = time.monotonic()
+        results = [{'file_path': video.file_path, 'success': False, 'msg': None,
+                    'transfer_seconds': 0, 'publish_seconds': 0} for video in self.videos]
+        report.items = results
+
+        async with browser_session(self.videos[0]) as browser:
+            context = await browser.new_context(storage_state=self.account_file)
+            context = await set_init_script(context, os.path.basename(self.account_file))
+            pending = None
+            try:
+                pages = [await context.new_page()]
+                if self.prefetch and len(self.videos) > 1:
+                    pages.append(await context.new_page())
+                report.setup_seconds = time.monotonic() - started
+
+                def start_transfer(index):
+                    page = pages[index % len(pages)]
+                    return asyncio.ensure_future(self._transfer(self.videos[index], page, results[index]))
+
+                pending = start_transfer(0)
+                for index, video in enumerate(self.videos):
+                    page = pages[index % len(pages)]
+                    error = await pending
+                    has_next = index + 1 < len(self.videos)
+                    # 两个标签页时，下一条在另一个标签页传输，与本条的填写、发布同时进行
+                    if has_next and len(pages) > 1:
+                        pending = start_transfer(index + 1)
+                    if error is None:
+                        await self._publish(video, page, results[index])
+                    else:
+                        results[index]['msg'] = f"{type(error).__name__}: {error}"
+                        await results[index].pop('monitor').finish()
+                        logger.error(f"[批量发布] {self.platform} {video.file_path} 传输失败: {error}")
+                        if PAGE_CLOSED in str(error):
+                            raise error
+                    if has_next and len(pages) == 1:
+                        pending = start_transfer(index + 1)
+                await context.storage_state(path=self.account_file)  # 保存cookie
+            finally:
+                if pending is not None and not pending.done():
+                    pending.cancel()
+                try:
+                    await context.close()
+                except Exception as ctx_error:
+                    logger.warning(f"[批量发布] 关闭浏览器上下文时出错（已忽略）: {str(ctx_error)}")
+
+        report.total_seconds = time.monotonic() - started
+        report.log()
+        return report
@@ -0,0 +1,336 @@
+import asyncio
+import contextvars
+import json
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+
+import psutil
+from patchright.async_api import async_playwright
+
+from social_auto_upload.conf import BROWSER_POOL_MAX_CONTEXTS, BROWSER_POOL_MAX_RSS_MB, BROWSER_POOL_MAX_ACTIVE, \
+    BROWSER_POOL_IDLE_TIMEOUT, BROWSER_POOL_BLOCK_WARN_SECONDS
+from social_auto_upload.utils.log import logger
+
+# 当前事件循环内生效的浏览器池，由 browser_pool_scope 设置
+_current_pool = contextvars.ContextVar("browser_pool", default=None)
+
+
+class _PooledBrowser(object):
+    def __init__(self, browser, pids):
+        self.browser = browser
+        self.pids = pids  # 浏览器主进程 pid，用于统计内存占用
+        self.active = 0  # 正在使用的上下文数量
+        self.served = 0  # 累计租出次数
+        self.retired = False
+        self.idle_since = time.monotonic()  # 最近一次没有上下文在使用的时间
+
+    def rss_mb(self):
+        total = 0
+        for pid in self.pids:
+            try:
+                proc = psutil.Process(pid)
+                total += proc.memory_info().rss
+                for child in proc.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+            except psutil.Error:
+                pass
+        return total / 1024 / 1024
+
+
+class _LeasedBrowser(object):
+    """租出的浏览器：记录通过它创建的上下文，租用结束时关闭仍未关闭的上下文
+
+    上传类只在成功时关闭自己的上下文，出错时由这里兜底，避免上下文泄漏在共用的浏览器中。
+    """
+
+    def __init__(self, browser):
+        self._browser = browser
+        self._contexts = []
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+    async def new_context(self, *args, **kwargs):
+        context = await self._browser.new_context(*args, **kwargs)
+        self._contexts.append(context)
+        return context
+
+    async def close_contexts(self):
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"[浏览器池] 关闭上下文时出错（已忽略）: {str(e)}")
+
+
+class BrowserPool(object):
+    """长驻的 Chromium 浏览器池
+
+    按 executable_path / proxy（含账号密码）/ headless / args 分组复用浏览器，每次上传只在浏览器内新建独立的上下文，
+    浏览器累计租出 max_contexts 次或内存超过 max_rss_mb 后不再分配新的上下文，等现有上下文全部关闭后回收；
+    空闲超过 idle_timeout 秒的浏览器也会关闭。每个分组单独加锁，启动、关闭浏览器不会阻塞其他分组。
+    """
+
+    def __init__(self, max_contexts=BROWSER_POOL_MAX_CONTEXTS, max_rss_mb=BROWSER_POOL_MAX_RSS_MB,
+                 max_active=BROWSER_POOL_MAX_ACTIVE, idle_timeout=BROWSER_POOL_IDLE_TIMEOUT):
+        self.max_contexts = max(1, int(max_contexts))
+        self.max_rss_mb = max_rss_mb
+        self.max_active = max(1, int(max_active))
+        self.idle_timeout = idle_timeout
+        self._playwright_cm = None
+        self._playwright = None
+        self._pools = {}
+        self._key_locks = {}
+        self._playwright_lock = asyncio.Lock()
+        self.launched = 0
+
+    async def _ensure_playwright(self):
+        async with self._playwright_lock:
+            if self._playwright is None:
+                self._playwright_cm = async_playwright()
+                self._playwright = await self._playwright_cm.__aenter__()
+            return self._playwright
+
+    def _key_lock(self, key):
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = self._key_locks[key] = asyncio.Lock()
+        return lock
+
+    @staticmethod
+    def _pool_key(options):
+        # 代理账号不同的浏览器不能共用（代理认证在启动时确定）
+        proxy = options.get('proxy') or {}
+        return json.dumps({
+            'executable_path': options.get('executable_path') or '',
+            'proxy': proxy if isinstance(proxy, dict) else str(proxy),
+            'headless': bool(options.get('headless')),
+            'args': list(options.get('args') or []),
+        }, sort_keys=True)
+
+    async def _launch(self, options):
+        playwright = await self._ensure_playwright()
+        launch_options = {k: v for k, v in options.items() if v not in (None, '')}
+        # 启动前后对比子进程，找出新启动的浏览器主进程
+        before = {p.pid for p in psutil.Process().children(recursive=True)}
+        browser = await playwright.chromium.launch(**launch_options)
+        new_pids = {p.pid for p in psutil.Process().children(recursive=True)} - before
+        pids = []
+        for pid in new_pids:
+            try:
+                # 只保留最顶层的新进程，渲染进程在统计内存时按子进程累加
+                if psutil.Process(pid).ppid() not in new_pids:
+                    pids.append(pid)
+            except psutil.Error:
+                pass
+        self.launched += 1
+        logger.info(f"[浏览器池] 启动新浏览器，当前累计启动 {self.launched} 次")
+        return _PooledBrowser(browser, pids)
+
+    async def _close_browser(self, item):
+        try:
+            await item.browser.close()
+        except Exception as e:
+            logger.warning(f"[浏览器池] 关闭浏览器时出错（已忽略）: {str(e)}")
+
+    async def _acquire(self, options):
+        key = self._pool_key(options)
+        stale = []
+        async with self._key_lock(key):
+            items = self._pools.setdefault(key, [])
+            for item in items:
+                if item.retired or item.active >= self.max_active:
+                    continue
+                if not item.browser.is_connected():
+                    item.retired = True
+                    continue
+                if self.max_rss_mb and item.rss_mb() > self.max_rss_mb:
+                    logger.info(f"[浏览器池] 浏览器内存超过 {self.max_rss_mb}MB，等待回收")
+                    item.retired = True
+                    continue
+                break
+            else:
+                item = await self._launch(options)
+                items.append(item)
+            item.active += 1
+            item.served += 1
+            if item.served >= self.max_contexts:
+                item.retired = True
+            # 已回收且没有上下文在使用的浏览器（如断开连接的）移出分组
+            stale = [other for other in items if other.retired and other.active <= 0]
+            for other in stale:
+                items.remove(other)
+        for other in stale:
+            await self._close_browser(other)
+        return key, item
+
+    async def _release(self, key, item):
+        close = False
+        async with self._key_lock(key):
+            item.active -= 1
+            if item.active <= 0:
+                item.idle_since = time.monotonic()
+                if item.retired:
+                    items = self._pools.get(key, [])
+                    if item in items:
+                        items.remove(item)
+                    close = True
+                elif self.idle_timeout:
+                    asyncio.get_running_loop().call_later(
+                        self.idle_timeout, lambda: asyncio.ensure_future(self._close_if_idle(key, item)))
+        # 在分组锁外关闭浏览器
+        if close:
+            await self._close_browser(item)
+
+    async def _close_if_idle(self, key, item):
+        async with self._key_lock(key):
+            if item.active > 0 or time.monotonic() - item.idle_since < self.idle_timeout:
+                return
+            items = self._pools.get(key, [])
+            if item not in items:
+                return
+            items.remove(item)
+        logger.info(f"[浏览器池] 浏览器空闲超过 {self.idle_timeout} 秒，关闭")
+        await self._close_browser(item)
+
+    @asynccontextmanager
+    async def lease(self, options):
+        """租用一个浏览器，调用方在浏览器内创建并关闭自己的上下文，租用结束时仍未关闭的上下文会被关闭"""
+        key, item = await self._acquire(options)
+        leased = _LeasedBrowser(item.browser)
+        try:
+            yield leased
+        finally:
+            await leased.close_contexts()
+            await self._release(key, item)
+
+    async def close(self):
+        pools, self._pools = self._pools, {}
+        for items in pools.values():
+            for item in items:
+                await self._close_browser(item)
+        async with self._playwright_lock:
+            if self._playwright_cm is not None:
+                try:
+                    await self._playwright_cm.__aexit__(None, None, None)
+                except Exception as e:
+                    logger.warning(f"[浏览器池] 关闭 playwright 时出错（已忽略）: {str(e)}")
+                self._playwright_cm = None
+                self._playwright = None
+
+
+def get_browser_pool():
+    """返回当前上下文中生效的浏览器池，未启用时返回 None"""
+    return _current_pool.get()
+
+
+@asynccontextmanager
+async def browser_pool_scope(**kwargs):
+    """在作用域内启用浏览器池，作用域结束时关闭池内所有浏览器
+
+    已经在长驻浏览器池中运行（run_with_browser_pool）时直接使用该池，作用域结束时不关闭。
+    """
+    current = _current_pool.get()
+    if current is not None:
+        yield current
+        return
+    pool = BrowserPool(**kwargs)
+    token = _current_pool.set(pool)
+    try:
+        yield pool
+    finally:
+        _current_pool.reset(token)
+        await pool.close()
+
+
+class LoopWatchdog(object):
+    """检测事件循环被同步调用阻塞
+
+    循环内的协程每 interval 秒记录一次心跳，后台线程发现心跳超过 threshold 秒没有更新时，
+    输出循环线程当前的调用栈（即阻塞所在的位置），每次阻塞只告警一次。
+    """
+
+    def __init__(self, loop, loop_thread_id, threshold, interval=0.2):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.threshold = threshold
+        self.interval = interval
+        self.last_beat = time.monotonic()
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._reported = False
+        self._stopped = threading.Event()
+
+    async def _beat(self):
+        while not self._stopped.is_set():
+            self.last_beat = time.monotonic()
+            self._reported = False
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            lag = time.monotonic() - self.last_beat - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag < self.threshold or self._reported:
+                continue
+            self._reported = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)[-6:]) if frame is not None else ''
+            logger.warning(f"[浏览器池] 事件循环已被阻塞 {lag:.1f} 秒，所有账号的上传都会暂停；"
+                           f"上传代码中的同步调用需要改为异步或放到 run_in_executor 中执行，当前位置：\n{stack}")
+
+    def start(self):
+        asyncio.run_coroutine_threadsafe(self._beat(), self.loop)
+        threading.Thread(target=self._watch, name="browser-pool-watchdog", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+
+# 长驻浏览器池：playwright 对象绑定事件循环，池和它的事件循环放在同一个后台线程中，多个发布任务共用
+_shared_loop = None
+_shared_pool = None
+_shared_watchdog = None
+_shared_lock = threading.Lock()
+
+
+def _get_shared_loop():
+    global _shared_loop, _shared_watchdog
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_shared_loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            if BROWSER_POOL_BLOCK_WARN_SECONDS:
+                _shared_watchdog = LoopWatchdog(_shared_loop, thread.ident, BROWSER_POOL_BLOCK_WARN_SECONDS).start()
+        return _shared_loop
+
+
+def run_with_browser_pool(coro):
+    """在长驻浏览器池的事件循环中执行 coro 并等待结果（供同步代码调用，替代 asyncio.run）
+
+    不同任务之间复用池内的浏览器，单文件、单账号的任务也不必每次重新启动浏览器。
+    所有任务共用一个事件循环线程，coro 中不能有阻塞调用（time.sleep、requests、同步数据库 / 大文件读写、
+    subprocess 等），否则所有账号的上传都会一起停顿；这类调用需要放到 loop.run_in_executor 中执行。
+    LoopWatchdog 会对超过 BROWSER_POOL_BLOCK_WARN_SECONDS 的阻塞输出告警和调用栈。
+    """
+    async def runner():
+        global _shared_pool
+        if _shared_pool is None:
+            _shared_pool = BrowserPool()
+        token = _current_pool.set(_shared_pool)
+        try:
+            return await coro
+        finally:
+            _current_pool.reset(token)
+
+    return asyncio.run_coroutine_threadsafe(runner(), _get_shared_loop()).result()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import requests
 
@@ -46,12 +47,15 @@ async def _get_camoufox_config(par_):
                 tencent_logger.warning(f"插件目录不存在或不是有效目录: {addons_path}")
         except Exception as e:
             tencent_logger.error(f"加载插件时出错: {str(e)}")
-    fingerprint = fingerprint_manager.get_or_create_fingerprint(os.path.basename(par_.account_file))
+    # 指纹读写数据库、代理检测是同步网络请求，放到线程池执行，不阻塞共用的事件循环（见 browser_pool）
+    loop = asyncio.get_running_loop()
+    fingerprint = await loop.run_in_executor(None, fingerprint_manager.get_or_create_fingerprint,
+                                             os.path.basename(par_.account_file))
     
     # 如果代理设置存在，先测试是否能访问 api.ipify.org
     enable_geoip = True
     if par_.proxy_setting and par_.proxy_setting.get('server'):
-        enable_geoip = test_geoip_with_proxy(par_.proxy_setting)
+        enable_geoip = await loop.run_in_executor(None, test_geoip_with_proxy, par_.proxy_setting)
     
     return {
         'humanize': 0.75,
@@ -0,0 +1,223 @@
+"""
+cookie 轻量探测：用 storage_state 中的 cookie 直接请求平台的登录态接口判断 cookie 是否有效，
+只有结果无法判断时才需要回退到浏览器校验。
+
+探测定义按平台类型注册，新增平台或接口变更时继承 CookieProbe 并调用 register_probe 即可。
+"""
+import asyncio
+import json
+
+import aiohttp
+from aiohttp import ThreadedResolver
+
+from social_auto_upload.utils.log import logger
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+class CookieProbe(object):
+    """单个平台的探测定义
+
+    judge 返回 True 表示有效，False 表示失效，None 表示无法判断（需要回退到浏览器校验）。
+    """
+    name = ''
+    domain = ''  # 只携带该域名下的 cookie
+    method = 'GET'
+    url = ''
+    # 出现即说明已登录失效的业务错误码
+    expired_codes = ()
+    # 缺少任意一个即视为失效的 cookie
+    required_cookies = ()
+
+    def build_headers(self, cookies):
+        return {
+            'Accept': 'application/json, text/plain, */*',
+            'User-Agent': DEFAULT_USER_AGENT,
+        }
+
+    def build_body(self, cookies):
+        return None
+
+    def judge(self, status, payload):
+        return None
+
+
+class DouyinProbe(CookieProbe):
+    name = 'douyin'
+    domain = 'douyin.com'
+    url = 'https://creator.douyin.com/web/api/media/user/info/'
+    expired_codes = (8,)
+
+    def judge(self, status, payload):
+        if not isinstance(payload, dict):
+            return None
+        code = payload.get('status_code')
+        if code == 0 and payload.get('user'):
+            return True
+        if code in self.expired_codes:
+            return False
+        return None
+
+
+class TencentProbe(CookieProbe):
+    name = 'tencent'
+    domain = 'weixin.qq.com'
+    method = 'POST'
+    url = 'https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/notification/notification_list'
+    expired_codes = (300333, 300334)
+    required_cookies = ('sessionid', 'wxuin')
+
+    def build_headers(self, cookies):
+        headers = super().build_headers(cookies)
+        headers['Content-Type'] = 'application/json'
+        headers['X-WECHAT-UIN'] = cookies.get('wxuin', '')
+        return headers
+
+    def build_body(self, cookies):
+        return {
+            'pageSize': 1,
+            'currentPage': 1,
+            'reqType': 1,
+            '_log_finder_uin': '',
+            '_log_finder_id': '',
+            'scene': 7,
+            'reqScene': 7
+        }
+
+    def judge(self, status, payload):
+        if not isinstance(payload, dict):
+            return None
+        code = payload.get('errCode')
+        if code == 0:
+            return True
+        if code in self.expired_codes:
+            return False
+        return None
+
+
+class KuaishouProbe(CookieProbe):
+    name = 'kuaishou'
+    domain = 'kuaishou.com'
+    method = 'POST'
+    url = 'https://cp.kuaishou.com/rest/cp/creator/pc/home/infoV2'
+    expired_codes = (109,)
+
+    def build_headers(self, cookies):
+        headers = super().build_headers(cookies)
+        headers['Content-Type'] = 'application/json'
+        return headers
+
+    def build_body(self, cookies):
+        return {}
+
+    def judge(self, status, payload):
+        if not isinstance(payload, dict):
+            return None
+        code = payload.get('result')
+        if code == 1:
+            return True
+        if code in self.expired_codes:
+            return False
+        return None
+
+
+class XiaohongshuProbe(CookieProbe):
+    name = 'xiaohongshu'
+    domain = 'xiaohongshu.com'
+    url = 'https://creator.xiaohongshu.com/api/galaxy/user/info'
+    expired_codes = (-100, -101)
+
+    def judge(self, status, payload):
+        if not isinstance(payload, dict):
+            return None
+        if payload.get('success') and payload.get('code') == 0:
+            return True
+        if payload.get('code') in self.expired_codes:
+            return False
+        return None
+
+
+# 平台类型 -> 探测定义，类型编号与 user_info.type 一致
+PROBES = {}
+
+
+def register_probe(platform_type, probe):
+    PROBES[platform_type] = probe
+
+
+register_probe(1, XiaohongshuProbe())
+register_probe(2, TencentProbe())
+register_probe(3, DouyinProbe())
+register_probe(4, KuaishouProbe())
+
+
+def load_cookies(account_file, domain=''):
+    """读取 storage_state 文件中指定域名下的 cookie，返回 {name: value}"""
+    with open(account_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    cookies_list = state.get('cookies', []) if isinstance(state, dict) else state
+    cookies = {}
+    for cookie in cookies_list:
+        cookie_domain = cookie.get('domain', '').lstrip('.')
+        if not domain or cookie_domain == domain or cookie_domain.endswith('.' + domain):
+            cookies[cookie['name']] = cookie['value']
+    return cookies
+
+
+def create_probe_session(timeout=5):
+    resolver = ThreadedResolver()  # 使用线程池进行DNS解析，避免Windows异步DNS问题
+    connector = aiohttp.TCPConnector(resolver=resolver, ssl=False)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+
+
+def _proxy_kwargs(proxy_setting):
+    """把 playwright 格式的代理设置转换为 aiohttp 请求参数"""
+    if not proxy_setting or not proxy_setting.get('server'):
+        return {}
+    kwargs = {'proxy': proxy_setting['server']}
+    if proxy_setting.get('username'):
+        kwargs['proxy_auth'] = aiohttp.BasicAuth(proxy_setting['username'], proxy_setting.get('password', ''))
+    return kwargs
+
+
+async def probe_cookie(platform_type, account_file, session=None, timeout=5, proxy_setting=None):
+    """用单个 HTTP 请求判断 cookie 是否有效，返回 True / False，无法判断时返回 None
+
+    proxy_setting 与 playwright 的 proxy 参数格式一致，保证探测请求与浏览器使用同一出口 IP。
+    """
+    probe = PROBES.get(platform_type)
+    if probe is None:
+        return None
+    try:
+        cookies = load_cookies(account_file, probe.domain)
+    except (OSError, ValueError) as e:
+        logger.warning(f"[cookie探测] 读取 cookie 文件失败 {account_file}: {str(e)}")
+        return None
+    if not cookies or any(name not in cookies for name in probe.required_cookies):
+        return False
+
+    own_session = session is None
+    if own_session:
+        session = create_probe_session(timeout)
+    try:
+        body = probe.build_body(cookies)
+        async with session.request(probe.method, probe.url, headers=probe.build_headers(cookies),
+                                   cookies=cookies, json=body, allow_redirects=False,
+                                   **_proxy_kwargs(proxy_setting)) as response:
+            if response.status in (301, 302) and 'login' in response.headers.get('Location', ''):
+                return False
+            if response.status == 401:
+                return False
+            if response.status != 200:
+                return None
+            try:
+                payload = await response.json(content_type=None)
+            except ValueError:
+                return None
+            return probe.judge(response.status, payload)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"[cookie探测] {probe.name} 请求失败: {str(e)}")
+        return None
+    finally:
+        if own_session:
+            await session.close()
@@ -0,0 +1,310 @@
+"""
+上传前的媒体预处理：用 ffprobe 探测视频，只在需要时转封装或转码为平台偏好的格式，
+在打开浏览器之前修复有问题的文件，避免上传后才出现“视频解析失败”或平台二次处理。
+
+- moov 不在文件头：转封装（-c copy -movflags +faststart），不重新编码；
+- 非 H.264 / AAC、像素格式不是 yuv420p、分辨率或码率超过平台配置：用 libx264 / aac 转码；
+- 输出按 源文件路径、大小、修改时间 + 平台配置 缓存在 MEDIA_CACHE_DIR，同一文件发往多个账号或重复发布时只处理一次；
+  缓存总大小超过 MEDIA_CACHE_MAX_GB 时按最近使用时间淘汰；
+- ffprobe / ffmpeg 本身就是子进程，由线程池调度，同时处理的文件数不超过 MEDIA_PREFLIGHT_WORKERS；
+  不使用进程池，避免 spawn 方式（Windows / macOS）下子进程重新导入主模块；
+- 未安装 ffmpeg 或处理失败时使用原文件，不影响发布。
+
+用法：
+    results = get_media_preflight().prepare(file_paths, 'tencent')
+    upload_paths = [result['path'] for result in results]
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from social_auto_upload.conf import MEDIA_PREFLIGHT_WORKERS, MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_GB, FFMPEG_PATH, \
+    FFPROBE_PATH
+from social_auto_upload.utils.log import logger
+
+ACTION_NONE = 'none'
+ACTION_REMUX = 'remux'
+ACTION_TRANSCODE = 'transcode'
+ACTION_ERROR = 'error'
+
+# 各平台偏好的格式：max_long_edge 为长边上限（像素），max_video_kbps 为视频码率上限
+DEFAULT_PROFILE = {'video_codec': 'h264', 'audio_codec': 'aac', 'pix_fmt': 'yuv420p',
+                   'max_long_edge': 1920, 'max_video_kbps': 10000, 'faststart': True}
+PROFILES = {
+    'tencent': dict(DEFAULT_PROFILE, max_video_kbps=8000),
+    'douyin': dict(DEFAULT_PROFILE, max_video_kbps=15000),
+    'kuaishou': dict(DEFAULT_PROFILE),
+    'xiaohongshu': dict(DEFAULT_PROFILE),
+}
+
+PROBE_TIMEOUT = 60
+TRANSCODE_TIMEOUT = 3600
+TRANSCODE_PRESET = 'veryfast'
+TRANSCODE_CRF = 20
+AUDIO_KBPS = 128
+CACHE_KEEP_SECONDS = 6 * 60 * 60  # 最近这段时间内用过的缓存不淘汰（可能仍在上传）
+
+
+def profile_for(platform):
+    return PROFILES.get(platform, DEFAULT_PROFILE)
+
+
+def profile_key(platform, profile):
+    """缓存键中的配置部分：平台名 + 配置内容摘要，修改配置后旧缓存自动失效"""
+    digest = hashlib.md5(json.dumps(profile, sort_keys=True).encode()).hexdigest()[:8]
+    return f'{platform}-{digest}'
+
+
+def source_key(path):
+    """缓存键中的源文件部分：绝对路径 + 大小 + 修改时间的摘要，不读取文件内容，文件被修改后旧缓存自动失效"""
+    stat = os.stat(path)
+    return hashlib.md5(f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'.encode()).hexdigest()
+
+
+def prune_cache(cache_dir, max_bytes, keep_seconds=CACHE_KEEP_SECONDS, now=None):
+    """缓存目录超过 max_bytes 时按最近使用时间从旧到新删除条目，返回删除的条目数
+
+    条目的最近使用时间为其中文件的修改时间（命中缓存时会更新），keep_seconds 内用过的条目不删除；
+    进程中断遗留的临时文件超过 TRANSCODE_TIMEOUT 后直接删除。
+    """
+    now = now or time.time()
+    try:
+        entry_dirs = [entry_dir for entry_dir in Path(cache_dir).iterdir() if entry_dir.is_dir()]
+    except FileNotFoundError:
+        return 0
+    entries = []
+    total = 0
+    for entry_dir in entry_dirs:
+        size, last_used = 0, 0
+        try:
+            for file in entry_dir.iterdir():
+                stat = file.stat()
+                if file.name.startswith('.') and now - stat.st_mtime > TRANSCODE_TIMEOUT:
+                    file.unlink()
+                    continue
+                size += stat.st_size
+                last_used = max(last_used, stat.st_mtime)
+        except FileNotFoundError:
+            continue  # 其他进程正在清理
+        total += size
+        entries.append((last_used, size, entry_dir))
+
+    removed = 0
+    for last_used, size, entry_dir in sorted(entries):
+        if total <= max_bytes or now - last_used < keep_seconds:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def moov_before_mdat(path):
+    """按顶层 box 顺序判断 moov 是否在 mdat 之前（faststart），无法判断时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + 8 <= file_size:
+                f.seek(offset)
+                size, box_type = struct.unpack('>I4s', f.read(8))
+                if size == 1:
+                    size = struct.unpack('>Q', f.read(8))[0]
+                elif size == 0:
+                    size = file_size - offset
+                if box_type == b'moov':
+                    return True
+                if box_type == b'mdat':
+                    return False
+                if size < 8:
+                    return None
+                offset += size
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def probe(path):
+    """ffprobe 探测，返回 {duration, size, bit_rate, video: {...}, audio: {...}}"""
+    output = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', str(path)],
+        capture_output=True, timeout=PROBE_TIMEOUT, check=True
+    ).stdout
+    data = json.loads(output or b'{}')
+    fmt = data.get('format', {})
+    info = {
+        'format': fmt.get('format_name', ''),
+        'duration': float(fmt.get('duration') or 0),
+        'size': int(fmt.get('size') or 0),
+        'bit_rate': int(fmt.get('bit_rate') or 0),
+        'video': None,
+        'audio': None,
+    }
+    for stream in data.get('streams', []):
+        kind = stream.get('codec_type')
+        if kind == 'video' and info['video'] is None:
+            info['video'] = {
+                'codec': stream.get('codec_name', ''),
+                'width': int(stream.get('width') or 0),
+                'height': int(stream.get('height') or 0),
+                'pix_fmt': stream.get('pix_fmt', ''),
+                'bit_rate': int(stream.get('bit_rate') or 0),
+            }
+        elif kind == 'audio' and info['audio'] is None:
+            info['audio'] = {'codec': stream.get('codec_name', '')}
+    return info
+
+
+def decide(info, profile, faststart):
+    """根据探测结果和平台配置决定处理方式，返回 (action, reasons)"""
+    reasons = []
+    video = info.get('video')
+    if video is None:
+        return ACTION_ERROR, ['没有视频流']
+    if video['codec'] != profile['video_codec']:
+        reasons.append(f"视频编码 {video['codec']}")
+    if profile.get('pix_fmt') and video['pix_fmt'] and video['pix_fmt'] != profile['pix_fmt']:
+        reasons.append(f"像素格式 {video['pix_fmt']}")
+    if max(video['width'], video['height']) > profile['max_long_edge']:
+        reasons.append(f"分辨率 {video['width']}x{video['height']}")
+    video_kbps = (video['bit_rate'] or info['bit_rate']) / 1000
+    if video_kbps > profile['max_video_kbps']:
+        reasons.append(f'码率 {video_kbps:.0f}kbps')
+    audio = info.get('audio')
+    if audio is not None and audio['codec'] != profile['audio_codec']:
+        reasons.append(f"音频编码 {audio['codec']}")
+    if reasons:
+        return ACTION_TRANSCODE, reasons
+    if profile.get('faststart') and faststart is False:
+        return ACTION_REMUX, ['moov 不在文件头']
+    return ACTION_NONE, []
+
+
+def ffmpeg_args(src, dst, action, profile, info):
+    if action == ACTION_REMUX:
+        return [FFMPEG_PATH, '-y', '-v', 'error', '-i', str(src), '-map', '0', '-c', 'copy',
+                '-movflags', '+faststart', str(dst)]
+    edge = profile['max_long_edge']
+    # 长边不超过 edge，保持比例，宽高取偶数
+    scale = (f"scale=w='min(iw,{edge})':h='min(ih,{edge})':force_original_aspect_ratio=decrease,"
+             f"scale=trunc(iw/2)*2:trunc(ih/2)*2")
+    max_kbps = profile['max_video_kbps']
+    args = [FFMPEG_PATH, '-y', '-v', 'error', '-i', str(src), '-map', '0:v:0', '-map', '0:a:0?',
+            '-vf', scale, '-c:v', 'libx264', '-preset', TRANSCODE_PRESET, '-crf', str(TRANSCODE_CRF),
+            '-maxrate', f'{max_kbps}k', '-bufsize', f'{max_kbps * 2}k', '-pix_fmt', profile.get('pix_fmt') or 'yuv420p']
+    if info.get('audio') is not None:
+        args += ['-c:a', 'aac', '-b:a', f'{AUDIO_KBPS}k']
+    return args + ['-movflags', '+faststart', str(dst)]
+
+
+def preflight_file(path, platform, cache_dir=MEDIA_CACHE_DIR):
+    """探测单个文件并在需要时处理（在线程池中执行），返回结果字典，path 为实际要上传的文件"""
+    started = time.time()
+    result = {'source': str(path), 'path': str(path), 'action': ACTION_NONE, 'reasons': [], 'cached': False}
+    try:
+        profile = profile_for(platform)
+        info = probe(path)
+        action, reasons = decide(info, profile, moov_before_mdat(path))
+        result.update(action=action, reasons=reasons, duration=info['duration'])
+        if action in (ACTION_REMUX, ACTION_TRANSCODE):
+            # 输出放在 {md5}_{配置} 目录下并保留原文件名，发布结果中的文件名不变
+            target_dir = Path(cache_dir) / f'{source_key(path)}_{profile_key(platform, profile)}'
+            target = target_dir / Path(path).name
+            if target.exists():
+                os.utime(target)  # 记录最近使用时间，淘汰时按它排序
+                result['cached'] = True
+            else:
+                target_dir.mkdir(parents=True, exist_ok=True)
+                # 临时文件名带进程、线程 id，同一文件同时被多个任务处理时互不覆盖
+                tmp = target_dir / f'.{os.getpid()}-{threading.get_ident()}.tmp{Path(path).suffix or ".mp4"}'
+                try:
+                    subprocess.run(ffmpeg_args(path, tmp, action, profile, info), capture_output=True,
+                                   timeout=TRANSCODE_TIMEOUT, check=True)
+                    os.replace(tmp, target)
+                finally:
+                    if tmp.exists():
+                        tmp.unlink()
+            result['path'] = str(target)
+    except FileNotFoundError as e:
+        result.update(action=ACTION_ERROR, reasons=[f'未找到 ffmpeg / ffprobe 或文件不存在: {e}'])
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b'').decode('utf-8', 'ignore').strip()[-300:]
+        result.update(action=ACTION_ERROR, reasons=[f'{Path(e.cmd[0]).name} 执行失败: {stderr}'])
+    except Exception as e:
+        result.update(action=ACTION_ERROR, reasons=[f'{type(e).__name__}: {e}'])
+    result['elapsed'] = time.time() - started
+    return result
+
+
+class MediaPreflight(object):
+    def __init__(self, max_workers=MEDIA_PREFLIGHT_WORKERS, cache_dir=MEDIA_CACHE_DIR, max_cache_gb=MEDIA_CACHE_MAX_GB):
+        self.max_workers = max(1, int(max_workers))
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = int(max_cache_gb * 1024 * 1024 * 1024)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='media-preflight')
+            return self._executor
+
+    @staticmethod
+    def available():
+        return shutil.which(FFPROBE_PATH) is not None and shutil.which(FFMPEG_PATH) is not None
+
+    def submit(self, path, platform):
+        return self.executor.submit(preflight_file, str(path), platform, str(self.cache_dir))
+
+    def prepare(self, paths, platform):
+        """并行处理一批文件，按输入顺序返回结果；处理失败的文件 path 仍为原文件"""
+        if not paths:
+            return []
+        if not self.available():
+            logger.warning('[媒体预处理] 未找到 ffmpeg / ffprobe，跳过预处理')
+            return [{'source': str(path), 'path': str(path), 'action': ACTION_NONE, 'reasons': [], 'cached': False}
+                    for path in paths]
+        futures = [self.submit(path, platform) for path in paths]
+        results = [future.result() for future in futures]
+        for result in results:
+            name = Path(result['source']).name
+            if result['action'] == ACTION_ERROR:
+                logger.warning(f"[媒体预处理] {platform} {name} 处理失败，使用原文件：{'；'.join(result['reasons'])}")
+            elif result['action'] != ACTION_NONE:
+                source = '缓存' if result['cached'] else f"耗时 {result['elapsed']:.1f}s"
+                logger.info(f"[媒体预处理] {platform} {name} {result['action']}（{'，'.join(result['reasons'])}），{source}")
+        if any(result['path'] != result['source'] and not result['cached'] for result in results):
+            self.prune()
+        return results
+
+    def prune(self):
+        """缓存超过上限时淘汰最久未使用的输出"""
+        removed = prune_cache(self.cache_dir, self.max_cache_bytes)
+        if removed:
+            logger.info(f"[媒体预处理] 缓存超过 {self.max_cache_bytes / 1024 ** 3:g} GB，已淘汰 {removed} 个最久未使用的文件")
+        return removed
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+_media_preflight = None
+
+
+def get_media_preflight():
+    global _media_preflight
+    if _media_preflight is None:
+        _media_preflight = MediaPreflight()
+    return _media_preflight
@@ -0,0 +1,110 @@
+"""
+页面条件等待：同时等待多个选择器 / URL，任意一个满足即返回，替代固定 sleep 的轮询循环。
+
+- 每个条件交给 playwright 自己的 wait_for_selector / wait_for_url 等待，不在 Python 里轮询；
+- 整体有总超时，超过后抛出 PageWaitTimeout，不会无限等待；
+- 等待期间每隔 progress_interval 秒调用一次 on_progress(已等待秒数)，可用于输出进度或重复点击按钮。
+
+用法：
+    matched = await wait_for_any(page, [
+        selector('uploaded', '[class^="long-card"] div:has-text("重新上传")'),
+        selector('failed', 'div.progress-div > div:has-text("上传失败")'),
+    ], timeout=1800, on_progress=lambda elapsed: logger.info(f'已上传 {elapsed:.0f} 秒'))
+    if matched == 'failed':
+        ...
+"""
+import asyncio
+import time
+
+from patchright.async_api import TimeoutError as PlaywrightTimeoutError
+
+DEFAULT_PROGRESS_INTERVAL = 5  # 进度回调间隔（秒）
+
+
+class PageWaitTimeout(TimeoutError):
+    def __init__(self, conditions, elapsed):
+        self.conditions = conditions
+        self.elapsed = elapsed
+        names = '、'.join(condition.name for condition in conditions)
+        super().__init__(f'等待 {names} 超时（{elapsed:.0f} 秒）')
+
+
+class Condition(object):
+    """等待条件：name 为返回给调用方的名称，kind 为 selector 或 url"""
+
+    def __init__(self, name, kind, value, state='visible'):
+        self.name = name
+        self.kind = kind
+        self.value = value
+        self.state = state
+
+    async def wait(self, page, timeout):
+        if self.kind == 'url':
+            await page.wait_for_url(self.value, timeout=timeout * 1000)
+        else:
+            await page.wait_for_selector(self.value, state=self.state, timeout=timeout * 1000)
+
+
+def selector(name, value, state='visible'):
+    return Condition(name, 'selector', value, state)
+
+
+def url(name, pattern):
+    return Condition(name, 'url', pattern)
+
+
+async def _call(callback, *args):
+    result = callback(*args)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+async def wait_for_any(page, conditions, timeout, on_progress=None, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """等待任意一个条件满足，返回该条件的 name；timeout 秒内都未满足时抛出 PageWaitTimeout
+
+    单个条件自身超时不影响其他条件；页面关闭等其他异常直接抛出。
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    tasks = {asyncio.ensure_future(condition.wait(page, timeout)): condition for condition in conditions}
+    try:
+        while tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(tasks, timeout=min(progress_interval, remaining),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                condition = tasks.pop(task)
+                error = task.exception()
+                if error is None:
+                    return condition.name
+                if not isinstance(error, PlaywrightTimeoutError):
+                    raise error
+            if tasks and on_progress is not None and time.monotonic() < deadline:
+                await _call(on_progress, time.monotonic() - started)
+        raise PageWaitTimeout(conditions, time.monotonic() - started)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class Deadline(object):
+    """多段等待共用的总期限：remaining() 为剩余秒数，超过期限时抛出 PageWaitTimeout"""
+
+    def __init__(self, timeout, description=''):
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.description = description
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise PageWaitTimeout([Condition(self.description, 'deadline', None)], self.elapsed)
+        return remaining
@@ -0,0 +1,226 @@
+"""
+平台写操作（删除、隐藏等）限流：按 账号 + 接口 分别限速，并记录每日额度。
+
+- 令牌桶控制请求间隔，接口失败时降低速率（乘性退避），成功后逐步恢复；
+- 每日额度记录在 api_quota_ledger 表中：平台提示“今日操作太频繁”时记下当天已成功的次数，
+  之后以最近几天触发限制时的次数作为每日上限，到达上限就不再请求，避免再次触发限制；
+- 额度用完时未执行的操作写入 api_deferred_actions 表排队，额度重置后由调用方取出继续执行
+  （视频号由违规巡检线程在额度恢复后自动执行）。
+
+用法：
+    limiter = get_rate_limiter()
+    if await limiter.acquire(account, 'delete'):
+        ok = ...
+        limiter.report(account, 'delete', ok)
+    else:
+        limiter.defer(account, 'delete', export_id)
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from db_manager import get_db_manager
+from social_auto_upload.utils.log import logger
+
+# 各接口的默认限速：rate 为每秒请求数，capacity 为允许的突发请求数，
+# min_rate 为退避后的最低速率，daily_quota 为每日上限（0 表示使用学习到的上限）
+DEFAULT_LIMIT = {'rate': 1.0, 'capacity': 1, 'min_rate': 1 / 60, 'daily_quota': 0}
+RATE_LIMIT_DEFAULTS = {
+    'delete': {'rate': 1 / 1.5, 'capacity': 1, 'min_rate': 1 / 60, 'daily_quota': 0},
+    'hide': {'rate': 1 / 1.5, 'capacity': 1, 'min_rate': 1 / 60, 'daily_quota': 0},
+}
+
+BACKOFF_FACTOR = 0.5  # 失败后速率减半
+RECOVER_FACTOR = 1.2  # 成功后速率逐步恢复到配置值
+QUOTA_RESET_HOUR = 0  # 每日额度重置的时刻（本地时间）
+QUOTA_LEARN_DAYS = 7  # 按最近几天触发限制时的次数估算每日上限
+
+
+def quota_day(timestamp=None):
+    """额度所属的日期（按 QUOTA_RESET_HOUR 切分）"""
+    moment = datetime.fromtimestamp(timestamp or time.time()) - timedelta(hours=QUOTA_RESET_HOUR)
+    return moment.strftime('%Y-%m-%d')
+
+
+def seconds_until_reset(timestamp=None):
+    now = datetime.fromtimestamp(timestamp or time.time())
+    reset = now.replace(hour=QUOTA_RESET_HOUR, minute=0, second=0, microsecond=0)
+    if reset <= now:
+        reset += timedelta(days=1)
+    return (reset - now).total_seconds()
+
+
+class TokenBucket(object):
+    """令牌桶：reserve 预留一个令牌并返回需要等待的秒数，令牌可以透支，等待时间按透支量计算"""
+
+    def __init__(self, rate, capacity, min_rate):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def backoff(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            return self.rate
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.base_rate, self.rate * RECOVER_FACTOR)
+
+
+class RateLimiter(object):
+    def __init__(self):
+        self.db_manager = get_db_manager()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.init_db()
+
+    def init_db(self):
+        with self.db_manager.get_session() as session:
+            session.execute(text('''CREATE TABLE IF NOT EXISTS api_quota_ledger (
+                account TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                day TEXT NOT NULL,                -- 额度日期
+                used INTEGER DEFAULT 0,           -- 当天成功次数
+                limited_at INTEGER DEFAULT 0,     -- 当天触发平台限制的时间，0 表示未触发
+                PRIMARY KEY (account, endpoint, day)
+            )'''))
+            session.execute(text('''CREATE TABLE IF NOT EXISTS api_deferred_actions (
+                account TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                target TEXT NOT NULL,             -- 操作对象，如 exportId
+                payload TEXT,                     -- 执行时需要的其他参数（JSON）
+                created_at INTEGER,
+                PRIMARY KEY (account, endpoint, target)
+            )'''))
+
+    @staticmethod
+    def limit(endpoint):
+        return RATE_LIMIT_DEFAULTS.get(endpoint, DEFAULT_LIMIT)
+
+    def bucket(self, account, endpoint):
+        key = (account, endpoint)
+        with self._lock:
+            if key not in self._buckets:
+                limit = self.limit(endpoint)
+                self._buckets[key] = TokenBucket(limit['rate'], limit['capacity'], limit['min_rate'])
+            return self._buckets[key]
+
+    def _ledger(self, account, endpoint, day=None):
+        row = self.db_manager._execute_query_one(
+            'SELECT used, limited_at FROM api_quota_ledger WHERE account = :account AND endpoint = :endpoint AND day = :day',
+            {'account': account, 'endpoint': endpoint, 'day': day or quota_day()}
+        )
+        return (row['used'], row['limited_at']) if row else (0, 0)
+
+    def daily_quota(self, account, endpoint):
+        """配置的每日上限，未配置时取最近几天触发限制时的最小成功次数，都没有时返回 None"""
+        configured = self.limit(endpoint).get('daily_quota')
+        if configured:
+            return configured
+        since = (datetime.now() - timedelta(days=QUOTA_LEARN_DAYS)).strftime('%Y-%m-%d')
+        row = self.db_manager._execute_query_one(
+            '''SELECT MIN(used) AS quota FROM api_quota_ledger
+               WHERE account = :account AND endpoint = :endpoint AND limited_at > 0 AND used > 0 AND day >= :since''',
+            {'account': account, 'endpoint': endpoint, 'since': since}
+        )
+        return row['quota'] if row and row['quota'] else None
+
+    def exhausted(self, account, endpoint):
+        """当天额度是否已用完（已触发平台限制，或已达到每日上限）"""
+        used, limited_at = self._ledger(account, endpoint)
+        if limited_at:
+            return True
+        quota = self.daily_quota(account, endpoint)
+        return quota is not None and used >= quota
+
+    async def acquire(self, account, endpoint):
+        """额度已用完时返回 False；否则按令牌桶等待后返回 True"""
+        if self.exhausted(account, endpoint):
+            return False
+        wait = self.bucket(account, endpoint).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def report(self, account, endpoint, ok, limited=False):
+        """上报请求结果：成功计入当天额度并恢复速率；失败退避；limited 表示平台提示当天额度已用完"""
+        bucket = self.bucket(account, endpoint)
+        params = {'account': account, 'endpoint': endpoint, 'day': quota_day(),
+                  'used': 1 if ok else 0, 'limited_at': int(time.time()) if limited else 0}
+        if ok or limited:
+            self.db_manager._execute_write(
+                '''INSERT INTO api_quota_ledger (account, endpoint, day, used, limited_at)
+                   VALUES (:account, :endpoint, :day, :used, :limited_at)
+                   ON CONFLICT(account, endpoint, day) DO UPDATE SET
+                       used = used + excluded.used,
+                       limited_at = CASE WHEN excluded.limited_at > 0 THEN excluded.limited_at ELSE limited_at END''',
+                params
+            )
+        if ok:
+            bucket.recover()
+        elif limited:
+            used, _ = self._ledger(account, endpoint)
+            logger.warning(f"[限流] {account} {endpoint} 触发平台每日限制（今日已成功 {used} 次），"
+                           f"{seconds_until_reset() / 3600:.1f} 小时后额度重置")
+        else:
+            rate = bucket.backoff()
+            logger.warning(f"[限流] {account} {endpoint} 请求失败，降低速率为每 {1 / rate:.1f} 秒一次")
+
+    def defer(self, account, endpoint, target, payload=None):
+        """额度用完时把操作加入队列，额度重置后再执行"""
+        self.db_manager._execute_write(
+            '''INSERT INTO api_deferred_actions (account, endpoint, target, payload, created_at)
+               VALUES (:account, :endpoint, :target, :payload, :created_at)
+               ON CONFLICT(account, endpoint, target) DO UPDATE SET payload = excluded.payload''',
+            {'account': account, 'endpoint': endpoint, 'target': target,
+             'payload': json.dumps(payload or {}, ensure_ascii=False), 'created_at': int(time.time())}
+        )
+
+    def deferred(self, account, endpoint):
+        """返回排队中的操作（按加入顺序），额度仍未恢复时返回空列表"""
+        if self.exhausted(account, endpoint):
+            return []
+        rows = self.db_manager._execute_query(
+            '''SELECT target, payload FROM api_deferred_actions
+               WHERE account = :account AND endpoint = :endpoint ORDER BY created_at''',
+            {'account': account, 'endpoint': endpoint}
+        )
+        return [{'target': row['target'], 'payload': json.loads(row['payload'] or '{}')} for row in rows]
+
+    def pending(self):
+        """有排队操作的 {(账号, 接口)}，不论额度是否恢复"""
+        rows = self.db_manager._execute_query('SELECT DISTINCT account, endpoint FROM api_deferred_actions', {})
+        return {(row['account'], row['endpoint']) for row in rows}
+
+    def complete(self, account, endpoint, target):
+        self.db_manager._execute_write(
+            'DELETE FROM api_deferred_actions WHERE account = :account AND endpoint = :endpoint AND target = :target',
+            {'account': account, 'endpoint': endpoint, 'target': target}
+        )
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,156 @@
+"""
+上传网络指标：监听浏览器上下文的网络事件，统计视频分片上传请求的字节数、吞吐、首字节时间和重试次数。
+
+用法：
+    monitor = UploadNetworkMonitor('douyin', self.file_path)
+    monitor.attach(context)
+    ...
+    self.upload_metrics = await monitor.finish()
+"""
+import asyncio
+import re
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from social_auto_upload.utils.log import logger
+
+# 各平台视频分片上传接口的 URL 特征
+UPLOAD_URL_PATTERNS = {
+    'douyin': re.compile(r'(tos-[\w-]+\.(snssdk|bytedance|volces|byteimg)|vod\.bytedanceapi|/upload/v1/|bytetos)', re.I),
+    'tencent': re.compile(r'(uploadpartdfs|applyuploaddfs|completepartuploaddfs|finder[\w-]*upload)', re.I),
+    'kuaishou': re.compile(r'(upload\.kuaishouzt\.com|/api/upload/fragment)', re.I),
+    'xiaohongshu': re.compile(r'(ros-upload[\w.-]*\.xiaohongshu\.com|/api/media/v1/upload)', re.I),
+    'toutiao': re.compile(r'(tos-[\w-]+\.(snssdk|bytedance|volces)|vod\.bytedanceapi|/upload/v1/)', re.I),
+    'tiktok': re.compile(r'(tos-[\w-]+\.(tiktok|byteoversea|ibyteimg)|vod-upload|/upload/v1/)', re.I),
+}
+
+# 用于区分同一个分片的查询参数，同一分片再次请求计为一次重试
+CHUNK_KEY_PARAMS = ('partnumber', 'part_number', 'fragment_id', 'chunk', 'chunkindex', 'chunk_index', 'offset',
+                    'uploadid', 'upload_id', 'phase')
+
+
+def _chunk_key(url):
+    parts = urlsplit(url)
+    params = sorted((k.lower(), v) for k, v in parse_qsl(parts.query) if k.lower() in CHUNK_KEY_PARAMS)
+    return parts.netloc + parts.path + '?' + '&'.join(f'{k}={v}' for k, v in params)
+
+
+class UploadNetworkMonitor(object):
+    """统计单次上传的网络指标"""
+
+    def __init__(self, platform, label='', url_pattern=None):
+        self.platform = platform
+        self.label = label
+        self.url_pattern = url_pattern or UPLOAD_URL_PATTERNS.get(platform)
+        self._target = None
+        self._started = {}
+        self._seen_chunks = {}
+        # 读取请求体大小的任务，finish 时等待全部完成，保证指标完整
+        self._pending = set()
+        self.requests = 0
+        self.finished = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.first_request_at = None
+        self.last_finished_at = None
+        self.ttfb_ms = []
+
+    def _match(self, request):
+        return (self.url_pattern is not None and request.method in ('POST', 'PUT')
+                and self.url_pattern.search(request.url) is not None)
+
+    def attach(self, target):
+        """监听 page 或 context 的网络事件"""
+        self._target = target
+        target.on('request', self._on_request)
+        target.on('requestfinished', self._on_request_finished)
+        target.on('requestfailed', self._on_request_failed)
+        return self
+
+    def detach(self):
+        if self._target is None:
+            return
+        for event, handler in (('request', self._on_request), ('requestfinished', self._on_request_finished),
+                               ('requestfailed', self._on_request_failed)):
+            try:
+                self._target.remove_listener(event, handler)
+            except Exception:
+                pass
+        self._target = None
+
+    def _on_request(self, request):
+        if not self._match(request):
+            return
+        now = time.time()
+        if self.first_request_at is None:
+            self.first_request_at = now
+        self.requests += 1
+        key = _chunk_key(request.url)
+        self._seen_chunks[key] = self._seen_chunks.get(key, 0) + 1
+        if self._seen_chunks[key] > 1:
+            self.retries += 1
+        self._started[request] = now
+
+    async def _add_body_size(self, request):
+        try:
+            sizes = await request.sizes()
+            size = sizes.get('requestBodySize', 0) or 0
+        except Exception:
+            length = request.headers.get('content-length')
+            size = int(length) if length and length.isdigit() else 0
+        self.bytes_sent += size
+
+    def _on_request_finished(self, request):
+        if self._started.pop(request, None) is None:
+            return
+        self.finished += 1
+        self.last_finished_at = time.time()
+        # 同步处理事件，只把读取请求体大小放到任务里并记录下来，避免 finish 时还有未执行完的回调
+        task = asyncio.ensure_future(self._add_body_size(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        timing = request.timing or {}
+        # timing 中的时间均为相对 startTime 的毫秒数，未获取到时为 -1
+        if timing.get('responseStart', -1) >= 0 and timing.get('requestStart', -1) >= 0:
+            self.ttfb_ms.append(timing['responseStart'] - timing['requestStart'])
+
+    def _on_request_failed(self, request):
+        if self._started.pop(request, None) is None:
+            return
+        self.failed += 1
+        logger.warning(f"[上传指标] {self.platform} {self.label} 分片请求失败: {request.failure}")
+
+    def summary(self):
+        duration = 0.0
+        if self.first_request_at and self.last_finished_at:
+            duration = max(self.last_finished_at - self.first_request_at, 0.001)
+        return {
+            'platform': self.platform,
+            'mode': 'browser',
+            'requests': self.requests,
+            'finished': self.finished,
+            'failed': self.failed,
+            'retries': self.retries,
+            'bytes_sent': self.bytes_sent,
+            'duration': round(duration, 2),
+            'bytes_per_second': int(self.bytes_sent / duration) if duration else 0,
+            'ttfb_avg_ms': round(sum(self.ttfb_ms) / len(self.ttfb_ms), 1) if self.ttfb_ms else None,
+            'ttfb_max_ms': round(max(self.ttfb_ms), 1) if self.ttfb_ms else None,
+        }
+
+    async def finish(self):
+        """停止监听，等待未完成的请求体大小读取后输出本次上传的网络指标"""
+        self.detach()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        metrics = self.summary()
+        if metrics['requests']:
+            logger.info(
+                f"[上传指标] {self.platform} {self.label} 分片请求 {metrics['requests']} 个（失败 {metrics['failed']}，"
+                f"重试 {metrics['retries']}），上传 {metrics['bytes_sent'] / 1024 / 1024:.2f} MB，"
+                f"耗时 {metrics['duration']} 秒，速度 {metrics['bytes_per_second'] / 1024 / 1024:.2f} MB/s，"
+                f"平均首字节 {metrics['ttfb_avg_ms']} ms")
+        else:
+            logger.info(f"[上传指标] {self.platform} {self.label} 未捕获到分片上传请求")
+        return metrics